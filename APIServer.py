@@ -1,15 +1,133 @@
 from flask import Flask, request, jsonify
 import time
 import uuid
+import base64
+import bisect
+import heapq
+import math
+import os
+import random
+import socket
+import struct
 from threading import Thread
 
 app = Flask(__name__)
 
 # In-memory cluster data
-nodes = {}       # node_id -> {cpu_cores, available_cpu, status, last_heartbeat, pods}
-pods = {}        # pod_id -> {node, cpu}
+nodes = {}       # node_id -> {cpu_cores, available_cpu, status, last_heartbeat, heartbeat_interval, suspect_beats,
+                 #             arrival_mean, arrival_var, pods}
+                 # pods is an insertion-ordered set, a dict of pod_id -> None
+pods = {}        # pod_id -> {node, cpu}; node is the reverse of the node's pod set
 node_load = {}   # node_id -> number of pods assigned
 
+# Secondary indexes for /nodes filtering and cursor pagination
+node_ids_sorted = []       # sorted node ids
+nodes_by_status = {}       # status -> set(node_id)
+nodes_by_available = {}    # available_cpu -> set(node_id)
+MAX_PAGE_SIZE = 1000
+
+def index_node(node_id):
+    info = nodes[node_id]
+    nodes_by_status.setdefault(info["status"], set()).add(node_id)
+    nodes_by_available.setdefault(info["available_cpu"], set()).add(node_id)
+
+def unindex_node(node_id):
+    info = nodes[node_id]
+    for index, value in ((nodes_by_status, info["status"]), (nodes_by_available, info["available_cpu"])):
+        index.get(value, set()).discard(node_id)
+        if not index.get(value, True):
+            del index[value]
+
+# UDP heartbeats: "HB", version, flags, handle (u32), sequence (u32), pod count (u16)
+UDP_HEARTBEAT_PORT = int(os.getenv("UDP_HEARTBEAT_PORT", "0"))  # 0 disables them
+HEARTBEAT_HEADER = struct.Struct("!2sBBIIH")
+heartbeat_handles = {}   # node_id -> handle
+handle_nodes = {}        # handle -> node_id
+handle_seq = {}          # handle -> last sequence number, None until the first datagram
+
+def heartbeat_handle(node_id):
+    """Handle for node_id's UDP heartbeats; registering again restarts its sequence"""
+    handle = heartbeat_handles.get(node_id)
+    if handle is None:
+        handle = random.getrandbits(32)
+        while handle in handle_nodes:
+            handle = random.getrandbits(32)
+        heartbeat_handles[node_id] = handle
+        handle_nodes[handle] = node_id
+    handle_seq[handle] = None
+    return handle
+
+# Heartbeat intervals told to nodes: max(10s, nodes / target rate) times a
+# backoff that grows while the measured rate is above the target. A node
+# whose heartbeat came late is told half the interval for its next 3.
+HEARTBEAT_TARGET_RATE = float(os.getenv("HEARTBEAT_TARGET_RATE", "100"))  # heartbeats/s for the whole fleet
+HEARTBEAT_BASE_INTERVAL, HEARTBEAT_MIN_INTERVAL, HEARTBEAT_MAX_INTERVAL = 10, 2, 120
+heartbeat_load = {"window_start": time.time(), "beats": 0, "backoff": 1.0, "interval": HEARTBEAT_BASE_INTERVAL}
+
+def next_heartbeat_interval(node_id):
+    now = time.time()
+    elapsed = now - heartbeat_load["window_start"]
+    if elapsed >= 10:
+        rate = heartbeat_load["beats"] / elapsed
+        if rate > HEARTBEAT_TARGET_RATE:
+            heartbeat_load["backoff"] = min(heartbeat_load["backoff"] * 1.5, HEARTBEAT_MAX_INTERVAL / HEARTBEAT_MIN_INTERVAL)
+        elif rate < 0.8 * HEARTBEAT_TARGET_RATE:
+            heartbeat_load["backoff"] = max(1.0, heartbeat_load["backoff"] / 1.25)
+        interval = max(HEARTBEAT_BASE_INTERVAL, len(nodes) / HEARTBEAT_TARGET_RATE) * heartbeat_load["backoff"]
+        heartbeat_load["interval"] = round(min(HEARTBEAT_MAX_INTERVAL, max(HEARTBEAT_MIN_INTERVAL, interval)), 2)
+        heartbeat_load["window_start"], heartbeat_load["beats"] = now, 0
+
+    info = nodes[node_id]
+    interval = heartbeat_load["interval"]
+    if info.get("suspect_beats"):
+        interval = max(HEARTBEAT_MIN_INTERVAL, interval / 2)
+        info["suspect_beats"] -= 1
+    info["heartbeat_interval"] = interval
+    # Rescale the learned arrival times so the new interval isn't read as silence
+    if "arrival_mean" in info and abs(interval - info["arrival_mean"]) > 0.25 * info["arrival_mean"]:
+        info["arrival_var"] *= (interval / info["arrival_mean"]) ** 2
+        info["arrival_mean"] = interval
+    return interval
+
+# Phi-accrual failure detection: each node's heartbeat inter-arrival times
+# are kept as an exponentially weighted mean and variance, and the silence
+# since its last heartbeat becomes phi = -log10(P(it is merely late)).
+# A node is suspect (no new pods) from phi 3 and unreachable from phi 8.
+PHI_SUSPECT_THRESHOLD = float(os.getenv("PHI_SUSPECT_THRESHOLD", "3"))
+PHI_FAILED_THRESHOLD = float(os.getenv("PHI_FAILED_THRESHOLD", "8"))
+PHI_ALPHA = 0.03  # weight of the newest inter-arrival time
+PHI_ACCEPTABLE_PAUSE = 3  # seconds of silence tolerated on top of the mean
+
+def phi(info, now):
+    mean = info.get("arrival_mean", info["heartbeat_interval"])
+    std = max(math.sqrt(info.get("arrival_var", (mean / 4) ** 2)), 0.1 * mean, 0.2)
+    # Logistic approximation of the normal CDF; y is clamped to keep exp() in range
+    y = min(10.0, max(-10.0, (now - info["last_heartbeat"] - mean - PHI_ACCEPTABLE_PAUSE) / std))
+    e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+    return -math.log10(e / (1.0 + e)) if y > 0 else -math.log10(1.0 - 1.0 / (1.0 + e))
+
+def mark_heartbeat(node_id):
+    now = time.time()
+    heartbeat_load["beats"] += 1
+    info = nodes[node_id]
+    arrival = now - info["last_heartbeat"]
+    if arrival > 1.5 * info["heartbeat_interval"]:
+        info["suspect_beats"] = 3
+    if info["status"] == "unreachable":
+        # Its arrival history says nothing about the node once it comes back
+        info.pop("arrival_mean", None)
+        info.pop("arrival_var", None)
+    elif arrival > 0:
+        mean = info.get("arrival_mean", info["heartbeat_interval"])
+        diff = arrival - mean
+        info["arrival_mean"] = mean + PHI_ALPHA * diff
+        info["arrival_var"] = (1 - PHI_ALPHA) * (info.get("arrival_var", (mean / 4) ** 2) + PHI_ALPHA * diff * diff)
+    nodes[node_id]["last_heartbeat"] = now
+    if nodes[node_id]["status"] != "healthy":
+        unindex_node(node_id)
+        nodes[node_id]["status"] = "healthy"
+        index_node(node_id)
+
 # ========== Route: Add node and launch Docker container ==========
 @app.route('/add_node', methods=['POST'])
 def add_node():
@@ -52,13 +170,19 @@ def monitor_nodes():
     while True:
         current_time = time.time()
         for node_id, info in list(nodes.items()):
-            last = info.get("last_heartbeat", 0)
-            if current_time - last > 60 and info["status"] != "unreachable":
+            level = phi(info, current_time)
+            if PHI_SUSPECT_THRESHOLD <= level < PHI_FAILED_THRESHOLD and info["status"] == "healthy":
+                print(f"⚠️ Node {node_id} is suspect (phi {level:.1f}).")
+                unindex_node(node_id)
+                info["status"] = "suspect"
+                index_node(node_id)
+            if level >= PHI_FAILED_THRESHOLD and info["status"] != "unreachable":
                 print(f"❌ Node {node_id} marked as unreachable.")
+                unindex_node(node_id)
                 info["status"] = "unreachable"
 
                 # Reschedule its pods
-                for pod_id in info["pods"]:
+                for pod_id in list(info["pods"]):
                     pod_cpu = pods[pod_id]["cpu"]
                     print(f"🔁 Rescheduling pod {pod_id} needing {pod_cpu} CPU")
 
@@ -78,8 +202,10 @@ def monitor_nodes():
                                 best_node = nid
 
                         if best_node:
+                            unindex_node(best_node)
                             nodes[best_node]["available_cpu"] -= pod_cpu
-                            nodes[best_node]["pods"].append(pod_id)
+                            index_node(best_node)
+                            nodes[best_node]["pods"][pod_id] = None
                             pods[pod_id]["node"] = best_node
                             print(f"✅ Pod {pod_id} rescheduled to {best_node}")
                     else:
@@ -87,13 +213,39 @@ def monitor_nodes():
                         print(f"⚠️ Pod {pod_id} could not be rescheduled.")
 
                 # Reset failed node's pod list and available CPU
-                info["pods"] = []
+                info["pods"] = {}
                 info["available_cpu"] = 0
+                index_node(node_id)
 
-        time.sleep(10)
+        time.sleep(1)
 
 Thread(target=monitor_nodes, daemon=True).start()
 
+# ========== Background Thread: Receive UDP heartbeats ==========
+def receive_udp_heartbeats():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("0.0.0.0", UDP_HEARTBEAT_PORT))
+    print(f"💓 Listening for UDP heartbeats on port {UDP_HEARTBEAT_PORT}", flush=True)
+    while True:
+        data = sock.recv(1400)
+        try:
+            magic, version, _, handle, seq, _ = HEARTBEAT_HEADER.unpack_from(data)
+        except struct.error:
+            continue
+        node_id = handle_nodes.get(handle)
+        if magic != b"HB" or version != 1 or node_id not in nodes:
+            continue
+        # Drop reordered and duplicate datagrams; the sequence may wrap around
+        last = handle_seq[handle]
+        if last is not None and not 0 < (seq - last) & 0xFFFFFFFF < 0x80000000:
+            continue
+        handle_seq[handle] = seq
+        mark_heartbeat(node_id)
+
+# Under the debug reloader only the serving child process binds the port
+if UDP_HEARTBEAT_PORT and not (__name__ == '__main__' and os.getenv("WERKZEUG_RUN_MAIN") != "true"):
+    Thread(target=receive_udp_heartbeats, daemon=True).start()
+
 # ========== Route: Register a node (called by node.py) ==========
 @app.route('/register_node', methods=['POST'])
 def register_node():
@@ -104,16 +256,69 @@ def register_node():
     if not node_id or not cpu_cores:
         return jsonify({"error": "Missing node_id or cpu_cores"}), 400
 
+    if node_id in nodes:
+        unindex_node(node_id)
+    else:
+        bisect.insort(node_ids_sorted, node_id)
     nodes[node_id] = {
         "cpu_cores": int(cpu_cores),
         "available_cpu": int(cpu_cores),
         "last_heartbeat": time.time(),
-        "pods": [],
+        "heartbeat_interval": heartbeat_load["interval"],
+        "suspect_beats": 0,
+        "pods": {},
         "status": "healthy"
     }
     node_load[node_id] = 0
+    index_node(node_id)
+
+    response = {"message": f"Node {node_id} registered successfully.",
+                "heartbeat_interval": next_heartbeat_interval(node_id)}
+    if UDP_HEARTBEAT_PORT:
+        response["heartbeat_handle"] = heartbeat_handle(node_id)
+        response["udp_port"] = UDP_HEARTBEAT_PORT
+    return jsonify(response), 200
+
+# ========== Route: Register many nodes at once (called by add_node.py --count) ==========
+@app.route('/register_nodes', methods=['POST'])
+def register_nodes():
+    data = request.get_json() or {}
+    entries = data.get("nodes")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "nodes must be a non-empty list"}), 400
+
+    # Check the whole batch first so it is admitted whole or not at all
+    batch = {}
+    for entry in entries:
+        node_id = entry.get("node_id") if isinstance(entry, dict) else None
+        try:
+            cpu_cores = int(entry.get("cpu_cores") or 0) if node_id else 0
+        except (TypeError, ValueError):
+            cpu_cores = 0
+        if not node_id or cpu_cores <= 0:
+            return jsonify({"error": f"Missing node_id or cpu_cores in {entry}"}), 400
+        batch[node_id] = cpu_cores
+
+    now = time.time()
+    for node_id, cpu_cores in batch.items():
+        if node_id in nodes:
+            unindex_node(node_id)
+        else:
+            bisect.insort(node_ids_sorted, node_id)
+        nodes[node_id] = {
+            "cpu_cores": cpu_cores,
+            "available_cpu": cpu_cores,
+            "last_heartbeat": now,
+            "heartbeat_interval": heartbeat_load["interval"],
+            "suspect_beats": 0,
+            "pods": {},
+            "status": "healthy"
+        }
+        node_load[node_id] = 0
+        index_node(node_id)
 
-    return jsonify({"message": f"Node {node_id} registered successfully."}), 200
+    return jsonify({"message": f"{len(batch)} nodes registered successfully.",
+                    "registered": list(batch)}), 200
 
 @app.route('/list_nodes', methods=['GET'])
 def list_nodes():
@@ -122,7 +327,7 @@ def list_nodes():
             "status": info["status"],
             "cpu_cores": info["cpu_cores"],
             "available_cpu": info["available_cpu"],
-            "pods": info["pods"],
+            "pods": list(info["pods"]),
             "last_heartbeat": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(info["last_heartbeat"]))
         }
         for node_id, info in nodes.items()
@@ -141,9 +346,9 @@ def send_heartbeat():
     if node_id not in nodes:
         return jsonify({"error": f"Node {node_id} not registered"}), 400
 
-    nodes[node_id]["last_heartbeat"] = time.time()
-    nodes[node_id]["status"] = "healthy"
-    return jsonify({"message": f"Heartbeat received from {node_id}"}), 200
+    mark_heartbeat(node_id)
+    return jsonify({"message": f"Heartbeat received from {node_id}",
+                    "heartbeat_interval": next_heartbeat_interval(node_id)}), 200
 
 # ========== Route: Schedule a pod using Best-Fit strategy ==========
 @app.route('/schedule_pod', methods=['POST'])
@@ -176,8 +381,18 @@ def schedule_pod():
             best_node = node_id
 
     if best_node:
+        if pod_id in pods:
+            # Scheduling a known pod again moves it, so drop it from its old node first
+            old_node = pods[pod_id]["node"]
+            if old_node in nodes and pod_id in nodes[old_node]["pods"]:
+                del nodes[old_node]["pods"][pod_id]
+                unindex_node(old_node)
+                nodes[old_node]["available_cpu"] += pods[pod_id]["cpu"]
+                index_node(old_node)
+        unindex_node(best_node)
         nodes[best_node]["available_cpu"] -= cpu_required
-        nodes[best_node]["pods"].append(pod_id)
+        index_node(best_node)
+        nodes[best_node]["pods"][pod_id] = None
         pods[pod_id] = {
             "node": best_node,
             "cpu": cpu_required
@@ -197,7 +412,56 @@ def pod_status():
 # ========== Route: Get all nodes and their details ==========
 @app.route('/nodes', methods=['GET'])
 def get_nodes():
-    return jsonify({"nodes": nodes})
+    # Optional query args: limit, cursor, status, cpu_min/cpu_max (available_cpu), fields
+    args = request.args
+    try:
+        limit = int(args["limit"]) if args.get("limit") else None
+        cpu_min = float(args["cpu_min"]) if args.get("cpu_min") else None
+        cpu_max = float(args["cpu_max"]) if args.get("cpu_max") else None
+        cursor = args.get("cursor")
+        if cursor:
+            cursor = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except ValueError:
+        return jsonify({"error": "Invalid limit, cursor or cpu range"}), 400
+    if limit is None and cursor:
+        limit = 100
+    if limit is not None:
+        if limit <= 0:
+            return jsonify({"error": "limit must be positive"}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+    fields = [f for f in args.get("fields", "").split(",") if f]
+
+    # Narrow down candidates through the secondary indexes
+    candidates = None
+    if args.get("status"):
+        candidates = set(nodes_by_status.get(args["status"], set()))
+    if cpu_min is not None or cpu_max is not None:
+        in_range = set()
+        for value, ids in nodes_by_available.items():
+            if (cpu_min is None or value >= cpu_min) and (cpu_max is None or value <= cpu_max):
+                in_range |= ids
+        candidates = in_range if candidates is None else candidates & in_range
+
+    if candidates is None:
+        start = bisect.bisect_right(node_ids_sorted, cursor) if cursor else 0
+        keys = node_ids_sorted[start:] if limit is None else node_ids_sorted[start:start + limit + 1]
+    else:
+        remaining = [k for k in candidates if not cursor or k > cursor]
+        keys = sorted(remaining) if limit is None else heapq.nsmallest(limit + 1, remaining)
+
+    next_cursor = None
+    if limit is not None and len(keys) > limit:
+        keys = keys[:limit]
+        next_cursor = base64.urlsafe_b64encode(keys[-1].encode()).decode().rstrip("=")
+
+    page = {}
+    for node_id in keys:
+        info = nodes[node_id]
+        view = {f: info[f] for f in fields if f in info} if fields else dict(info)
+        if "pods" in view:
+            view["pods"] = list(view["pods"])
+        page[node_id] = view
+    return jsonify({"nodes": page, "next_cursor": next_cursor})
 
 # ========== Route: Remove a node ==========
 @app.route('/remove_node', methods=['DELETE'])
@@ -211,6 +475,8 @@ def remove_node():
     for pod_id in nodes[node_id]["pods"]:
         pods[pod_id]["node"] = None  # Unschedule
 
+    unindex_node(node_id)
+    del node_ids_sorted[bisect.bisect_left(node_ids_sorted, node_id)]
     del nodes[node_id]
     del node_load[node_id]
 
@@ -3,14 +3,27 @@ from flask import Flask, request, jsonify
 import time
 from threading import Thread
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import docker
 import os
 import datetime
 
+from api_server.clock import make_clock
 from api_server.node_manager import NodeManager
-from api_server.pod_scheduler import PodScheduler
+from api_server.pod_scheduler import PodScheduler, resolve_priority
 from api_server.health_monitor import HealthMonitor
+from api_server.heartbeat_policy import HeartbeatPolicy
+from api_server.failure_detector import PhiAccrualDetector
+from api_server.membership import GossipMembership
 from api_server.resource_monitor import ResourceMonitor
+from api_server.metrics_history import MetricsHistory
+from api_server.pagination import parse_list_query
+from api_server.constraints import parse_labels, parse_placement
+from api_server.replication import MutationLog
+from api_server.udp_heartbeat import UdpHeartbeatListener
+from api_server.scheduler_pipeline import SchedulingPipeline
+from api_server.rebalancer import Rebalancer
+from api_server.autoscaler import Autoscaler, DockerNodeProvisioner, SimulatedNodeProvisioner
 
 app = Flask(__name__)
 
@@ -19,21 +32,119 @@ def timestamp_to_time(timestamp):
     dt = datetime.datetime.fromtimestamp(timestamp)
     return dt.strftime('%H:%M:%S')
 
+# Heartbeat timeouts, metric windows and reservations read time from one clock.
+# CLOCK_MODE is "real" (default), "scaled" (CLOCK_SCALE times faster) or
+# "manual" (only moves on POST /api/clock/advance)
+clock = make_clock(os.getenv("CLOCK_MODE", "real"), float(os.getenv("CLOCK_SCALE", "1")))
+
 # Initializing components
-node_manager = NodeManager()
-pod_scheduler = PodScheduler(node_manager)
+node_manager = NodeManager(clock=clock)
+pod_scheduler = PodScheduler(node_manager, max_pending=int(os.getenv("MAX_PENDING_PODS", "10000")))
 health_monitor = HealthMonitor(node_manager)
 resource_monitor = ResourceMonitor(node_manager)
 
 # Connectting the pod scheduler to the health monitor
 health_monitor.set_pod_scheduler(pod_scheduler)
 
+# Nodes are told their next heartbeat interval, sized to keep the fleet
+# under HEARTBEAT_TARGET_RATE heartbeats per second
+health_monitor.set_heartbeat_policy(HeartbeatPolicy(
+    node_manager,
+    target_rate=float(os.getenv("HEARTBEAT_TARGET_RATE", "1000")),
+    min_interval=float(os.getenv("HEARTBEAT_MIN_INTERVAL", "2")),
+    max_interval=float(os.getenv("HEARTBEAT_MAX_INTERVAL", "120"))
+))
+
+# Nodes are judged by how late their heartbeat is compared to their own
+# history (phi accrual); FAILURE_DETECTOR=timeout keeps the fixed timeout
+if os.getenv("FAILURE_DETECTOR", "phi") == "phi":
+    health_monitor.set_failure_detector(PhiAccrualDetector(
+        suspect_threshold=float(os.getenv("PHI_SUSPECT_THRESHOLD", "3")),
+        failed_threshold=float(os.getenv("PHI_FAILED_THRESHOLD", "8"))
+    ))
+
+# Node agents running gossip watch each other and report confirmed failures
+gossip_membership = GossipMembership(node_manager, health_monitor)
+health_monitor.set_membership(gossip_membership)
+
+# Every state change is published to a log that read followers tail
+mutation_log = MutationLog()
+node_manager.set_mutation_log(mutation_log)
+pod_scheduler.set_mutation_log(mutation_log)
+resource_monitor.set_mutation_log(mutation_log)
+
+# Pod launches are placed by a pool of scheduler worker processes. Start it
+# first so the workers are forked before any other thread exists.
+scheduling_pipeline = SchedulingPipeline(
+    pod_scheduler, node_manager,
+    workers=int(os.getenv("SCHEDULER_WORKERS", str(os.cpu_count() or 1)))
+)
+scheduling_pipeline.start()
+LAUNCH_TIMEOUT = int(os.getenv("LAUNCH_TIMEOUT", "30"))  # seconds a waiting launch request waits for its placement
+
+# Pods that don't fit anywhere wait until capacity is released
+pod_scheduler.start_pending_retries()
+
+# Repack pods in the background when free capacity gets too fragmented
+rebalancer = Rebalancer(
+    node_manager, pod_scheduler,
+    interval=float(os.getenv("REBALANCE_INTERVAL", "60")),
+    churn_budget=int(os.getenv("REBALANCE_CHURN_BUDGET", "50")),
+    dry_run=os.getenv("REBALANCE_DRY_RUN", "1") == "1"
+)
+rebalancer.start_rebalancing()
+
+# Docker network for the cluster
+DOCKER_NETWORK = "distributed_systems_clusters_stimulation_framework_cluster_network"
+
+# Add and remove node containers from pending demand and utilization.
+# AUTOSCALER_MODE is "off" (default), "docker" or "simulated" (in-process nodes)
+AUTOSCALER_MODE = os.getenv("AUTOSCALER_MODE", "off")
+autoscaler = None
+if AUTOSCALER_MODE in ("docker", "simulated"):
+    if AUTOSCALER_MODE == "docker":
+        provisioner = DockerNodeProvisioner(node_manager, DOCKER_NETWORK)
+    else:
+        provisioner = SimulatedNodeProvisioner(node_manager)
+    autoscaler = Autoscaler(
+        node_manager, pod_scheduler, resource_monitor, provisioner,
+        min_nodes=int(os.getenv("AUTOSCALER_MIN_NODES", "1")),
+        max_nodes=int(os.getenv("AUTOSCALER_MAX_NODES", "50"))
+    )
+    autoscaler.start_autoscaling()
+
 # Start background monitoring threads
 health_monitor.start_monitoring()
 resource_monitor.start_monitoring()
 
-# Docker network for the cluster
-DOCKER_NETWORK = "distributed_systems_clusters_stimulation_framework_cluster_network"
+# Nodes may send heartbeats as UDP datagrams to UDP_HEARTBEAT_PORT (unset
+# disables it). Under the debug reloader only the serving child binds the port.
+udp_heartbeats = None
+if os.getenv("UDP_HEARTBEAT_PORT") and (os.getenv("API_DEBUG", "1") != "1" or os.getenv("WERKZEUG_RUN_MAIN") == "true"):
+    udp_heartbeats = UdpHeartbeatListener(health_monitor, resource_monitor, port=int(os.getenv("UDP_HEARTBEAT_PORT")))
+    udp_heartbeats.start_listening()
+
+# Node and cluster usage history: raw samples in memory, minute and hour
+# rollups in segment files under METRICS_HISTORY_DIR (unset disables it),
+# each tier bounded to its METRICS_HISTORY_*_MB. Under the debug reloader
+# only the serving child writes the files.
+metrics_history = None
+if os.getenv("METRICS_HISTORY_DIR") and (
+        os.getenv("API_DEBUG", "1") != "1" or os.getenv("WERKZEUG_RUN_MAIN") == "true"):
+    metrics_history = MetricsHistory(
+        resource_monitor,
+        os.getenv("METRICS_HISTORY_DIR"),
+        sample_interval=float(os.getenv("METRICS_SAMPLE_INTERVAL", "10")),
+        minute_max_bytes=int(float(os.getenv("METRICS_HISTORY_MINUTE_MB", "512")) * 2 ** 20),
+        hour_max_bytes=int(float(os.getenv("METRICS_HISTORY_HOUR_MB", "128")) * 2 ** 20)
+    )
+    metrics_history.start_recording()
+
+# Seconds clients are asked to wait when the pending queue is full
+PENDING_RETRY_AFTER = 5
+
+# Largest batch accepted by /api/nodes/register/bulk
+MAX_BULK_NODES = 5000
 
 @app.route('/')
 def home():
@@ -41,9 +152,14 @@ def home():
 
 @app.route('/api/nodes', methods=['GET'])
 def get_nodes():
-    """List all nodes and their status"""
-    nodes = node_manager.get_all_nodes()
-    return jsonify({"nodes": nodes})
+    """List nodes and their status, optionally paginated, filtered and projected"""
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    nodes, next_cursor = node_manager.list_nodes(query)
+    return jsonify({"nodes": nodes, "next_cursor": next_cursor})
 
 @app.route('/api/nodes/add', methods=['POST'])
 def add_node():
@@ -59,8 +175,13 @@ def add_node():
         if cpu_cores <= 0:
             return jsonify({"error": "CPU cores must be positive"}), 400
 
-        # Generate node ID
-        node_id = f"node-{str(uuid.uuid4())[:8]}"
+        try:
+            labels = parse_labels(data.get("labels"))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        # Generate node ID (the shard router picks it up front to route the request)
+        node_id = data.get("node_id") or f"node-{str(uuid.uuid4())[:8]}"
 
         # Launch Docker container for the node
         client = docker.from_env()
@@ -71,6 +192,7 @@ def add_node():
             environment={
                 "NODE_ID": node_id,
                 "CPU_CORES": str(cpu_cores),
+                "NODE_LABELS": ",".join(f"{k}={v}" for k, v in labels.items()),
                 "API_SERVER": "http://api_server:5000"
             },
             network=DOCKER_NETWORK,
@@ -78,12 +200,13 @@ def add_node():
         )
 
         # Register node
-        node_manager.add_node(node_id, cpu_cores)
+        node_manager.add_node(node_id, cpu_cores, labels)
 
         return jsonify({
             "message": "Node added successfully",
             "node_id": node_id,
             "cpu_cores": cpu_cores,
+            "labels": labels,
             "container_id": container.id
         }), 201
 
@@ -100,8 +223,53 @@ def register_node():
     if not node_id or not cpu_cores:
         return jsonify({"error": "Missing node_id or cpu_cores"}), 400
     
-    node_manager.register_node(node_id, int(cpu_cores))
-    return jsonify({"message": f"Node {node_id} registered successfully"}), 200
+    try:
+        labels = parse_labels(data.get("labels")) if "labels" in data else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    node_manager.register_node(node_id, int(cpu_cores), labels)
+    response = {"message": f"Node {node_id} registered successfully",
+                "heartbeat_interval": health_monitor.heartbeat_interval(node_id)}
+    if udp_heartbeats is not None:
+        response["heartbeat_handle"] = udp_heartbeats.handle_for(node_id)
+        response["udp_port"] = udp_heartbeats.port
+    return jsonify(response), 200
+
+@app.route('/api/nodes/register/bulk', methods=['POST'])
+def register_nodes():
+    """Register many nodes at once; the batch is admitted whole or rejected whole"""
+    data = request.get_json() or {}
+    entries = data.get("nodes")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "nodes must be a non-empty list"}), 400
+    if len(entries) > MAX_BULK_NODES:
+        return jsonify({"error": f"At most {MAX_BULK_NODES} nodes per request"}), 400
+
+    nodes = []
+    errors = {}
+    seen = set()
+    for i, entry in enumerate(entries):
+        try:
+            node_id = entry.get("node_id")
+            cpu_cores = int(entry.get("cpu_cores") or 0)
+            labels = parse_labels(entry.get("labels")) if "labels" in entry else None
+        except (AttributeError, TypeError, ValueError) as e:
+            errors[i] = str(e)
+            continue
+        if not node_id or cpu_cores <= 0:
+            errors[i] = "Missing node_id or cpu_cores"
+        elif node_id in seen:
+            errors[i] = f"Duplicate node_id {node_id}"
+        else:
+            seen.add(node_id)
+            nodes.append((node_id, cpu_cores, labels))
+    if errors:
+        return jsonify({"error": "Invalid nodes, none were registered", "errors": errors}), 400
+
+    node_manager.register_nodes(nodes)
+    return jsonify({"message": f"Registered {len(nodes)} nodes",
+                    "registered": [node_id for node_id, _, _ in nodes]}), 200
 
 @app.route('/api/nodes/heartbeat', methods=['POST'])
 def receive_heartbeat():
@@ -123,7 +291,64 @@ def receive_heartbeat():
         print(f"Received metrics from node {node_id}: {pod_metrics}")
         resource_monitor.update_pod_metrics(node_id, pod_metrics)
     
-    return jsonify({"status": "heartbeat acknowledged"}), 200
+    return jsonify({"status": "heartbeat acknowledged",
+                    "heartbeat_interval": health_monitor.heartbeat_interval(node_id)}), 200
+
+@app.route('/api/nodes/heartbeat/policy', methods=['GET'])
+def get_heartbeat_policy():
+    """Fleet heartbeat interval and the load it was derived from"""
+    return jsonify(health_monitor.heartbeat_policy.get_stats())
+
+@app.route('/api/nodes/heartbeat/detector', methods=['GET'])
+def get_failure_detector_stats():
+    """Phi levels across the nodes the failure detector tracks"""
+    if health_monitor.failure_detector is None:
+        return jsonify({"error": "The phi accrual detector is disabled, unset FAILURE_DETECTOR"}), 404
+    return jsonify(health_monitor.failure_detector.get_stats(clock.time()))
+
+@app.route('/api/nodes/heartbeat/udp', methods=['GET'])
+def get_udp_heartbeat_stats():
+    """Counters of the UDP heartbeat listener"""
+    if udp_heartbeats is None:
+        return jsonify({"error": "UDP heartbeats are disabled, set UDP_HEARTBEAT_PORT"}), 404
+    return jsonify(udp_heartbeats.get_stats())
+
+@app.route('/api/gossip/join', methods=['POST'])
+def gossip_join():
+    """Record a node agent's gossip address and hand it seeds to join through"""
+    data = request.get_json() or {}
+    node_id = data.get("node_id")
+    port = data.get("port")
+    if not node_id or not port:
+        return jsonify({"error": "Missing node_id or port"}), 400
+    if node_manager.get_node(node_id) is None:
+        return jsonify({"error": f"Node {node_id} not found"}), 404
+    
+    host = data.get("host") or request.remote_addr
+    seeds = gossip_membership.join(node_id, host, int(port))
+    return jsonify({"seeds": seeds}), 200
+
+@app.route('/api/gossip/report', methods=['POST'])
+def gossip_report():
+    """A gossip member confirmed that another member is dead"""
+    data = request.get_json() or {}
+    reporter = data.get("reporter")
+    node_id = data.get("node_id")
+    if not reporter or not node_id or data.get("state") != "dead":
+        return jsonify({"error": "Expected reporter, node_id and state dead"}), 400
+    
+    try:
+        incarnation = int(data.get("incarnation", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid incarnation"}), 400
+    if not gossip_membership.report(reporter, node_id, incarnation):
+        return jsonify({"error": f"Reporter {reporter} has not joined gossip"}), 403
+    return jsonify({"status": "report accepted"}), 200
+
+@app.route('/api/gossip/members', methods=['GET'])
+def get_gossip_members():
+    """Gossip membership counters"""
+    return jsonify(gossip_membership.get_stats())
 
 @app.route('/api/nodes/remove', methods=['POST'])
 def remove_node():
@@ -158,6 +383,7 @@ def remove_node():
         return jsonify({
             "message": f"Node {node_id} removed successfully",
             "rescheduled_pods": result.get("rescheduled", []),
+            "pending_pods": result.get("pending", []),
             "failed_pods": result.get("failed", [])
         }), 200
     
@@ -167,9 +393,28 @@ def remove_node():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/shard/capacity', methods=['GET'])
+def get_shard_capacity():
+    """Summarize this server's schedulable capacity for the shard router"""
+    return jsonify(node_manager.get_capacity_summary())
+
+def _backpressure_response():
+    response = jsonify({"error": "Pending pod queue is full, retry later"})
+    response.headers["Retry-After"] = str(PENDING_RETRY_AFTER)
+    return response, 429
+
 @app.route('/api/pods/launch', methods=['POST'])
 def launch_pod():
-    """Launch a new pod with specified CPU requirements"""
+    """Launch a new pod with specified CPU requirements.
+    
+    The launch is queued for the scheduler workers. With "wait": false the
+    request returns 202 right away, otherwise it waits for the placement.
+    Pods that fit nowhere preempt lower-priority pods, or are left pending
+    (202); once the pending queue is full new launches are refused with 429
+    so clients back off. "priority" is an integer or a priority class name;
+    "app", "node_selector", "affinity", "anti_affinity" and "spread" are
+    placement constraints (see api_server/constraints.py).
+    """
     data = request.get_json()
     cpu_req = data.get("cpu_cores")
     
@@ -178,10 +423,50 @@ def launch_pod():
     
     try:
         cpu_req = int(cpu_req)
+        
+        try:
+            priority = resolve_priority(data.get("priority"))
+            spec = parse_placement(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if pod_scheduler.pending.is_full():
+            return _backpressure_response()
+        
         pod_id = f"pod-{str(uuid.uuid4())[:8]}"
         
-        # Schedule the pod
-        result = pod_scheduler.schedule_pod(pod_id, cpu_req)
+        # Queue the pod for scheduling
+        future = scheduling_pipeline.submit(pod_id, cpu_req, priority, spec)
+        if not data.get("wait", True):
+            return jsonify({
+                "message": "Pod queued for scheduling",
+                "pod_id": pod_id,
+                "cpu_cores": cpu_req,
+                "priority": priority
+            }), 202
+        
+        try:
+            result = future.result(timeout=LAUNCH_TIMEOUT)
+        except FutureTimeoutError:
+            if scheduling_pipeline.withdraw(future):
+                return jsonify({
+                    "error": f"Pod was not scheduled within {LAUNCH_TIMEOUT}s and was withdrawn, retry later",
+                    "pod_id": pod_id
+                }), 504
+            # Already being committed, its result is moments away
+            result = future.result()
+        
+        if result.get("pending"):
+            return jsonify({
+                "message": result["message"],
+                "pod_id": pod_id,
+                "cpu_cores": cpu_req,
+                "priority": priority,
+                "status": "pending"
+            }), 202
+        
+        if result.get("backpressure"):
+            return _backpressure_response()
         
         if not result["success"]:
             return jsonify({"error": result["message"]}), 400
@@ -190,23 +475,168 @@ def launch_pod():
             "message": "Pod launched successfully",
             "pod_id": pod_id,
             "node_id": result["node_id"],
-            "cpu_cores": cpu_req
+            "cpu_cores": cpu_req,
+            "priority": priority,
+            "preempted_pods": result.get("preempted", [])
         }), 201
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/gangs/launch', methods=['POST'])
+def launch_gang():
+    """Launch a gang of pods that are placed all together or not at all.
+    
+    Give "pods" (count) and "cpu_cores" per pod, or "members" as a list of
+    per-pod cores. Priority and placement constraints work as for single
+    pods and apply to every member. With "commit": false the gang is only
+    reserved and must be started through /api/gangs/<gang_id>/commit within
+    "timeout" seconds, or its capacity is released. A gang that does not fit
+    reserves nothing (409).
+    """
+    data = request.get_json() or {}
+    try:
+        if data.get("members"):
+            cores = [int(cpu) for cpu in data["members"]]
+        else:
+            cores = [int(data.get("cpu_cores", 0))] * int(data.get("pods", 0))
+        if not cores or min(cores) < 1:
+            return jsonify({"error": "A gang needs pods with at least one CPU core each"}), 400
+        timeout = float(data["timeout"]) if data.get("timeout") is not None else None
+        priority = resolve_priority(data.get("priority"))
+        spec = parse_placement(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    
+    gang_id = data.get("gang_id") or f"gang-{str(uuid.uuid4())[:8]}"
+    members = [(f"{gang_id}-{i}", cpu) for i, cpu in enumerate(cores)]
+    result = pod_scheduler.reserve_gang(gang_id, members, priority, spec,
+                                        timeout=timeout, commit=data.get("commit", True))
+    if not result["success"]:
+        return jsonify({"error": result["message"], "gang_id": gang_id}), 409
+    return jsonify({
+        "message": f"Gang {gang_id} {result['status']}",
+        "gang_id": gang_id,
+        "status": result["status"],
+        "expires_at": result["expires_at"],
+        "placements": result["placements"],
+        "priority": priority
+    }), 201
+
+@app.route('/api/gangs/<gang_id>', methods=['GET'])
+def get_gang(gang_id):
+    """Status of a gang and the nodes of its pods"""
+    gang = pod_scheduler.get_gang(gang_id)
+    if gang is None:
+        return jsonify({"error": f"Gang {gang_id} not found"}), 404
+    return jsonify(gang)
+
+@app.route('/api/gangs/<gang_id>/commit', methods=['POST'])
+def commit_gang(gang_id):
+    """Start a reserved gang before its reservation times out"""
+    if not pod_scheduler.commit_gang(gang_id):
+        return jsonify({"error": f"Gang {gang_id} is not reserved (unknown, started or expired)"}), 404
+    return jsonify({"message": f"Gang {gang_id} started"}), 200
+
+@app.route('/api/gangs/<gang_id>/release', methods=['POST'])
+def release_gang(gang_id):
+    """Remove all pods of a gang, reserved or running"""
+    if not pod_scheduler.release_gang(gang_id):
+        return jsonify({"error": f"Gang {gang_id} not found"}), 404
+    return jsonify({"message": f"Gang {gang_id} released"}), 200
+
 @app.route('/api/pods', methods=['GET'])
 def get_pods():
-    """Get all pods in the cluster"""
-    pods = pod_scheduler.get_all_pods()
-    return jsonify({"pods": pods})
+    """Get pods in the cluster, optionally paginated, filtered and projected"""
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    pods, next_cursor = pod_scheduler.list_pods(query)
+    return jsonify({"pods": pods, "next_cursor": next_cursor})
+
+@app.route('/api/scheduler/stats', methods=['GET'])
+def get_scheduler_stats():
+    """Scheduling pipeline counters and queue depth"""
+    return jsonify(dict(scheduling_pipeline.get_stats(), pending=pod_scheduler.pending.get_stats(),
+                        preemptions=pod_scheduler.preemptions, gangs=pod_scheduler.get_gang_stats(),
+                        equivalence_cache=pod_scheduler.candidates.get_stats()))
+
+@app.route('/api/rebalancer', methods=['GET'])
+def get_rebalancer_status():
+    """Current fragmentation, rebalancer counters and the last run"""
+    return jsonify(dict(rebalancer.get_status(), analysis=rebalancer.analyze()))
+
+@app.route('/api/rebalancer/run', methods=['POST'])
+def run_rebalancer():
+    """Run one rebalancing round now; {"dry_run": true} only returns the plan"""
+    data = request.get_json(silent=True) or {}
+    try:
+        return jsonify(rebalancer.run_once(dry_run=data.get("dry_run")))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/autoscaler', methods=['GET'])
+def get_autoscaler_status():
+    """Autoscaler mode, nodes being provisioned and recent scaling decisions"""
+    if autoscaler is None:
+        return jsonify({"mode": AUTOSCALER_MODE})
+    return jsonify(dict(autoscaler.get_status(), mode=AUTOSCALER_MODE))
+
+@app.route('/api/clock', methods=['GET'])
+def get_clock():
+    """Clock mode and current time"""
+    return jsonify({"mode": clock.mode, "time": clock.time(), "scale": getattr(clock, "scale", 1)})
+
+@app.route('/api/clock/advance', methods=['POST'])
+def advance_clock():
+    """Move a manual clock forward by {"seconds": n}"""
+    if clock.mode != "manual":
+        return jsonify({"error": "Only a manual clock can be advanced"}), 409
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get("seconds", 0))
+        return jsonify({"mode": clock.mode, "time": clock.advance(seconds)})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/pods/pending', methods=['GET'])
+def get_pending_pods():
+    """Pending queue depth and wait times"""
+    return jsonify(pod_scheduler.pending.get_stats())
 
 @app.route('/api/pods/metrics', methods=['GET'])
 def get_pod_metrics():
-    """Get resource usage metrics for all pods"""
-    metrics = resource_monitor.get_all_pod_metrics()
-    return jsonify({"metrics": metrics})
+    """Get resource usage metrics for pods, optionally paginated and filtered"""
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    metrics, next_cursor = resource_monitor.list_pod_metrics(query)
+    return jsonify({"metrics": metrics, "next_cursor": next_cursor})
+
+@app.route('/api/metrics/history', methods=['GET'])
+def get_metrics_history():
+    """Usage of one node, or of the cluster, over a time range"""
+    if metrics_history is None:
+        return jsonify({"error": "Metrics history is disabled, set METRICS_HISTORY_DIR"}), 404
+    series = request.args.get("series", "cluster")
+    try:
+        end = float(request.args.get("end", clock.time()))
+        start = float(request.args.get("start", end - 3600))
+        resolution, points = metrics_history.query(series, start, end, request.args.get("resolution"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"series": series, "resolution": resolution, "start": start, "end": end, "points": points})
+
+@app.route('/api/metrics/history/stats', methods=['GET'])
+def get_metrics_history_stats():
+    """Series recorded and the disk use and reach of each rollup tier"""
+    if metrics_history is None:
+        return jsonify({"error": "Metrics history is disabled, set METRICS_HISTORY_DIR"}), 404
+    return jsonify(metrics_history.get_stats())
 
 @app.route('/api/pods/unschedule', methods=['POST'])
 def unschedule_pod():
@@ -224,5 +654,35 @@ def unschedule_pod():
     else:
         return jsonify({"error": f"Pod {pod_id} not found or could not be unscheduled"}), 404
 
+@app.route('/api/replication/snapshot', methods=['GET'])
+def get_replication_snapshot():
+    """Full state copy for a follower, valid from the returned log sequence on"""
+    # Read the sequence first: entries after it may already be reflected in
+    # the copy, which is fine since replaying a record is idempotent
+    seq = mutation_log.last_seq()
+    return jsonify({
+        "seq": seq,
+        "nodes": node_manager.snapshot(),
+        "pods": pod_scheduler.snapshot(),
+        "metrics": resource_monitor.snapshot()
+    })
+
+@app.route('/api/replication/log', methods=['GET'])
+def get_replication_log():
+    """Long-poll for mutation log entries after `since`"""
+    try:
+        since = int(request.args.get("since", 0))
+        timeout = min(float(request.args.get("timeout", 0)), 30)
+    except ValueError:
+        return jsonify({"error": "Invalid since or timeout"}), 400
+    
+    entries, seq = mutation_log.read_since(since, timeout=timeout)
+    if entries is None:
+        return jsonify({"error": "Log position no longer available, reload the snapshot", "seq": seq}), 410
+    return jsonify({"entries": entries, "seq": seq})
+
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Shards started by the shard router run on their own port without the debug reloader
+    port = int(os.getenv("API_PORT", "5000"))
+    debug = os.getenv("API_DEBUG", "1") == "1"
+    app.run(debug=debug, host='0.0.0.0', port=port)
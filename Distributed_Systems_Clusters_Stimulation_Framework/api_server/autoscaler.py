@@ -0,0 +1,320 @@
+import threading
+import uuid
+from collections import deque
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class DockerNodeProvisioner:
+    """Starts and stops node containers, like /api/nodes/add and /api/nodes/remove"""
+
+    def __init__(self, node_manager, network, api_server_url="http://api_server:5000", image="node-image"):
+        import docker
+        self.docker = docker
+        self.client = docker.from_env()
+        self.node_manager = node_manager
+        self.network = network
+        self.api_server_url = api_server_url
+        self.image = image
+
+    def add_node(self, node_id, cpu_cores):
+        self.client.containers.run(
+            self.image,
+            name=node_id,
+            detach=True,
+            environment={
+                "NODE_ID": node_id,
+                "CPU_CORES": str(cpu_cores),
+                "API_SERVER": self.api_server_url
+            },
+            network=self.network,
+            restart_policy={"Name": "on-failure"},
+        )
+        # The node turns healthy once its agent registers
+        self.node_manager.add_node(node_id, cpu_cores)
+
+    def remove_node(self, node_id):
+        try:
+            container = self.client.containers.get(node_id)
+            container.stop()
+            container.remove()
+        except self.docker.errors.NotFound:
+            pass  # Container might already be gone
+
+    def keepalive(self):
+        pass  # real node agents send their own heartbeats
+
+class SimulatedNodeProvisioner:
+    """Registers nodes in-process instead of starting containers, for offline runs.
+
+    Simulated nodes have no agent, so keepalive() heartbeats for them to keep
+    the health monitor from failing them.
+    """
+
+    def __init__(self, node_manager):
+        self.node_manager = node_manager
+        self.nodes = set()
+
+    def add_node(self, node_id, cpu_cores):
+        self.node_manager.register_node(node_id, cpu_cores)
+        self.nodes.add(node_id)
+
+    def remove_node(self, node_id):
+        self.nodes.discard(node_id)
+
+    def keepalive(self):
+        for node_id in list(self.nodes):
+            self.node_manager.update_heartbeat(node_id)
+
+def plan_node_sizes(demand, node_sizes, free_cores=()):
+    """Pick node sizes that fit the pending demand.
+
+    demand maps cpu_cores -> pending pod count. Pods are packed first-fit
+    decreasing, first into free_cores (capacity already on its way) and then
+    into new nodes. A new node gets the smallest size that holds both the pod
+    opening it and as much of the remaining demand as the largest size
+    allows. Returns (sizes, unfit) where unfit counts pods bigger than any
+    node size.
+    """
+    node_sizes = sorted(node_sizes)
+    pods = sorted((cpu for cpu, count in demand.items() for _ in range(count)), reverse=True)
+    bins = list(free_cores)
+    sizes = []
+    unfit = 0
+    remaining = sum(pods)
+    for cpu_cores in pods:
+        remaining -= cpu_cores
+        for i, free in enumerate(bins):
+            if free >= cpu_cores:
+                bins[i] -= cpu_cores
+                break
+        else:
+            want = min(cpu_cores + remaining, node_sizes[-1])
+            size = next((s for s in node_sizes if s >= max(want, cpu_cores)), None)
+            if size is None:
+                unfit += 1
+                continue
+            sizes.append(size)
+            bins.append(size - cpu_cores)
+    return sizes, unfit
+
+class Autoscaler:
+    """Adds nodes for pending pods and drains underutilized nodes.
+
+    Scale-up reacts to pods that have been pending for scale_up_delay
+    seconds, sizing new nodes to the pending demand and counting nodes that
+    are still starting. Scale-down only removes a node that stayed below
+    scale_down_utilization for scale_down_delay seconds while nothing was
+    pending, and only if its pods fit on the other nodes. Both directions
+    have their own cooldown.
+    """
+
+    def __init__(self, node_manager, pod_scheduler, resource_monitor, provisioner,
+                 interval=15, node_sizes=(2, 4, 8, 16), min_nodes=1, max_nodes=50,
+                 max_nodes_per_scale_up=5, scale_up_delay=10, scale_up_cooldown=30,
+                 scale_down_utilization=0.3, scale_down_delay=300, scale_down_cooldown=120,
+                 provision_timeout=120):
+        self.node_manager = node_manager
+        self.pod_scheduler = pod_scheduler
+        self.resource_monitor = resource_monitor
+        self.provisioner = provisioner
+        self.clock = node_manager.clock  # pending waits are measured on the same clock
+        self.interval = interval  # seconds between evaluations
+        self.node_sizes = sorted(node_sizes)
+        self.min_nodes = min_nodes
+        self.max_nodes = max_nodes
+        self.max_nodes_per_scale_up = max_nodes_per_scale_up
+        self.scale_up_delay = scale_up_delay  # seconds the oldest pod must have waited
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_utilization = scale_down_utilization
+        self.scale_down_delay = scale_down_delay  # seconds a node must stay underutilized
+        self.scale_down_cooldown = scale_down_cooldown
+        self.provision_timeout = provision_timeout  # seconds a new node has to turn healthy
+        self.provisioning = {}  # node_id -> (cpu_cores, started at)
+        self.underutilized_since = {}  # node_id -> first check it was underutilized
+        self.last_scale_up = 0
+        self.last_scale_down = 0
+        self.events = deque(maxlen=100)
+        self.stats = {"evaluations": 0, "nodes_added": 0, "nodes_removed": 0, "pods_moved": 0}
+        self.lock = Lock()
+        self.running = False
+        self.autoscale_thread = None
+
+    def start_autoscaling(self):
+        """Start the autoscaler thread"""
+        with self.lock:
+            if self.running:
+                return False
+
+            self.running = True
+            self.autoscale_thread = threading.Thread(target=self._autoscale_loop, daemon=True)
+            self.autoscale_thread.start()
+            return True
+
+    def stop_autoscaling(self):
+        """Stop the autoscaler thread"""
+        with self.lock:
+            if not self.running:
+                return False
+
+            self.running = False
+        if self.autoscale_thread:
+            self.autoscale_thread.join(timeout=self.interval + 5)
+        return True
+
+    def _autoscale_loop(self):
+        while self.running:
+            try:
+                self.provisioner.keepalive()
+                self.evaluate()
+            except Exception as e:
+                logger.error(f"Error in autoscaler: {e}")
+            self.clock.sleep(self.interval)
+
+    def _record(self, action, **details):
+        event = dict(details, action=action, timestamp=self.clock.time())
+        self.events.append(event)
+        logger.info(f"Autoscaler {action}: {details}")
+
+    def evaluate(self, now=None):
+        """Run one scaling decision"""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            self.stats["evaluations"] += 1
+            nodes = self.node_manager.get_all_nodes()
+
+            # Nodes that came up, vanished or never started are no longer provisioning
+            for node_id, (cpu_cores, started) in list(self.provisioning.items()):
+                node = nodes.get(node_id)
+                if node is not None and node["status"] == "healthy":
+                    del self.provisioning[node_id]
+                elif node is None or now - started > self.provision_timeout:
+                    logger.warning(f"Node {node_id} did not become healthy in time")
+                    del self.provisioning[node_id]
+
+            pending = self.pod_scheduler.pending.get_stats()
+            if pending["depth"]:
+                self.underutilized_since.clear()
+                return self._scale_up(nodes, pending, now)
+            return self._scale_down(nodes, now)
+
+    def _scale_up(self, nodes, pending, now):
+        if (pending["oldest_wait"] or 0) < self.scale_up_delay:
+            return None
+        if now - self.last_scale_up < self.scale_up_cooldown:
+            return None
+
+        starting = [cpu_cores for cpu_cores, _ in self.provisioning.values()]
+        sizes, unfit = plan_node_sizes(pending["depth_by_cpu"], self.node_sizes, starting)
+        room = min(self.max_nodes - len(nodes), self.max_nodes_per_scale_up)
+        sizes = sizes[:max(0, room)]
+        if unfit:
+            logger.warning(f"{unfit} pending pods are larger than the largest node size {self.node_sizes[-1]}")
+        if not sizes:
+            return None
+
+        added = []
+        for cpu_cores in sizes:
+            node_id = f"node-{str(uuid.uuid4())[:8]}"
+            try:
+                self.provisioner.add_node(node_id, cpu_cores)
+            except Exception as e:
+                logger.error(f"Failed to add node {node_id}: {e}")
+                break
+            self.provisioning[node_id] = (cpu_cores, now)
+            added.append({"node_id": node_id, "cpu_cores": cpu_cores})
+
+        if added:
+            self.last_scale_up = now
+            self.stats["nodes_added"] += len(added)
+            self._record("scale_up", nodes=added, pending=pending["depth"])
+        return {"action": "scale_up", "nodes": added}
+
+    def _scale_down(self, nodes, now):
+        usage = self.resource_monitor.get_node_usage()
+        healthy = {nid: info for nid, info in nodes.items() if info["status"] == "healthy"}
+
+        # Track how long each node has been underutilized (hysteresis)
+        for node_id, info in healthy.items():
+            allocated = (info["cpu_cores"] - info["available_cores"]) / info["cpu_cores"]
+            used = usage.get(node_id, {}).get("cpu_usage", 0) / info["cpu_cores"]
+            if max(allocated, used) < self.scale_down_utilization:
+                self.underutilized_since.setdefault(node_id, now)
+            else:
+                self.underutilized_since.pop(node_id, None)
+        for node_id in list(self.underutilized_since):
+            if node_id not in healthy:
+                del self.underutilized_since[node_id]
+
+        if len(healthy) <= self.min_nodes or now - self.last_scale_down < self.scale_down_cooldown:
+            return None
+
+        candidates = sorted(
+            (healthy[nid]["cpu_cores"] - healthy[nid]["available_cores"], nid)
+            for nid, since in self.underutilized_since.items()
+            if now - since >= self.scale_down_delay and nid not in self.provisioning
+        )
+        for _, node_id in candidates:
+            placements = self._plan_drain(healthy, node_id)
+            if placements is not None:
+                return self._drain(node_id, placements, now)
+        return None
+
+    def _plan_drain(self, healthy, node_id):
+        """Best-fit the node's pods onto the other healthy nodes, or None if they don't fit"""
+        free = {nid: info["available_cores"] for nid, info in healthy.items() if nid != node_id}
+        pods = []
+        for pod_id in healthy[node_id]["pods"]:
+            pod = self.pod_scheduler.get_pod(pod_id)
+            if pod is not None:
+                pods.append((pod["cpu_cores"], pod_id))
+
+        placements = []
+        for cpu_cores, pod_id in sorted(pods, reverse=True):
+            fits = [(f, nid) for nid, f in free.items() if f >= cpu_cores]
+            if not fits:
+                return None
+            _, target = min(fits)
+            free[target] -= cpu_cores
+            placements.append((pod_id, target))
+        return placements
+
+    def _drain(self, node_id, placements, now):
+        # Cordon the node first so nothing new lands on it while its pods move out
+        if not self.node_manager.update_node_status(node_id, "draining"):
+            return None
+        moved = sum(1 for pod_id, target in placements if self.pod_scheduler.move_pod(pod_id, target))
+
+        # Pods that could not be moved, or landed meanwhile, are rescheduled or left pending
+        result = self.pod_scheduler.reschedule_pods_from_node(node_id)
+        self.node_manager.remove_node(node_id)
+        try:
+            self.provisioner.remove_node(node_id)
+        except Exception as e:
+            logger.error(f"Failed to stop node {node_id}: {e}")
+
+        self.underutilized_since.pop(node_id, None)
+        self.last_scale_down = now
+        self.stats["nodes_removed"] += 1
+        self.stats["pods_moved"] += moved
+        self._record("scale_down", node_id=node_id, moved=moved,
+                     rescheduled=len(result["rescheduled"]), pending=len(result["pending"]))
+        return {"action": "scale_down", "node_id": node_id, "moved": moved}
+
+    def get_status(self):
+        """Settings, nodes being provisioned, scale-down candidates and recent decisions"""
+        now = self.clock.time()
+        with self.lock:
+            return {
+                "interval": self.interval,
+                "node_sizes": self.node_sizes,
+                "min_nodes": self.min_nodes,
+                "max_nodes": self.max_nodes,
+                "provisioning": {nid: cpu for nid, (cpu, _) in self.provisioning.items()},
+                "underutilized": {nid: round(now - since, 1) for nid, since in self.underutilized_since.items()},
+                "stats": dict(self.stats),
+                "events": list(self.events)[-20:]
+            }
@@ -0,0 +1,117 @@
+# api_server/clock.py
+"""Clocks injected into the components that measure time.
+
+Heartbeat timeouts, stale-metric windows and reservation expiry all read
+the time from a clock object instead of the time module, so failure and
+recovery scenarios can run faster than real time:
+    RealClock    wall-clock time
+    ScaledClock  time passes scale times faster than real time
+    ManualClock  time only moves when advance() is called; sleepers wake
+                 once the clock has been advanced past their deadline
+"""
+import time
+import threading
+import datetime
+from threading import Lock
+
+class RealClock:
+    mode = "real"
+
+    def time(self):
+        """Seconds since the epoch"""
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, waitable, timeout=None):
+        """Wait on an Event, or a held Condition, for up to timeout clock seconds"""
+        return waitable.wait(timeout)
+
+class ScaledClock(RealClock):
+    mode = "scaled"
+
+    def __init__(self, scale, start=None):
+        if scale <= 0:
+            raise ValueError("Clock scale must be positive")
+        self.scale = scale
+        self.start = time.time() if start is None else start
+        self.real_start = time.monotonic()
+
+    def monotonic(self):
+        return (time.monotonic() - self.real_start) * self.scale
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.scale)
+
+    def wait(self, waitable, timeout=None):
+        return waitable.wait(None if timeout is None else timeout / self.scale)
+
+class ManualClock(RealClock):
+    mode = "manual"
+
+    def __init__(self, start=None):
+        self.start = time.time() if start is None else start
+        self.elapsed = 0.0
+        self.lock = Lock()
+        self.advanced = threading.Condition(self.lock)
+        self.waiters = set()  # conditions to notify whenever the clock moves
+
+    def monotonic(self):
+        with self.lock:
+            return self.elapsed
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    def advance(self, seconds):
+        """Move the clock forward, waking every sleeper whose deadline has passed"""
+        if seconds < 0:
+            raise ValueError("A clock cannot go backwards")
+        with self.lock:
+            self.elapsed += seconds
+            self.advanced.notify_all()
+            waiters = list(self.waiters)
+        for condition in waiters:
+            with condition:
+                condition.notify_all()
+        return self.time()
+
+    def sleep(self, seconds):
+        with self.lock:
+            deadline = self.elapsed + seconds
+            while self.elapsed < deadline:
+                self.advanced.wait()
+
+    def wait(self, waitable, timeout=None):
+        # Conditions are notified when the clock moves. The caller computed
+        # timeout from an earlier reading, so also wake up now and then to let
+        # it recheck in case the clock moved in between.
+        if not isinstance(waitable, threading.Condition):
+            return waitable.wait(None if timeout is None else 0.1)
+        with self.lock:
+            self.waiters.add(waitable)
+        try:
+            return waitable.wait(None if timeout is None else 0.1)
+        finally:
+            with self.lock:
+                self.waiters.discard(waitable)
+
+def make_clock(mode="real", scale=1.0):
+    """Build a clock from a CLOCK_MODE style setting"""
+    if mode == "real":
+        return RealClock()
+    if mode == "scaled":
+        return ScaledClock(scale)
+    if mode == "manual":
+        return ManualClock()
+    raise ValueError(f"Unknown clock mode: {mode}")
@@ -0,0 +1,83 @@
+# api_server/constraints.py
+"""Node labels and pod placement constraints.
+
+Nodes carry labels such as zone, rack and instance type. A pod may name its
+app and ask for:
+    node_selector  {"zone": "a"}                          nodes with all these labels
+    affinity       [{"app": "db", "topology_key": "zone"}]  a zone already running db pods
+    anti_affinity  [{"app": "web", "topology_key": "node"}] no node already running web pods
+    spread         [{"topology_key": "zone", "max_skew": 1}] keep the pod's app balanced over zones
+The topology key "node" makes every node its own domain.
+"""
+
+NODE_TOPOLOGY = "node"
+
+def parse_labels(value):
+    """Parse labels given as a dict or as "key=value,key=value", raising ValueError"""
+    if not value:
+        return {}
+    if isinstance(value, str):
+        labels = {}
+        for item in value.split(","):
+            if not item.strip():
+                continue
+            key, sep, label = item.partition("=")
+            if not sep or not key.strip():
+                raise ValueError(f"Invalid label: {item}")
+            labels[key.strip()] = label.strip()
+        return labels
+    if isinstance(value, dict):
+        return {str(k): str(v) for k, v in value.items()}
+    raise ValueError("labels must be an object or key=value pairs")
+
+def _as_rules(value, name):
+    if not value:
+        return []
+    rules = value if isinstance(value, list) else [value]
+    if not all(isinstance(rule, dict) for rule in rules):
+        raise ValueError(f"{name} must be an object or a list of objects")
+    return rules
+
+def parse_placement(data):
+    """Validate the placement fields of a launch request.
+
+    Returns {"app": ..., "constraints": {...}} with only the given fields,
+    or None for a pod without an app or constraints.
+    """
+    spec = {}
+    app = data.get("app")
+    if app:
+        spec["app"] = str(app)
+
+    constraints = {}
+    node_selector = parse_labels(data.get("node_selector"))
+    if node_selector:
+        constraints["node_selector"] = node_selector
+
+    for name in ("affinity", "anti_affinity"):
+        rules = []
+        for rule in _as_rules(data.get(name), name):
+            if not rule.get("app"):
+                raise ValueError(f"{name} rules need an app")
+            rules.append({"app": str(rule["app"]),
+                          "topology_key": str(rule.get("topology_key", NODE_TOPOLOGY))})
+        if rules:
+            constraints[name] = rules
+
+    rules = []
+    for rule in _as_rules(data.get("spread"), "spread"):
+        if not app:
+            raise ValueError("spread constraints need the pod's app")
+        try:
+            max_skew = int(rule.get("max_skew", 1))
+        except (TypeError, ValueError):
+            raise ValueError("max_skew must be an integer")
+        if max_skew < 1:
+            raise ValueError("max_skew must be at least 1")
+        rules.append({"topology_key": str(rule.get("topology_key", NODE_TOPOLOGY)), "max_skew": max_skew})
+    if rules:
+        constraints["spread"] = rules
+
+    if constraints:
+        spec["constraints"] = constraints
+    return spec or None
@@ -0,0 +1,194 @@
+# api_server/equivalence_cache.py
+"""Feasible-node caches shared by pods of the same shape.
+
+Most launches ask for one of a few core counts. Pods asking for the same
+number of cores form an equivalence class: they fit on exactly the same
+nodes. Rather than scanning every node for every pod, the cache keeps one
+feasible-node list per class, plus the free capacity of every node in
+sorted buckets, and remembers the best candidate of each class until a
+change could have displaced it. Node changes are applied one node at a
+time, so only the classes whose feasibility that node crossed are touched.
+
+Placement constraints depend on which pods already run where, so
+constrained pods bypass the cache.
+"""
+import bisect
+from threading import Lock
+
+class EquivalenceCache:
+    def __init__(self, nodes=(), max_classes=64):
+        self.lock = Lock()
+        self.available = {}  # node_id -> available cores, healthy nodes only
+        self.order = {}  # node_id -> position in the order nodes were first seen, for first-fit
+        self.next_order = 0
+        self.levels = []  # sorted distinct available core counts
+        self.buckets = {}  # available cores -> {node_id: None}, least recently changed first
+        self.classes = {}  # cpu_cores -> sorted [(order, node_id)] of the nodes the class fits on
+        self.best = {}  # (cpu_cores, algorithm) -> cached best node
+        self.max_classes = max_classes  # bounds the work done per node change
+        self.stats = {"best_hits": 0, "best_misses": 0, "classes_built": 0, "node_updates": 0}
+        for node_id, available in nodes:
+            self._set(node_id, available)
+
+    def node_changed(self, node_id, node):
+        """NodeManager listener: node is the changed record, or None once it was removed"""
+        with self.lock:
+            if node is None:
+                self._remove(node_id)
+                self.order.pop(node_id, None)
+            elif node["status"] != "healthy":
+                self._remove(node_id)
+            else:
+                self._set(node_id, node["available_cores"])
+
+    def update(self, node_id, available):
+        """Set the available cores of a healthy node"""
+        with self.lock:
+            self._set(node_id, available)
+
+    def _set(self, node_id, available):
+        old = self.available.get(node_id)
+        if old == available:
+            return  # heartbeats and pod list changes leave the classes alone
+        self.stats["node_updates"] += 1
+        if node_id not in self.order:
+            self.order[node_id] = self.next_order
+            self.next_order += 1
+        if old is not None:
+            self._unbucket(node_id, old)
+        self.available[node_id] = available
+        bucket = self.buckets.get(available)
+        if bucket is None:
+            bucket = self.buckets[available] = {}
+            bisect.insort(self.levels, available)
+        bucket[node_id] = None
+
+        entry = (self.order[node_id], node_id)
+        for cpu_cores, feasible in self.classes.items():
+            fitted = old is not None and old >= cpu_cores
+            fits = available >= cpu_cores
+            if fitted and not fits:
+                del feasible[bisect.bisect_left(feasible, entry)]
+            elif fits and not fitted:
+                bisect.insort(feasible, entry)
+
+        # Drop only the cached choices this change could have displaced, so a
+        # burst of one shape keeps hitting the node it is filling up
+        for (cpu_cores, algorithm), best in list(self.best.items()):
+            if best == node_id:
+                if algorithm == "best-fit":
+                    stale = available < cpu_cores or available > old
+                elif algorithm == "worst-fit":
+                    stale = available < old
+                else:
+                    stale = available < cpu_cores
+            elif available < cpu_cores:
+                stale = False
+            elif algorithm == "best-fit":
+                stale = available < self.available[best]
+            elif algorithm == "worst-fit":
+                stale = available > self.available[best]
+            else:
+                stale = self.order[node_id] < self.order[best]
+            if stale:
+                del self.best[(cpu_cores, algorithm)]
+
+    def _remove(self, node_id):
+        old = self.available.pop(node_id, None)
+        if old is None:
+            return
+        self.stats["node_updates"] += 1
+        self._unbucket(node_id, old)
+        entry = (self.order[node_id], node_id)
+        for cpu_cores, feasible in self.classes.items():
+            if old >= cpu_cores:
+                del feasible[bisect.bisect_left(feasible, entry)]
+        for key, best in list(self.best.items()):
+            if best == node_id:
+                del self.best[key]
+
+    def _unbucket(self, node_id, available):
+        bucket = self.buckets[available]
+        del bucket[node_id]
+        if not bucket:
+            del self.buckets[available]
+            del self.levels[bisect.bisect_left(self.levels, available)]
+
+    def _class(self, cpu_cores):
+        """The feasible nodes of a class, built on its first request"""
+        feasible = self.classes.get(cpu_cores)
+        if feasible is None:
+            if len(self.classes) >= self.max_classes:
+                evicted = next(iter(self.classes))
+                del self.classes[evicted]
+                for key in [key for key in self.best if key[0] == evicted]:
+                    del self.best[key]
+            feasible = sorted((self.order[node_id], node_id)
+                              for node_id, available in self.available.items() if available >= cpu_cores)
+            self.classes[cpu_cores] = feasible
+            self.stats["classes_built"] += 1
+        return feasible
+
+    def _candidates(self, cpu_cores, algorithm, k, exclude):
+        feasible = self._class(cpu_cores)
+        found = []
+        if algorithm == "first-fit":
+            for _, node_id in feasible:
+                if node_id not in exclude:
+                    found.append(node_id)
+                    if len(found) == k:
+                        break
+            return found
+
+        # Best-fit walks the free-capacity buckets up from the request, worst-fit down from the top
+        start = bisect.bisect_left(self.levels, cpu_cores)
+        if algorithm == "worst-fit":
+            levels = range(len(self.levels) - 1, start - 1, -1)
+        else:
+            levels = range(start, len(self.levels))
+        for i in levels:
+            for node_id in self.buckets[self.levels[i]]:
+                if node_id not in exclude:
+                    found.append(node_id)
+                    if len(found) == k:
+                        return found
+        return found
+
+    def candidates(self, cpu_cores, algorithm, k=1, exclude=()):
+        """Up to k nodes for a pod of cpu_cores, best first by the given algorithm"""
+        with self.lock:
+            return self._candidates(cpu_cores, algorithm, k, exclude)
+
+    def choose(self, cpu_cores, algorithm, exclude=()):
+        """The best node for a pod of cpu_cores, or None if no healthy node fits it"""
+        with self.lock:
+            key = (cpu_cores, algorithm)
+            if not exclude and key in self.best:
+                self.stats["best_hits"] += 1
+                return self.best[key]
+            self.stats["best_misses"] += 1
+            found = self._candidates(cpu_cores, algorithm, 1, exclude)
+            if not found:
+                return None
+            if not exclude:
+                self.best[key] = found[0]
+            return found[0]
+
+    def get_available(self, node_id):
+        with self.lock:
+            return self.available.get(node_id)
+
+    def max_available(self):
+        """The most free cores on any healthy node"""
+        with self.lock:
+            return self.levels[-1] if self.levels else 0
+
+    def __len__(self):
+        with self.lock:
+            return len(self.available)
+
+    def get_stats(self):
+        """Cache counters and the feasible node count of every class"""
+        with self.lock:
+            return dict(self.stats, healthy_nodes=len(self.available),
+                        classes={cpu_cores: len(feasible) for cpu_cores, feasible in sorted(self.classes.items())})
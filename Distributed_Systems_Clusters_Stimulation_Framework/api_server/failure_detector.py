@@ -0,0 +1,202 @@
+# api_server/failure_detector.py
+"""Phi-accrual failure detection.
+
+Instead of a fixed timeout, each node's heartbeat inter-arrival times are
+summarized by an exponentially weighted mean and variance (three numbers
+per node, whatever its history). The silence since the last heartbeat is
+turned into phi = -log10(P(a heartbeat arrives later than now)) under a
+normal distribution with those parameters. phi 1 means a 10% chance that
+the node is merely slow, phi 3 a 0.1% chance.
+
+HealthMonitor marks a node suspect at suspect_threshold, which only keeps
+new pods off it, and failed at failed_threshold, which reschedules its
+pods. A node on a steady network gets a narrow distribution and is
+detected within a few seconds of its usual interval. A node whose
+heartbeats jitter (GC pauses, a loaded server) learns a wider one and is
+not failed for pauses it has shown before.
+
+min_std and acceptable_pause keep a perfectly regular node from being
+failed by the first small delay. A pause far longer than anything the
+node has shown (every agent stalling at once, say) still fails it; raise
+acceptable_pause or failed_threshold where that is expected. When the API server tells a node a new
+heartbeat interval, expect() rescales its distribution, so a longer
+interval isn't read as silence; an interval told before the first
+heartbeat seeds the distribution instead.
+
+Each heartbeat also works out when the node's phi will cross
+suspect_threshold and files that deadline in a heap. overdue() pops only
+the deadlines that have passed, so a health check costs time in
+proportion to the nodes falling behind, not to the fleet size.
+"""
+import heapq
+import math
+from threading import Lock
+
+class PhiAccrualDetector:
+    def __init__(self, suspect_threshold=3.0, failed_threshold=8.0, alpha=0.03, min_std=0.2, min_std_ratio=0.1,
+                 acceptable_pause=3.0, first_interval=10.0):
+        self.suspect_threshold = suspect_threshold
+        self.failed_threshold = failed_threshold
+        self.alpha = alpha  # weight of the newest inter-arrival time; small, so a pause is remembered for ~30 beats
+        self.min_std = min_std  # seconds
+        self.min_std_ratio = min_std_ratio  # standard deviation floor as a share of the mean
+        self.acceptable_pause = acceptable_pause  # seconds of extra silence tolerated on top of the mean
+        self.first_interval = first_interval  # assumed mean for a node that was never told an interval
+        self.lock = Lock()
+        self.arrivals = {}  # node_id -> [last arrival, mean interval, interval variance]
+        self.intervals = {}  # node_id -> heartbeat interval it was last told
+        # Standardized lateness at which phi reaches each threshold
+        self.suspect_lateness = self._crossing(suspect_threshold)
+        self.failed_lateness = self._crossing(failed_threshold)
+        self.deadlines = {}  # node_id -> clock time of its next check
+        self.checks = []  # heap of (clock time, node_id), stale once deadlines moved on
+
+    def heartbeat(self, node_id, now):
+        """Record a heartbeat arrival"""
+        with self.lock:
+            self._arrival(node_id, now)
+
+    def heartbeats(self, node_ids, now):
+        with self.lock:
+            for node_id in node_ids:
+                self._arrival(node_id, now)
+
+    def _arrival(self, node_id, now):
+        # Called with self.lock held
+        entry = self.arrivals.get(node_id)
+        if entry is None:
+            mean = self.intervals.get(node_id, self.first_interval)
+            entry = self.arrivals[node_id] = [now, mean, (mean / 4) ** 2]
+        else:
+            interval = now - entry[0]
+            if interval <= 0:
+                return
+            diff = interval - entry[1]
+            entry[1] += self.alpha * diff
+            entry[2] = (1 - self.alpha) * (entry[2] + self.alpha * diff * diff)
+            entry[0] = now
+        self._schedule(node_id, self._deadline(entry, self.suspect_lateness))
+
+    def expect(self, node_id, interval):
+        """The node was told to heartbeat every `interval` seconds from now on"""
+        with self.lock:
+            self.intervals[node_id] = interval
+            entry = self.arrivals.get(node_id)
+            if entry is not None and abs(interval - entry[1]) > 0.25 * entry[1]:
+                entry[2] *= (interval / entry[1]) ** 2
+                entry[1] = interval
+                self._schedule(node_id, self._deadline(entry, self.suspect_lateness))
+
+    def forget(self, node_id):
+        """Drop the node's arrival history, e.g. once it failed; its told interval is kept"""
+        with self.lock:
+            self.arrivals.pop(node_id, None)
+            self.deadlines.pop(node_id, None)
+
+    def remove(self, node_id):
+        """Drop everything known about a node that left the cluster"""
+        with self.lock:
+            self.arrivals.pop(node_id, None)
+            self.deadlines.pop(node_id, None)
+            self.intervals.pop(node_id, None)
+
+    def overdue(self, now):
+        """(node_id, state, phi) of the nodes that became suspect or failed since their deadline.
+
+        Each node is reported once per state: a suspect node is checked
+        again when it would fail, and a failed one not before its next
+        heartbeat.
+        """
+        found = []
+        with self.lock:
+            while self.checks and self.checks[0][0] <= now:
+                due, node_id = heapq.heappop(self.checks)
+                if self.deadlines.get(node_id) != due:
+                    continue  # superseded by a later heartbeat
+                del self.deadlines[node_id]
+                entry = self.arrivals[node_id]
+                if now >= self._deadline(entry, self.failed_lateness):
+                    found.append((node_id, "failed"))
+                    continue
+                suspect_at = self._deadline(entry, self.suspect_lateness)
+                if now >= suspect_at:
+                    found.append((node_id, "suspect"))
+                    self._schedule(node_id, self._deadline(entry, self.failed_lateness))
+                else:
+                    self._schedule(node_id, suspect_at)  # its interval was rescaled meanwhile
+        return [(node_id, state, self.phi(node_id, now)) for node_id, state in found]
+
+    def _schedule(self, node_id, due):
+        # Called with self.lock held
+        self.deadlines[node_id] = due
+        heapq.heappush(self.checks, (due, node_id))
+
+    def _deadline(self, entry, lateness):
+        """Clock time at which a node's phi reaches the threshold of `lateness`"""
+        last, mean, variance = entry
+        return last + mean + self.acceptable_pause + lateness * self._std(mean, variance)
+
+    def _std(self, mean, variance):
+        return max(math.sqrt(variance), self.min_std, self.min_std_ratio * mean)
+
+    @staticmethod
+    def _phi_at(y):
+        # Logistic approximation of the normal CDF, as in Akka's detector
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if y > 0:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    @classmethod
+    def _crossing(cls, threshold):
+        """Standardized lateness y in [-10, 10] at which phi first reaches threshold"""
+        low, high = -10.0, 10.0
+        for _ in range(60):
+            middle = (low + high) / 2
+            if cls._phi_at(middle) < threshold:
+                low = middle
+            else:
+                high = middle
+        return high
+
+    def tracks(self, node_id):
+        """Whether the node has sent a heartbeat since it was last forgotten"""
+        with self.lock:
+            return node_id in self.arrivals
+
+    def phi(self, node_id, now):
+        """Suspicion level of node_id, None if it never sent a heartbeat"""
+        with self.lock:
+            entry = self.arrivals.get(node_id)
+            if entry is None:
+                return None
+            last, mean, variance = entry
+        # Clamping y keeps exp() in range; phi tops out at about 37
+        y = min(10.0, max(-10.0, (now - last - mean - self.acceptable_pause) / self._std(mean, variance)))
+        return self._phi_at(y)
+
+    def classify(self, node_id, now):
+        """Node state by phi: healthy, suspect or failed; None if the node never sent a heartbeat"""
+        phi = self.phi(node_id, now)
+        if phi is None:
+            return None
+        if phi >= self.failed_threshold:
+            return "failed"
+        if phi >= self.suspect_threshold:
+            return "suspect"
+        return "healthy"
+
+    def get_stats(self, now):
+        """Nodes tracked and the phi distribution across them"""
+        with self.lock:
+            node_ids = list(self.arrivals)
+            scheduled = len(self.deadlines)
+        levels = sorted(phi for phi in (self.phi(node_id, now) for node_id in node_ids) if phi is not None)
+        return {
+            "tracked_nodes": len(levels),
+            "suspect_threshold": self.suspect_threshold,
+            "failed_threshold": self.failed_threshold,
+            "scheduled_checks": scheduled,
+            "phi_p50": round(levels[len(levels) // 2], 3) if levels else None,
+            "phi_max": round(levels[-1], 3) if levels else None
+        }
@@ -0,0 +1,158 @@
+# api_server/fleet.py
+"""Bring up a fleet of node containers in parallel.
+
+A bounded pool of threads starts the containers. As they come up, the
+nodes are registered through /api/nodes/register/bulk in batches, while
+the remaining containers are still starting. Bringing up a test fleet
+then takes about as long as container startup, not one serial launch and
+registration per node. Agents still register themselves once they run,
+which only refreshes the entry.
+
+    python -m api_server.fleet --nodes 500 --cpu-cores 4 --parallelism 32
+    python -m api_server.fleet --nodes 100 --cpu-cores 8 --labels zone=a --api-server http://localhost:5000
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+
+import requests
+
+from api_server.constraints import parse_labels
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Same network as the API server's /api/nodes/add
+DOCKER_NETWORK = "distributed_systems_clusters_stimulation_framework_cluster_network"
+
+class FleetBootstrap:
+    def __init__(self, api_server, agent_api_server, network=DOCKER_NETWORK, image="node-image",
+                 parallelism=16, batch_size=100):
+        import docker
+        self.docker = docker
+        self.api_server = api_server.rstrip("/")
+        self.agent_api_server = agent_api_server
+        self.network = network
+        self.image = image
+        self.parallelism = parallelism
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        self._local = threading.local()
+
+    def _client(self):
+        """Per-thread Docker client, so parallel launches don't share one connection"""
+        if not hasattr(self._local, "client"):
+            self._local.client = self.docker.from_env()
+        return self._local.client
+
+    def launch(self, node_id, cpu_cores, labels):
+        """Start one node container, like /api/nodes/add"""
+        self._client().containers.run(
+            self.image,
+            name=node_id,
+            detach=True,
+            environment={
+                "NODE_ID": node_id,
+                "CPU_CORES": str(cpu_cores),
+                "NODE_LABELS": ",".join(f"{k}={v}" for k, v in labels.items()),
+                "API_SERVER": self.agent_api_server
+            },
+            network=self.network,
+            restart_policy={"Name": "on-failure"},
+        )
+
+    def register(self, node_ids, cpu_cores, labels):
+        """Register a batch of nodes in one request, returning the ids the server admitted"""
+        nodes = [{"node_id": node_id, "cpu_cores": cpu_cores, "labels": labels} for node_id in node_ids]
+        try:
+            response = self.session.post(f"{self.api_server}/api/nodes/register/bulk",
+                                         json={"nodes": nodes}, timeout=30)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to register {len(node_ids)} nodes: {e}")
+            return []
+        body = response.json()
+        if response.status_code != 200:
+            logger.error(f"Bulk registration refused: {body.get('error')}")
+        return body.get("registered", [])
+
+    def bootstrap(self, count, cpu_cores, labels=None, prefix="node"):
+        """Start count node containers and register them, returning a summary"""
+        labels = labels or {}
+        node_ids = [f"{prefix}-{str(uuid.uuid4())[:8]}" for _ in range(count)]
+        started = time.monotonic()
+        failed = {}
+        registered = []
+        batch = []
+        launched = 0
+
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            futures = {pool.submit(self.launch, node_id, cpu_cores, labels): node_id for node_id in node_ids}
+            # Register finished launches while the rest are still starting
+            for future in as_completed(futures):
+                node_id = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Failed to launch node {node_id}: {e}")
+                    failed[node_id] = str(e)
+                    continue
+                launched += 1
+                batch.append(node_id)
+                if len(batch) >= self.batch_size:
+                    registered.extend(self.register(batch, cpu_cores, labels))
+                    batch = []
+            launch_seconds = time.monotonic() - started
+            if batch:
+                registered.extend(self.register(batch, cpu_cores, labels))
+
+        elapsed = time.monotonic() - started
+        return {
+            "requested": count,
+            "launched": launched,
+            "registered": len(registered),
+            "failed": failed,
+            "launch_seconds": round(launch_seconds, 2),
+            "time_to_ready_seconds": round(elapsed, 2),
+            "nodes_per_second": round(len(registered) / elapsed, 1) if elapsed else None,
+            "node_ids": registered
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Launch node containers in parallel and register them in bulk")
+    parser.add_argument("--nodes", type=int, required=True, help="number of node containers to start")
+    parser.add_argument("--cpu-cores", type=int, default=2)
+    parser.add_argument("--labels", default="", help="labels for every node, e.g. zone=a,rack=r1")
+    parser.add_argument("--prefix", default="node", help="node id prefix")
+    parser.add_argument("--parallelism", type=int, default=16, help="containers started at once")
+    parser.add_argument("--batch-size", type=int, default=100, help="nodes per bulk registration")
+    parser.add_argument("--api-server", default="http://localhost:5000", help="API server (or shard router) to register with")
+    parser.add_argument("--agent-api-server", default="http://api_server:5000",
+                        help="API server URL as seen from inside the node containers")
+    parser.add_argument("--network", default=DOCKER_NETWORK)
+    parser.add_argument("--image", default="node-image")
+    parser.add_argument("--output", help="also write the summary to this JSON file")
+    args = parser.parse_args()
+    if args.nodes <= 0 or args.cpu_cores <= 0 or args.parallelism <= 0 or args.batch_size <= 0:
+        parser.error("--nodes, --cpu-cores, --parallelism and --batch-size must be positive")
+
+    try:
+        labels = parse_labels(args.labels)
+    except ValueError as e:
+        parser.error(str(e))
+
+    fleet = FleetBootstrap(args.api_server, args.agent_api_server, args.network, args.image,
+                           args.parallelism, args.batch_size)
+    summary = fleet.bootstrap(args.nodes, args.cpu_cores, labels, args.prefix)
+    logger.info(f"{summary['registered']}/{args.nodes} nodes ready in {summary['time_to_ready_seconds']}s")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    print(json.dumps({key: value for key, value in summary.items() if key != "node_ids"}, indent=2))
+
+if __name__ == "__main__":
+    main()
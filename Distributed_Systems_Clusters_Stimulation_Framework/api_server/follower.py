@@ -0,0 +1,110 @@
+# api_server/follower.py
+"""Read follower for the API server.
+
+Tails the leader's mutation log into local NodeManager, PodScheduler and
+ResourceMonitor copies and serves the read endpoints from them. Reads are
+forwarded to the leader whenever the copy may be more than MAX_STALENESS
+seconds behind; every other request is forwarded to the leader.
+
+    LEADER_URL=http://api_server:5000 API_PORT=5001 python -m api_server.follower
+"""
+import os
+import logging
+
+import requests
+from flask import Flask, request, jsonify
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+from api_server.resource_monitor import ResourceMonitor
+from api_server.pagination import parse_list_query
+from api_server.replication import LogFollower
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+
+LEADER_URL = os.getenv("LEADER_URL", "http://api_server:5000")
+MAX_STALENESS = float(os.getenv("MAX_STALENESS", "5"))  # seconds
+
+# Local copies, only ever written by the log follower
+node_manager = NodeManager()
+pod_scheduler = PodScheduler(node_manager)
+resource_monitor = ResourceMonitor(node_manager)
+
+follower = LogFollower(LEADER_URL, node_manager, pod_scheduler, resource_monitor)
+follower.start_following()
+
+session = requests.Session()
+
+def _forward_to_leader(path):
+    try:
+        response = session.request(
+            request.method,
+            f"{LEADER_URL}/{path}",
+            params=request.args,
+            data=request.get_data(),
+            headers={"Content-Type": request.headers.get("Content-Type", "application/json")},
+            timeout=30
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to forward {request.method} /{path} to leader: {e}")
+        return jsonify({"error": "Leader unavailable"}), 502
+    return response.content, response.status_code, {"Content-Type": "application/json"}
+
+def _serve_read(path, key, list_fn):
+    """Serve a list read locally while the copy is fresh enough"""
+    staleness = follower.staleness()
+    if staleness > MAX_STALENESS:
+        return _forward_to_leader(path)
+
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    items, next_cursor = list_fn(query)
+    response = jsonify({key: items, "next_cursor": next_cursor})
+    response.headers["X-Replica-Seq"] = str(follower.applied_seq)
+    response.headers["X-Replica-Staleness"] = f"{staleness:.3f}"
+    return response
+
+@app.route('/')
+def home():
+    return jsonify({
+        "message": "Distributed Cluster API read follower is running",
+        "leader": LEADER_URL,
+        "applied_seq": follower.applied_seq,
+        "staleness": follower.staleness()
+    })
+
+@app.route('/api/nodes', methods=['GET'])
+def get_nodes():
+    """List nodes from the local copy"""
+    return _serve_read("api/nodes", "nodes", node_manager.list_nodes)
+
+@app.route('/api/pods', methods=['GET'])
+def get_pods():
+    """List pods from the local copy"""
+    return _serve_read("api/pods", "pods", pod_scheduler.list_pods)
+
+@app.route('/api/pods/metrics', methods=['GET'])
+def get_pod_metrics():
+    """List pod metrics from the local copy"""
+    return _serve_read("api/pods/metrics", "metrics", resource_monitor.list_pod_metrics)
+
+@app.route('/api/shard/capacity', methods=['GET'])
+def get_shard_capacity():
+    if follower.staleness() > MAX_STALENESS:
+        return _forward_to_leader("api/shard/capacity")
+    return jsonify(node_manager.get_capacity_summary())
+
+@app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+def forward(path):
+    """Writes and anything else not served locally go to the leader"""
+    return _forward_to_leader(path)
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.getenv("API_PORT", "5001")), threaded=True)
@@ -0,0 +1,44 @@
+import bisect
+import hashlib
+
+class HashRing:
+    """Consistent-hash ring mapping keys (node ids) to shards"""
+
+    def __init__(self, shards=None, replicas=100):
+        self.replicas = replicas  # virtual points per shard, smooths the partition sizes
+        self.ring = []  # sorted hash points
+        self.owners = {}  # hash point -> shard
+        for shard in shards or []:
+            self.add_shard(shard)
+
+    @staticmethod
+    def _hash(key):
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def add_shard(self, shard):
+        """Add a shard and its virtual points to the ring"""
+        for i in range(self.replicas):
+            point = self._hash(f"{shard}#{i}")
+            if point in self.owners:
+                continue
+            bisect.insort(self.ring, point)
+            self.owners[point] = shard
+
+    def remove_shard(self, shard):
+        """Remove a shard, its keys move to the next shards on the ring"""
+        for i in range(self.replicas):
+            point = self._hash(f"{shard}#{i}")
+            if self.owners.get(point) == shard:
+                del self.owners[point]
+                del self.ring[bisect.bisect_left(self.ring, point)]
+
+    def get_shard(self, key):
+        """Get the shard owning a key"""
+        if not self.ring:
+            return None
+        i = bisect.bisect(self.ring, self._hash(key)) % len(self.ring)
+        return self.owners[self.ring[i]]
+
+    def get_shards(self):
+        """Get all shards on the ring"""
+        return sorted(set(self.owners.values()))
@@ -1,20 +1,82 @@
-import time
+import heapq
 import threading
+import time
 from threading import Lock
 
 class HealthMonitor:
-    def __init__(self, node_manager, pod_scheduler=None):
+    def __init__(self, node_manager, pod_scheduler=None, clock=None):
         self.node_manager = node_manager
         self.pod_scheduler = pod_scheduler
+        self.clock = clock or node_manager.clock  # must match the clock heartbeats are stamped with
         self.lock = Lock()
-        self.heartbeat_timeout = 30  # seconds
+        self.heartbeat_timeout = 30  # seconds, for nodes without a negotiated interval
+        self.heartbeat_policy = None
+        self.membership = None
+        self.failure_detector = None
+        self.check_interval = 1  # seconds between checks of nodes whose deadline passed
+        # Nodes judged by timeout (all of them without a failure detector) are checked
+        # when their timeout would run out, not swept
+        self.timeout_lock = Lock()
+        self.timeout_due = {}  # node_id -> clock time of its next timeout check
+        self.timeout_checks = []  # heap of (clock time, node_id), stale once timeout_due moved on
         self.running = False
         self.monitor_thread = None
+        node_manager.add_node_listener(self._node_changed)
+        for node_id, status, last_heartbeat in node_manager.get_heartbeat_states():
+            if status != "failed":
+                self._schedule_timeout(node_id, last_heartbeat + self.heartbeat_timeout)
     
     def set_pod_scheduler(self, scheduler):
         """Set the pod scheduler (used for rescheduling pods from failed nodes)"""
         self.pod_scheduler = scheduler
     
+    def set_heartbeat_policy(self, policy):
+        """Negotiate heartbeat intervals with nodes and derive their timeouts from them"""
+        self.heartbeat_policy = policy
+    
+    def set_failure_detector(self, detector):
+        """Judge nodes by phi accrual instead of a fixed timeout once they have sent heartbeats"""
+        self.failure_detector = detector
+        self.node_manager.add_node_listener(
+            lambda node_id, node: detector.remove(node_id) if node is None else None)
+    
+    def _node_changed(self, node_id, node):
+        """NodeManager listener: queue a timeout check for a node the detector doesn't judge"""
+        if node is None:
+            with self.timeout_lock:
+                self.timeout_due.pop(node_id, None)
+            return
+        if node.status == "failed" or node_id in self.timeout_due:
+            return
+        if self.failure_detector and self.failure_detector.tracks(node_id):
+            return
+        self._schedule_timeout(node_id, node.last_heartbeat + self._timeout(node_id))
+    
+    def _timeout(self, node_id):
+        policy = self.heartbeat_policy
+        return policy.timeout_for(node_id, self.heartbeat_timeout) if policy else self.heartbeat_timeout
+    
+    def _schedule_timeout(self, node_id, due):
+        with self.timeout_lock:
+            self.timeout_due[node_id] = due
+            heapq.heappush(self.timeout_checks, (due, node_id))
+    
+    def _due_timeouts(self, now):
+        """Pop the nodes whose timeout check is due"""
+        due_nodes = []
+        with self.timeout_lock:
+            checks = self.timeout_checks
+            while checks and checks[0][0] <= now:
+                due, node_id = heapq.heappop(checks)
+                if self.timeout_due.get(node_id) == due:
+                    del self.timeout_due[node_id]
+                    due_nodes.append(node_id)
+        return due_nodes
+    
+    def set_membership(self, membership):
+        """Gossip membership; its members get the longest heartbeat interval"""
+        self.membership = membership
+    
     def start_monitoring(self):
         """Start the health monitoring thread"""
         with self.lock:
@@ -46,29 +108,88 @@ class HealthMonitor:
                 print(f"Error in health monitor: {e}")
             
             # Sleep for a bit
-            time.sleep(5)
+            self.clock.sleep(self.check_interval)
     
     def _check_node_health(self):
-        """Check the health of all nodes"""
-        current_time = time.time()
-        nodes = self.node_manager.get_all_nodes()
+        """Check the nodes whose phi deadline or heartbeat timeout has passed"""
+        current_time = self.clock.time()
+        detector = self.failure_detector
         
-        for node_id, node_info in nodes.items():
-            # Skip nodes that are already marked as failed
-            if node_info["status"] == "failed":
+        if detector:
+            for node_id, state, phi in detector.overdue(current_time):
+                if state == "failed":
+                    self.fail_node(node_id, f"phi {phi:.1f}")
+                else:
+                    # Keep new pods off it, but leave its pods alone until it fails
+                    node = self.node_manager.get_node(node_id)
+                    if node is not None and node["status"] == "healthy":
+                        self.node_manager.update_node_status(node_id, "suspect")
+        
+        for node_id in self._due_timeouts(current_time):
+            state = self.node_manager.get_heartbeat_state(node_id)
+            # Failed nodes, and nodes judged by phi since, are queued again by their next change
+            if state is None or state[0] == "failed" or (detector and detector.tracks(node_id)):
                 continue
             
             # Check if the node missed a heartbeat
-            last_heartbeat = node_info["last_heartbeat"]
-            if current_time - last_heartbeat > self.heartbeat_timeout:
-                print(f"Node {node_id} marked as failed - missed heartbeat")
-                self.node_manager.update_node_status(node_id, "failed")
-                
-                # Reschedule pods from the failed node
-                if self.pod_scheduler:
-                    result = self.pod_scheduler.reschedule_pods_from_node(node_id)
-                    print(f"Rescheduled pods from node {node_id}: {result}")
+            deadline = state[1] + self._timeout(node_id)
+            if current_time > deadline:
+                self.fail_node(node_id, "missed heartbeat")
+            else:
+                self._schedule_timeout(node_id, deadline)
+    
+    def fail_node(self, node_id, reason):
+        """Mark a node failed and reschedule its pods, unless it already failed"""
+        node = self.node_manager.get_node(node_id)
+        if node is None or node["status"] == "failed":
+            return False
+        print(f"Node {node_id} marked as failed - {reason}")
+        self.node_manager.update_node_status(node_id, "failed")
+        if self.failure_detector:
+            # Its arrival history says nothing about the node once it comes back
+            self.failure_detector.forget(node_id)
+        
+        # Reschedule pods from the failed node
+        if self.pod_scheduler:
+            result = self.pod_scheduler.reschedule_pods_from_node(node_id)
+            print(f"Rescheduled pods from node {node_id}: {result}")
+        return True
     
     def process_heartbeat(self, node_id):
         """Process a heartbeat from a node"""
-        return self.node_manager.update_heartbeat(node_id)
\ No newline at end of file
+        started = time.perf_counter()
+        success = self.node_manager.update_heartbeat(node_id)
+        if success and self.failure_detector:
+            self.failure_detector.heartbeat(node_id, self.clock.time())
+        if self.heartbeat_policy:
+            self.heartbeat_policy.record(1, time.perf_counter() - started)
+        return success
+    
+    def process_heartbeats(self, node_ids):
+        """Process a batch of heartbeats, returning the ids of nodes that are not registered"""
+        started = time.perf_counter()
+        unknown = self.node_manager.update_heartbeats(node_ids)
+        if self.failure_detector:
+            missing = set(unknown)
+            self.failure_detector.heartbeats([node_id for node_id in node_ids if node_id not in missing],
+                                             self.clock.time())
+        if self.heartbeat_policy:
+            self.heartbeat_policy.observe(node_ids)
+            self.heartbeat_policy.record(len(node_ids), time.perf_counter() - started)
+        return unknown
+    
+    def heartbeat_interval(self, node_id):
+        """Seconds until node_id should send its next heartbeat, None without a policy"""
+        if self.heartbeat_policy is None:
+            return None
+        gossip = self.membership is not None and self.membership.is_member(node_id)
+        interval = self.heartbeat_policy.assign(node_id, gossip)
+        if self.failure_detector:
+            self.failure_detector.expect(node_id, interval)
+        # A shorter interval shortens the timeout, so a queued timeout check may need to come sooner
+        due = self.clock.time() + self._timeout(node_id)
+        with self.timeout_lock:
+            if due < self.timeout_due.get(node_id, due):
+                self.timeout_due[node_id] = due
+                heapq.heappush(self.timeout_checks, (due, node_id))
+        return interval
@@ -0,0 +1,140 @@
+# api_server/heartbeat_policy.py
+"""Heartbeat intervals handed out by the API server.
+
+Every heartbeat response (and the registration response) tells the node
+when to send the next one. The interval is chosen so that the whole fleet
+stays under target_rate heartbeats per second:
+
+    fleet interval = max(base_interval, nodes / target_rate) * backoff
+
+clamped to [min_interval, max_interval]. backoff starts at 1. It grows
+while the measured heartbeat rate is above the target, or while applying
+heartbeats takes more than max_busy of the server's time. It shrinks back
+once both are well below their limits. A node whose heartbeat arrived
+late is suspect, and for its next few heartbeats it is told to send them
+at suspect_factor times the fleet interval, so it is confirmed failed, or
+cleared, sooner.
+
+A node is declared failed after timeout_multiplier times the interval it
+was last told. A node that never negotiated an interval (registered in
+bulk, or reporting over UDP only since the server restarted) falls back to
+HealthMonitor.heartbeat_timeout. Members of the agents' gossip group
+(api_server/membership.py) are told max_interval.
+"""
+import time
+from threading import Lock
+
+class HeartbeatPolicy:
+    def __init__(self, node_manager, clock=None, target_rate=1000, base_interval=10, min_interval=2,
+                 max_interval=120, timeout_multiplier=3, suspect_factor=0.5, suspect_beats=3,
+                 max_busy=0.25, adjust_period=10):
+        self.node_manager = node_manager
+        self.clock = clock or node_manager.clock
+        self.target_rate = target_rate  # heartbeats per second the whole fleet may send
+        self.base_interval = base_interval  # interval of a small, idle cluster
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout_multiplier = timeout_multiplier  # missed intervals before a node is failed
+        self.suspect_factor = suspect_factor
+        self.suspect_beats = suspect_beats  # tightened heartbeats after a late one
+        self.max_busy = max_busy  # share of real time heartbeat handling may take
+        self.adjust_period = adjust_period  # seconds between load measurements
+        self.lock = Lock()
+        self.assigned = {}  # node_id -> [interval told, clock time of the last heartbeat, tightened beats left]
+        self.backoff = 1.0
+        self.fleet_interval = base_interval
+        self.window_start = self.clock.time()
+        self.window_real_start = time.monotonic()
+        self.window_beats = 0
+        self.window_busy = 0.0  # real seconds spent applying heartbeats this window
+        self.stats = {"heartbeats": 0, "late": 0, "backoffs": 0, "measured_rate": 0.0, "busy": 0.0}
+        node_manager.add_node_listener(self.node_changed)
+
+    def node_changed(self, node_id, node):
+        """NodeManager listener: forget removed nodes"""
+        if node is None:
+            with self.lock:
+                self.assigned.pop(node_id, None)
+
+    def record(self, count, seconds):
+        """Count heartbeats that took `seconds` of real time to apply"""
+        with self.lock:
+            self.window_beats += count
+            self.window_busy += seconds
+            self.stats["heartbeats"] += count
+
+    def observe(self, node_ids):
+        """Note heartbeats whose sender is not told a new interval, such as UDP ones"""
+        with self.lock:
+            now = self.clock.time()
+            for node_id in node_ids:
+                entry = self.assigned.get(node_id)
+                if entry is not None:
+                    self._check_late(entry, now)
+                    entry[1] = now
+
+    def assign(self, node_id, gossip=False):
+        """The interval to tell node_id in the response to its heartbeat or registration.
+
+        Members of the agents' gossip group watch each other, so they get
+        max_interval and their heartbeats are only a backstop.
+        """
+        with self.lock:
+            now = self.clock.time()
+            self._adjust(now)
+            entry = self.assigned.get(node_id)
+            if entry is None:
+                entry = self.assigned[node_id] = [self.fleet_interval, now, 0]
+            else:
+                self._check_late(entry, now)
+            interval = self.max_interval if gossip else self.fleet_interval
+            if entry[2] > 0 and not gossip:
+                interval = max(self.min_interval, interval * self.suspect_factor)
+                entry[2] -= 1
+            entry[0] = interval
+            entry[1] = now
+            return interval
+
+    def timeout_for(self, node_id, default):
+        """Seconds of silence after which node_id is failed"""
+        with self.lock:
+            entry = self.assigned.get(node_id)
+            if entry is None:
+                return max(default, self.timeout_multiplier * self.fleet_interval)
+            return self.timeout_multiplier * entry[0]
+
+    def _check_late(self, entry, now):
+        # Called with self.lock held
+        if now - entry[1] > 1.5 * entry[0]:
+            entry[2] = self.suspect_beats
+            self.stats["late"] += 1
+
+    def _adjust(self, now):
+        # Called with self.lock held; recomputes the fleet interval once per adjust_period
+        elapsed = now - self.window_start
+        if elapsed < self.adjust_period:
+            return
+        real_elapsed = time.monotonic() - self.window_real_start
+        rate = self.window_beats / elapsed
+        busy = self.window_busy / real_elapsed if real_elapsed > 0 else 0.0
+        if rate > self.target_rate or busy > self.max_busy:
+            self.backoff = min(self.backoff * 1.5, self.max_interval / self.min_interval)
+            self.stats["backoffs"] += 1
+        elif rate < 0.8 * self.target_rate and busy < 0.5 * self.max_busy:
+            self.backoff = max(1.0, self.backoff / 1.25)
+        nodes = len(self.node_manager.nodes)
+        interval = max(self.base_interval, nodes / self.target_rate) * self.backoff
+        self.fleet_interval = round(min(self.max_interval, max(self.min_interval, interval)), 2)
+        self.stats["measured_rate"] = round(rate, 1)
+        self.stats["busy"] = round(busy, 3)
+        self.window_start = now
+        self.window_real_start = time.monotonic()
+        self.window_beats = 0
+        self.window_busy = 0.0
+
+    def get_stats(self):
+        """Current fleet interval and the load it was derived from"""
+        with self.lock:
+            suspects = sum(1 for entry in self.assigned.values() if entry[2] > 0)
+            return dict(self.stats, fleet_interval=self.fleet_interval, backoff=round(self.backoff, 2),
+                        target_rate=self.target_rate, negotiated_nodes=len(self.assigned), suspects=suspects)
@@ -0,0 +1,97 @@
+# api_server/membership.py
+"""Server side of the node agents' gossip membership (node/gossip.py).
+
+Agents that run gossip join through POST /api/gossip/join and get a few
+random members as seeds. From then on they watch each other, and the server
+only hears about failures they have confirmed, via POST /api/gossip/report.
+Those go through HealthMonitor.fail_node like a missed heartbeat would.
+Reports are deduplicated by incarnation, so the handful of members that
+confirm the same failure cost one reschedule.
+
+Gossip members are told the longest heartbeat interval (see
+HeartbeatPolicy), so their heartbeats, and the HealthMonitor timeout
+derived from them, are only a backstop, e.g. for a whole gossip group
+going silent at once. Each failure then costs the server one report, and
+the per-second health check only visits nodes past their phi deadline
+(PhiAccrualDetector.overdue) or their heartbeat timeout. Heartbeat
+handling, at the longest interval, still grows with the fleet.
+"""
+import random
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class GossipMembership:
+    def __init__(self, node_manager, health_monitor, seed_count=3):
+        self.node_manager = node_manager
+        self.health_monitor = health_monitor
+        self.seed_count = seed_count  # members handed to a joining agent
+        self.lock = Lock()
+        self.addresses = {}  # node_id -> (host, port) of its gossip socket
+        self.member_ids = []  # the same ids, for O(1) random seed picks
+        self.positions = {}  # node_id -> index in member_ids
+        self.confirmed = {}  # node_id -> incarnation of the last failure acted on
+        self.stats = {"joins": 0, "reports": 0, "duplicate_reports": 0, "failures_confirmed": 0}
+        node_manager.add_node_listener(self.node_changed)
+
+    def node_changed(self, node_id, node):
+        """NodeManager listener: forget removed nodes"""
+        if node is None:
+            with self.lock:
+                self._remove(node_id)
+                self.confirmed.pop(node_id, None)
+
+    def join(self, node_id, host, port):
+        """Record a member's gossip address and return seeds for it to join through"""
+        with self.lock:
+            if node_id not in self.addresses:
+                self.positions[node_id] = len(self.member_ids)
+                self.member_ids.append(node_id)
+            self.addresses[node_id] = (host, port)
+            self.stats["joins"] += 1
+            seeds = set()
+            for _ in range(min(self.seed_count, len(self.member_ids) - 1) * 2):
+                seed = random.choice(self.member_ids)
+                if seed != node_id:
+                    seeds.add(seed)
+                if len(seeds) >= self.seed_count:
+                    break
+            return [{"node_id": seed, "host": self.addresses[seed][0], "port": self.addresses[seed][1]}
+                    for seed in seeds]
+
+    def is_member(self, node_id):
+        with self.lock:
+            return node_id in self.addresses
+
+    def report(self, reporter, node_id, incarnation):
+        """Act on a failure confirmed by gossip; returns False when the reporter is not a member"""
+        with self.lock:
+            if reporter not in self.addresses:
+                return False
+            self.stats["reports"] += 1
+            if self.confirmed.get(node_id, -1) >= incarnation:
+                self.stats["duplicate_reports"] += 1
+                return True
+            self.confirmed[node_id] = incarnation
+            self._remove(node_id)  # a dead member is no use as a seed; it joins again when it restarts
+            self.stats["failures_confirmed"] += 1
+        logger.info(f"Gossip member {reporter} confirmed {node_id} dead")
+        self.health_monitor.fail_node(node_id, f"confirmed dead by gossip ({reporter})")
+        return True
+
+    def _remove(self, node_id):
+        # Called with self.lock held; swap the last id into the removed slot
+        if self.addresses.pop(node_id, None) is None:
+            return
+        index = self.positions.pop(node_id)
+        last = self.member_ids.pop()
+        if last != node_id:
+            self.member_ids[index] = last
+            self.positions[last] = index
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, members=len(self.member_ids))
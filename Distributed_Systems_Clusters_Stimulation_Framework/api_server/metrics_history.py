@@ -0,0 +1,419 @@
+# api_server/metrics_history.py
+"""Tiered, disk-backed history of node and cluster resource usage.
+
+ResourceMonitor only holds the latest metrics of each pod. Every
+sample_interval seconds MetricsHistory samples the per-node totals
+(ResourceMonitor.get_node_usage), plus their sum as the "cluster" series,
+and keeps them in three tiers:
+
+    raw   the last raw_seconds of samples, in a fixed-size ring per series
+    1m    per series and minute, the min, max, mean and p95 of each metric
+    1h    the same per hour, computed from the hour's raw samples
+
+A rollup is written once its minute or hour is over, as a 64-byte record
+appended to the tier's current segment file under directory/1m or
+directory/1h. A tier starts a new segment every segment_bytes and deletes
+its oldest segments once it holds more than max_bytes. Records are in
+(bucket, series) order, so a range read maps the segments and binary
+searches them, unpacking only the records of the series asked for.
+Memory stays at the raw rings whatever the history length. At the default
+sizes, 1000 nodes keep about five days of minutes and two months of hours.
+
+Series ids are numbered in directory/series.txt, one id per line, so a
+record holds a number instead of a string. Once a series has not been
+sampled for the raw window and the tiers have deleted its last rollup,
+its line is blanked and the number is reused, so the file stays as large
+as the nodes still on record.
+"""
+import heapq
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+METRICS = ("cpu_usage", "memory_usage", "io_rate")
+STATS = ("min", "max", "mean", "p95")
+CLUSTER_SERIES = "cluster"
+
+# bucket start, series number, sample count, then min/max/mean/p95 of each metric
+RECORD = struct.Struct("<dII12f")
+KEY = struct.Struct("<dI")
+LAST_SERIES = 2 ** 32 - 1
+
+def rollup(samples):
+    """Pack-ready stats of [(cpu, memory, io), ...]: count, then min/max/mean/p95 per metric"""
+    stats = [len(samples)]
+    for column in zip(*samples):
+        ordered = sorted(column)
+        stats += [ordered[0], ordered[-1], sum(ordered) / len(ordered),
+                  ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]]
+    return stats
+
+class SampleRing:
+    """The last `capacity` (time, cpu, memory, io) samples of one series, in preallocated arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("f", bytes(4 * len(METRICS) * capacity))
+        self.next = 0  # slot the next sample goes to
+        self.count = 0
+
+    def append(self, timestamp, values):
+        self.times[self.next] = timestamp
+        base = self.next * len(METRICS)
+        self.values[base:base + len(METRICS)] = array("f", values)
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last_time(self):
+        return self.times[(self.next - 1) % self.capacity] if self.count else None
+
+    def between(self, start, end):
+        """(time, (cpu, memory, io)) samples with start <= time < end, oldest first"""
+        found = []
+        for i in range(self.count):
+            slot = (self.next - 1 - i) % self.capacity
+            timestamp = self.times[slot]
+            if timestamp < start:
+                break
+            if timestamp < end:
+                base = slot * len(METRICS)
+                found.append((timestamp, tuple(self.values[base:base + len(METRICS)])))
+        found.reverse()
+        return found
+
+class RollupTier:
+    """Append-only segment files of rollup records, bounded to max_bytes on disk"""
+
+    def __init__(self, directory, width, segment_bytes, max_bytes):
+        self.directory = directory
+        self.width = width  # seconds per bucket
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Segments are named after their first bucket, so sorting by name sorts by time
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith(".seg"))
+        self.maps = {}  # segment -> (mapped size, mmap)
+        self.active = None  # file object of the newest segment
+        self.last_bucket = None
+        if self.segments:
+            size = os.path.getsize(self._path(self.segments[-1]))
+            usable = size - size % RECORD.size  # drop a record torn by a crash
+            if usable != size:
+                os.truncate(self._path(self.segments[-1]), usable)
+            if usable:
+                self.last_bucket = self._key(self.segments[-1], usable // RECORD.size - 1)[0]
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:012d}.seg")
+
+    def append(self, bucket, records):
+        """Append the packed records of one bucket, which must be later than the last one"""
+        if self.last_bucket is not None and bucket <= self.last_bucket:
+            logger.warning(f"Dropping {len(records)} rollups for {bucket}, not after the last one ({self.last_bucket})")
+            return False
+        data = b"".join(records)
+        if self.active is None or self.active.tell() + len(data) > self.segment_bytes:
+            if self.active is not None:
+                self.active.close()
+            if not self.segments or os.path.getsize(self._path(self.segments[-1])) + len(data) > self.segment_bytes:
+                self.segments.append(int(bucket))
+            self.active = open(self._path(self.segments[-1]), "ab")
+        self.active.write(data)
+        self.active.flush()
+        self.last_bucket = bucket
+        self._enforce_retention()
+        return True
+
+    def _enforce_retention(self):
+        # Delete the oldest segments, never the one being written
+        while len(self.segments) > 1 and self.size() > self.max_bytes:
+            segment = self.segments.pop(0)
+            mapped = self.maps.pop(segment, None)
+            if mapped is not None:
+                mapped[1].close()
+            os.remove(self._path(segment))
+
+    def size(self):
+        return sum(os.path.getsize(self._path(segment)) for segment in self.segments)
+
+    def _map(self, segment):
+        """The segment's mmap, remapped when it has grown; None while it is empty"""
+        size = os.path.getsize(self._path(segment))
+        size -= size % RECORD.size
+        mapped = self.maps.get(segment)
+        if mapped is not None and mapped[0] == size:
+            return mapped[1]
+        if mapped is not None:
+            mapped[1].close()
+            del self.maps[segment]
+        if size == 0:
+            return None
+        with open(self._path(segment), "rb") as f:
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self.maps[segment] = (size, mm)
+        return mm
+
+    def _key(self, segment, index):
+        with open(self._path(segment), "rb") as f:
+            f.seek(index * RECORD.size)
+            return KEY.unpack(f.read(KEY.size))
+
+    def read(self, series, start, end):
+        """Unpacked records of one series with start <= bucket < end"""
+        found = []
+        first = max(0, bisect_right(self.segments, start) - 1)
+        for segment in self.segments[first:]:
+            if segment >= end:
+                break
+            mm = self._map(segment)
+            if mm is None:
+                continue
+            count = len(mm) // RECORD.size
+            position = self._bisect(mm, 0, count, (start, 0))
+            # Per bucket, jump to the series' record, then past the bucket
+            while position < count:
+                bucket = KEY.unpack_from(mm, position * RECORD.size)[0]
+                if bucket >= end:
+                    break
+                hit = self._bisect(mm, position, count, (bucket, series))
+                if hit < count and KEY.unpack_from(mm, hit * RECORD.size) == (bucket, series):
+                    found.append(RECORD.unpack_from(mm, hit * RECORD.size))
+                position = self._bisect(mm, hit, count, (bucket, LAST_SERIES))
+        return found
+
+    @staticmethod
+    def _bisect(mm, lo, hi, key):
+        # First record index in [lo, hi) whose (bucket, series) is not below key
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(mm, mid * RECORD.size) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def oldest_bucket(self):
+        for segment in self.segments:
+            if os.path.getsize(self._path(segment)) >= RECORD.size:
+                return self._key(segment, 0)[0]
+        return None
+
+    def close(self):
+        if self.active is not None:
+            self.active.close()
+            self.active = None
+        for _, mm in self.maps.values():
+            mm.close()
+        self.maps = {}
+
+class MetricsHistory:
+    def __init__(self, resource_monitor, directory, clock=None, sample_interval=10, raw_seconds=3600,
+                 minute_max_bytes=512 * 2 ** 20, hour_max_bytes=128 * 2 ** 20, segment_bytes=16 * 2 ** 20):
+        self.resource_monitor = resource_monitor
+        self.clock = clock or resource_monitor.clock
+        self.sample_interval = sample_interval  # seconds
+        self.raw_seconds = max(raw_seconds, 3600)  # hourly rollups are computed from the raw samples
+        # A whole window holds up to raw_seconds / sample_interval + 1 samples, and the
+        # hour is closed by the first sample after it; 5% more absorbs early wakeups
+        self.ring_capacity = math.ceil(1.05 * self.raw_seconds / sample_interval) + 2
+        self.directory = directory
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.tiers = {
+            "1m": RollupTier(os.path.join(directory, "1m"), 60, segment_bytes, minute_max_bytes),
+            "1h": RollupTier(os.path.join(directory, "1h"), 3600, segment_bytes, hour_max_bytes)
+        }
+        self.series_path = os.path.join(directory, "series.txt")
+        self.series_ids = []  # series number -> id, "" for a retired number
+        if os.path.exists(self.series_path):
+            with open(self.series_path) as f:
+                self.series_ids = [line.rstrip("\n") for line in f]
+        self.series_numbers = {series: number for number, series in enumerate(self.series_ids) if series}
+        self.free_numbers = [number for number, series in enumerate(self.series_ids) if not series]  # heap
+        # Newest rollup bucket written per series. Series loaded from disk may
+        # have records up to the newest bucket on disk.
+        newest = max((tier.last_bucket for tier in self.tiers.values() if tier.last_bucket is not None), default=None)
+        self.last_rollups = dict.fromkeys(self.series_numbers.values(), newest)
+        self.rings = {}  # series number -> SampleRing
+        self.open_buckets = {"1m": None, "1h": None}  # tier -> bucket still collecting samples
+        self.stats = {"samples": 0, "rollups_written": 0, "series_retired": 0}
+        self.running = False
+        self.record_thread = None
+
+    def start_recording(self):
+        """Start sampling in a background thread"""
+        with self.lock:
+            if self.running:
+                return False
+            self.running = True
+            self.record_thread = threading.Thread(target=self._record_loop, daemon=True)
+            self.record_thread.start()
+            logger.info(f"Recording metrics history to {self.directory}")
+            return True
+
+    def stop_recording(self):
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+        if self.record_thread:
+            self.record_thread.join(timeout=5)
+        with self.lock:
+            for tier in self.tiers.values():
+                tier.close()
+        return True
+
+    def _record_loop(self):
+        while self.running:
+            try:
+                self.record()
+            except Exception as e:
+                logger.error(f"Error recording metrics history: {e}")
+            self.clock.sleep(self.sample_interval)
+
+    def record(self, now=None):
+        """Sample every node's usage and the cluster total, closing finished rollup buckets first"""
+        now = self.clock.time() if now is None else now
+        usage = self.resource_monitor.get_node_usage()
+        totals = [sum(node[metric] for node in usage.values()) for metric in METRICS]
+        with self.lock:
+            for name, tier in self.tiers.items():
+                bucket = now // tier.width * tier.width
+                if self.open_buckets[name] is not None and bucket > self.open_buckets[name]:
+                    self._close_bucket(tier, self.open_buckets[name])
+                    if name == "1h":
+                        self._retire_series()
+                self.open_buckets[name] = bucket
+
+            sampled = set()
+            for series, values in [(CLUSTER_SERIES, totals)] + [
+                    (node_id, [node[metric] for metric in METRICS]) for node_id, node in usage.items()]:
+                number = self._series_number(series)
+                ring = self.rings.get(number)
+                if ring is None:
+                    ring = self.rings[number] = SampleRing(self.ring_capacity)
+                ring.append(now, values)
+                sampled.add(number)
+            self.stats["samples"] += len(sampled)
+            # Nodes gone for longer than the raw window give their ring back
+            for number in [n for n, ring in self.rings.items()
+                           if n not in sampled and ring.last_time() < now - self.raw_seconds]:
+                del self.rings[number]
+
+    def _series_number(self, series):
+        # Called with self.lock held
+        number = self.series_numbers.get(series)
+        if number is None:
+            if self.free_numbers:
+                number = heapq.heappop(self.free_numbers)
+                self.series_ids[number] = series
+                self._write_series()
+            else:
+                number = len(self.series_ids)
+                self.series_ids.append(series)
+                with open(self.series_path, "a") as f:
+                    f.write(series + "\n")
+            self.series_numbers[series] = number
+        return number
+
+    def _retire_series(self):
+        # Called with self.lock held. A series is retired once it has no ring
+        # and every tier has deleted the buckets it last wrote.
+        oldest = min((bucket for bucket in (tier.oldest_bucket() for tier in self.tiers.values())
+                      if bucket is not None), default=None)
+        retired = [(series, number) for series, number in self.series_numbers.items()
+                   if number not in self.rings and (
+                       self.last_rollups.get(number) is None or oldest is None or self.last_rollups[number] < oldest)]
+        if not retired:
+            return
+        for series, number in retired:
+            del self.series_numbers[series]
+            self.last_rollups.pop(number, None)
+            self.series_ids[number] = ""
+        while self.series_ids and not self.series_ids[-1]:
+            self.series_ids.pop()
+        self.free_numbers = [number for number, series in enumerate(self.series_ids) if not series]
+        heapq.heapify(self.free_numbers)
+        self._write_series()
+        self.stats["series_retired"] += len(retired)
+        logger.info(f"Retired {len(retired)} metrics history series no longer on record")
+
+    def _write_series(self):
+        # Called with self.lock held; replace the file whole so a crash leaves the old or the new numbering
+        partial = self.series_path + ".tmp"
+        with open(partial, "w") as f:
+            f.writelines(series + "\n" for series in self.series_ids)
+        os.replace(partial, self.series_path)
+
+    def _close_bucket(self, tier, bucket):
+        # Called with self.lock held; series numbers ascend, keeping the segment in (bucket, series) order
+        records = []
+        numbers = []
+        for number in sorted(self.rings):
+            samples = self.rings[number].between(bucket, bucket + tier.width)
+            if samples:
+                records.append(RECORD.pack(bucket, number, *rollup([values for _, values in samples])))
+                numbers.append(number)
+        if records and tier.append(bucket, records):
+            self.stats["rollups_written"] += len(records)
+            for number in numbers:
+                last = self.last_rollups.get(number)
+                self.last_rollups[number] = bucket if last is None else max(last, bucket)
+
+    def query(self, series, start, end, resolution=None):
+        """Samples or rollups of one series with start <= time < end.
+
+        resolution is "raw", "1m" or "1h". By default the range picks it:
+        raw within the raw window, minutes up to two days, hours beyond.
+        Returns (resolution, points); a rollup appears once its bucket is over.
+        """
+        if resolution is None:
+            now = self.clock.time()
+            if start >= now - self.raw_seconds:
+                resolution = "raw"
+            elif end - start <= 2 * 86400:
+                resolution = "1m"
+            else:
+                resolution = "1h"
+        if resolution not in ("raw", "1m", "1h"):
+            raise ValueError(f"Unknown resolution {resolution}, use raw, 1m or 1h")
+        with self.lock:
+            number = self.series_numbers.get(series)
+            if number is None:
+                return resolution, []
+            if resolution == "raw":
+                ring = self.rings.get(number)
+                samples = ring.between(start, end) if ring else []
+                return resolution, [dict(zip(METRICS, (round(v, 4) for v in values)), time=timestamp)
+                                    for timestamp, values in samples]
+            # Include the bucket that start falls in
+            tier = self.tiers[resolution]
+            records = tier.read(number, start // tier.width * tier.width, end)
+        points = []
+        for record in records:
+            point = {"time": record[0], "samples": record[2]}
+            for i, metric in enumerate(METRICS):
+                point[metric] = {stat: round(record[3 + 4 * i + j], 4) for j, stat in enumerate(STATS)}
+            points.append(point)
+        return resolution, points
+
+    def get_stats(self):
+        """Series, samples and the disk use and reach of each tier"""
+        with self.lock:
+            stats = dict(self.stats, series=len(self.series_numbers), sampled_series=len(self.rings),
+                         raw_seconds=self.raw_seconds, sample_interval=self.sample_interval)
+            for name, tier in self.tiers.items():
+                stats[name] = {"bytes": tier.size(), "max_bytes": tier.max_bytes,
+                               "segments": len(tier.segments), "oldest": tier.oldest_bucket()}
+            return stats
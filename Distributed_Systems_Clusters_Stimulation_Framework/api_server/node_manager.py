@@ -1,50 +1,161 @@
 #nodemanager.py
-import time
 from threading import Lock
 import logging
 
+from api_server.clock import RealClock
+from api_server.records import IdSet, NodeRecord, intern_id
+from api_server.pagination import (
+    SortedKeys, index_add, index_discard, intersect, page_keys, project, range_keys
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class NodeManager:
-    def __init__(self):
-        self.nodes = {}  # node_id -> {cpu_cores, available_cores, status, last_heartbeat, pods}
+    def __init__(self, clock=None):
+        self.clock = clock or RealClock()  # heartbeat times are read from here
+        self.nodes = {}  # node_id -> {cpu_cores, available_cores, status, last_heartbeat, pods, labels}
         self.lock = Lock()  # For thread safety
+        # Secondary indexes used by list_nodes
+        self.node_ids = SortedKeys()  # sorted node ids, for cursor pagination
+        self.nodes_by_status = {}  # status -> set(node_id)
+        self.nodes_by_available = {}  # available_cores -> set(node_id)
+        self.nodes_by_label = {}  # (label key, value) -> set(node_id), for placement constraints
+        self.mutation_log = None  # replication log tailed by read followers
+        self.capacity_listeners = []  # called whenever schedulable capacity may have grown
+        self.node_listeners = []  # called with (node_id, record or None) after every node change
+    
+    def _index_node(self, node_id):
+        node = self.nodes[node_id]
+        index_add(self.nodes_by_status, node["status"], node_id)
+        index_add(self.nodes_by_available, node["available_cores"], node_id)
+        for label in node.get("labels", {}).items():
+            index_add(self.nodes_by_label, label, node_id)
+    
+    def _unindex_node(self, node_id):
+        node = self.nodes[node_id]
+        index_discard(self.nodes_by_status, node["status"], node_id)
+        index_discard(self.nodes_by_available, node["available_cores"], node_id)
+        for label in node.get("labels", {}).items():
+            index_discard(self.nodes_by_label, label, node_id)
+    
+    def set_mutation_log(self, mutation_log):
+        """Publish every node change to a replication log"""
+        self.mutation_log = mutation_log
+    
+    def add_capacity_listener(self, callback):
+        """Register a callback for capacity increases; it runs with self.lock held and must not block"""
+        self.capacity_listeners.append(callback)
+    
+    def add_node_listener(self, callback):
+        """Register a callback for every node change; it runs with self.lock held and must not block"""
+        self.node_listeners.append(callback)
+    
+    def _notify_capacity(self):
+        for callback in self.capacity_listeners:
+            callback()
+    
+    @staticmethod
+    def _replicated(node):
+        # Everything but the pod set, which is replicated as per-pod changes
+        return {
+            "cpu_cores": node.cpu_cores,
+            "available_cores": node.available_cores,
+            "status": node.status,
+            "last_heartbeat": node.last_heartbeat,
+            "labels": dict(node.labels or {})
+        }
     
-    def add_node(self, node_id, cpu_cores):
+    def _publish(self, node_id, pod_change=None):
+        # Called with self.lock held so log order matches mutation order.
+        # pod_change is the (pod_id, present) of a pod joining or leaving the node
+        node = self.nodes.get(node_id)
+        for callback in self.node_listeners:
+            callback(node_id, node)
+        if self.mutation_log is not None:
+            if pod_change is not None:
+                self.mutation_log.append("node_pod", node_id, pod_change)
+            elif node is None:
+                self.mutation_log.append("node", node_id, None)
+                self.mutation_log.discard("heartbeat", node_id)
+            else:
+                self.mutation_log.append("node", node_id, self._replicated(node))
+    
+    def _publish_many(self, node_ids):
+        # Like _publish, but the batch goes to the mutation log in one append
+        for node_id in node_ids:
+            node = self.nodes.get(node_id)
+            for callback in self.node_listeners:
+                callback(node_id, node)
+        if self.mutation_log is not None:
+            self.mutation_log.extend("node", [(node_id, self._replicated(self.nodes[node_id])) for node_id in node_ids])
+    
+    def add_node(self, node_id, cpu_cores, labels=None):
         """Add a new node to the cluster"""
+        node_id = intern_id(node_id)
         with self.lock:
             logger.info(f"Adding new node {node_id} with {cpu_cores} CPU cores")
-            self.nodes[node_id] = {
-                "cpu_cores": cpu_cores,
-                "available_cores": cpu_cores,
-                "status": "initializing",
-                "last_heartbeat": time.time(),
-                "pods": []
-            }
+            if node_id in self.nodes:
+                self._unindex_node(node_id)
+            self.nodes[node_id] = NodeRecord(
+                cpu_cores=cpu_cores,
+                available_cores=cpu_cores,
+                status="initializing",
+                last_heartbeat=self.clock.time(),
+                pods=[],
+                labels=dict(labels or {})
+            )
+            self.node_ids.add(node_id)
+            self._index_node(node_id)
+            self._publish(node_id)
             return True
     
-    def register_node(self, node_id, cpu_cores):
+    def register_node(self, node_id, cpu_cores, labels=None):
         """Register a node that's started up"""
         with self.lock:
-            if node_id in self.nodes:
-                # Update node details if already exists
-                logger.info(f"Node {node_id} already exists, updating status to healthy")
-                self.nodes[node_id]["status"] = "healthy"
-                self.nodes[node_id]["last_heartbeat"] = time.time()
-                return True
-            else:
-                # Create new node entry
-                logger.info(f"Registering new node {node_id} with {cpu_cores} CPU cores")
-                self.nodes[node_id] = {
-                    "cpu_cores": cpu_cores,
-                    "available_cores": cpu_cores,
-                    "status": "healthy",
-                    "last_heartbeat": time.time(),
-                    "pods": []
-                }
-                return True
+            self._register_node(node_id, cpu_cores, labels)
+            self._notify_capacity()
+            return True
+    
+    def register_nodes(self, nodes):
+        """Register many nodes in one locked transaction.
+        
+        nodes holds (node_id, cpu_cores, labels) tuples. Capacity listeners
+        are notified once for the whole batch.
+        """
+        with self.lock:
+            for node_id, cpu_cores, labels in nodes:
+                self._register_node(node_id, cpu_cores, labels)
+            if nodes:
+                self._notify_capacity()
+            return len(nodes)
+    
+    def _register_node(self, node_id, cpu_cores, labels):
+        # Called with self.lock held
+        node_id = intern_id(node_id)
+        if node_id in self.nodes:
+            # Update node details if already exists
+            logger.info(f"Node {node_id} already exists, updating status to healthy")
+            self._unindex_node(node_id)
+            self.nodes[node_id]["status"] = "healthy"
+            self.nodes[node_id]["last_heartbeat"] = self.clock.time()
+            if labels is not None:
+                self.nodes[node_id]["labels"] = dict(labels)
+        else:
+            # Create new node entry
+            logger.info(f"Registering new node {node_id} with {cpu_cores} CPU cores")
+            self.nodes[node_id] = NodeRecord(
+                cpu_cores=cpu_cores,
+                available_cores=cpu_cores,
+                status="healthy",
+                last_heartbeat=self.clock.time(),
+                pods=[],
+                labels=dict(labels or {})
+            )
+            self.node_ids.add(node_id)
+        self._index_node(node_id)
+        self._publish(node_id)
     
     def remove_node(self, node_id):
         """Remove a node from the cluster"""
@@ -55,7 +166,10 @@ class NodeManager:
             
             # Remove node
             logger.info(f"Removing node {node_id} from cluster")
+            self._unindex_node(node_id)
+            self.node_ids.discard(node_id)
             node_info = self.nodes.pop(node_id)
+            self._publish(node_id)
             return True
     
     def update_node_status(self, node_id, status):
@@ -66,21 +180,64 @@ class NodeManager:
                 return False
             
             logger.info(f"Updating node {node_id} status to {status}")
+            self._unindex_node(node_id)
             self.nodes[node_id]["status"] = status
+            self._index_node(node_id)
+            self._publish(node_id)
+            if status == "healthy":
+                self._notify_capacity()
             return True
     
     def update_heartbeat(self, node_id):
-        """Update a node's last heartbeat time"""
+        """Update a node's last heartbeat time, bringing a failed or suspect node back to healthy.
+        
+        A draining node stays cordoned. The heartbeat time is put to the mutation log, which keeps only
+        the latest one per node, and a status change is appended to it.
+        """
         with self.lock:
             if node_id not in self.nodes:
                 logger.warning(f"Received heartbeat from non-existent node {node_id}")
                 return False
             
             logger.debug(f"Updated heartbeat for node {node_id}")
-            self.nodes[node_id]["last_heartbeat"] = time.time()
-            self.nodes[node_id]["status"] = "healthy"
+            now = self.clock.time()
+            self.nodes[node_id]["last_heartbeat"] = now
+            if self.mutation_log is not None:
+                self.mutation_log.put("heartbeat", node_id, now)
+            if self.nodes[node_id]["status"] not in ("healthy", "draining"):
+                self._unindex_node(node_id)
+                self.nodes[node_id]["status"] = "healthy"
+                self._index_node(node_id)
+                self._notify_capacity()
+                self._publish(node_id)
             return True
     
+    def update_heartbeats(self, node_ids):
+        """Record heartbeats of many nodes under one lock, returning the ids that are not registered"""
+        unknown = []
+        known = []
+        recovered = []  # status changes are appended to the log, as in update_heartbeat
+        with self.lock:
+            now = self.clock.time()
+            for node_id in node_ids:
+                node = self.nodes.get(node_id)
+                if node is None:
+                    unknown.append(node_id)
+                    continue
+                node.last_heartbeat = now
+                known.append((node_id, now))
+                if node.status not in ("healthy", "draining"):
+                    self._unindex_node(node_id)
+                    node.status = "healthy"
+                    self._index_node(node_id)
+                    recovered.append(node_id)
+            if self.mutation_log is not None and known:
+                self.mutation_log.put_many("heartbeat", known)
+            if recovered:
+                self._publish_many(recovered)
+                self._notify_capacity()
+        return unknown
+    
     def allocate_resources(self, node_id, cpu_cores):
         """Allocate CPU resources on a node"""
         with self.lock:
@@ -89,14 +246,27 @@ class NodeManager:
                 return False
             
             node = self.nodes[node_id]
+            if node["status"] != "healthy":
+                logger.warning(f"Node {node_id} is {node['status']}, not allocating resources")
+                return False
+            
             if node["available_cores"] < cpu_cores:
                 logger.warning(f"Node {node_id} has insufficient resources: requested {cpu_cores}, available {node['available_cores']}")
                 return False
             
             logger.info(f"Allocating {cpu_cores} cores on node {node_id}")
+            self._unindex_node(node_id)
             node["available_cores"] -= cpu_cores
+            self._index_node(node_id)
+            self._publish(node_id)
             return True
     
+    def can_fit(self, node_id, cpu_cores):
+        """Check whether a healthy node currently has room for cpu_cores"""
+        with self.lock:
+            node = self.nodes.get(node_id)
+            return node is not None and node["status"] == "healthy" and node["available_cores"] >= cpu_cores
+    
     def release_resources(self, node_id, cpu_cores):
         """Release CPU resources on a node"""
         with self.lock:
@@ -106,6 +276,7 @@ class NodeManager:
             
             node = self.nodes[node_id]
             logger.info(f"Releasing {cpu_cores} cores on node {node_id}")
+            self._unindex_node(node_id)
             node["available_cores"] += cpu_cores
             
             # Ensure we don't exceed total cores
@@ -113,6 +284,9 @@ class NodeManager:
                 logger.warning(f"Available cores exceeded total cores on node {node_id}, capping at {node['cpu_cores']}")
                 node["available_cores"] = node["cpu_cores"]
             
+            self._index_node(node_id)
+            self._publish(node_id)
+            self._notify_capacity()
             return True
     
     def add_pod_to_node(self, node_id, pod_id):
@@ -123,11 +297,12 @@ class NodeManager:
                 return False
             
             logger.info(f"Adding pod {pod_id} to node {node_id}")
-            if pod_id in self.nodes[node_id]["pods"]:
+            if pod_id in self.nodes[node_id].pods:
                 logger.warning(f"Pod {pod_id} already exists on node {node_id}")
                 return True
                 
-            self.nodes[node_id]["pods"].append(pod_id)
+            self.nodes[node_id].pods.add(pod_id)
+            self._publish(node_id, (pod_id, True))
             return True
     
     def remove_pod_from_node(self, node_id, pod_id):
@@ -137,9 +312,10 @@ class NodeManager:
                 logger.warning(f"Attempted to remove pod from non-existent node {node_id}")
                 return False
             
-            if pod_id in self.nodes[node_id]["pods"]:
+            if pod_id in self.nodes[node_id].pods:
                 logger.info(f"Removing pod {pod_id} from node {node_id}")
-                self.nodes[node_id]["pods"].remove(pod_id)
+                self.nodes[node_id].pods.discard(pod_id)
+                self._publish(node_id, (pod_id, False))
                 return True
             else:
                 logger.warning(f"Pod {pod_id} not found on node {node_id}")
@@ -153,12 +329,39 @@ class NodeManager:
                 logger.warning(f"Attempted to get info for non-existent node {node_id}")
             return node_info
     
+    def get_node_labels(self, node_id):
+        """Get a node's labels"""
+        with self.lock:
+            node = self.nodes.get(node_id)
+            return dict(node.get("labels", {})) if node is not None else {}
+    
+    def get_nodes_with_label(self, key, value):
+        """Get the ids of the nodes labelled key=value"""
+        with self.lock:
+            return set(self.nodes_by_label.get((key, value), ()))
+    
+    def get_label_domains(self, key):
+        """Get value -> node ids for every value of a label key"""
+        with self.lock:
+            return {value: set(node_ids) for (k, value), node_ids in self.nodes_by_label.items() if k == key}
+    
     def get_all_nodes(self):
         """Get information about all nodes"""
         with self.lock:
             # Create a copy to avoid concurrent modification issues
             return {nid: info.copy() for nid, info in self.nodes.items()}
     
+    def get_heartbeat_states(self):
+        """(node_id, status, last_heartbeat) of every node, without copying the records"""
+        with self.lock:
+            return [(nid, info.status, info.last_heartbeat) for nid, info in self.nodes.items()]
+    
+    def get_heartbeat_state(self, node_id):
+        """(status, last_heartbeat) of a node, or None if it isn't registered"""
+        with self.lock:
+            node = self.nodes.get(node_id)
+            return None if node is None else (node.status, node.last_heartbeat)
+    
     def get_healthy_nodes(self):
         """Get all healthy nodes"""
         with self.lock:
@@ -166,3 +369,116 @@ class NodeManager:
                    if info["status"] == "healthy"}
             logger.debug(f"Found {len(healthy)} healthy nodes")
             return healthy
+    
+    def list_nodes(self, query):
+        """Get a page of nodes matching the filters of a parsed list query"""
+        with self.lock:
+            filters = []
+            if query["node_id"]:
+                filters.append({query["node_id"]} if query["node_id"] in self.nodes else set())
+            if query["ids"]:
+                filters.append({nid for nid in query["ids"] if nid in self.nodes})
+            if query["status"]:
+                filters.append(self.nodes_by_status.get(query["status"], set()))
+            if query["cpu_min"] is not None or query["cpu_max"] is not None:
+                filters.append(range_keys(self.nodes_by_available, query["cpu_min"], query["cpu_max"]))
+            for label in (query.get("labels") or {}).items():
+                filters.append(self.nodes_by_label.get(label, set()))
+            
+            keys, next_cursor = page_keys(self.node_ids, intersect(filters),
+                                          query["cursor"], query["limit"])
+            
+            fields = query["fields"]
+            page = {}
+            for nid in keys:
+                info = self.nodes[nid]
+                view = project(info, fields)
+                if fields and "pod_count" in fields:
+                    view["pod_count"] = len(info.pods)
+                page[nid] = view
+            return page, next_cursor
+    
+    def get_capacity_summary(self):
+        """Summarize schedulable capacity, used by the shard router for pod placement"""
+        with self.lock:
+            healthy = self.nodes_by_status.get("healthy", set())
+            max_available = 0
+            for available in sorted(self.nodes_by_available, reverse=True):
+                if self.nodes_by_available[available] & healthy:
+                    max_available = available
+                    break
+            return {
+                "nodes": len(self.nodes),
+                "healthy_nodes": len(healthy),
+                "total_cores": sum(self.nodes[nid]["cpu_cores"] for nid in healthy),
+                "available_cores": sum(self.nodes[nid]["available_cores"] for nid in healthy),
+                "max_available_cores": max_available
+            }
+    
+    def snapshot(self):
+        """Copy every node record, for replication snapshots"""
+        with self.lock:
+            return {nid: project(info, None) for nid, info in self.nodes.items()}
+    
+    def load_replica(self, nodes):
+        """Replace all nodes with a replicated snapshot"""
+        with self.lock:
+            self.nodes = {}
+            self.node_ids = SortedKeys()
+            self.nodes_by_status = {}
+            self.nodes_by_available = {}
+            self.nodes_by_label = {}
+            for node_id, record in nodes.items():
+                node_id = intern_id(node_id)
+                self.nodes[node_id] = NodeRecord.from_dict(record)
+                self.node_ids.add(node_id)
+                self._index_node(node_id)
+    
+    def apply_replicated(self, node_id, record):
+        """Apply a replicated node change (record is None for a removed node).
+        
+        The record leaves out the node's pods, which arrive through apply_replicated_pod.
+        """
+        node_id = intern_id(node_id)
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node is not None:
+                self._unindex_node(node_id)
+                if record is None:
+                    self.node_ids.discard(node_id)
+                    del self.nodes[node_id]
+                    return
+                node.update(record)
+            elif record is None:
+                return
+            else:
+                self.node_ids.add(node_id)
+                node = self.nodes[node_id] = NodeRecord.from_dict(record)
+                if node.pods is None:
+                    node.pods = IdSet()
+            self._index_node(node_id)
+    
+    def apply_replicated_pod(self, node_id, change):
+        """Apply a replicated (pod_id, present) change to a node's pods"""
+        pod_id, present = change
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node is None:
+                return
+            if present:
+                node.pods.add(intern_id(pod_id))
+            else:
+                node.pods.discard(pod_id)
+    
+    def apply_replicated_heartbeat(self, node_id, last_heartbeat):
+        """Apply a node's replicated heartbeat time"""
+        with self.lock:
+            node = self.nodes.get(node_id)
+            if node is not None and last_heartbeat > node.last_heartbeat:
+                node.last_heartbeat = last_heartbeat
+    
+    def get_capacity_snapshot(self):
+        """Get (node_id, available_cores) of healthy nodes in insertion order, for scheduler workers"""
+        with self.lock:
+            return [(nid, info["available_cores"]) for nid, info in self.nodes.items()
+                    if info["status"] == "healthy"]
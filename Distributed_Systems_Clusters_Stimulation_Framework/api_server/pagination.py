@@ -0,0 +1,215 @@
+import base64
+import binascii
+import bisect
+import heapq
+import itertools
+
+from api_server.constraints import parse_labels
+from api_server.records import Record
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def parse_list_query(args):
+    """Parse pagination, filter and projection arguments of a list request"""
+    query = {
+        "cursor": decode_cursor(args.get("cursor")),
+        "limit": None,
+        "fields": _split(args.get("fields")),
+        "ids": _split(args.get("ids")),
+        "node_id": args.get("node_id") or None,
+        "status": args.get("status") or None,
+        "cpu_min": _parse_number(args.get("cpu_min"), "cpu_min"),
+        "cpu_max": _parse_number(args.get("cpu_max"), "cpu_max"),
+        "labels": parse_labels(args.get("labels")) or None,
+    }
+
+    limit = args.get("limit")
+    if limit:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError("limit must be an integer")
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        query["limit"] = min(limit, MAX_PAGE_SIZE)
+    elif query["cursor"] is not None:
+        query["limit"] = DEFAULT_PAGE_SIZE
+
+    return query
+
+def _split(value):
+    """Split a comma separated argument into a list, or None if absent"""
+    if not value:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+def _parse_number(value, name):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+def encode_cursor(key):
+    """Encode the last key of a page as an opaque cursor"""
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    if not cursor:
+        return None
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (binascii.Error, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+class SortedKeys:
+    """Sorted set of keys, the cursor index of a collection.
+
+    Keys are kept in sorted blocks of up to 2 * BLOCK_SIZE, so adding or
+    removing a key shifts the keys of one block rather than of the whole
+    collection, which a flat sorted list of a million pods would.
+    """
+    BLOCK_SIZE = 512
+
+    def __init__(self, keys=()):
+        keys = sorted(set(keys))
+        self.blocks = [keys[i:i + self.BLOCK_SIZE] for i in range(0, len(keys), self.BLOCK_SIZE)]
+        self.maxes = [block[-1] for block in self.blocks]  # last key of each block
+        self.size = len(keys)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for block in self.blocks:
+            yield from block
+
+    def __contains__(self, key):
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            return False
+        block = self.blocks[i]
+        j = bisect.bisect_left(block, key)
+        return block[j] == key
+
+    def add(self, key):
+        if not self.blocks:
+            self.blocks.append([key])
+            self.maxes.append(key)
+            self.size = 1
+            return
+        i = min(bisect.bisect_left(self.maxes, key), len(self.maxes) - 1)
+        block = self.blocks[i]
+        j = bisect.bisect_left(block, key)
+        if j < len(block) and block[j] == key:
+            return
+        block.insert(j, key)
+        self.size += 1
+        if j == len(block) - 1:
+            self.maxes[i] = key
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self.blocks.insert(i + 1, block[self.BLOCK_SIZE:])
+            del block[self.BLOCK_SIZE:]
+            self.maxes.insert(i, block[-1])
+
+    def discard(self, key):
+        i = bisect.bisect_left(self.maxes, key)
+        if i == len(self.maxes):
+            return
+        block = self.blocks[i]
+        j = bisect.bisect_left(block, key)
+        if block[j] != key:
+            return
+        del block[j]
+        self.size -= 1
+        if not block:
+            del self.blocks[i]
+            del self.maxes[i]
+        elif j == len(block):
+            self.maxes[i] = block[-1]
+
+    def keys_after(self, cursor, count=None):
+        """Up to count keys (all with None) following cursor, or from the start when cursor is None"""
+        if cursor is None:
+            i = j = 0
+        else:
+            i = bisect.bisect_right(self.maxes, cursor)
+            j = bisect.bisect_right(self.blocks[i], cursor) if i < len(self.blocks) else 0
+        keys = []
+        for block in itertools.islice(self.blocks, i, None):
+            keys.extend(block[j:] if count is None else block[j:j + count - len(keys)])
+            j = 0
+            if count is not None and len(keys) >= count:
+                break
+        return keys
+
+def page_keys(sorted_keys, candidates, cursor, limit):
+    """Select the page of keys following the cursor.
+
+    sorted_keys is the SortedKeys index of every key in the collection and
+    candidates an optional set of keys left after filtering. Returns the
+    page keys in sorted order and the cursor of the next page (or None).
+    """
+    if candidates is None:
+        keys = sorted_keys.keys_after(cursor, None if limit is None else limit + 1)
+    else:
+        remaining = candidates if cursor is None else [k for k in candidates if k > cursor]
+        keys = sorted(remaining) if limit is None else heapq.nsmallest(limit + 1, remaining)
+
+    if limit is not None and len(keys) > limit:
+        keys = keys[:limit]
+        return keys, encode_cursor(keys[-1])
+    return keys, None
+
+def intersect(key_sets):
+    """Intersect filter results, or return None when there were no filters"""
+    key_sets = sorted(key_sets, key=len)
+    if not key_sets:
+        return None
+    result = set(key_sets[0])
+    for keys in key_sets[1:]:
+        result.intersection_update(keys)
+    return result
+
+def range_keys(index, low, high):
+    """Union the keys of an index whose values fall within [low, high]"""
+    result = set()
+    for value, keys in index.items():
+        if (low is None or value >= low) and (high is None or value <= high):
+            result |= keys
+    return result
+
+def index_add(index, value, key, empty=set):
+    index.setdefault(value, empty()).add(key)
+
+def index_discard(index, value, key):
+    keys = index.get(value)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del index[value]
+
+def sorted_insert(sorted_keys, key):
+    i = bisect.bisect_left(sorted_keys, key)
+    if i == len(sorted_keys) or sorted_keys[i] != key:
+        sorted_keys.insert(i, key)
+
+def sorted_remove(sorted_keys, key):
+    i = bisect.bisect_left(sorted_keys, key)
+    if i < len(sorted_keys) and sorted_keys[i] == key:
+        del sorted_keys[i]
+
+def project(record, fields):
+    """Copy a record, keeping only the requested fields"""
+    if not fields:
+        view = record.to_dict() if isinstance(record, Record) else dict(record)
+    else:
+        view = {f: record[f] for f in fields if f in record}
+    # Lists and dicts are shared with the live record, copy them before serializing
+    for key, value in view.items():
+        if isinstance(value, (list, dict)):
+            view[key] = type(value)(value)
+    return view
@@ -0,0 +1,117 @@
+from collections import OrderedDict, deque
+from threading import Lock
+
+from api_server.clock import RealClock
+
+class PendingPodQueue:
+    """Bounded queue of pods waiting for capacity, indexed by priority and CPU request.
+
+    Each (priority, CPU request) pair has its own FIFO, so the scheduler can
+    skip every size that no node can currently fit without looking at the
+    pods, and higher priorities are always served first.
+    """
+
+    def __init__(self, max_depth=10000, wait_samples=1000, clock=None):
+        self.max_depth = max_depth
+        self.clock = clock or RealClock()
+        self.lock = Lock()
+        self.queues = {}  # (priority, cpu_cores) -> OrderedDict(pod_id -> enqueue time)
+        self.pod_class = {}  # pod_id -> (priority, cpu_cores)
+        self.waits = deque(maxlen=wait_samples)  # recent queue wait times, seconds
+        self.placed = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return len(self.pod_class)
+
+    def __contains__(self, pod_id):
+        return pod_id in self.pod_class
+
+    def add(self, pod_id, cpu_cores, force=False, priority=0):
+        """Queue a pod; returns False when the queue is full (unless forced)"""
+        with self.lock:
+            if pod_id in self.pod_class:
+                return True
+            if not force and len(self.pod_class) >= self.max_depth:
+                self.rejected += 1
+                return False
+            key = (priority, cpu_cores)
+            self.queues.setdefault(key, OrderedDict())[pod_id] = self.clock.time()
+            self.pod_class[pod_id] = key
+            return True
+
+    def remove(self, pod_id, placed=False):
+        """Drop a pod from the queue, recording its wait time if it was placed"""
+        with self.lock:
+            key = self.pod_class.pop(pod_id, None)
+            if key is None:
+                return False
+            queue = self.queues[key]
+            enqueued_at = queue.pop(pod_id)
+            if not queue:
+                del self.queues[key]
+            if placed:
+                self.placed += 1
+                self.waits.append(self.clock.time() - enqueued_at)
+            return True
+
+    def next_pod(self, max_cpu, skip=(), outranking=None):
+        """Highest priority, then oldest, queued pod requesting at most max_cpu cores, as (pod_id, cpu_cores).
+        
+        Pods in skip are passed over. Pods with a priority above outranking
+        may preempt others, so they are returned whatever their size.
+        """
+        with self.lock:
+            best = None
+            for (priority, cpu_cores), queue in self.queues.items():
+                if cpu_cores > max_cpu and (outranking is None or priority <= outranking):
+                    continue
+                head = next(((pod_id, enqueued_at) for pod_id, enqueued_at in queue.items()
+                             if pod_id not in skip), None)
+                if head is None:
+                    continue
+                pod_id, enqueued_at = head
+                if best is None or (-priority, enqueued_at) < best[0]:
+                    best = ((-priority, enqueued_at), pod_id, cpu_cores)
+            return None if best is None else (best[1], best[2])
+
+    def demand(self):
+        """Number of queued pods per CPU request size"""
+        with self.lock:
+            demand = {}
+            for (_, cpu_cores), queue in self.queues.items():
+                demand[cpu_cores] = demand.get(cpu_cores, 0) + len(queue)
+            return demand
+
+    def is_full(self):
+        with self.lock:
+            return len(self.pod_class) >= self.max_depth
+
+    def get_stats(self):
+        """Queue depth and wait time metrics"""
+        with self.lock:
+            now = self.clock.time()
+            waits = sorted(self.waits)
+            oldest = min((next(iter(q.values())) for q in self.queues.values()), default=None)
+            depth_by_cpu = {}
+            depth_by_priority = {}
+            for (priority, cpu_cores), queue in self.queues.items():
+                depth_by_cpu[cpu_cores] = depth_by_cpu.get(cpu_cores, 0) + len(queue)
+                depth_by_priority[priority] = depth_by_priority.get(priority, 0) + len(queue)
+
+            def percentile(p):
+                return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else None
+
+            return {
+                "depth": len(self.pod_class),
+                "max_depth": self.max_depth,
+                "depth_by_cpu": dict(sorted(depth_by_cpu.items())),
+                "depth_by_priority": dict(sorted(depth_by_priority.items())),
+                "oldest_wait": round(now - oldest, 3) if oldest is not None else None,
+                "placed": self.placed,
+                "rejected": self.rejected,
+                "wait_p50": percentile(0.50),
+                "wait_p95": percentile(0.95),
+                "wait_max": round(waits[-1], 3) if waits else None,
+                "wait_mean": round(sum(waits) / len(waits), 3) if waits else None
+            }
@@ -1,16 +1,132 @@
+import time
+import threading
+from collections import deque
 from threading import Lock
 import logging
 
+from api_server.pagination import (
+    SortedKeys, index_add, index_discard, intersect, page_keys, project, range_keys,
+    sorted_insert, sorted_remove
+)
+from api_server.pending_queue import PendingPodQueue
+from api_server.constraints import NODE_TOPOLOGY
+from api_server.equivalence_cache import EquivalenceCache
+from api_server.records import IdSet, PodRecord
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Named priority classes; launches may also pass a plain integer
+PRIORITY_CLASSES = {
+    "best-effort": -100,
+    "default": 0,
+    "high": 100,
+    "critical": 1000
+}
+
+def resolve_priority(value):
+    """Turn a priority class name or integer into a priority value"""
+    if value is None:
+        return PRIORITY_CLASSES["default"]
+    if isinstance(value, str) and value in PRIORITY_CLASSES:
+        return PRIORITY_CLASSES[value]
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Unknown priority class: {value}")
+
 class PodScheduler:
-    def __init__(self, node_manager):
+    def __init__(self, node_manager, max_pending=10000):
         self.node_manager = node_manager
-        self.pods = {}  # pod_id -> {node_id, cpu_cores}
+        self.clock = node_manager.clock  # reservation expiry and pending waits use the node clock
+        # pod_id -> {node_id, cpu_cores, priority, [app, constraints]}, node_id is None while pending
+        self.pods = {}
         self.lock = Lock()  # For thread safety
         self.scheduling_algorithm = "best-fit"  # Default algorithm
+        # Secondary indexes used by list_pods
+        self.pod_ids = SortedKeys()  # every pod id, for cursor pagination; touched only on create and delete
+        self.pods_by_node = {}  # node_id -> IdSet(pod_id), in placement order
+        self.pods_by_status = {}  # status -> set(pod_id), running pods (nearly all of them) are left out
+        self.pods_by_cpu = {}  # cpu_cores -> set(pod_id)
+        # node_id -> sorted [(priority, pod_id)], lowest priority first, for picking preemption victims
+        self.pods_by_node_priority = {}
+        self.preemptible = {}  # priority -> number of running pods that may be preempted
+        self.preemptions = 0
+        # Placement constraint indexes over running pods that name an app
+        self.app_counts = {}  # (topology key, domain, app) -> pod count
+        self.app_domains = {}  # (topology key, app) -> set(domain) running the app
+        self.pod_domains = {}  # pod_id -> [(topology key, domain)] it was counted in
+        self.mutation_log = None  # replication log tailed by read followers
+        # Feasible nodes per pod shape, kept current by NodeManager node events
+        self.candidates = EquivalenceCache(
+            (nid, info["available_cores"]) for nid, info in node_manager.get_healthy_nodes().items()
+        )
+        self.node_manager.add_node_listener(self.candidates.node_changed)
+        # Pods that did not fit anywhere wait here until capacity is released
+        self.pending = PendingPodQueue(max_depth=max_pending, clock=self.clock)
+        self.capacity_changed = threading.Event()
+        self.node_manager.add_capacity_listener(self.capacity_changed.set)
+        self.pending_retry_timeout = 30  # seconds, safety net if a capacity event is missed
+        # Gangs are placed all-or-nothing; a reserved gang is released unless committed in time
+        self.gangs = {}  # gang_id -> {pods, priority, status, expires_at}
+        self.gang_timeout = 60  # seconds a reservation is held by default
+        self.gang_stats = {"reserved": 0, "committed": 0, "rejected": 0, "expired": 0, "released": 0}
+        self.gang_latencies = deque(maxlen=1000)  # seconds taken to plan and reserve each gang
+        self.running = False
+        self.pending_thread = None
+    
+    def _index_pod(self, pod_id):
+        pod = self.pods[pod_id]
+        index_add(self.pods_by_node, pod.node_id, pod_id, IdSet)
+        if pod.status is not None:
+            index_add(self.pods_by_status, pod.status, pod_id)
+        index_add(self.pods_by_cpu, pod.cpu_cores, pod_id)
+        if pod.node_id is not None:
+            if not pod.gang_id:
+                # Evicting one member would strand the rest of a gang, so gangs are never preempted
+                sorted_insert(self.pods_by_node_priority.setdefault(pod.node_id, []),
+                              (pod.priority or 0, pod_id))
+                self.preemptible[pod.priority or 0] = self.preemptible.get(pod.priority or 0, 0) + 1
+            if pod.app:
+                domains = [(NODE_TOPOLOGY, pod.node_id)]
+                domains.extend(self.node_manager.get_node_labels(pod.node_id).items())
+                self.pod_domains[pod_id] = domains
+                for key, domain in domains:
+                    count_key = (key, domain, pod.app)
+                    self.app_counts[count_key] = self.app_counts.get(count_key, 0) + 1
+                    index_add(self.app_domains, (key, pod.app), domain)
+    
+    def _unindex_pod(self, pod_id):
+        pod = self.pods[pod_id]
+        index_discard(self.pods_by_node, pod.node_id, pod_id)
+        if pod.status is not None:
+            index_discard(self.pods_by_status, pod.status, pod_id)
+        index_discard(self.pods_by_cpu, pod.cpu_cores, pod_id)
+        if pod.node_id is not None and not pod.gang_id:
+            by_priority = self.pods_by_node_priority[pod.node_id]
+            sorted_remove(by_priority, (pod.priority or 0, pod_id))
+            if not by_priority:
+                del self.pods_by_node_priority[pod.node_id]
+            self.preemptible[pod.priority or 0] -= 1
+            if not self.preemptible[pod.priority or 0]:
+                del self.preemptible[pod.priority or 0]
+        for key, domain in self.pod_domains.pop(pod_id, ()):
+            count_key = (key, domain, pod.app)
+            self.app_counts[count_key] -= 1
+            if not self.app_counts[count_key]:
+                del self.app_counts[count_key]
+                index_discard(self.app_domains, (key, pod.app), domain)
+    
+    def set_mutation_log(self, mutation_log):
+        """Publish every pod change to a replication log"""
+        self.mutation_log = mutation_log
+    
+    def _publish(self, pod_id):
+        # Called with self.lock held so log order matches mutation order
+        if self.mutation_log is not None:
+            pod = self.pods.get(pod_id)
+            self.mutation_log.append("pod", pod_id, pod.to_dict() if pod is not None else None)
     
     def set_scheduling_algorithm(self, algorithm):
         """Set the scheduling algorithm to use"""
@@ -21,7 +137,7 @@ class PodScheduler:
         self.scheduling_algorithm = algorithm
         return True
     
-    def schedule_pod(self, pod_id, cpu_cores):
+    def schedule_pod(self, pod_id, cpu_cores, priority=0, spec=None):
         """Schedule a pod to a node based on the selected algorithm"""
         with self.lock:
             # Check if pod already exists
@@ -29,48 +145,498 @@ class PodScheduler:
                 logger.warning(f"Pod {pod_id} already exists, cannot reschedule")
                 return {"success": False, "message": "Pod already exists"}
             
-            # Get healthy nodes
-            healthy_nodes = self.node_manager.get_healthy_nodes()
-            if not healthy_nodes:
+            if not len(self.candidates):
                 logger.warning("No healthy nodes available for scheduling")
                 return {"success": False, "message": "No healthy nodes available"}
             
-            # Find node to schedule on
-            node_id = None
-            
-            if self.scheduling_algorithm == "first-fit":
-                node_id = self._first_fit_scheduling(healthy_nodes, cpu_cores)
-            elif self.scheduling_algorithm == "best-fit":
-                node_id = self._best_fit_scheduling(healthy_nodes, cpu_cores)
-            elif self.scheduling_algorithm == "worst-fit":
-                node_id = self._worst_fit_scheduling(healthy_nodes, cpu_cores)
+            # Find node to schedule on; only constrained pods need a node snapshot
+            if spec and spec.get("constraints"):
+                healthy_nodes = self.node_manager.get_healthy_nodes()
+                allowed = self._allowed_nodes(spec, healthy_nodes)
+                node_id = self._choose_node(self._restrict(healthy_nodes, allowed), cpu_cores)
+            else:
+                node_id = self.candidates.choose(cpu_cores, self.scheduling_algorithm)
             
             if not node_id:
+                result = self._preempt_for(pod_id, cpu_cores, priority, spec)
+                if result:
+                    return result
                 logger.warning(f"No node with sufficient resources for pod {pod_id} requiring {cpu_cores} cores")
                 return {"success": False, "message": "No node with sufficient resources"}
             
             logger.info(f"Scheduling pod {pod_id} to node {node_id}")
+            return self._bind_pod(pod_id, node_id, cpu_cores, priority, spec)
+    
+    def _bind_pod(self, pod_id, node_id, cpu_cores, priority=None, spec=None):
+        """Allocate resources for a pod on a node and record it (self.lock held).
+        
+        priority None keeps the priority of an existing pending record; spec
+        holds the app and constraints of a new pod.
+        """
+        # Allocate resources on the node
+        if not self.node_manager.allocate_resources(node_id, cpu_cores):
+            logger.error(f"Failed to allocate resources for pod {pod_id} on node {node_id}")
+            return {"success": False, "message": "Failed to allocate resources"}
+        
+        # Add pod to node
+        if not self.node_manager.add_pod_to_node(node_id, pod_id):
+            # Roll back resource allocation if adding pod fails
+            self.node_manager.release_resources(node_id, cpu_cores)
+            logger.error(f"Failed to add pod {pod_id} to node {node_id}")
+            return {"success": False, "message": "Failed to add pod to node"}
+        
+        # Store pod information, replacing a pending or rescheduling record
+        pod = self.pods.get(pod_id)
+        if pod is not None:
+            self._unindex_pod(pod_id)
+        else:
+            pod = self.pods[pod_id] = PodRecord()
+            self.pod_ids.add(pod_id)
+        pod["node_id"] = node_id
+        pod["cpu_cores"] = cpu_cores
+        pod["priority"] = pod.get("priority", 0) if priority is None else priority
+        pod.pop("status", None)
+        if spec:
+            pod.update(spec)
+        self._index_pod(pod_id)
+        self._publish(pod_id)
+        self.pending.remove(pod_id, placed=True)
+        
+        logger.info(f"Successfully scheduled pod {pod_id} on node {node_id}")
+        return {"success": True, "node_id": node_id}
+    
+    def _choose_node(self, nodes, cpu_cores):
+        """Pick a node for cpu_cores with the selected algorithm"""
+        if self.scheduling_algorithm == "first-fit":
+            return self._first_fit_scheduling(nodes, cpu_cores)
+        elif self.scheduling_algorithm == "best-fit":
+            return self._best_fit_scheduling(nodes, cpu_cores)
+        elif self.scheduling_algorithm == "worst-fit":
+            return self._worst_fit_scheduling(nodes, cpu_cores)
+        return None
+    
+    def _domain_nodes(self, key, domains):
+        """Nodes in any of the given domains of a topology key"""
+        if key == NODE_TOPOLOGY:
+            return set(domains)
+        node_ids = set()
+        for domain in domains:
+            node_ids |= self.node_manager.get_nodes_with_label(key, domain)
+        return node_ids
+    
+    def _topology_domains(self, key, nodes):
+        """domain -> node ids for the domains of a topology key with a node in the snapshot"""
+        if key == NODE_TOPOLOGY:
+            return {node_id: {node_id} for node_id in nodes}
+        return {domain: node_ids for domain, node_ids in self.node_manager.get_label_domains(key).items()
+                if any(node_id in nodes for node_id in node_ids)}
+    
+    def _allowed_nodes(self, spec, nodes):
+        """Ids of the snapshot nodes satisfying a pod's constraints, or None if it has none (self.lock held).
+        
+        Every rule is answered from the label and app-count indexes, so the
+        cost grows with the number of constraints and domains rather than
+        with nodes times pods.
+        """
+        constraints = spec.get("constraints")
+        if not constraints:
+            return None
+        
+        app = spec.get("app")
+        allowed = None  # None means no restriction yet
+        for key, value in constraints.get("node_selector", {}).items():
+            matching = self.node_manager.get_nodes_with_label(key, value)
+            allowed = matching if allowed is None else allowed & matching
+        
+        for rule in constraints.get("affinity", ()):
+            domains = self.app_domains.get((rule["topology_key"], rule["app"]), ())
+            if not domains and rule["app"] == app:
+                continue  # the first pod of an app with self-affinity may go anywhere
+            matching = self._domain_nodes(rule["topology_key"], domains)
+            allowed = matching if allowed is None else allowed & matching
+        
+        for rule in constraints.get("spread", ()):
+            key = rule["topology_key"]
+            domains = self._topology_domains(key, nodes)
+            counts = {domain: self.app_counts.get((key, domain, app), 0) for domain in domains}
+            lowest = min(counts.values(), default=0)
+            matching = set()
+            for domain, count in counts.items():
+                if count + 1 - lowest <= rule["max_skew"]:
+                    matching |= domains[domain]
+            allowed = matching if allowed is None else allowed & matching
+        
+        if allowed is None:
+            allowed = set(nodes)
+        for rule in constraints.get("anti_affinity", ()):
+            domains = self.app_domains.get((rule["topology_key"], rule["app"]), ())
+            allowed -= self._domain_nodes(rule["topology_key"], domains)
+        return allowed
+    
+    def _restrict(self, nodes, allowed):
+        """The part of a node snapshot that is allowed, sharing the node entries"""
+        if allowed is None:
+            return nodes
+        return {node_id: nodes[node_id] for node_id in allowed if node_id in nodes}
+    
+    def _place_on_snapshot(self, pod_id, cpu_cores, nodes, priority=None, spec=None):
+        """Place a pod on one of the nodes of a healthy-node snapshot, keeping the snapshot up to date (self.lock held).
+        
+        Unconstrained pods are placed through the equivalence cache, which
+        tracks current capacity; the snapshot then only limits which nodes
+        may be used.
+        """
+        allowed = self._allowed_nodes(spec or self.pods.get(pod_id) or {}, nodes)
+        excluded = set()
+        while True:
+            if allowed is None:
+                node_id = self.candidates.choose(cpu_cores, self.scheduling_algorithm, excluded)
+                if node_id and node_id not in nodes:
+                    excluded.add(node_id)
+                    continue
+            else:
+                node_id = self._choose_node(self._restrict(nodes, allowed), cpu_cores)
+            if not node_id:
+                # constrained: only the nodes allowed by the pod's constraints were short of capacity
+                return {"success": False, "constrained": allowed is not None,
+                        "message": "No node with sufficient resources"}
+            
+            result = self._bind_pod(pod_id, node_id, cpu_cores, priority, spec)
+            if result["success"]:
+                nodes[node_id]["available_cores"] -= cpu_cores
+                return result
+            # The snapshot was stale for this node, stop considering it
+            nodes.pop(node_id)
+            excluded.add(node_id)
+    
+    def _make_pending(self, pod_id, cpu_cores, force=False, priority=None, spec=None):
+        """Queue a pod until capacity frees up (self.lock held)"""
+        pod = self.pods.get(pod_id)
+        if priority is None:
+            priority = pod.get("priority", 0) if pod is not None else 0
+        if not self.pending.add(pod_id, cpu_cores, force=force, priority=priority):
+            logger.warning(f"Pending queue full, rejecting pod {pod_id}")
+            return {"success": False, "backpressure": True, "message": "Pending pod queue is full"}
+        
+        if pod is not None:
+            self._unindex_pod(pod_id)
+        else:
+            pod = self.pods[pod_id] = PodRecord()
+            self.pod_ids.add(pod_id)
+        pod["node_id"] = None
+        pod["cpu_cores"] = cpu_cores
+        pod["priority"] = priority
+        pod["status"] = "pending"
+        if spec:
+            pod.update(spec)
+        self._index_pod(pod_id)
+        self._publish(pod_id)
+        
+        logger.info(f"Pod {pod_id} requiring {cpu_cores} cores is pending until capacity is available")
+        return {"success": False, "pending": True, "message": "Pod pending until capacity is available"}
+    
+    def _pick_victims(self, lower, needed):
+        """Cheapest subset of (cpu_cores, priority, pod_id) freeing at least needed cores.
+        
+        Taking the largest pods first gives the fewest evictions; each victim
+        is then swapped for a smaller spare pod when that still frees enough,
+        to evict as little CPU as possible.
+        """
+        lower = sorted(lower, key=lambda item: (-item[0], item[1]))
+        victims = []
+        freed = 0
+        for item in lower:
+            if freed >= needed:
+                break
+            victims.append(item)
+            freed += item[0]
+        
+        spare = sorted(lower[len(victims):])
+        for i, victim in enumerate(victims):
+            for j, item in enumerate(spare):
+                if item[0] >= victim[0]:
+                    break
+                if freed - victim[0] + item[0] >= needed:
+                    victims[i], spare[j] = item, victim
+                    freed += item[0] - victim[0]
+                    spare.sort()
+                    break
+        return victims
+    
+    def _find_victims(self, cpu_cores, priority, healthy_nodes, allowed=None):
+        """Find the node where the cheapest set of lower-priority pods frees enough cores (self.lock held)"""
+        best = None
+        for node_id, by_priority in self.pods_by_node_priority.items():
+            # The per-node index starts with the lowest priority, so nodes
+            # without anything to preempt are skipped after one comparison
+            if by_priority[0][0] >= priority:
+                continue
+            if allowed is not None and node_id not in allowed:
+                continue
+            node_info = healthy_nodes.get(node_id)
+            if node_info is None or node_info["cpu_cores"] < cpu_cores:
+                continue
             
-            # Allocate resources on the node
-            if not self.node_manager.allocate_resources(node_id, cpu_cores):
-                logger.error(f"Failed to allocate resources for pod {pod_id} on node {node_id}")
-                return {"success": False, "message": "Failed to allocate resources"}
+            needed = cpu_cores - node_info["available_cores"]
+            if needed <= 0:
+                return node_id, []  # capacity freed up since the caller's snapshot
+            lower = []
+            freeable = 0
+            for pod_priority, victim_id in by_priority:
+                if pod_priority >= priority:
+                    break
+                victim_cpu = self.pods[victim_id]["cpu_cores"]
+                lower.append((victim_cpu, pod_priority, victim_id))
+                freeable += victim_cpu
+            if freeable < needed:
+                continue
             
-            # Add pod to node
-            if not self.node_manager.add_pod_to_node(node_id, pod_id):
-                # Roll back resource allocation if adding pod fails
-                self.node_manager.release_resources(node_id, cpu_cores)
-                logger.error(f"Failed to add pod {pod_id} to node {node_id}")
-                return {"success": False, "message": "Failed to add pod to node"}
+            victims = self._pick_victims(lower, needed)
+            cost = (len(victims), sum(v[0] for v in victims), max(v[1] for v in victims))
+            if best is None or cost < best[0]:
+                best = (cost, node_id, [v[2] for v in victims])
+        
+        return (best[1], best[2]) if best else (None, [])
+    
+    def _evict(self, pod_id):
+        """Take a running pod off its node and queue it again (self.lock held)"""
+        pod = self.pods[pod_id]
+        node_id = pod["node_id"]
+        self.node_manager.remove_pod_from_node(node_id, pod_id)
+        self.node_manager.release_resources(node_id, pod["cpu_cores"])
+        self._make_pending(pod_id, pod["cpu_cores"], force=True)
+        self.preemptions += 1
+    
+    def _preempt_for(self, pod_id, cpu_cores, priority, spec=None, healthy_nodes=None):
+        """Evict lower-priority pods to make room for a pod, returning the bind result or None (self.lock held).
+        
+        A caller placing many pods passes its healthy-node snapshot, which is
+        then kept up to date like in _place_on_snapshot.
+        """
+        snapshot = healthy_nodes
+        if healthy_nodes is None:
+            healthy_nodes = self.node_manager.get_healthy_nodes()
+        allowed = self._allowed_nodes(spec or self.pods.get(pod_id) or {}, healthy_nodes)
+        node_id, victims = self._find_victims(cpu_cores, priority, healthy_nodes, allowed)
+        if node_id is None:
+            return None
+        
+        if victims:
+            logger.info(f"Preempting pods {victims} on node {node_id} for pod {pod_id} with priority {priority}")
+        freed = 0
+        for victim_id in victims:
+            freed += self.pods[victim_id]["cpu_cores"]
+            self._evict(victim_id)
+        
+        result = self._bind_pod(pod_id, node_id, cpu_cores, priority, spec)
+        if result["success"]:
+            result["preempted"] = victims
+            freed -= cpu_cores
+        if snapshot is not None:
+            snapshot[node_id]["available_cores"] += freed
+        return result
+    
+    def commit_placement(self, pod_id, cpu_cores, candidates, queue_if_unschedulable=False, priority=0, spec=None):
+        """Commit a placement proposed against an older capacity snapshot.
+        
+        Candidates are tried in order; allocation re-validates each node's
+        current health and capacity, so a proposal that conflicts with a
+        placement committed since the snapshot is rejected instead of
+        overcommitting the node. With queue_if_unschedulable the pod
+        preempts lower-priority pods, or is left pending, instead of
+        failing when none of the candidates fit. Candidates are ranked
+        without looking at placement constraints, so a constrained pod is
+        placed on a fresh snapshot when none of them satisfies its constraints.
+        """
+        with self.lock:
+            if pod_id in self.pods:
+                logger.warning(f"Pod {pod_id} already exists, cannot reschedule")
+                return {"success": False, "message": "Pod already exists"}
+            
+            constrained = bool(spec and spec.get("constraints"))
+            allowed = None
+            if constrained:
+                healthy_nodes = self.node_manager.get_healthy_nodes()
+                allowed = self._allowed_nodes(spec, healthy_nodes)
             
-            # Store pod information
-            self.pods[pod_id] = {
-                "node_id": node_id,
-                "cpu_cores": cpu_cores
+            for node_id in candidates:
+                if not self.node_manager.can_fit(node_id, cpu_cores):
+                    continue  # taken by a placement committed after the snapshot
+                if allowed is not None and node_id not in allowed:
+                    continue
+                result = self._bind_pod(pod_id, node_id, cpu_cores, priority, spec)
+                if result["success"]:
+                    return result
+            
+            if constrained:
+                result = self._place_on_snapshot(pod_id, cpu_cores, healthy_nodes, priority, spec)
+                if result["success"]:
+                    return result
+                # The snapshot is current, retrying against a new one won't help
+                queue_if_unschedulable = True
+            
+            if queue_if_unschedulable:
+                result = self._preempt_for(pod_id, cpu_cores, priority, spec)
+                if result and result["success"]:
+                    return result
+                return self._make_pending(pod_id, cpu_cores, priority=priority, spec=spec)
+            return {"success": False, "conflict": bool(candidates),
+                    "message": "No node with sufficient resources"}
+    
+    def reserve_gang(self, gang_id, members, priority=0, spec=None, timeout=None, commit=False):
+        """Place a gang of pods all-or-nothing.
+        
+        members is a list of (pod_id, cpu_cores). Placements for the whole
+        gang are planned against one healthy-node snapshot and then reserved
+        under the scheduler lock; if any reservation fails, the ones made so
+        far are rolled back, so a gang never holds part of its capacity.
+        Reserved pods take their cores but are not started until
+        commit_gang(); reservations not committed within timeout seconds are
+        released. With commit the gang is started right away. Constraints in
+        spec apply to every member and are judged against pods outside the gang.
+        """
+        started = time.perf_counter()
+        with self.lock:
+            if gang_id in self.gangs:
+                return {"success": False, "message": "Gang already exists"}
+            if not members:
+                return {"success": False, "message": "A gang needs at least one pod"}
+            if any(pod_id in self.pods for pod_id, _ in members):
+                return {"success": False, "message": "Pod already exists"}
+            
+            nodes = self.node_manager.get_healthy_nodes()
+            candidates = self._restrict(nodes, self._allowed_nodes(spec or {}, nodes))
+            
+            # Plan the largest members first, they are the hardest to fit
+            plan = []
+            for pod_id, cpu_cores in sorted(members, key=lambda member: -member[1]):
+                node_id = self._choose_node(candidates, cpu_cores)
+                if not node_id:
+                    self.gang_stats["rejected"] += 1
+                    logger.info(f"Gang {gang_id} of {len(members)} pods does not fit, nothing reserved")
+                    return {"success": False, "message": "Not enough capacity for the whole gang"}
+                candidates[node_id]["available_cores"] -= cpu_cores
+                plan.append((pod_id, node_id, cpu_cores))
+            
+            reserved = []
+            for pod_id, node_id, cpu_cores in plan:
+                result = self._bind_pod(pod_id, node_id, cpu_cores, priority,
+                                        dict(spec or {}, gang_id=gang_id, status="reserved"))
+                if not result["success"]:
+                    # The snapshot went stale (a node failed meanwhile), undo the partial gang
+                    for reserved_id in reserved:
+                        self._release_pod(reserved_id)
+                    self.gang_stats["rejected"] += 1
+                    return {"success": False, "message": "Capacity changed while reserving the gang, retry"}
+                reserved.append(pod_id)
+            
+            timeout = self.gang_timeout if timeout is None else timeout
+            self.gangs[gang_id] = {
+                "pods": [pod_id for pod_id, _ in members],
+                "priority": priority,
+                "status": "reserved",
+                "expires_at": self.clock.time() + timeout
             }
+            self.gang_stats["reserved"] += 1
+            self.gang_latencies.append(time.perf_counter() - started)
+            logger.info(f"Reserved gang {gang_id} of {len(members)} pods for {timeout} seconds")
+            if commit:
+                self._commit_gang(gang_id)
             
-            logger.info(f"Successfully scheduled pod {pod_id} on node {node_id}")
-            return {"success": True, "node_id": node_id}
+            gang = self.gangs[gang_id]
+            return {
+                "success": True,
+                "gang_id": gang_id,
+                "status": gang["status"],
+                "expires_at": gang["expires_at"],
+                "placements": {pod_id: node_id for pod_id, node_id, _ in plan}
+            }
+    
+    def commit_gang(self, gang_id):
+        """Start the pods of a reserved gang"""
+        with self.lock:
+            gang = self.gangs.get(gang_id)
+            if gang is None or gang["status"] != "reserved":
+                return False
+            self._commit_gang(gang_id)
+            return True
+    
+    def _commit_gang(self, gang_id):
+        gang = self.gangs[gang_id]
+        for pod_id in gang["pods"]:
+            if pod_id in self.pods:
+                self._unindex_pod(pod_id)
+                self.pods[pod_id].pop("status", None)
+                self._index_pod(pod_id)
+                self._publish(pod_id)
+        gang["status"] = "running"
+        gang["expires_at"] = None
+        self.gang_stats["committed"] += 1
+        logger.info(f"Started gang {gang_id}")
+    
+    def release_gang(self, gang_id):
+        """Remove every pod of a gang and give back its capacity"""
+        with self.lock:
+            if gang_id not in self.gangs:
+                return False
+            self._release_gang(gang_id)
+            self.gang_stats["released"] += 1
+            return True
+    
+    def _release_gang(self, gang_id):
+        for pod_id in self.gangs.pop(gang_id)["pods"]:
+            if pod_id in self.pods:
+                self._release_pod(pod_id)
+        logger.info(f"Released gang {gang_id}")
+    
+    def _release_pod(self, pod_id):
+        """Drop a pod and free its cores (self.lock held)"""
+        pod = self.pods[pod_id]
+        if pod["node_id"] is not None:
+            self.node_manager.remove_pod_from_node(pod["node_id"], pod_id)
+            self.node_manager.release_resources(pod["node_id"], pod["cpu_cores"])
+        else:
+            self.pending.remove(pod_id)
+        self._unindex_pod(pod_id)
+        del self.pods[pod_id]
+        self.pod_ids.discard(pod_id)
+        self._publish(pod_id)
+    
+    def expire_reservations(self, now=None):
+        """Release reserved gangs whose timeout has passed, returning how many"""
+        now = self.clock.time() if now is None else now
+        with self.lock:
+            expired = [gang_id for gang_id, gang in self.gangs.items()
+                       if gang["status"] == "reserved" and gang["expires_at"] <= now]
+            for gang_id in expired:
+                logger.warning(f"Reservation of gang {gang_id} timed out")
+                self._release_gang(gang_id)
+            self.gang_stats["expired"] += len(expired)
+            return len(expired)
+    
+    def _next_expiry(self):
+        with self.lock:
+            return min((gang["expires_at"] for gang in self.gangs.values() if gang["status"] == "reserved"),
+                       default=None)
+    
+    def get_gang(self, gang_id):
+        """Get a gang's status and the placement of its pods"""
+        with self.lock:
+            gang = self.gangs.get(gang_id)
+            if gang is None:
+                return None
+            return dict(gang, pods={pod_id: self.pods[pod_id]["node_id"]
+                                    for pod_id in gang["pods"] if pod_id in self.pods})
+    
+    def get_gang_stats(self):
+        """Gang counters and reservation latency percentiles in milliseconds"""
+        with self.lock:
+            latencies = sorted(self.gang_latencies)
+            stats = dict(self.gang_stats, gangs=len(self.gangs),
+                         reserved_now=sum(1 for gang in self.gangs.values() if gang["status"] == "reserved"))
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            stats[f"latency_{name}_ms"] = round(latencies[int(q * (len(latencies) - 1))] * 1000, 3) if latencies else None
+        return stats
     
     def _first_fit_scheduling(self, nodes, cpu_cores):
         """First-fit scheduling algorithm - use the first node with enough resources"""
@@ -116,6 +682,16 @@ class PodScheduler:
             node_id = pod_info["node_id"]
             cpu_cores = pod_info["cpu_cores"]
             
+            if node_id is None:
+                # Pending pods hold no resources
+                logger.info(f"Removing pending pod {pod_id}")
+                self.pending.remove(pod_id)
+                self._unindex_pod(pod_id)
+                del self.pods[pod_id]
+                self.pod_ids.discard(pod_id)
+                self._publish(pod_id)
+                return True
+            
             logger.info(f"Unscheduling pod {pod_id} from node {node_id}")
             
             # Remove pod from node
@@ -129,59 +705,208 @@ class PodScheduler:
                 # Continue anyway as we want to clean up our internal state
             
             # Remove pod from tracking
+            self._unindex_pod(pod_id)
             del self.pods[pod_id]
+            self.pod_ids.discard(pod_id)
+            self._publish(pod_id)
             logger.info(f"Successfully unscheduled pod {pod_id}")
             
             return True
     
+    def move_pod(self, pod_id, target_node_id):
+        """Move a running pod to another node, reserving the target before releasing the source"""
+        with self.lock:
+            pod = self.pods.get(pod_id)
+            if pod is None or pod["node_id"] is None:
+                logger.warning(f"Pod {pod_id} is not running, cannot move it")
+                return False
+            
+            source_node_id = pod["node_id"]
+            cpu_cores = pod["cpu_cores"]
+            if source_node_id == target_node_id:
+                return False
+            
+            if pod.get("constraints"):
+                # Judge the target as if the pod had already left its node
+                self._unindex_pod(pod_id)
+                allowed = self._allowed_nodes(pod, self.node_manager.get_healthy_nodes())
+                self._index_pod(pod_id)
+                if target_node_id not in allowed:
+                    logger.warning(f"Node {target_node_id} violates the constraints of pod {pod_id}")
+                    return False
+            
+            if not self.node_manager.allocate_resources(target_node_id, cpu_cores):
+                logger.warning(f"Node {target_node_id} cannot take pod {pod_id}")
+                return False
+            if not self.node_manager.add_pod_to_node(target_node_id, pod_id):
+                self.node_manager.release_resources(target_node_id, cpu_cores)
+                return False
+            
+            self.node_manager.remove_pod_from_node(source_node_id, pod_id)
+            self.node_manager.release_resources(source_node_id, cpu_cores)
+            
+            self._unindex_pod(pod_id)
+            pod["node_id"] = target_node_id
+            self._index_pod(pod_id)
+            self._publish(pod_id)
+            
+            logger.info(f"Moved pod {pod_id} from node {source_node_id} to node {target_node_id}")
+            return True
+    
     def reschedule_pods_from_node(self, node_id):
-        """Reschedule all pods from a failed node"""
+        """Reschedule all pods from a failed node, leaving pods that don't fit pending"""
         with self.lock:
             logger.info(f"Attempting to reschedule all pods from node {node_id}")
             
+            # A reserved gang losing a node is released whole rather than
+            # reserved piecemeal elsewhere; its owner can reserve it again
+            for gang_id in {self.pods[pod_id].get("gang_id") for pod_id in self.pods_by_node.get(node_id, ())}:
+                if gang_id in self.gangs and self.gangs[gang_id]["status"] == "reserved":
+                    logger.warning(f"Releasing gang {gang_id}, node {node_id} holding part of its reservation failed")
+                    self._release_gang(gang_id)
+                    self.gang_stats["released"] += 1
+            
             # Find all pods on this node
-            pods_to_reschedule = []
-            for pod_id, info in list(self.pods.items()):
-                if info["node_id"] == node_id:
-                    pods_to_reschedule.append((pod_id, info["cpu_cores"]))
-                    # Don't delete from internal tracking yet!
-                    # Keep this line commented: del self.pods[pod_id]
+            pods_to_reschedule = [(pod_id, self.pods[pod_id]["cpu_cores"])
+                                  for pod_id in self.pods_by_node.get(node_id, ())]
             
             logger.info(f"Found {len(pods_to_reschedule)} pods to reschedule from node {node_id}")
             
-            # Try to reschedule each pod
+            # One snapshot of the other healthy nodes serves the whole evacuation
+            healthy_nodes = self.node_manager.get_healthy_nodes()
+            healthy_nodes.pop(node_id, None)
+            
             rescheduled = []
+            pending = []
             failed = []
             
             for pod_id, cpu_cores in pods_to_reschedule:
                 logger.info(f"Attempting to reschedule pod {pod_id} with {cpu_cores} CPU cores")
                 
-                # First update the pod's status to show it's being rescheduled
-                if pod_id in self.pods:
-                    self.pods[pod_id]["status"] = "rescheduling"
+                # First update the pod's status to show it's being rescheduled.
+                # It no longer counts as running on its node, so its own
+                # anti-affinity and spread rules don't rule out the old domains
+                self._unindex_pod(pod_id)
+                self.pods[pod_id]["status"] = "rescheduling"
+                self.pods[pod_id]["node_id"] = None
+                self._index_pod(pod_id)
+                self._publish(pod_id)
                 
-                # Remove the actual pod from the node before rescheduling
+                # Remove the actual pod from the node and give back its cores,
+                # so the node has its full capacity if it ever recovers
                 self.node_manager.remove_pod_from_node(node_id, pod_id)
+                self.node_manager.release_resources(node_id, cpu_cores)
                 
                 # Schedule the pod on a new node
-                result = self.schedule_pod(pod_id, cpu_cores)
+                result = self._place_on_snapshot(pod_id, cpu_cores, healthy_nodes)
                 
                 if result["success"]:
                     new_node = result["node_id"]
                     logger.info(f"Successfully rescheduled pod {pod_id} to node {new_node}")
                     rescheduled.append(pod_id)
+                    continue
+                
+                # A pod outranking others on the remaining nodes takes their place
+                result = self._preempt_for(pod_id, cpu_cores, self.pods[pod_id]["priority"],
+                                           healthy_nodes=healthy_nodes)
+                if result and result["success"]:
+                    logger.info(f"Rescheduled pod {pod_id} to node {result['node_id']} by preemption")
+                    rescheduled.append(pod_id)
+                    continue
+                
+                # Already admitted pods are never dropped, they wait for capacity
+                result = self._make_pending(pod_id, cpu_cores, force=True)
+                if result.get("pending"):
+                    pending.append(pod_id)
                 else:
-                    # If rescheduling failed, now we can delete it from tracking
-                    if pod_id in self.pods:
-                        del self.pods[pod_id]
                     logger.warning(f"Failed to reschedule pod {pod_id}: {result['message']}")
                     failed.append(pod_id)
             
             return {
                 "rescheduled": rescheduled,
+                "pending": pending,
                 "failed": failed
             }
     
+    def retry_pending(self):
+        """Place pending pods that fit the current capacity, highest priority and oldest first"""
+        with self.lock:
+            if not len(self.pending):
+                return 0
+            
+            nodes = self.node_manager.get_healthy_nodes()
+            max_cpu = self.candidates.max_available()
+            placed = 0
+            blocked = set()  # pods whose constraints rule out every node with room
+            while True:
+                # Pods outranking a running pod are tried whatever their size, they may preempt it
+                lowest = min(self.preemptible, default=None)
+                next_pod = self.pending.next_pod(max_cpu, blocked, outranking=lowest)
+                if next_pod is None:
+                    break
+                
+                pod_id, cpu_cores = next_pod
+                priority = self.pods[pod_id]["priority"]
+                result = self._place_on_snapshot(pod_id, cpu_cores, nodes)
+                if not result["success"] and lowest is not None and priority > lowest:
+                    preempted = self._preempt_for(pod_id, cpu_cores, priority, healthy_nodes=nodes)
+                    if preempted and preempted["success"]:
+                        result = preempted
+                    else:
+                        blocked.add(pod_id)
+                        continue
+                if result["success"]:
+                    placed += 1
+                elif result.get("constrained"):
+                    # Other pods of this size may still fit elsewhere
+                    blocked.add(pod_id)
+                else:
+                    # Nothing of this size or larger fits anywhere right now
+                    max_cpu = cpu_cores - 1
+            
+            if placed:
+                logger.info(f"Placed {placed} pending pods, {len(self.pending)} still pending")
+            return placed
+    
+    def start_pending_retries(self):
+        """Start the thread placing pending pods whenever capacity is released"""
+        with self.lock:
+            if self.running:
+                return False
+            
+            self.running = True
+            self.pending_thread = threading.Thread(target=self._pending_loop, daemon=True)
+            self.pending_thread.start()
+            return True
+    
+    def stop_pending_retries(self):
+        """Stop the pending pod thread"""
+        with self.lock:
+            if not self.running:
+                return False
+            
+            self.running = False
+        self.capacity_changed.set()
+        if self.pending_thread:
+            self.pending_thread.join(timeout=5)
+        return True
+    
+    def _pending_loop(self):
+        while self.running:
+            # Woken by NodeManager capacity events rather than polling, or
+            # when the next gang reservation runs out
+            timeout = self.pending_retry_timeout
+            next_expiry = self._next_expiry()
+            if next_expiry is not None:
+                timeout = max(0, min(timeout, next_expiry - self.clock.time()))
+            self.clock.wait(self.capacity_changed, timeout)
+            self.capacity_changed.clear()
+            try:
+                self.expire_reservations()
+                self.retry_pending()
+            except Exception as e:
+                logger.error(f"Error retrying pending pods: {e}")
+    
     def get_pod(self, pod_id):
         """Get information about a pod"""
         with self.lock:
@@ -190,4 +915,62 @@ class PodScheduler:
     def get_all_pods(self):
         """Get information about all pods"""
         with self.lock:
-            return {pid: info.copy() for pid, info in self.pods.items()}
+            return {pid: info.to_dict() for pid, info in self.pods.items()}
+    
+    def list_pods(self, query):
+        """Get a page of pods matching the filters of a parsed list query"""
+        with self.lock:
+            filters = []
+            if query["ids"]:
+                filters.append({pid for pid in query["ids"] if pid in self.pods})
+            if query["node_id"]:
+                filters.append(self.pods_by_node.get(query["node_id"], set()))
+            if query["status"] and query["status"] != "running":
+                filters.append(self.pods_by_status.get(query["status"], set()))
+            if query["cpu_min"] is not None or query["cpu_max"] is not None:
+                filters.append(range_keys(self.pods_by_cpu, query["cpu_min"], query["cpu_max"]))
+            
+            matching = intersect(filters)
+            if query["status"] == "running":
+                if matching is None:
+                    matching = {pid for pid, pod in self.pods.items() if pod.status is None}
+                else:
+                    matching = {pid for pid in matching if self.pods[pid].status is None}
+            keys, next_cursor = page_keys(self.pod_ids, matching, query["cursor"], query["limit"])
+            return {pid: project(self.pods[pid], query["fields"]) for pid in keys}, next_cursor
+    
+    def snapshot(self):
+        """Copy every pod record, for replication snapshots"""
+        with self.lock:
+            return {pid: info.to_dict() for pid, info in self.pods.items()}
+    
+    def load_replica(self, pods):
+        """Replace all pods with a replicated snapshot"""
+        with self.lock:
+            self.pods = {}
+            self.pod_ids = SortedKeys(pods)
+            self.pods_by_node = {}
+            self.pods_by_status = {}
+            self.pods_by_cpu = {}
+            self.pods_by_node_priority = {}
+            self.preemptible = {}
+            self.app_counts = {}
+            self.app_domains = {}
+            self.pod_domains = {}
+            self.gangs = {}
+            for pod_id, record in pods.items():
+                self.pods[pod_id] = PodRecord.from_dict(record)
+                self._index_pod(pod_id)
+    
+    def apply_replicated(self, pod_id, record):
+        """Apply a replicated pod change (record is None for a removed pod)"""
+        with self.lock:
+            if pod_id in self.pods:
+                self._unindex_pod(pod_id)
+                del self.pods[pod_id]
+            if record is None:
+                self.pod_ids.discard(pod_id)
+            else:
+                self.pods[pod_id] = PodRecord.from_dict(record)
+                self.pod_ids.add(pod_id)  # already there unless the pod is new
+                self._index_pod(pod_id)
@@ -0,0 +1,267 @@
+import threading
+from collections import deque
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def fragmentation(free):
+    """Share of the free cores outside the largest free block"""
+    total_free = sum(free)
+    return 1 - max(free, default=0) / total_free if total_free else 0.0
+
+def plan_moves(nodes, pod_cores, block_cores, max_moves, max_blocks=None):
+    """Plan pod moves that open free blocks of block_cores on single nodes.
+
+    nodes maps node_id -> {cpu_cores, available_cores, pods} for the healthy
+    nodes, pod_cores maps pod_id -> cpu_cores. Each round drains the node
+    that needs the least CPU moved to reach the block size, placing the moved
+    pods best-fit on the remaining nodes. Nodes that receive pods are never
+    drained afterwards, so a plan never moves a pod twice. block_cores None
+    asks for whole empty nodes. Planning stops after max_blocks blocks.
+
+    A round is only taken if it leaves more empty nodes or lowers the
+    fragmentation; draining one node into another empty one would just
+    swap them, and the next run would swap them back. Ties go to the lowest
+    node id, so repeated runs over the same cluster plan the same moves.
+
+    Returns (moves, blocks) where moves are (pod_id, source, target, cpu_cores)
+    and blocks are the node ids whose free capacity the plan opens up.
+    """
+    free = {node_id: info["available_cores"] for node_id, info in nodes.items()}
+
+    def shape(state):
+        """(empty nodes, fragmentation) of a free-cores state"""
+        empty = sum(1 for node_id, f in state.items() if f >= nodes[node_id]["cpu_cores"])
+        return empty, fragmentation(list(state.values()))
+
+    moves = []
+    blocks = []
+    receivers = set()
+
+    while len(moves) < max_moves and (max_blocks is None or len(blocks) < max_blocks):
+        best = None
+        empty_now, fragmentation_now = shape(free)
+        for node_id, info in sorted(nodes.items()):
+            if node_id in receivers or node_id in blocks:
+                continue
+            goal = info["cpu_cores"] if block_cores is None else block_cores
+            needed = goal - free[node_id]
+            if goal > info["cpu_cores"] or needed <= 0:
+                continue
+
+            # Move the smallest pods first, they are the easiest to place elsewhere
+            selected = []
+            freed = 0
+            for cpu_cores, pod_id in sorted((pod_cores[p], p) for p in info["pods"] if p in pod_cores):
+                if freed >= needed:
+                    break
+                selected.append((cpu_cores, pod_id))
+                freed += cpu_cores
+            if freed < needed or len(selected) > max_moves - len(moves):
+                continue
+
+            trial = {n: f for n, f in free.items() if n != node_id and n not in blocks}
+            placements = []
+            for cpu_cores, pod_id in sorted(selected, reverse=True):
+                fits = [(f, n) for n, f in trial.items() if f >= cpu_cores]
+                if not fits:
+                    break
+                _, target = min(fits)
+                trial[target] -= cpu_cores
+                placements.append((pod_id, node_id, target, cpu_cores))
+            else:
+                after = dict(free)
+                after[node_id] += freed
+                for _, _, target, cpu_cores in placements:
+                    after[target] -= cpu_cores
+                empty, fragmented = shape(after)
+                if empty <= empty_now and fragmented >= fragmentation_now:
+                    continue  # no node emptied and no less fragmented
+                cost = (freed, len(placements))
+                if best is None or cost < best[0]:
+                    best = (cost, node_id, placements)
+
+        if best is None:
+            break
+
+        _, node_id, placements = best
+        for pod_id, source, target, cpu_cores in placements:
+            free[source] += cpu_cores
+            free[target] -= cpu_cores
+            receivers.add(target)
+        moves.extend(placements)
+        blocks.append(node_id)
+
+    return moves, blocks
+
+class Rebalancer:
+    """Background repacking of pods to undo capacity fragmentation.
+
+    Free cores scattered over many nodes cannot host a large pod. The
+    rebalancer measures how fragmented the free capacity is and, past a
+    threshold or when pending pods are stuck behind fragmentation, moves a
+    bounded number of pods to open up large free blocks or empty whole nodes.
+    Moves are rate limited and capped by a churn budget per time window.
+    """
+
+    def __init__(self, node_manager, pod_scheduler, interval=60, threshold=0.5,
+                 max_moves_per_run=10, churn_budget=50, churn_window=3600,
+                 move_interval=1.0, dry_run=True):
+        self.node_manager = node_manager
+        self.pod_scheduler = pod_scheduler
+        self.clock = node_manager.clock  # run intervals, move pacing and the churn window use the node clock
+        self.interval = interval  # seconds between background runs
+        self.threshold = threshold  # fragmentation that triggers repacking without pending demand
+        self.max_moves_per_run = max_moves_per_run
+        self.churn_budget = churn_budget  # moves allowed per churn_window seconds
+        self.churn_window = churn_window
+        self.move_interval = move_interval  # seconds between two applied moves
+        self.dry_run = dry_run
+        self.move_times = deque()  # when recent moves were applied, for the churn budget
+        self.stats = {"runs": 0, "moves_planned": 0, "moves_applied": 0, "moves_failed": 0, "blocks_opened": 0}
+        self.last_run = None
+        self.lock = Lock()
+        self.run_lock = Lock()  # one run at a time, background or on demand
+        self.running = False
+        self.rebalance_thread = None
+
+    def start_rebalancing(self):
+        """Start the background rebalancing thread"""
+        with self.lock:
+            if self.running:
+                return False
+
+            self.running = True
+            self.rebalance_thread = threading.Thread(target=self._rebalance_loop, daemon=True)
+            self.rebalance_thread.start()
+            return True
+
+    def stop_rebalancing(self):
+        """Stop the background rebalancing thread"""
+        with self.lock:
+            if not self.running:
+                return False
+
+            self.running = False
+        if self.rebalance_thread:
+            self.rebalance_thread.join(timeout=self.move_interval + 5)
+        return True
+
+    def _rebalance_loop(self):
+        while self.running:
+            self.clock.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Error in rebalancer: {e}")
+
+    def analyze(self, nodes=None):
+        """Measure how fragmented the free capacity of the healthy nodes is"""
+        if nodes is None:
+            nodes = self.node_manager.get_healthy_nodes()
+        free = [info["available_cores"] for info in nodes.values()]
+        total_free = sum(free)
+        largest_block = max(free, default=0)
+        demand = self.pod_scheduler.pending.demand()
+        # Pending pods that would fit in the free cores if they were on one node
+        stranded = {cpu: count for cpu, count in demand.items() if largest_block < cpu <= total_free}
+        return {
+            "healthy_nodes": len(nodes),
+            "empty_nodes": sum(1 for info in nodes.values() if not info["pods"]),
+            "total_free_cores": total_free,
+            "largest_free_block": largest_block,
+            "fragmentation": round(fragmentation(free), 3),
+            "stranded_pending": sum(stranded.values()),
+            "stranded_cores": max(stranded, default=None)
+        }
+
+    def _budget_left(self, now):
+        with self.lock:
+            while self.move_times and now - self.move_times[0] > self.churn_window:
+                self.move_times.popleft()
+            return max(0, self.churn_budget - len(self.move_times))
+
+    def run_once(self, dry_run=None):
+        """Plan, and unless dry-running apply, one round of pod moves"""
+        dry_run = self.dry_run if dry_run is None else dry_run
+        with self.run_lock:
+            nodes = self.node_manager.get_healthy_nodes()
+            analysis = self.analyze(nodes)
+
+            # Open a block for the largest stranded pending pod; otherwise only
+            # consolidate onto fewer nodes when fragmentation is high
+            if analysis["stranded_cores"]:
+                block_cores = analysis["stranded_cores"]
+            elif analysis["fragmentation"] >= self.threshold:
+                block_cores = None
+            else:
+                block_cores = 0
+
+            moves, blocks = [], []
+            budget = min(self.max_moves_per_run, self._budget_left(self.clock.time()))
+            max_blocks = analysis["stranded_pending"] if block_cores else None
+            if block_cores != 0 and budget:
+                pod_cores = {}
+                for info in nodes.values():
+                    for pod_id in info["pods"]:
+                        pod = self.pod_scheduler.get_pod(pod_id)
+                        if pod and pod["node_id"] is not None:
+                            pod_cores[pod_id] = pod["cpu_cores"]
+                moves, blocks = plan_moves(nodes, pod_cores, block_cores, budget, max_blocks)
+
+            applied = failed = 0
+            if not dry_run:
+                for i, (pod_id, source, target, _) in enumerate(moves):
+                    if i and self.move_interval:
+                        self.clock.sleep(self.move_interval)
+                    if self.pod_scheduler.move_pod(pod_id, target):
+                        applied += 1
+                        with self.lock:
+                            self.move_times.append(self.clock.time())
+                    else:
+                        # The cluster changed since the plan; the next run replans
+                        failed += 1
+                        logger.warning(f"Skipping planned move of pod {pod_id} from {source} to {target}")
+
+            result = {
+                "dry_run": dry_run,
+                "analysis": analysis,
+                "block_cores": block_cores,
+                "moves": [{"pod_id": pod_id, "from": source, "to": target, "cpu_cores": cpu_cores}
+                          for pod_id, source, target, cpu_cores in moves],
+                "blocks": blocks,
+                "applied": applied,
+                "failed": failed,
+                "timestamp": self.clock.time()
+            }
+            if moves and not dry_run:
+                logger.info(f"Rebalancer applied {applied}/{len(moves)} moves, opening blocks on {blocks}")
+                result["analysis_after"] = self.analyze()
+
+            with self.lock:
+                self.stats["runs"] += 1
+                self.stats["moves_planned"] += len(moves)
+                self.stats["moves_applied"] += applied
+                self.stats["moves_failed"] += failed
+                if not dry_run:
+                    self.stats["blocks_opened"] += len(blocks)
+                self.last_run = result
+            return result
+
+    def get_status(self):
+        """Settings, counters, remaining churn budget and the last run"""
+        budget_left = self._budget_left(self.clock.time())
+        with self.lock:
+            return {
+                "dry_run": self.dry_run,
+                "interval": self.interval,
+                "threshold": self.threshold,
+                "churn_budget": self.churn_budget,
+                "churn_window": self.churn_window,
+                "churn_budget_left": budget_left,
+                "stats": dict(self.stats),
+                "last_run": self.last_run
+            }
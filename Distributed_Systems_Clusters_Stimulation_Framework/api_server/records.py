@@ -0,0 +1,133 @@
+# api_server/records.py
+"""Compact node and pod records.
+
+A dict per record costs a hash table per node and pod, and at a million
+pods those tables dominate memory and garbage collection. Records are
+slotted objects instead. Ids and status values are interned, so every
+record shares one string object per value rather than holding its own copy
+of, say, a node id that came back from a scheduler worker process.
+
+Records still read like the dicts they replaced: record["node_id"],
+record.get("status", "running") and "app" in record all work. Optional
+fields holding None count as absent. Set fields are IdSets, read through the
+dict interface as lists. to_dict() builds the JSON view only when one is
+needed.
+"""
+import sys
+from operator import attrgetter
+
+def intern_id(value):
+    """The shared copy of an id or status string"""
+    return sys.intern(value) if type(value) is str else value
+
+class IdSet(dict):
+    """Insertion-ordered set of ids, a dict whose values are all None"""
+    __slots__ = ()
+
+    def add(self, key):
+        self[key] = None
+
+    def discard(self, key):
+        self.pop(key, None)
+
+class Record:
+    __slots__ = ()
+    FIELDS = ()
+    OPTIONAL = frozenset()  # fields that read as absent while they hold None
+    SETS = frozenset()  # IdSet fields, which read as lists
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._values = attrgetter(*cls.FIELDS)
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            setattr(self, field, None)
+        self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a replicated or serialized dict"""
+        record = cls()
+        record.update(data)
+        return record
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None and key in self.OPTIONAL:
+            raise KeyError(key)
+        return list(value) if key in self.SETS else value
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        if key in self.SETS:
+            setattr(self, key, IdSet.fromkeys(value))
+        else:
+            setattr(self, key, intern_id(value))
+
+    def __contains__(self, key):
+        return key in self.FIELDS and (key not in self.OPTIONAL or getattr(self, key) is not None)
+
+    def get(self, key, default=None):
+        if key not in self.FIELDS:
+            return default
+        if getattr(self, key) is None and key in self.OPTIONAL:
+            return default
+        return self[key]
+
+    def pop(self, key, default=None):
+        """Clear an optional field, returning its old value"""
+        if key not in self.OPTIONAL:
+            raise KeyError(key)
+        value = getattr(self, key)
+        setattr(self, key, None)
+        return default if value is None else value
+
+    def update(self, fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    def keys(self):
+        optional = self.OPTIONAL
+        return [field for field, value in zip(self.FIELDS, self._values(self))
+                if value is not None or field not in optional]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        optional, sets = self.OPTIONAL, self.SETS
+        return [(field, list(value) if field in sets else value)
+                for field, value in zip(self.FIELDS, self._values(self))
+                if value is not None or field not in optional]
+
+    def copy(self):
+        """A shallow copy, sharing sets, lists and dicts with this record"""
+        record = self.__class__.__new__(self.__class__)
+        for field, value in zip(self.FIELDS, self._values(self)):
+            setattr(record, field, value)
+        return record
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()})"
+
+class NodeRecord(Record):
+    """pods is an IdSet, so adding and removing a pod costs O(1)"""
+    __slots__ = ("cpu_cores", "available_cores", "status", "last_heartbeat", "pods", "labels")
+    FIELDS = __slots__
+    SETS = frozenset(("pods",))
+
+class PodRecord(Record):
+    """node_id is None while the pod is pending; a pod without a status is running"""
+    __slots__ = ("node_id", "cpu_cores", "priority", "status", "app", "constraints", "gang_id")
+    FIELDS = __slots__
+    OPTIONAL = frozenset(("status", "app", "constraints", "gang_id"))
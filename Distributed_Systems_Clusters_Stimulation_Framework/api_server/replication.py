@@ -0,0 +1,223 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from operator import itemgetter
+from threading import Condition
+import logging
+
+import requests
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MutationLog:
+    """Bounded, ordered log of state changes that followers tail.
+
+    Entries are (seq, kind, key, record) where record is the new value of
+    the changed key (None when it was deleted), so replaying an entry twice
+    is harmless.
+
+    Heartbeats and pod metrics change on every report, so they are not
+    appended but put: only the latest value per key is kept, under a fresh
+    seq, and readers get it merged into the log in seq order. A busy fleet
+    then costs the log one slot per node and pod rather than one entry per
+    report, and never pushes structural changes out of the bounded log.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.entries = deque(maxlen=max_entries)
+        self.latest = OrderedDict()  # (kind, key) -> (seq, record), least recently put first
+        self.seq = 0
+        self.evicted_seq = 0  # seq of the newest entry dropped from the full log
+        self.cond = Condition()
+
+    def _append(self, kind, key, record):
+        # Called with self.cond held. A logged change supersedes a put value of the same key
+        self.seq += 1
+        if len(self.entries) == self.entries.maxlen:
+            self.evicted_seq = self.entries[0][0]
+        self.entries.append((self.seq, kind, key, record))
+        self.latest.pop((kind, key), None)
+
+    def append(self, kind, key, record):
+        """Append a change, waking up followers waiting for new entries"""
+        with self.cond:
+            self._append(kind, key, record)
+            self.cond.notify_all()
+
+    def extend(self, kind, changes):
+        """Append many (key, record) changes of one kind, waking up followers once"""
+        with self.cond:
+            for key, record in changes:
+                self._append(kind, key, record)
+            self.cond.notify_all()
+
+    def put(self, kind, key, record):
+        """Record the latest value of a key, replacing an earlier put"""
+        self.put_many(kind, ((key, record),))
+
+    def put_many(self, kind, changes):
+        """Record the latest values of many (key, record) pairs, replacing earlier puts"""
+        with self.cond:
+            latest = self.latest
+            for key, record in changes:
+                self.seq += 1
+                latest[(kind, key)] = (self.seq, record)
+                latest.move_to_end((kind, key))
+            self.cond.notify_all()
+
+    def discard(self, kind, key):
+        """Drop the put value of a key whose owner has been deleted"""
+        with self.cond:
+            self.latest.pop((kind, key), None)
+
+    def last_seq(self):
+        with self.cond:
+            return self.seq
+
+    def read_since(self, seq, limit=5000, timeout=0):
+        """Get entries after seq, waiting up to timeout seconds for new ones.
+
+        Returns (entries, last_seq); entries is None when seq has already
+        been evicted from the log and the follower must reload a snapshot.
+        """
+        with self.cond:
+            if self.seq <= seq and timeout:
+                self.cond.wait_for(lambda: self.seq > seq, timeout)
+            if self.seq <= seq:
+                return [], self.seq
+            if seq < self.evicted_seq:
+                return None, self.seq
+
+            logged = []
+            for entry in reversed(self.entries):
+                if entry[0] <= seq:
+                    break
+                logged.append(entry)
+            logged.reverse()
+            put = []
+            for (kind, key), (entry_seq, record) in reversed(self.latest.items()):
+                if entry_seq <= seq:
+                    break
+                put.append((entry_seq, kind, key, record))
+            put.reverse()
+            merged = heapq.merge(logged, put, key=itemgetter(0))
+            return list(itertools.islice(merged, limit)), self.seq
+
+class LogFollower:
+    """Keeps local NodeManager/PodScheduler/ResourceMonitor copies in sync with a leader"""
+
+    def __init__(self, leader_url, node_manager, pod_scheduler, resource_monitor, poll_timeout=5):
+        self.leader_url = leader_url
+        self.node_manager = node_manager
+        self.pod_scheduler = pod_scheduler
+        self.resource_monitor = resource_monitor
+        self.poll_timeout = poll_timeout  # long-poll wait on the leader, in seconds
+        self.applied_seq = 0
+        self.leader_seq = 0
+        self.last_caught_up = 0  # time we last knew we had every leader entry
+        self.waiting_since = 0  # start of an in-flight long poll issued while caught up
+        self.needs_snapshot = True
+        self.lock = threading.Lock()
+        self.running = False
+        self.follow_thread = None
+        self.session = requests.Session()
+
+    def start_following(self):
+        """Start tailing the leader's mutation log"""
+        with self.lock:
+            if self.running:
+                return False
+
+            self.running = True
+            self.follow_thread = threading.Thread(target=self._follow_loop, daemon=True)
+            self.follow_thread.start()
+            logger.info(f"Following leader {self.leader_url}")
+            return True
+
+    def stop_following(self):
+        """Stop tailing the leader"""
+        with self.lock:
+            if not self.running:
+                return False
+
+            self.running = False
+            if self.follow_thread:
+                self.follow_thread.join(timeout=self.poll_timeout + 5)
+            return True
+
+    def staleness(self):
+        """Upper bound, in seconds, on how far this copy lags behind the leader"""
+        if self.needs_snapshot or not self.last_caught_up:
+            return float('inf')
+        now = time.time()
+        # While a long poll issued in a caught-up state is pending, the leader
+        # answers it as soon as anything changes, so the copy is current
+        if self.waiting_since and now - self.waiting_since < self.poll_timeout + 1:
+            return 0.0
+        return now - self.last_caught_up
+
+    def _follow_loop(self):
+        while self.running:
+            try:
+                if self.needs_snapshot:
+                    self._load_snapshot()
+                else:
+                    self._poll_log()
+            except Exception as e:
+                logger.error(f"Error following leader {self.leader_url}: {e}")
+                time.sleep(1)
+
+    def _load_snapshot(self):
+        response = self.session.get(f"{self.leader_url}/api/replication/snapshot", timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        self.node_manager.load_replica(data["nodes"])
+        self.pod_scheduler.load_replica(data["pods"])
+        self.resource_monitor.load_replica(data["metrics"])
+        self.applied_seq = data["seq"]
+        self.leader_seq = data["seq"]
+        self.needs_snapshot = False
+        self.last_caught_up = time.time()
+        logger.info(f"Loaded snapshot at seq {self.applied_seq} from {self.leader_url}")
+
+    def _poll_log(self):
+        if self.applied_seq >= self.leader_seq:
+            self.waiting_since = time.time()
+        try:
+            response = self.session.get(
+                f"{self.leader_url}/api/replication/log",
+                params={"since": self.applied_seq, "timeout": self.poll_timeout},
+                timeout=self.poll_timeout + 10
+            )
+        finally:
+            self.waiting_since = 0
+        if response.status_code == 410:
+            logger.warning(f"Fell behind the leader's log at seq {self.applied_seq}, reloading snapshot")
+            self.needs_snapshot = True
+            return
+        response.raise_for_status()
+        data = response.json()
+
+        for seq, kind, key, record in data["entries"]:
+            self.apply(kind, key, record)
+            self.applied_seq = seq
+        self.leader_seq = data["seq"]
+        if self.applied_seq >= self.leader_seq:
+            self.last_caught_up = time.time()
+
+    def apply(self, kind, key, record):
+        """Apply one log entry to the local copy"""
+        if kind == "node":
+            self.node_manager.apply_replicated(key, record)
+        elif kind == "node_pod":
+            self.node_manager.apply_replicated_pod(key, record)
+        elif kind == "heartbeat":
+            self.node_manager.apply_replicated_heartbeat(key, record)
+        elif kind == "pod":
+            self.pod_scheduler.apply_replicated(key, record)
+        elif kind == "metrics":
+            self.resource_monitor.apply_replicated(key, record)
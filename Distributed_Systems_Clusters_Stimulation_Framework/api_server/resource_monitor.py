@@ -1,20 +1,44 @@
-import time
 import threading
 from threading import Lock
 import logging
 
+from api_server.pagination import (
+    SortedKeys, index_add, index_discard, intersect, page_keys, project
+)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class ResourceMonitor:
-    def __init__(self, node_manager):
+    def __init__(self, node_manager, clock=None):
         self.node_manager = node_manager
+        self.clock = clock or node_manager.clock
+        self.cleanup_interval = 60  # seconds
+        self.stale_after = 300  # seconds without an update before a pod's metrics are dropped
         self.lock = Lock()
-        self.pod_metrics = {}  # pod_id -> {cpu_usage, memory_usage, timestamp}
+        self.pod_metrics = {}  # pod_id -> {cpu_usage, memory_usage, io_rate, node_id, timestamp}
+        self.pod_ids = SortedKeys()  # sorted pod ids with metrics, for cursor pagination
+        self.metrics_by_node = {}  # node_id -> set(pod_id)
+        self.mutation_log = None  # replication log tailed by read followers
         self.running = False
         self.monitor_thread = None
     
+    def set_mutation_log(self, mutation_log):
+        """Publish every metrics change to a replication log"""
+        self.mutation_log = mutation_log
+    
+    def _publish(self, pod_id):
+        # Called with self.lock held so log order matches mutation order. Metrics
+        # change on every heartbeat, so the log keeps only the latest per pod; records
+        # are replaced, never modified, so the log can share them
+        if self.mutation_log is not None:
+            metrics = self.pod_metrics.get(pod_id)
+            if metrics is None:
+                self.mutation_log.append("metrics", pod_id, None)
+            else:
+                self.mutation_log.put("metrics", pod_id, metrics)
+    
     def start_monitoring(self):
         """Start the resource monitoring thread"""
         with self.lock:
@@ -48,16 +72,16 @@ class ResourceMonitor:
                 logger.error(f"Error in resource monitor: {e}")
             
             # Sleep for a bit
-            time.sleep(60)  # Clean up once a minute
+            self.clock.sleep(self.cleanup_interval)
     
     def _cleanup_metrics(self):
         """Clean up metrics for pods that no longer exist"""
         with self.lock:
             # Get current time
-            current_time = time.time()
+            current_time = self.clock.time()
             
-            # Remove metrics older than 5 minutes
-            stale_time = current_time - 300  # 5 minutes
+            # Remove metrics not updated within the stale window
+            stale_time = current_time - self.stale_after
             stale_pods = []
             
             for pod_id in list(self.pod_metrics.keys()):
@@ -66,22 +90,51 @@ class ResourceMonitor:
                     
             for pod_id in stale_pods:
                 logger.info(f"Removing stale metrics for pod {pod_id}")
+                index_discard(self.metrics_by_node, self.pod_metrics[pod_id]["node_id"], pod_id)
+                self.pod_ids.discard(pod_id)
                 del self.pod_metrics[pod_id]
+                self._publish(pod_id)
     
     def update_pod_metrics(self, node_id, pod_metrics):
         """Update metrics for pods on a node"""
         with self.lock:
             # Update timestamp for each pod
-            current_time = time.time()
+            current_time = self.clock.time()
             
             for pod_id, metrics in pod_metrics.items():
                 logger.info(f"Updating metrics for pod {pod_id} on node {node_id}: {metrics}")
-                self.pod_metrics[pod_id] = {
-                    "cpu_usage": metrics.get("cpu_usage", 0),
-                    "memory_usage": metrics.get("memory_usage", 0),
-                    "node_id": node_id,
-                    "timestamp": current_time
-                }
+                self._store_metrics(node_id, pod_id, metrics, current_time)
+    
+    def update_nodes_pod_metrics(self, node_pod_metrics):
+        """Update metrics reported by many nodes, {node_id: {pod_id: metrics}}, under one lock"""
+        with self.lock:
+            current_time = self.clock.time()
+            changed = []
+            for node_id, pod_metrics in node_pod_metrics.items():
+                for pod_id, metrics in pod_metrics.items():
+                    self._store_metrics(node_id, pod_id, metrics, current_time, publish=False)
+                    changed.append(pod_id)
+            if self.mutation_log is not None:
+                self.mutation_log.put_many("metrics", [(pod_id, self.pod_metrics[pod_id]) for pod_id in changed])
+    
+    def _store_metrics(self, node_id, pod_id, metrics, current_time, publish=True):
+        # Called with self.lock held
+        previous = self.pod_metrics.get(pod_id)
+        if previous is None:
+            self.pod_ids.add(pod_id)
+            index_add(self.metrics_by_node, node_id, pod_id)
+        elif previous["node_id"] != node_id:
+            index_discard(self.metrics_by_node, previous["node_id"], pod_id)
+            index_add(self.metrics_by_node, node_id, pod_id)
+        self.pod_metrics[pod_id] = {
+            "cpu_usage": metrics.get("cpu_usage", 0),
+            "memory_usage": metrics.get("memory_usage", 0),
+            "io_rate": metrics.get("io_rate", 0),
+            "node_id": node_id,
+            "timestamp": current_time
+        }
+        if publish:
+            self._publish(pod_id)
     
     def get_pod_metrics(self, pod_id):
         """Get metrics for a specific pod"""
@@ -94,3 +147,60 @@ class ResourceMonitor:
             logger.info(f"Retrieved all pod metrics: {self.pod_metrics}")
             return {pid: {k: v for k, v in info.items() if k != 'timestamp'} 
                    for pid, info in self.pod_metrics.items()}
+    
+    def get_node_usage(self):
+        """Sum the measured usage of each node's pods"""
+        with self.lock:
+            usage = {}
+            for node_id, pod_ids in self.metrics_by_node.items():
+                usage[node_id] = {
+                    "cpu_usage": sum(self.pod_metrics[pid]["cpu_usage"] for pid in pod_ids),
+                    "memory_usage": sum(self.pod_metrics[pid]["memory_usage"] for pid in pod_ids),
+                    "io_rate": sum(self.pod_metrics[pid].get("io_rate", 0) for pid in pod_ids),
+                    "pods": len(pod_ids)
+                }
+            return usage
+    
+    def list_pod_metrics(self, query):
+        """Get a page of pod metrics matching the filters of a parsed list query"""
+        with self.lock:
+            filters = []
+            if query["ids"]:
+                filters.append({pid for pid in query["ids"] if pid in self.pod_metrics})
+            if query["node_id"]:
+                filters.append(self.metrics_by_node.get(query["node_id"], set()))
+            
+            keys, next_cursor = page_keys(self.pod_ids, intersect(filters),
+                                          query["cursor"], query["limit"])
+            fields = query["fields"] or ["cpu_usage", "memory_usage", "io_rate", "node_id"]
+            return {pid: project(self.pod_metrics[pid], fields) for pid in keys}, next_cursor
+    
+    def snapshot(self):
+        """Copy every metrics entry, for replication snapshots"""
+        with self.lock:
+            return {pid: dict(info) for pid, info in self.pod_metrics.items()}
+    
+    def load_replica(self, pod_metrics):
+        """Replace all metrics with a replicated snapshot"""
+        with self.lock:
+            self.pod_metrics = {}
+            self.pod_ids = SortedKeys()
+            self.metrics_by_node = {}
+            for pod_id, record in pod_metrics.items():
+                self.pod_metrics[pod_id] = record
+                self.pod_ids.add(pod_id)
+                index_add(self.metrics_by_node, record["node_id"], pod_id)
+    
+    def apply_replicated(self, pod_id, record):
+        """Apply a replicated metrics change (record is None for removed metrics)"""
+        with self.lock:
+            previous = self.pod_metrics.pop(pod_id, None)
+            if previous is not None:
+                index_discard(self.metrics_by_node, previous["node_id"], pod_id)
+                if record is None:
+                    self.pod_ids.discard(pod_id)
+            elif record is not None:
+                self.pod_ids.add(pod_id)
+            if record is not None:
+                self.pod_metrics[pod_id] = record
+                index_add(self.metrics_by_node, record["node_id"], pod_id)
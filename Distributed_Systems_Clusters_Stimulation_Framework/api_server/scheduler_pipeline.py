@@ -0,0 +1,224 @@
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock
+import logging
+
+from api_server.equivalence_cache import EquivalenceCache
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def score_requests(snapshot, requests, algorithm, top_k, offset=0):
+    """Rank candidate nodes for each (pod_id, cpu_cores) request.
+
+    Runs in a scheduler worker process against a capacity snapshot of
+    (node_id, available_cores) pairs. Requests in one chunk are placed
+    against a local equivalence cache of the snapshot so they spread out
+    instead of all proposing the same node, and pods of the same size share
+    its feasible-node lists instead of scanning every node. Each chunk
+    breaks ties starting at its own offset into the node list to keep
+    parallel chunks from colliding.
+    """
+    cache = EquivalenceCache(snapshot[offset:] + snapshot[:offset])
+    proposals = []
+    for pod_id, cpu_cores in requests:
+        ranked = cache.candidates(cpu_cores, algorithm, top_k)
+        if ranked:
+            cache.update(ranked[0], cache.get_available(ranked[0]) - cpu_cores)
+        proposals.append(ranked)
+    return proposals
+
+def score_chunk(snapshot_bytes, requests, algorithm, top_k, offset):
+    """score_requests against a snapshot the dispatcher pickled once for all chunks"""
+    return score_requests(pickle.loads(snapshot_bytes), requests, algorithm, top_k, offset)
+
+class SchedulingPipeline:
+    """Queue of pod launches placed by parallel scheduler workers.
+
+    A dispatcher thread drains queued launches in batches, takes one
+    capacity snapshot per batch and lets a process pool rank candidate
+    nodes for chunks of the batch in parallel. Proposals are committed
+    optimistically through PodScheduler.commit_placement; launches whose
+    candidates were all taken in the meantime are retried on a fresh
+    snapshot.
+    """
+
+    def __init__(self, pod_scheduler, node_manager, workers=None, batch_size=256, top_k=3, max_attempts=3):
+        self.pod_scheduler = pod_scheduler
+        self.node_manager = node_manager
+        self.workers = (os.cpu_count() or 1) if workers is None else workers  # 0 scores in the dispatcher thread
+        self.batch_size = batch_size
+        self.top_k = top_k  # candidates proposed per pod, tried in order at commit
+        self.max_attempts = max_attempts
+        self.queue = queue.Queue()
+        self.lock = Lock()
+        self.running = False
+        self.dispatch_thread = None
+        self.pool = None
+        self.committing = None  # future of the launch being committed right now
+        self.stats = {"queued": 0, "scheduled": 0, "failed": 0, "conflicts": 0, "pending": 0, "batches": 0}
+
+    def start(self):
+        """Start the worker pool and the dispatcher thread"""
+        with self.lock:
+            if self.running:
+                return False
+
+            if self.workers > 0:
+                # Fork the workers up front (the first task launches the whole
+                # pool), before the server starts its other threads
+                self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                mp_context=multiprocessing.get_context("fork"))
+                self.pool.submit(os.getpid).result()
+
+            self.running = True
+            self.dispatch_thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self.dispatch_thread.start()
+            logger.info(f"Scheduling pipeline started with {self.workers} worker processes")
+            return True
+
+    def stop(self):
+        """Stop the dispatcher thread and the worker pool, failing launches still queued"""
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+            dispatch_thread, self.dispatch_thread = self.dispatch_thread, None
+            pool, self.pool = self.pool, None
+
+        # The dispatcher takes the lock to commit, so join it without holding the lock
+        if dispatch_thread:
+            dispatch_thread.join(timeout=5)
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        while True:
+            try:
+                future = self.queue.get_nowait()[4]
+            except queue.Empty:
+                break
+            if not future.done():
+                future.set_result({"success": False, "message": "Scheduling pipeline stopped"})
+        return True
+
+    def submit(self, pod_id, cpu_cores, priority=0, spec=None):
+        """Queue a pod launch, returning a Future with the commit_placement style result"""
+        future = Future()
+        self.queue.put((pod_id, cpu_cores, priority, spec, future, 1))
+        with self.lock:
+            self.stats["queued"] += 1
+        return future
+
+    def withdraw(self, future):
+        """Withdraw a queued launch so it is never placed.
+
+        Returns False if the launch is being committed or already finished;
+        its result then follows shortly.
+        """
+        with self.lock:
+            if future is self.committing:
+                return False
+            return future.cancel()
+
+    def get_stats(self):
+        """Get pipeline counters and current queue depth"""
+        with self.lock:
+            return dict(self.stats, queue_depth=self.queue.qsize(), workers=self.workers)
+
+    def _next_batch(self):
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        # Higher priorities get the first pick of the snapshot
+        batch.sort(key=lambda item: -item[2])
+        return batch
+
+    def _score(self, snapshot, batch):
+        requests = [(pod_id, cpu_cores) for pod_id, cpu_cores, _, _, _, _ in batch]
+        algorithm = self.pod_scheduler.scheduling_algorithm
+        if not self.pool or len(requests) == 1:
+            return score_requests(snapshot, requests, algorithm, self.top_k)
+
+        chunk_size = -(-len(requests) // self.workers)
+        chunks = [requests[i:i + chunk_size] for i in range(0, len(requests), chunk_size)]
+        offsets = [i * len(snapshot) // len(chunks) for i in range(len(chunks))]
+        # Pickled once here; each chunk then only copies the bytes
+        snapshot_bytes = pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL)
+        try:
+            results = self.pool.map(score_chunk, [snapshot_bytes] * len(chunks), chunks,
+                                    [algorithm] * len(chunks), [self.top_k] * len(chunks), offsets)
+            return [proposal for chunk in results for proposal in chunk]
+        except BrokenProcessPool:
+            logger.error("Scheduler worker pool broke, scoring in the dispatcher thread")
+            self.pool = None
+            return score_requests(snapshot, requests, algorithm, self.top_k)
+
+    def _dispatch_loop(self):
+        while self.running:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            requeued = set()  # futures already back in the queue for another attempt
+            try:
+                snapshot = self.node_manager.get_capacity_snapshot()
+                proposals = self._score(snapshot, batch)
+                self._commit(batch, proposals, requeued)
+            except Exception as e:
+                logger.error(f"Error in scheduling pipeline: {e}")
+                with self.lock:
+                    self.committing = None
+                for _, _, _, _, future, _ in batch:
+                    if future not in requeued and not future.done():
+                        future.set_result({"success": False, "message": str(e)})
+
+    def _commit(self, batch, proposals, requeued):
+        scheduled = failed = conflicts = pending = 0
+        for (pod_id, cpu_cores, priority, spec, future, attempt), candidates in zip(batch, proposals):
+            with self.lock:
+                if future.cancelled():
+                    continue  # withdrawn by a launch request that timed out
+                self.committing = future
+            # Pods that fit nowhere, or keep losing races, preempt lower
+            # priorities or wait in the pending queue
+            queue_if_unschedulable = not candidates or attempt >= self.max_attempts
+            result = self.pod_scheduler.commit_placement(pod_id, cpu_cores, candidates,
+                                                         queue_if_unschedulable=queue_if_unschedulable,
+                                                         priority=priority, spec=spec)
+            if result.get("conflict"):
+                conflicts += 1
+                if attempt < self.max_attempts:
+                    # Candidates were taken since the snapshot, retry against a fresh one
+                    with self.lock:
+                        self.committing = None
+                    requeued.add(future)
+                    self.queue.put((pod_id, cpu_cores, priority, spec, future, attempt + 1))
+                    continue
+            if result["success"]:
+                scheduled += 1
+            elif result.get("pending"):
+                pending += 1
+            else:
+                failed += 1
+                logger.warning(f"Failed to schedule pod {pod_id}: {result['message']}")
+            result.pop("conflict", None)
+            future.set_result(result)
+            with self.lock:
+                self.committing = None
+
+        with self.lock:
+            self.stats["batches"] += 1
+            self.stats["scheduled"] += scheduled
+            self.stats["failed"] += failed
+            self.stats["conflicts"] += conflicts
+            self.stats["pending"] += pending
@@ -0,0 +1,396 @@
+# api_server/shard_router.py
+"""Thin router in front of several API server shards.
+
+Each shard is a regular api_server.app process owning a consistent-hash
+partition of the nodes. Node-scoped requests are forwarded to the owning
+shard, list requests are fanned out and merged, and pod launches are
+placed on a shard after comparing the shards' capacity summaries.
+
+Run with local shard processes:
+    python -m api_server.shard_router --shards 4
+or in front of already running shards:
+    python -m api_server.shard_router --shard-urls http://host:5101,http://host:5102
+"""
+import argparse
+import atexit
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import requests
+from flask import Flask, request, jsonify
+
+from api_server.hash_ring import HashRing
+from api_server.pagination import encode_cursor, parse_list_query
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__)
+
+ring = HashRing([url for url in os.getenv("SHARD_URLS", "").split(",") if url])
+executor = ThreadPoolExecutor(max_workers=32)
+_local = threading.local()
+REQUEST_TIMEOUT = 10  # seconds
+
+def _session():
+    """Per-thread HTTP session so connections to the shards are reused"""
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+def _call(shard, method, path, **kwargs):
+    return _session().request(method, f"{shard}{path}", timeout=REQUEST_TIMEOUT, **kwargs)
+
+def _relay(response):
+    """Turn a shard response into a Flask response"""
+    return response.content, response.status_code, {"Content-Type": "application/json"}
+
+def _fan_out(method, path, **kwargs):
+    """Send the same request to every shard, returning (shard, response or None)"""
+    shards = ring.get_shards()
+    futures = [executor.submit(_call, shard, method, path, **kwargs) for shard in shards]
+    results = []
+    for shard, future in zip(shards, futures):
+        try:
+            results.append((shard, future.result()))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Shard {shard} unreachable: {e}")
+            results.append((shard, None))
+    return results
+
+def _forward_to_owner(node_id, method, path, **kwargs):
+    shard = ring.get_shard(node_id)
+    if shard is None:
+        return jsonify({"error": "No shards configured"}), 503
+    try:
+        return _relay(_call(shard, method, path, **kwargs))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to forward {path} for node {node_id} to {shard}: {e}")
+        return jsonify({"error": f"Shard for node {node_id} unavailable"}), 502
+
+def _merged_list(path, key):
+    """Fan a list request out to all shards and merge the pages"""
+    try:
+        query = parse_list_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Node-scoped filters only need the owning shard
+    if query["node_id"]:
+        return _forward_to_owner(query["node_id"], "GET", path, params=request.args)
+
+    merged = {}
+    more = False
+    for shard, response in _fan_out("GET", path, params=request.args):
+        if response is None or response.status_code != 200:
+            continue
+        data = response.json()
+        merged.update(data.get(key, {}))
+        more = more or bool(data.get("next_cursor"))
+
+    # Cursors are the last key of a page, so every shard resumes from the
+    # same point and the first `limit` merged keys form the global page
+    next_cursor = None
+    limit = query["limit"]
+    if limit is not None:
+        keys = sorted(merged)
+        if len(keys) > limit:
+            keys = keys[:limit]
+            more = True
+        merged = {k: merged[k] for k in keys}
+        if more and keys:
+            next_cursor = encode_cursor(keys[-1])
+    return jsonify({key: merged, "next_cursor": next_cursor})
+
+@app.route('/')
+def home():
+    return jsonify({"message": "Distributed Cluster shard router is running",
+                    "shards": ring.get_shards()})
+
+@app.route('/api/shards', methods=['GET'])
+def get_shards():
+    """Capacity summary of every shard"""
+    summaries = {}
+    for shard, response in _fan_out("GET", "/api/shard/capacity"):
+        summaries[shard] = response.json() if response is not None and response.status_code == 200 else None
+    return jsonify({"shards": summaries})
+
+@app.route('/api/nodes', methods=['GET'])
+def get_nodes():
+    """List nodes across all shards"""
+    return _merged_list("/api/nodes", "nodes")
+
+@app.route('/api/pods', methods=['GET'])
+def get_pods():
+    """List pods across all shards"""
+    return _merged_list("/api/pods", "pods")
+
+@app.route('/api/pods/metrics', methods=['GET'])
+def get_pod_metrics():
+    """List pod metrics across all shards"""
+    return _merged_list("/api/pods/metrics", "metrics")
+
+@app.route('/api/nodes/add', methods=['POST'])
+def add_node():
+    """Pick the node ID here so the request goes to the shard that will own it"""
+    data = request.get_json() or {}
+    data["node_id"] = data.get("node_id") or f"node-{str(uuid.uuid4())[:8]}"
+    return _forward_to_owner(data["node_id"], "POST", "/api/nodes/add", json=data)
+
+@app.route('/api/nodes/register', methods=['POST'])
+def register_node():
+    """Register a node with its owning shard and tell it where that shard is"""
+    data = request.get_json() or {}
+    node_id = data.get("node_id")
+    if not node_id:
+        return jsonify({"error": "Missing node_id or cpu_cores"}), 400
+
+    shard = ring.get_shard(node_id)
+    if shard is None:
+        return jsonify({"error": "No shards configured"}), 503
+    try:
+        response = _call(shard, "POST", "/api/nodes/register", json=data)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to register node {node_id} with {shard}: {e}")
+        return jsonify({"error": f"Shard for node {node_id} unavailable"}), 502
+
+    body = response.json()
+    if response.status_code == 200:
+        # Nodes send heartbeats straight to their shard, bypassing the router
+        body["shard_url"] = shard
+    return jsonify(body), response.status_code
+
+@app.route('/api/nodes/register/bulk', methods=['POST'])
+def register_nodes():
+    """Split a bulk registration by owning shard and send each part in parallel.
+
+    Each shard admits its part whole or not at all, so a failed shard leaves
+    the other shards' nodes registered; the response says which is which.
+    """
+    data = request.get_json() or {}
+    entries = data.get("nodes")
+    if not isinstance(entries, list) or not entries:
+        return jsonify({"error": "nodes must be a non-empty list"}), 400
+    if not ring.get_shards():
+        return jsonify({"error": "No shards configured"}), 503
+
+    parts = {}
+    for entry in entries:
+        node_id = entry.get("node_id") if isinstance(entry, dict) else None
+        if not node_id:
+            return jsonify({"error": "Missing node_id or cpu_cores"}), 400
+        parts.setdefault(ring.get_shard(node_id), []).append(entry)
+
+    futures = {shard: executor.submit(_call, shard, "POST", "/api/nodes/register/bulk", json={"nodes": part})
+               for shard, part in parts.items()}
+    registered, shard_urls, errors = [], {}, {}
+    for shard, future in futures.items():
+        try:
+            response = future.result()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Failed to register {len(parts[shard])} nodes with {shard}: {e}")
+            errors[shard] = "Shard unavailable"
+            continue
+        body = response.json()
+        if response.status_code != 200:
+            errors[shard] = body
+            continue
+        registered.extend(body["registered"])
+        shard_urls.update((node_id, shard) for node_id in body["registered"])
+
+    body = {"registered": registered, "shard_urls": shard_urls}
+    if errors:
+        body["error"] = "Some shards did not register their nodes"
+        body["errors"] = errors
+        return jsonify(body), 502
+    body["message"] = f"Registered {len(registered)} nodes"
+    return jsonify(body), 200
+
+@app.route('/api/nodes/heartbeat', methods=['POST'])
+def receive_heartbeat():
+    """Fallback path for nodes that heartbeat through the router"""
+    data = request.get_json() or {}
+    if not data.get("node_id"):
+        return jsonify({"error": "Missing node_id"}), 400
+    return _forward_to_owner(data["node_id"], "POST", "/api/nodes/heartbeat", json=data)
+
+@app.route('/api/gossip/join', methods=['POST'])
+def gossip_join():
+    """A node gossips with the other nodes of its own shard"""
+    data = request.get_json() or {}
+    if not data.get("node_id"):
+        return jsonify({"error": "Missing node_id or port"}), 400
+    return _forward_to_owner(data["node_id"], "POST", "/api/gossip/join", json=data)
+
+@app.route('/api/gossip/report', methods=['POST'])
+def gossip_report():
+    data = request.get_json() or {}
+    if not data.get("node_id"):
+        return jsonify({"error": "Expected reporter, node_id and state dead"}), 400
+    return _forward_to_owner(data["node_id"], "POST", "/api/gossip/report", json=data)
+
+@app.route('/api/metrics/history', methods=['GET'])
+def get_metrics_history():
+    """A node's history lives on its shard; the cluster series comes back per shard"""
+    series = request.args.get("series", "cluster")
+    if series != "cluster":
+        return _forward_to_owner(series, "GET", "/api/metrics/history", params=request.args)
+    shards = {}
+    for shard, response in _fan_out("GET", "/api/metrics/history", params=request.args):
+        shards[shard] = response.json() if response is not None and response.status_code == 200 else None
+    return jsonify({"series": series, "shards": shards})
+
+@app.route('/api/nodes/remove', methods=['POST'])
+def remove_node():
+    data = request.get_json() or {}
+    if not data.get("node_id"):
+        return jsonify({"error": "Missing node_id"}), 400
+    return _forward_to_owner(data["node_id"], "POST", "/api/nodes/remove", json=data)
+
+@app.route('/api/pods/launch', methods=['POST'])
+def launch_pod():
+    """Place a pod on a shard that has a node large enough for it"""
+    data = request.get_json() or {}
+    try:
+        cpu_req = int(data.get("cpu_cores"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Missing CPU requirement"}), 400
+
+    candidates = []
+    for shard, response in _fan_out("GET", "/api/shard/capacity"):
+        if response is None or response.status_code != 200:
+            continue
+        summary = response.json()
+        fits = summary["max_available_cores"] >= cpu_req
+        candidates.append((fits, summary["available_cores"], shard))
+
+    # Prefer shards with a node large enough and the most free capacity, fall
+    # back to the next one if the summary went stale before the launch
+    # committed. If no shard fits the pod it is left pending on the first one.
+    last_error = ({"error": "No node with sufficient resources"}, 400)
+    for _, _, shard in sorted(candidates, reverse=True):
+        try:
+            response = _call(shard, "POST", "/api/pods/launch", json=data)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Shard {shard} unreachable during pod launch: {e}")
+            continue
+        if response.status_code in (201, 202):
+            return _relay(response)
+        if response.status_code == 429:
+            # Keep the shard's Retry-After if every shard is backed up
+            last_error = (response.json(), response.status_code,
+                          {"Retry-After": response.headers.get("Retry-After", "5")})
+            continue
+        last_error = (response.json(), response.status_code)
+    return (jsonify(last_error[0]),) + last_error[1:]
+
+@app.route('/api/gangs/launch', methods=['POST'])
+def launch_gang():
+    """A gang is placed whole on one shard, try the shards with the most free capacity first"""
+    data = dict(request.get_json() or {})
+    data.setdefault("gang_id", f"gang-{str(uuid.uuid4())[:8]}")
+
+    candidates = []
+    for shard, response in _fan_out("GET", "/api/shard/capacity"):
+        if response is not None and response.status_code == 200:
+            candidates.append((response.json()["available_cores"], shard))
+
+    last_error = ({"error": "Not enough capacity for the whole gang", "gang_id": data["gang_id"]}, 409)
+    for _, shard in sorted(candidates, reverse=True):
+        try:
+            response = _call(shard, "POST", "/api/gangs/launch", json=data)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Shard {shard} unreachable during gang launch: {e}")
+            continue
+        if response.status_code == 201 or response.status_code == 400:
+            return _relay(response)
+        last_error = (response.json(), response.status_code)
+    return jsonify(last_error[0]), last_error[1]
+
+@app.route('/api/gangs/<gang_id>', methods=['GET'])
+@app.route('/api/gangs/<gang_id>/<action>', methods=['POST'])
+def gang_action(gang_id, action=None):
+    """Gangs are not partitioned by ID, ask every shard"""
+    path = f"/api/gangs/{gang_id}" + (f"/{action}" if action else "")
+    for shard, response in _fan_out(request.method, path):
+        if response is not None and response.status_code == 200:
+            return _relay(response)
+    return jsonify({"error": f"Gang {gang_id} not found"}), 404
+
+@app.route('/api/pods/unschedule', methods=['POST'])
+def unschedule_pod():
+    """Pods are not partitioned by ID, ask every shard to unschedule it"""
+    data = request.get_json() or {}
+    if not data.get("pod_id"):
+        return jsonify({"error": "Missing pod_id"}), 400
+
+    results = _fan_out("POST", "/api/pods/unschedule", json=data)
+    for shard, response in results:
+        if response is not None and response.status_code == 200:
+            return _relay(response)
+    return jsonify({"error": f"Pod {data['pod_id']} not found or could not be unscheduled"}), 404
+
+def start_local_shards(count, base_port, host="127.0.0.1"):
+    """Start `count` API server shards as local processes and wait until they answer"""
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    processes = []
+    urls = []
+    for i in range(count):
+        port = base_port + i
+        env = dict(os.environ, API_PORT=str(port), API_DEBUG="0")
+        if env.get("UDP_HEARTBEAT_PORT"):
+            # Each shard listens for its own nodes' UDP heartbeats
+            env["UDP_HEARTBEAT_PORT"] = str(int(env["UDP_HEARTBEAT_PORT"]) + i)
+        if env.get("METRICS_HISTORY_DIR"):
+            # Each shard keeps its own usage history
+            env["METRICS_HISTORY_DIR"] = os.path.join(env["METRICS_HISTORY_DIR"], f"shard-{i}")
+        env["PYTHONPATH"] = package_root + os.pathsep + env.get("PYTHONPATH", "")
+        processes.append(subprocess.Popen([sys.executable, "-m", "api_server.app"], cwd=package_root, env=env))
+        urls.append(f"http://{host}:{port}")
+        logger.info(f"Started shard {i} on port {port} (pid {processes[-1].pid})")
+
+    def stop_shards():
+        for process in processes:
+            process.terminate()
+    atexit.register(stop_shards)
+
+    for url in urls:
+        for _ in range(50):
+            try:
+                requests.get(url, timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                time.sleep(0.2)
+        else:
+            logger.warning(f"Shard {url} did not come up in time")
+    return urls
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded API server router")
+    parser.add_argument("--shards", type=int, default=0, help="number of local shard processes to start")
+    parser.add_argument("--shard-urls", default="", help="comma separated URLs of running shards")
+    parser.add_argument("--base-port", type=int, default=5101, help="port of the first local shard")
+    parser.add_argument("--advertise-host", default="127.0.0.1", help="host nodes use to reach local shards")
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "5000")))
+    args = parser.parse_args()
+
+    urls = [url for url in args.shard_urls.split(",") if url]
+    if args.shards:
+        urls += start_local_shards(args.shards, args.base_port, args.advertise_host)
+    for url in urls:
+        ring.add_shard(url)
+    if not ring.get_shards():
+        parser.error("no shards configured, use --shards or --shard-urls")
+
+    logger.info(f"Routing across shards: {ring.get_shards()}")
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# api_server/udp_heartbeat.py
+"""Heartbeats over UDP in a fixed binary format.
+
+An HTTP heartbeat costs a JSON round trip through Flask for what is a node
+id and a few numbers. When UDP_HEARTBEAT_PORT is set, registration hands
+each node a 32-bit handle, and the node can send its heartbeats as
+single datagrams instead:
+
+    header  "HB", version, flags, handle (u32), sequence (u32), pod count (u16)
+    per pod id length (u8), id (utf-8), cpu_usage, memory_usage, io_rate (f32)
+
+All fields are big-endian. A listener thread drains the socket in batches
+and applies each batch to the HealthMonitor and ResourceMonitor under one
+lock acquisition per component. Datagrams whose sequence number is not
+newer than the last one seen from the handle are dropped, so reordered and
+duplicated datagrams don't move metrics backwards. Nodes keep sending an
+HTTP heartbeat now and then, which re-registers them if the server no
+longer knows their handle.
+"""
+import random
+import select
+import socket
+import struct
+import threading
+from threading import Lock
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAGIC = b"HB"
+VERSION = 1
+HEADER = struct.Struct("!2sBBIIH")
+POD_METRICS = struct.Struct("!fff")
+MAX_DATAGRAM = 1400  # stays under a typical MTU, so datagrams are never fragmented
+SEQ_MASK = 0xFFFFFFFF
+
+def encode_heartbeat(handle, seq, pod_metrics=None):
+    """Pack a heartbeat, or return None when the pod metrics don't fit in one datagram"""
+    parts = [HEADER.pack(MAGIC, VERSION, 0, handle, seq & SEQ_MASK, len(pod_metrics or ()))]
+    size = HEADER.size
+    for pod_id, metrics in (pod_metrics or {}).items():
+        raw_id = pod_id.encode()
+        size += 1 + len(raw_id) + POD_METRICS.size
+        if len(raw_id) > 255 or size > MAX_DATAGRAM:
+            return None
+        parts.append(bytes((len(raw_id),)) + raw_id)
+        parts.append(POD_METRICS.pack(metrics.get("cpu_usage", 0), metrics.get("memory_usage", 0),
+                                      metrics.get("io_rate", 0)))
+    return b"".join(parts)
+
+def decode_heartbeat(data):
+    """Unpack a heartbeat into (handle, seq, pod_metrics), raising ValueError if it is malformed"""
+    try:
+        magic, version, _, handle, seq, count = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("Truncated heartbeat")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a heartbeat datagram")
+    pod_metrics = {}
+    offset = HEADER.size
+    try:
+        for _ in range(count):
+            length = data[offset]
+            pod_id = data[offset + 1:offset + 1 + length].decode()
+            offset += 1 + length
+            cpu, memory, io = POD_METRICS.unpack_from(data, offset)
+            offset += POD_METRICS.size
+            pod_metrics[pod_id] = {"cpu_usage": round(cpu, 3), "memory_usage": round(memory, 1),
+                                   "io_rate": round(io, 1)}
+    except (IndexError, UnicodeDecodeError, struct.error):
+        raise ValueError("Truncated pod metrics")
+    return handle, seq, pod_metrics
+
+class UdpHeartbeatListener:
+    def __init__(self, health_monitor, resource_monitor, host="0.0.0.0", port=5001, batch_size=1024):
+        self.health_monitor = health_monitor
+        self.resource_monitor = resource_monitor
+        self.host = host
+        self.port = port
+        self.batch_size = batch_size  # datagrams applied per lock acquisition
+        self.lock = Lock()
+        self.handles = {}  # node_id -> handle
+        self.node_ids = {}  # handle -> node_id
+        self.last_seq = {}  # handle -> last applied sequence number, None until the first one
+        self.stats = {"received": 0, "applied": 0, "malformed": 0, "stale": 0, "unknown": 0}
+        self.sock = None
+        self.running = False
+        self.listen_thread = None
+        health_monitor.node_manager.add_node_listener(self.node_changed)
+
+    def handle_for(self, node_id):
+        """Handle a node puts in its heartbeats; registering again restarts its sequence"""
+        with self.lock:
+            handle = self.handles.get(node_id)
+            if handle is None:
+                # Random rather than sequential, so a node still using a handle
+                # from before a server restart is dropped instead of mistaken for another node
+                handle = random.getrandbits(32)
+                while handle in self.node_ids:
+                    handle = random.getrandbits(32)
+                self.handles[node_id] = handle
+                self.node_ids[handle] = node_id
+            self.last_seq[handle] = None
+            return handle
+
+    def forget(self, node_id):
+        """Drop a node's handle, so its datagrams count as unknown until it registers again"""
+        with self.lock:
+            handle = self.handles.pop(node_id, None)
+            if handle is not None:
+                del self.node_ids[handle]
+                del self.last_seq[handle]
+
+    def node_changed(self, node_id, node):
+        """NodeManager listener: forget removed nodes"""
+        if node is None:
+            self.forget(node_id)
+
+    def start_listening(self):
+        """Bind the socket and start the listener thread"""
+        with self.lock:
+            if self.running:
+                return False
+
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+            self.sock.bind((self.host, self.port))
+            self.port = self.sock.getsockname()[1]
+            self.sock.setblocking(False)
+            self.running = True
+            self.listen_thread = threading.Thread(target=self._listen_loop, daemon=True)
+            self.listen_thread.start()
+            logger.info(f"Listening for UDP heartbeats on port {self.port}")
+            return True
+
+    def stop_listening(self):
+        """Stop the listener thread and close the socket"""
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+        self.listen_thread.join(timeout=5)
+        self.sock.close()
+        return True
+
+    def _listen_loop(self):
+        """Wait for datagrams, then drain the socket in batches"""
+        recv = self.sock.recv
+        while self.running:
+            ready, _, _ = select.select([self.sock], [], [], 0.5)
+            if not ready:
+                continue
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(recv(MAX_DATAGRAM))
+            except BlockingIOError:
+                pass
+            except OSError as e:
+                logger.error(f"Error receiving heartbeats: {e}")
+            if batch:
+                try:
+                    self.process(batch)
+                except Exception as e:
+                    logger.error(f"Error applying heartbeats: {e}")
+
+    def process(self, datagrams):
+        """Apply a batch of heartbeat datagrams"""
+        beats = {}  # node_id -> pod metrics of its newest datagram in the batch
+        malformed = stale = unknown = 0
+        with self.lock:
+            node_ids, last_seq = self.node_ids, self.last_seq
+            for data in datagrams:
+                try:
+                    handle, seq, pod_metrics = decode_heartbeat(data)
+                except ValueError:
+                    malformed += 1
+                    continue
+                node_id = node_ids.get(handle)
+                if node_id is None:
+                    unknown += 1
+                    continue
+                last = last_seq[handle]
+                # Serial number arithmetic, so the sequence may wrap around
+                if last is not None and not 0 < (seq - last) & SEQ_MASK < 0x80000000:
+                    stale += 1
+                    continue
+                last_seq[handle] = seq
+                beats[node_id] = pod_metrics
+            self.stats["received"] += len(datagrams)
+            self.stats["malformed"] += malformed
+            self.stats["stale"] += stale
+
+        missing = ()
+        if beats:
+            missing = set(self.health_monitor.process_heartbeats(list(beats)))
+            metrics = {node_id: pod_metrics for node_id, pod_metrics in beats.items()
+                       if pod_metrics and node_id not in missing}
+            if metrics:
+                self.resource_monitor.update_nodes_pod_metrics(metrics)
+        with self.lock:
+            self.stats["applied"] += len(beats) - len(missing)
+            self.stats["unknown"] += unknown + len(missing)
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, port=self.port, nodes=len(self.node_ids))
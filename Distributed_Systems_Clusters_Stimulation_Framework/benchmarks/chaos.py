@@ -0,0 +1,488 @@
+# benchmarks/chaos.py
+"""Correlated failure scenarios with recovery timing.
+
+A scenario decides which nodes stop heartbeating and when they come back:
+    rack       every node of one rack goes down for good
+    fraction   a random --fraction of the nodes goes down for good
+    flapping   a --fraction of the nodes cycles between --flap-down seconds
+               silent and --flap-up seconds heartbeating
+    partition  the heartbeats of a --fraction of the nodes are dropped for
+               --partition-duration seconds; the nodes keep running
+The cluster is first filled to --fill of its cores with pods. Scenarios
+run in one of two modes:
+    sim   in-process NodeManager, PodScheduler and HealthMonitor on a
+          ManualClock, so a long scenario runs in moments (the default)
+    live  simulated node agents against a running API server, which
+          keep heartbeating until the scenario silences them
+Reported, in (clock) seconds from injection: time to detection per failed
+node, time until every pod from a failed node runs again on a healthy node,
+pods lost, and scheduling latency during the rescheduling storm compared
+with before it.
+
+In sim mode, --detector picks the fixed --heartbeat-timeout or the phi
+accrual detector, and --jitter and --pause-rate/--pause delay heartbeats
+the way a loaded network or a GC pause would. Healthy nodes that were
+failed anyway, and the pods that moved because of it, are reported as
+spurious.
+
+    python -m benchmarks.chaos --scenario rack --nodes 1000 --racks 20
+    python -m benchmarks.chaos --scenario partition --mode live --url http://localhost:5000 --nodes 200
+    python -m benchmarks.chaos --scenario fraction --detector phi --jitter 2 --pause-rate 0.01 --pause 12
+"""
+import argparse
+import asyncio
+import contextlib
+import heapq
+import io
+import json
+import logging
+import random
+import time
+
+from api_server.clock import ManualClock
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+from api_server.health_monitor import HealthMonitor
+from api_server.failure_detector import PhiAccrualDetector
+
+SCENARIOS = ("rack", "fraction", "flapping", "partition")
+
+def rack_of(index, nodes, racks):
+    """Nodes fill racks in order"""
+    return f"rack-{index * racks // nodes}"
+
+def plan_failures(args, node_ids, racks, rng):
+    """Return sorted (seconds after injection, "down" or "up", node_id) events"""
+    count = max(1, round(args.fraction * len(node_ids)))
+    events = []
+    if args.scenario == "rack":
+        rack = rng.choice(sorted(set(racks.values())))
+        events = [(0.0, "down", node_id) for node_id in node_ids if racks[node_id] == rack]
+    elif args.scenario == "fraction":
+        events = [(0.0, "down", node_id) for node_id in rng.sample(node_ids, count)]
+    elif args.scenario == "partition":
+        for node_id in rng.sample(node_ids, count):
+            events += [(0.0, "down", node_id), (args.partition_duration, "up", node_id)]
+    else:
+        for node_id in rng.sample(node_ids, count):
+            offset = rng.uniform(0, args.flap_up)
+            while offset < args.duration:
+                events += [(offset, "down", node_id), (offset + args.flap_down, "up", node_id)]
+                offset += args.flap_down + args.flap_up
+    return sorted(events)
+
+def percentiles(values, scale=1.0, digits=3):
+    if not values:
+        return None
+    values = sorted(values)
+    return {name: round(values[min(len(values) - 1, int(q * len(values)))] * scale, digits)
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))}
+
+class RecoveryTracker:
+    """Turns node and pod observations into detection and recovery times"""
+
+    def __init__(self):
+        self.down = {}  # node_id -> when it went silent, while it is silent
+        self.undetected = {}  # node_id -> when it went silent, until reported failed
+        self.detections = []  # seconds from going silent to being reported failed
+        self.affected = set()  # pods that were on a node when it went silent
+        self.unplaced = set()  # affected pods not yet running on a healthy node
+        self.lost = set()
+        self.last_recovered = None  # when the unplaced set last became empty
+        self.max_unplaced = 0
+        self.placement = {}  # pod_id -> node_id from the last observation
+
+    @property
+    def storm(self):
+        """Whether a failure is still being detected or its pods rescheduled"""
+        return bool(self.undetected or self.unplaced)
+
+    def node_down(self, node_id, now):
+        self.down[node_id] = now
+        self.undetected.setdefault(node_id, now)
+        pods = {pod_id for pod_id, placed_on in self.placement.items() if placed_on == node_id}
+        self.affected |= pods
+        self.unplaced |= pods
+
+    def forget(self, pod_id):
+        """Stop following a pod its owner deleted"""
+        self.affected.discard(pod_id)
+        self.unplaced.discard(pod_id)
+        self.placement.pop(pod_id, None)
+
+    def node_up(self, node_id, now):
+        self.down.pop(node_id, None)
+        self.undetected.pop(node_id, None)  # came back before the server noticed
+
+    def observe(self, now, statuses, placement):
+        """statuses: node_id -> status; placement: pod_id -> node_id or None, for every pod"""
+        for node_id, since in list(self.undetected.items()):
+            if statuses.get(node_id) == "failed":
+                self.detections.append(now - since)
+                del self.undetected[node_id]
+
+        self.placement = placement
+        had_unplaced = bool(self.unplaced)
+        for pod_id in list(self.unplaced):
+            if pod_id not in placement:
+                self.lost.add(pod_id)
+                self.unplaced.discard(pod_id)
+                continue
+            node_id = placement[pod_id]
+            if node_id is not None and node_id not in self.down and statuses.get(node_id) in ("healthy", "suspect"):
+                self.unplaced.discard(pod_id)
+        self.max_unplaced = max(self.max_unplaced, len(self.unplaced))
+        if had_unplaced and not self.unplaced:
+            self.last_recovered = now
+
+    def report(self, nodes_failed):
+        return {
+            "nodes_failed": nodes_failed,
+            "nodes_undetected": len(self.undetected),
+            "detection_seconds": percentiles(self.detections),
+            "time_to_full_reschedule_seconds": (round(self.last_recovered, 3)
+                                                if self.last_recovered is not None and not self.unplaced else None),
+            "pods_affected": len(self.affected),
+            "pods_lost": len(self.lost),
+            "pods_still_unplaced": len(self.unplaced),
+            "max_pods_unplaced": self.max_unplaced
+        }
+
+def run_simulation(args):
+    """Replay the scenario in-process on a manual clock"""
+    rng = random.Random(args.seed)
+    clock = ManualClock()
+    node_manager = NodeManager(clock=clock)
+    scheduler = PodScheduler(node_manager)
+    scheduler.set_scheduling_algorithm(args.algorithm)
+    health_monitor = HealthMonitor(node_manager, scheduler)
+    health_monitor.heartbeat_timeout = args.heartbeat_timeout
+    health_monitor.check_interval = args.check_interval
+    if args.detector == "phi":
+        health_monitor.set_failure_detector(PhiAccrualDetector(
+            suspect_threshold=args.phi_suspect, failed_threshold=args.phi_failed,
+            first_interval=args.heartbeat_interval))
+
+    node_ids = [f"node-{i:05d}" for i in range(args.nodes)]
+    racks = {node_id: rack_of(i, args.nodes, args.racks) for i, node_id in enumerate(node_ids)}
+    for node_id in node_ids:
+        node_manager.register_node(node_id, args.node_cores, {"rack": racks[node_id]})
+    # Agents heartbeat on their own phase; a beat due at `nominal` arrives at `next_beat`
+    nominal = {node_id: rng.uniform(0, args.heartbeat_interval) for node_id in node_ids}
+
+    # Pauses come from a --pause-nodes share of the nodes, like GC-heavy agents
+    pausing = set(rng.sample(node_ids, round(args.pause_nodes * len(node_ids))))
+
+    def delay(node_id):
+        pause = args.pause if node_id in pausing and rng.random() < args.pause_rate else 0.0
+        return rng.uniform(0, args.jitter) + pause
+
+    next_beat = {node_id: due + delay(node_id) for node_id, due in nominal.items()}
+
+    pod_count = 0
+    target = args.fill * args.nodes * args.node_cores
+    placed_cores = 0
+    while placed_cores < target:
+        cpu_cores = rng.choice(args.pod_cores)
+        if not scheduler.schedule_pod(f"pod-{pod_count:06d}", cpu_cores)["success"]:
+            break
+        pod_count += 1
+        placed_cores += cpu_cores
+
+    tracker = RecoveryTracker()
+    events = plan_failures(args, node_ids, racks, rng)
+    failed_nodes = {node_id for _, action, node_id in events if action == "down"}
+    latencies = {"baseline": [], "storm": []}  # seconds per launch
+    expiries = []  # heap of (clock seconds, pod_id) when launched pods are deleted
+    check_latencies = []  # seconds per health check, including the rescheduling it triggers
+    launches = {"placed": 0, "pending": 0, "rejected": 0}
+    launch_budget = 0.0
+    next_check = args.check_interval
+    injected_at = args.warmup
+    silent = set()
+    spurious = {"failures": 0, "suspicions": 0, "pods_moved": 0}
+
+    statuses_seen = {}
+
+    def status_changed(node_id, node):
+        # NodeManager listener: count nodes judged dead or slow while they still heartbeat
+        if node is None or statuses_seen.get(node_id) == node["status"]:
+            return
+        statuses_seen[node_id] = node["status"]
+        if node_id in silent:
+            return
+        if node["status"] == "failed":
+            spurious["failures"] += 1
+            spurious["pods_moved"] += len(node["pods"])
+        elif node["status"] == "suspect":
+            spurious["suspicions"] += 1
+    node_manager.add_node_listener(status_changed)
+
+    def observe(now):
+        pods = scheduler.get_all_pods()
+        statuses = {node_id: info["status"] for node_id, info in node_manager.get_all_nodes().items()}
+        tracker.observe(now, statuses, {pod_id: info["node_id"] for pod_id, info in pods.items()})
+
+    observe(-injected_at)
+    now = 0.0
+    end = args.warmup + args.duration
+    while now < end:
+        now = clock.advance(args.step) - clock.start
+        offset = now - injected_at
+        while events and injected_at + events[0][0] <= now:
+            event_offset, action, node_id = events.pop(0)
+            if action == "down":
+                silent.add(node_id)
+                tracker.node_down(node_id, event_offset)
+            else:
+                silent.discard(node_id)
+                tracker.node_up(node_id, event_offset)
+                nominal[node_id] = next_beat[node_id] = now
+
+        for node_id, arrival in next_beat.items():
+            if arrival <= now:
+                if node_id not in silent:
+                    health_monitor.process_heartbeat(node_id)
+                nominal[node_id] += args.heartbeat_interval
+                next_beat[node_id] = max(arrival, nominal[node_id] + delay(node_id))
+
+        while expiries and expiries[0][0] <= now:
+            pod_id = heapq.heappop(expiries)[1]
+            scheduler.unschedule_pod(pod_id)
+            tracker.forget(pod_id)
+
+        # The pending thread runs whenever capacity comes back
+        scheduler.retry_pending()
+
+        # Steady launches, timed to compare scheduling latency before and during the storm
+        launch_budget += args.launch_rate * args.step
+        while launch_budget >= 1:
+            launch_budget -= 1
+            cpu_cores = rng.choice(args.pod_cores)
+            started = time.perf_counter()
+            candidates = scheduler.candidates.candidates(cpu_cores, scheduler.scheduling_algorithm, 3)
+            pod_id = f"pod-{pod_count:06d}"
+            result = scheduler.commit_placement(pod_id, cpu_cores, candidates, queue_if_unschedulable=True)
+            latencies["storm" if tracker.storm and offset >= 0 else "baseline"].append(time.perf_counter() - started)
+            pod_count += 1
+            if args.pod_lifetime > 0:
+                heapq.heappush(expiries, (now + rng.expovariate(1 / args.pod_lifetime), pod_id))
+            launches["placed" if result["success"] else "pending" if result.get("pending") else "rejected"] += 1
+
+        if now >= next_check:
+            next_check += args.check_interval
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # HealthMonitor prints every failure
+                health_monitor._check_node_health()
+            check_latencies.append(time.perf_counter() - started)
+            observe(offset)
+
+    observe(now - injected_at)
+    return dict(tracker.report(len(failed_nodes)),
+                detector=args.detector,
+                spurious=spurious,
+                launches=launches,
+                pods_total=pod_count,
+                scheduling_latency_ms={name: percentiles(samples, 1000) for name, samples in latencies.items()},
+                health_check_ms=percentiles(check_latencies, 1000))
+
+class LiveChaos:
+    """Simulated agents against a running API server; silenced agents stop heartbeating"""
+
+    def __init__(self, args):
+        from benchmarks.load_generator import HttpClient
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.client = HttpClient(args.url, args.connections, args.timeout)
+        self.node_ids = [f"{args.node_prefix}-{i:05d}" for i in range(args.nodes)]
+        self.racks = {node_id: rack_of(i, args.nodes, args.racks) for i, node_id in enumerate(self.node_ids)}
+        self.silent = set()
+        self.pods = set()  # pods launched by this run
+        self.tracker = RecoveryTracker()
+        self.latencies = {"baseline": [], "storm": []}
+        self.launches = {"placed": 0, "pending": 0, "rejected": 0}
+        self.injected_at = None
+        self.stopping = False
+
+    def offset(self):
+        return time.monotonic() - self.injected_at if self.injected_at is not None else 0.0
+
+    async def heartbeat(self, node_id):
+        await asyncio.sleep(self.rng.uniform(0, self.args.heartbeat_interval))
+        while not self.stopping:
+            if node_id not in self.silent:
+                try:
+                    await self.client.request("POST", "/api/nodes/heartbeat", {"node_id": node_id})
+                except (OSError, asyncio.TimeoutError, ValueError):
+                    pass
+            await asyncio.sleep(self.args.heartbeat_interval)
+
+    async def launch(self, cpu_cores, lifetime=0):
+        started = time.perf_counter()
+        try:
+            status, data = await self.client.request("POST", "/api/pods/launch", {"cpu_cores": cpu_cores})
+        except (OSError, asyncio.TimeoutError, ValueError):
+            status, data = None, None
+        if self.injected_at is not None:
+            phase = "storm" if self.tracker.storm else "baseline"
+            self.latencies[phase].append(time.perf_counter() - started)
+        if status in (201, 202) and data:
+            self.pods.add(data["pod_id"])
+            self.launches["placed" if status == 201 else "pending"] += 1
+            if lifetime > 0:
+                await asyncio.sleep(lifetime)
+                if not self.stopping:
+                    self.pods.discard(data["pod_id"])
+                    self.tracker.forget(data["pod_id"])
+                    try:
+                        await self.client.request("POST", "/api/pods/unschedule", {"pod_id": data["pod_id"]})
+                    except (OSError, asyncio.TimeoutError, ValueError):
+                        pass
+            return True
+        self.launches["rejected"] += 1
+        return False
+
+    async def list_all(self, path, key, fields):
+        """Every record of a paginated list endpoint, projected to fields"""
+        records, cursor = {}, None
+        while True:
+            params = {"fields": fields, "limit": 1000}
+            if cursor:
+                params["cursor"] = cursor
+            status, data = await self.client.request("GET", path, params=params)
+            if status != 200 or not data:
+                return None
+            records.update(data.get(key, {}))
+            cursor = data.get("next_cursor")
+            if not cursor:
+                return records
+
+    async def observe(self):
+        nodes = await self.list_all("/api/nodes", "nodes", "status")
+        pods = await self.list_all("/api/pods", "pods", "node_id")
+        if nodes is None or pods is None:
+            return
+        statuses = {node_id: info.get("status") for node_id, info in nodes.items()}
+        placement = {pod_id: info.get("node_id") for pod_id, info in pods.items() if pod_id in self.pods}
+        self.tracker.observe(self.offset(), statuses, placement)
+
+    async def observe_loop(self):
+        while not self.stopping:
+            try:
+                await self.observe()
+            except (OSError, asyncio.TimeoutError, ValueError):
+                pass
+            await asyncio.sleep(self.args.observe_interval)
+
+    async def workload(self):
+        if self.args.launch_rate <= 0:
+            return
+        while not self.stopping:
+            await asyncio.sleep(self.rng.expovariate(self.args.launch_rate))
+            lifetime = self.rng.expovariate(1 / self.args.pod_lifetime) if self.args.pod_lifetime > 0 else 0
+            asyncio.ensure_future(self.launch(self.rng.choice(self.args.pod_cores), lifetime))
+
+    async def run(self):
+        args = self.args
+        for node_id in self.node_ids:
+            await self.client.request("POST", "/api/nodes/register", {
+                "node_id": node_id, "cpu_cores": args.node_cores, "labels": {"rack": self.racks[node_id]}})
+        tasks = [asyncio.ensure_future(self.heartbeat(node_id)) for node_id in self.node_ids]
+
+        placed_cores = 0
+        while placed_cores < args.fill * args.nodes * args.node_cores:
+            cpu_cores = self.rng.choice(args.pod_cores)
+            if not await self.launch(cpu_cores):
+                break
+            placed_cores += cpu_cores
+        await self.observe()
+
+        tasks.append(asyncio.ensure_future(self.workload()))
+        tasks.append(asyncio.ensure_future(self.observe_loop()))
+        await asyncio.sleep(args.warmup)
+
+        events = plan_failures(args, self.node_ids, self.racks, self.rng)
+        failed_nodes = {node_id for _, action, node_id in events if action == "down"}
+        self.injected_at = time.monotonic()
+        for event_offset, action, node_id in events:
+            delay = event_offset - self.offset()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if action == "down":
+                self.silent.add(node_id)
+                self.tracker.node_down(node_id, event_offset)
+            else:
+                self.silent.discard(node_id)
+                self.tracker.node_up(node_id, event_offset)
+        await asyncio.sleep(max(0.0, args.duration - self.offset()))
+
+        self.stopping = True
+        await asyncio.wait(tasks, timeout=args.timeout + 1)
+        for task in tasks:
+            task.cancel()
+        await self.observe()
+        return dict(self.tracker.report(len(failed_nodes)),
+                    launches=self.launches,
+                    pods_total=self.launches["placed"] + self.launches["pending"],
+                    scheduling_latency_ms={name: percentiles(samples, 1000) for name, samples in self.latencies.items()})
+
+def parse_ints(value):
+    return [int(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Inject correlated node failures and time the recovery")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="rack")
+    parser.add_argument("--mode", choices=("sim", "live"), default="sim")
+    parser.add_argument("--url", default="http://localhost:5000", help="API server, live mode")
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--racks", type=int, default=10)
+    parser.add_argument("--node-cores", type=int, default=16)
+    parser.add_argument("--pod-cores", type=parse_ints, default=[1, 2, 4], help="cores per pod, picked at random")
+    parser.add_argument("--fill", type=float, default=0.6, help="share of the cores filled with pods before injection")
+    parser.add_argument("--fraction", type=float, default=0.3, help="share of nodes failing, except in the rack scenario")
+    parser.add_argument("--flap-down", type=float, default=45, help="seconds a flapping node stays silent")
+    parser.add_argument("--flap-up", type=float, default=60, help="seconds a flapping node heartbeats between outages")
+    parser.add_argument("--partition-duration", type=float, default=90)
+    parser.add_argument("--warmup", type=float, default=30, help="seconds before injection")
+    parser.add_argument("--duration", type=float, default=300, help="seconds after injection")
+    parser.add_argument("--heartbeat-interval", type=float, default=10)
+    parser.add_argument("--heartbeat-timeout", type=float, default=30, help="sim mode")
+    parser.add_argument("--check-interval", type=float, default=5, help="seconds between health checks, sim mode")
+    parser.add_argument("--detector", choices=("timeout", "phi"), default="timeout", help="sim mode")
+    parser.add_argument("--phi-suspect", type=float, default=3)
+    parser.add_argument("--phi-failed", type=float, default=8)
+    parser.add_argument("--jitter", type=float, default=0, help="heartbeats arrive up to this many seconds late, sim mode")
+    parser.add_argument("--pause-rate", type=float, default=0, help="share of heartbeats held up by a pause, sim mode")
+    parser.add_argument("--pause", type=float, default=15, help="seconds a pause holds a heartbeat, sim mode")
+    parser.add_argument("--pause-nodes", type=float, default=1.0, help="share of the nodes that pause, sim mode")
+    parser.add_argument("--step", type=float, default=0.5, help="clock seconds per simulation step")
+    parser.add_argument("--launch-rate", type=float, default=5, help="pod launches per second during the run")
+    parser.add_argument("--pod-lifetime", type=float, default=120,
+                        help="mean seconds before a launched pod is deleted, 0 to keep")
+    parser.add_argument("--algorithm", choices=("first-fit", "best-fit", "worst-fit"), default="worst-fit",
+                        help="sim mode; worst-fit spreads pods over every rack, like a production cluster")
+    parser.add_argument("--observe-interval", type=float, default=1, help="seconds between server polls, live mode")
+    parser.add_argument("--node-prefix", default="chaos")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="chaos_results.json")
+    args = parser.parse_args()
+
+    # Every failure, eviction and placement is logged at INFO or WARNING
+    logging.disable(logging.WARNING)
+    started = time.monotonic()
+    if args.mode == "sim":
+        results = run_simulation(args)
+    else:
+        results = asyncio.run(LiveChaos(args).run())
+    results["wall_seconds"] = round(time.monotonic() - started, 3)
+    results["params"] = vars(args)
+
+    print(json.dumps({key: value for key, value in results.items() if key != "params"}, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
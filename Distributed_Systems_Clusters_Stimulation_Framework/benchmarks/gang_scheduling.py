@@ -0,0 +1,142 @@
+# benchmarks/gang_scheduling.py
+"""Gang scheduling benchmark: per-gang latency and capacity deadlocks.
+
+Runs in-process against PodScheduler and NodeManager. Each trial starts a
+burst of gangs on a cluster that cannot hold them all at once and plays
+them out in rounds, in one of two modes:
+    pods  members are launched one at a time, like separate /api/pods/launch
+          calls; a partial gang keeps its pods while it waits for the rest
+    gang  each gang is reserved all-or-nothing with PodScheduler.reserve_gang
+A complete gang runs for a few rounds and then finishes, freeing its cores.
+A trial deadlocks when gangs are still waiting, none is running that could
+free capacity, and a whole round placed nothing.
+
+    python -m benchmarks.gang_scheduling --trials 50 --nodes 8 --cores 8
+"""
+import argparse
+import json
+import logging
+import random
+import time
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(q * (len(values) - 1))]
+
+def run_trial(mode, rng, nodes, cores, gangs, min_size, max_size, cpu_cores, duration, max_rounds=1000):
+    """Play out one burst of gangs, returning its outcome"""
+    node_manager = NodeManager()
+    for i in range(nodes):
+        node_manager.register_node(f"node-{i}", cores)
+    scheduler = PodScheduler(node_manager)
+
+    sizes = {f"gang-{i}": rng.randint(min_size, max_size) for i in range(gangs)}
+    waiting = list(sizes)
+    rng.shuffle(waiting)
+    placed = {gang_id: [] for gang_id in sizes}  # pods mode: members placed so far
+    running = {}  # gang_id -> round it finishes
+    latencies = []  # seconds spent scheduling each completed gang
+    spent = {gang_id: 0.0 for gang_id in sizes}
+    waited = []  # rounds each gang waited before it started
+    deadlocked = False
+
+    for round_no in range(max_rounds):
+        progress = False
+        for gang_id, finish in list(running.items()):
+            if finish <= round_no:
+                del running[gang_id]
+                if mode == "gang":
+                    scheduler.release_gang(gang_id)
+                else:
+                    for pod_id in placed[gang_id]:
+                        scheduler.unschedule_pod(pod_id)
+                progress = True
+
+        for gang_id in list(waiting):
+            started = time.perf_counter()
+            if mode == "gang":
+                members = [(f"{gang_id}-{i}", cpu_cores) for i in range(sizes[gang_id])]
+                complete = scheduler.reserve_gang(gang_id, members, commit=True)["success"]
+                progress = progress or complete
+            else:
+                # Interleave gangs one member per round, as concurrent clients would
+                pod_id = f"{gang_id}-{len(placed[gang_id])}"
+                if scheduler.schedule_pod(pod_id, cpu_cores)["success"]:
+                    placed[gang_id].append(pod_id)
+                    progress = True
+                complete = len(placed[gang_id]) == sizes[gang_id]
+            spent[gang_id] += time.perf_counter() - started
+            if complete:
+                waiting.remove(gang_id)
+                running[gang_id] = round_no + duration
+                latencies.append(spent[gang_id])
+                waited.append(round_no)
+
+        if not waiting and not running:
+            break
+        if waiting and not running and not progress:
+            deadlocked = True
+            break
+
+    return {
+        "deadlocked": deadlocked,
+        "completed": gangs - len(waiting),
+        "rounds": round_no + 1,
+        "stranded_cores": sum(len(placed[gang_id]) * cpu_cores for gang_id in waiting),
+        "latencies": latencies,
+        "waited": waited
+    }
+
+def run_benchmark(mode, trials, seed, **params):
+    rng = random.Random(seed)
+    results = [run_trial(mode, rng, **params) for _ in range(trials)]
+    latencies = [latency for result in results for latency in result["latencies"]]
+    waited = [rounds for result in results for rounds in result["waited"]]
+    deadlocks = sum(1 for result in results if result["deadlocked"])
+    return {
+        "mode": mode,
+        "trials": trials,
+        "deadlocks": deadlocks,
+        "deadlock_rate": round(deadlocks / trials, 3) if trials else 0.0,
+        "gangs_completed": sum(result["completed"] for result in results),
+        "gangs_total": trials * params["gangs"],
+        "mean_stranded_cores": round(sum(result["stranded_cores"] for result in results) / trials, 2) if trials else 0.0,
+        "latency_ms": {name: round(percentile(latencies, q) * 1000, 3) if latencies else None
+                       for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "rounds_waited": {name: percentile(waited, q) for name, q in (("p50", 0.5), ("p95", 0.95))}
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Gang scheduling latency and deadlock benchmark")
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--nodes", type=int, default=8)
+    parser.add_argument("--cores", type=int, default=8, help="cores per node")
+    parser.add_argument("--gangs", type=int, default=6, help="gangs arriving together per trial")
+    parser.add_argument("--min-size", type=int, default=4, help="smallest gang, in pods")
+    parser.add_argument("--max-size", type=int, default=16, help="largest gang, in pods")
+    parser.add_argument("--cpu-cores", type=int, default=2, help="cores per pod")
+    parser.add_argument("--duration", type=int, default=3, help="rounds a complete gang runs")
+    parser.add_argument("--mode", choices=("pods", "gang", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # The scheduler logs every placement at INFO
+    logging.disable(logging.WARNING)
+    params = dict(nodes=args.nodes, cores=args.cores, gangs=args.gangs, min_size=args.min_size,
+                  max_size=args.max_size, cpu_cores=args.cpu_cores, duration=args.duration)
+    modes = ("pods", "gang") if args.mode == "both" else (args.mode,)
+    results = [run_benchmark(mode, args.trials, args.seed, **params) for mode in modes]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# benchmarks/gossip.py
+"""Gossip failure detection among in-process node agents.
+
+Starts --nodes GossipMember instances on loopback, all joined through an
+in-process GossipMembership the way node agents join through
+/api/gossip/join. Once their views have converged, --fail of them stop
+outright. --loss drops that share of all datagrams, to show whether
+indirect probes keep healthy members from being confirmed dead.
+
+Reported: time from the failure until the server got the first report and
+until every survivor saw each failed member dead, reports the server
+received per failure, healthy members wrongly confirmed dead, and
+datagrams per member per second.
+
+    python -m benchmarks.gossip --nodes 50 --fail 3
+    python -m benchmarks.gossip --nodes 100 --fail 5 --loss 0.05 --period 0.5
+"""
+import argparse
+import json
+import logging
+import random
+import time
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+from api_server.health_monitor import HealthMonitor
+from api_server.membership import GossipMembership
+from node.gossip import GossipMember, DEAD
+
+class LossyMember(GossipMember):
+    """Drops a share of its outgoing datagrams"""
+    loss = 0.0
+
+    def _send(self, message, addr, piggyback=True):
+        if random.random() < self.loss:
+            return
+        super()._send(message, addr, piggyback)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure gossip failure detection")
+    parser.add_argument("--nodes", type=int, default=50)
+    parser.add_argument("--fail", type=int, default=3, help="members stopped at once")
+    parser.add_argument("--loss", type=float, default=0.0, help="share of datagrams dropped")
+    parser.add_argument("--period", type=float, default=0.5, help="protocol period in seconds")
+    parser.add_argument("--timeout", type=float, default=60, help="give up waiting after this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if args.fail >= args.nodes:
+        parser.error("--fail must be smaller than --nodes")
+    logging.disable(logging.WARNING)
+    random.seed(args.seed)
+    LossyMember.loss = args.loss
+
+    node_manager = NodeManager()
+    health_monitor = HealthMonitor(node_manager, PodScheduler(node_manager))
+    membership = GossipMembership(node_manager, health_monitor)
+    reports = []  # (seconds, reporter, node_id)
+    started = time.monotonic()
+
+    members = {}
+    for i in range(args.nodes):
+        node_id = f"node-{i:04d}"
+        node_manager.register_node(node_id, 4)
+
+        def report(dead_id, state, incarnation, reporter=node_id):
+            reports.append((time.monotonic(), reporter, dead_id))
+            membership.report(reporter, dead_id, incarnation)
+
+        member = LossyMember(node_id, host="127.0.0.1", port=0, advertise_host="127.0.0.1", on_confirmed=report,
+                             protocol_period=args.period, ack_timeout=args.period * 0.3)
+        member.start()
+        member.join(membership.join(node_id, "127.0.0.1", member.port))
+        members[node_id] = member
+
+    # Wait until every member knows every other one
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline and min(len(m.alive_members()) for m in members.values()) < args.nodes - 1:
+        time.sleep(args.period)
+    converge_seconds = time.monotonic() - started
+    sent_before = sum(m.get_stats()["sent"] for m in members.values())
+    measure_start = time.monotonic()
+
+    failed = random.sample(sorted(members), args.fail)
+    failed_at = time.monotonic()
+    for node_id in failed:
+        members[node_id].stop()
+    survivors = [m for node_id, m in members.items() if node_id not in failed]
+
+    all_seen = {}
+    while time.monotonic() < deadline and len(all_seen) < len(failed):
+        for node_id in failed:
+            if node_id not in all_seen and all(
+                    m.members.get(node_id, {}).get("state", DEAD) == DEAD for m in survivors):
+                all_seen[node_id] = time.monotonic() - failed_at
+        time.sleep(args.period / 5)
+    # Keep running a while longer so false positives have time to show
+    time.sleep(args.period * 10)
+    elapsed = time.monotonic() - measure_start
+    sent = sum(m.get_stats()["sent"] for m in members.values()) - sent_before
+    # Survivors stopping one by one would be detected too, ignore reports from here on
+    stopped_at = time.monotonic()
+    membership_stats = membership.get_stats()
+    for member in survivors:
+        member.stop()
+    reports = [report for report in reports if report[0] < stopped_at]
+
+    first_report = {}
+    for at, _, node_id in reports:
+        if at >= failed_at:
+            first_report.setdefault(node_id, at - failed_at)
+    statuses = {node_id: info["status"] for node_id, info in node_manager.get_all_nodes().items()}
+    print(json.dumps({
+        "nodes": args.nodes,
+        "failed": args.fail,
+        "loss": args.loss,
+        "protocol_period": args.period,
+        "convergence_seconds": round(converge_seconds, 2),
+        "first_report_seconds": {n: round(first_report[n], 2) for n in failed if n in first_report},
+        "all_survivors_agree_seconds": {n: round(s, 2) for n, s in all_seen.items()},
+        "reports_per_failure": round(sum(1 for _, _, n in reports if n in failed) / args.fail, 2),
+        "failed_on_server": sum(1 for n in failed if statuses[n] == "failed"),
+        "false_positives": sorted({n for _, _, n in reports if n not in failed}),
+        "datagrams_per_member_per_second": round(sent / elapsed / args.nodes, 2),
+        "membership": membership_stats
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
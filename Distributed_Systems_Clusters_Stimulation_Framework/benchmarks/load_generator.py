@@ -0,0 +1,367 @@
+# benchmarks/load_generator.py
+"""Load generator simulating many node agents in one asyncio process.
+
+Each simulated agent speaks the same protocol as a real one: it registers,
+heartbeats and (for this framework's API server) polls its pod list. A
+workload coroutine launches pods at a Poisson rate and deletes them after
+an exponential lifetime, and a watcher counts simulated nodes the server
+reports as not healthy even though they keep heartbeating (false failure
+detections).
+
+    # this framework's API server (node/node.py protocol)
+    python -m benchmarks.load_generator --url http://localhost:5000 --nodes 2000 --duration 120
+    # the root APIServer.py (root node.py protocol)
+    python -m benchmarks.load_generator --protocol root --url http://localhost:5000 --nodes 500
+
+Throughput, error rates and p50/p95/p99 latency are reported per endpoint
+and written to --output as JSON. Only the standard library is used: HTTP/1.1
+requests go over a bounded pool of keep-alive connections.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+
+# Endpoints of the two API server flavours
+PROTOCOLS = {
+    "framework": {
+        "register": ("POST", "/api/nodes/register"),
+        "heartbeat": ("POST", "/api/nodes/heartbeat"),
+        "poll": ("GET", "/api/pods"),
+        "launch": ("POST", "/api/pods/launch"),
+        "delete": ("POST", "/api/pods/unschedule"),
+        "node_status": ("GET", "/api/nodes")
+    },
+    "root": {
+        "register": ("POST", "/register_node"),
+        "heartbeat": ("POST", "/send_heartbeat"),
+        "launch": ("POST", "/schedule_pod"),
+        "node_status": ("GET", "/nodes")
+    }
+}
+
+class HttpClient:
+    """Minimal HTTP/1.1 client over asyncio streams with a bounded pool of keep-alive connections"""
+
+    def __init__(self, base_url, connections, timeout=10):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.pool = asyncio.Queue()
+        for _ in range(connections):
+            self.pool.put_nowait(None)  # connections are opened on first use
+
+    async def request(self, method, path, body=None, params=None):
+        """Send a request, returning (status, parsed JSON body or None)"""
+        if params:
+            path = f"{path}?{urllib.parse.urlencode(params)}"
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {self.base_path}{path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n")
+        message = head.encode() + payload
+
+        conn = await self.pool.get()
+        try:
+            reused = conn is not None
+            while True:
+                if conn is None:
+                    conn = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+                try:
+                    status, data, keep_alive = await asyncio.wait_for(self._exchange(conn, message), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    conn[1].close()
+                    conn = None
+                    if reused:
+                        reused = False
+                        continue  # the server closed an idle connection, retry once on a new one
+                    raise
+                if not keep_alive:
+                    conn[1].close()
+                    conn = None
+                break
+        finally:
+            self.pool.put_nowait(conn)
+
+        try:
+            return status, json.loads(data) if data else None
+        except ValueError:
+            return status, None
+
+    async def _exchange(self, conn, message):
+        reader, writer = conn
+        writer.write(message)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionError("connection closed")
+        version, status = status_line.split(None, 2)[:2]
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                data += await reader.readexactly(size)
+                await reader.readline()
+        else:
+            data = await reader.read()
+            keep_alive = False
+        return int(status), data, keep_alive
+
+class Recorder:
+    """Latency samples, status codes and errors per endpoint"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def record(self, endpoint, seconds, status):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[endpoint] += 1
+
+    def report(self, duration):
+        endpoints = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            samples = sorted(samples)
+            count = len(samples)
+            endpoints[endpoint] = {
+                "requests": count,
+                "throughput_rps": round(count / duration, 2) if duration else None,
+                "errors": self.errors[endpoint],
+                "error_rate": round(self.errors[endpoint] / count, 4),
+                "latency_ms": {
+                    name: round(samples[min(count - 1, int(q * count))] * 1000, 2)
+                    for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+                },
+                "status_codes": dict(self.statuses[endpoint])
+            }
+        return endpoints
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.endpoints = PROTOCOLS[args.protocol]
+        self.clients = {}  # base URL -> HttpClient, agents may be sent to shards
+        self.client = self._client(args.url)
+        self.recorder = Recorder()
+        self.node_ids = [f"{args.node_prefix}-{i:05d}" for i in range(args.nodes)]
+        self.registered = set()
+        self.false_failures = Counter()  # node_id -> times seen not healthy
+        self.status_checks = 0
+        self.pods = {"launched": 0, "pending": 0, "rejected": 0, "deleted": 0}
+        self.stopping = False
+
+    def _client(self, base_url):
+        if base_url not in self.clients:
+            self.clients[base_url] = HttpClient(base_url, self.args.connections, self.args.timeout)
+        return self.clients[base_url]
+
+    async def call(self, endpoint, body=None, params=None, client=None):
+        method, path = self.endpoints[endpoint]
+        started = time.perf_counter()
+        try:
+            status, data = await (client or self.client).request(method, path, body, params)
+        except (OSError, asyncio.TimeoutError, ValueError) as e:
+            self.recorder.record(endpoint, time.perf_counter() - started, type(e).__name__)
+            return None, None
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return status, data
+
+    async def run_agent(self, node_id):
+        args = self.args
+        await asyncio.sleep(random.uniform(0, args.ramp))
+        cores = random.choice(args.node_cores)
+
+        client = self.client
+        while not self.stopping:
+            status, data = await self.call("register", {"node_id": node_id, "cpu_cores": cores})
+            if status == 200:
+                # A sharded API server hands out the shard owning the node
+                if data and data.get("shard_url"):
+                    client = self._client(data["shard_url"])
+                self.registered.add(node_id)
+                break
+            await asyncio.sleep(args.retry_interval)
+
+        pods = {}
+        tasks = [asyncio.ensure_future(self._heartbeat_loop(node_id, client, pods))]
+        if "poll" in self.endpoints:
+            tasks.append(asyncio.ensure_future(self._poll_loop(node_id, client, pods)))
+        await asyncio.gather(*tasks)
+
+    async def _heartbeat_loop(self, node_id, client, pods):
+        interval = self.args.heartbeat_interval
+        await asyncio.sleep(random.uniform(0, interval))
+        while not self.stopping:
+            body = {"node_id": node_id}
+            if self.args.protocol == "framework":
+                body["pod_metrics"] = {
+                    pod_id: {"cpu_usage": cpu_cores * 0.5, "memory_usage": 64, "io_rate": 0}
+                    for pod_id, cpu_cores in pods.items()
+                }
+            await self.call("heartbeat", body, client=client)
+            await asyncio.sleep(interval)
+
+    async def _poll_loop(self, node_id, client, pods):
+        interval = self.args.poll_interval
+        await asyncio.sleep(random.uniform(0, interval))
+        while not self.stopping:
+            status, data = await self.call("poll", params={"node_id": node_id, "status": "running",
+                                                           "fields": "cpu_cores"}, client=client)
+            if status == 200 and data:
+                pods.clear()
+                pods.update({pod_id: info.get("cpu_cores", 1) for pod_id, info in data.get("pods", {}).items()})
+            await asyncio.sleep(interval)
+
+    async def run_workload(self):
+        args = self.args
+        if args.launch_rate <= 0:
+            return
+        deletions = []
+        while not self.stopping:
+            await asyncio.sleep(random.expovariate(args.launch_rate))
+            if self.stopping:
+                break
+            deletions.append(asyncio.ensure_future(self._launch_pod()))
+        await asyncio.gather(*deletions, return_exceptions=True)
+
+    async def _launch_pod(self):
+        args = self.args
+        cpu_cores = random.choice(args.pod_cores)
+        if args.protocol == "root":
+            pod_id = f"pod-{random.getrandbits(32):08x}"
+            status, _ = await self.call("launch", {"pod_id": pod_id, "cpu": cpu_cores})
+        else:
+            status, data = await self.call("launch", {"cpu_cores": cpu_cores, "wait": not args.no_wait})
+            pod_id = data.get("pod_id") if data else None
+
+        if status in (200, 201):
+            self.pods["launched"] += 1
+        elif status == 202:
+            self.pods["pending"] += 1
+        else:
+            self.pods["rejected"] += 1
+            return
+        if "delete" not in self.endpoints or not pod_id or args.pod_lifetime <= 0:
+            return
+
+        # Live for an exponential lifetime, or until the run ends
+        lifetime = random.expovariate(1 / args.pod_lifetime)
+        deadline = time.monotonic() + lifetime
+        while not self.stopping and time.monotonic() < deadline:
+            await asyncio.sleep(min(1.0, deadline - time.monotonic()))
+        if not self.stopping:
+            status, _ = await self.call("delete", {"pod_id": pod_id})
+            if status == 200:
+                self.pods["deleted"] += 1
+
+    async def watch_failures(self):
+        """Count live simulated nodes that the server reports as not healthy"""
+        ours = set(self.node_ids)
+        while not self.stopping:
+            await asyncio.sleep(self.args.check_interval)
+            cursor = None
+            while not self.stopping:
+                params = {"fields": "status", "limit": 1000}
+                if cursor:
+                    params["cursor"] = cursor
+                status, data = await self.call("node_status", params=params)
+                if status != 200 or not data:
+                    break
+                for node_id, info in data.get("nodes", {}).items():
+                    if node_id in ours and node_id in self.registered and info.get("status") != "healthy":
+                        self.false_failures[node_id] += 1
+                cursor = data.get("next_cursor")
+                if not cursor:
+                    self.status_checks += 1
+                    break
+
+    async def run(self):
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(self.run_agent(node_id)) for node_id in self.node_ids]
+        tasks.append(asyncio.ensure_future(self.run_workload()))
+        tasks.append(asyncio.ensure_future(self.watch_failures()))
+        await asyncio.sleep(self.args.duration)
+        self.stopping = True
+        # Let in-flight requests finish, they count towards the results
+        await asyncio.wait(tasks, timeout=self.args.timeout + 1)
+        for task in tasks:
+            task.cancel()
+        duration = time.monotonic() - started
+        return {
+            "params": vars(self.args),
+            "duration": round(duration, 2),
+            "registered_nodes": len(self.registered),
+            "endpoints": self.recorder.report(duration),
+            "pods": self.pods,
+            "false_failures": {
+                "nodes": len(self.false_failures),
+                "observations": sum(self.false_failures.values()),
+                "checks": self.status_checks
+            }
+        }
+
+def parse_ints(value):
+    return [int(item) for item in value.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate many node agents and a pod workload against an API server")
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--protocol", choices=sorted(PROTOCOLS), default="framework",
+                        help="framework: node/node.py and api_server; root: node.py and APIServer.py")
+    parser.add_argument("--nodes", type=int, default=1000, help="simulated node agents")
+    parser.add_argument("--node-cores", type=parse_ints, default=[4, 8, 16], help="cores per node, picked at random")
+    parser.add_argument("--node-prefix", default="loadgen")
+    parser.add_argument("--duration", type=float, default=60, help="seconds")
+    parser.add_argument("--ramp", type=float, default=10, help="seconds over which agents register")
+    parser.add_argument("--heartbeat-interval", type=float, default=10)
+    parser.add_argument("--poll-interval", type=float, default=5)
+    parser.add_argument("--retry-interval", type=float, default=5, help="seconds between registration attempts")
+    parser.add_argument("--launch-rate", type=float, default=10, help="pod launches per second, 0 for none")
+    parser.add_argument("--pod-cores", type=parse_ints, default=[1, 2, 4], help="cores per pod, picked at random")
+    parser.add_argument("--pod-lifetime", type=float, default=30, help="mean seconds before a pod is deleted, 0 to keep")
+    parser.add_argument("--no-wait", action="store_true", help="don't wait for placement on launch (framework)")
+    parser.add_argument("--check-interval", type=float, default=5, help="seconds between node health checks")
+    parser.add_argument("--connections", type=int, default=64, help="keep-alive connections per server")
+    parser.add_argument("--timeout", type=float, default=10, help="seconds per request")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", default="load_generator_results.json")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    results = asyncio.run(LoadGenerator(args).run())
+
+    for endpoint, stats in results["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{endpoint:12} {stats['requests']:8} req {stats['throughput_rps']:9} rps "
+              f"{stats['error_rate']:7.2%} err  p50 {latency['p50']}ms p95 {latency['p95']}ms p99 {latency['p99']}ms")
+    print(f"pods: {results['pods']}")
+    print(f"false failure detections: {results['false_failures']}")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/scheduler_pipeline.py
+"""Launch throughput of the scheduling pipeline by number of scorer workers.
+
+Submits a burst of launches to a SchedulingPipeline and waits for all of
+them, once per worker count. Besides launches per second it reports how
+the dispatcher thread spent its time: scoring (snapshot pickling, shipping
+chunks to the workers and ranking) and committing, which is serial under
+the scheduler lock whatever the worker count.
+
+    python -m benchmarks.scheduler_pipeline --nodes 5000 --pods 20000 --workers 0 1 2 4
+"""
+import argparse
+import json
+import logging
+import time
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+from api_server.scheduler_pipeline import SchedulingPipeline
+
+def timed(stats, key, method):
+    def wrapper(*args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            stats[key] += time.perf_counter() - started
+    return wrapper
+
+def run(nodes, cores, pods, cpu_cores, workers, batch_size):
+    node_manager = NodeManager()
+    node_manager.register_nodes([(f"node-{i}", cores, None) for i in range(nodes)])
+    scheduler = PodScheduler(node_manager)
+    pipeline = SchedulingPipeline(scheduler, node_manager, workers=workers, batch_size=batch_size)
+    spent = {"score": 0.0, "commit": 0.0}
+    pipeline._score = timed(spent, "score", pipeline._score)
+    pipeline._commit = timed(spent, "commit", pipeline._commit)
+    pipeline.start()
+    try:
+        started = time.perf_counter()
+        futures = [pipeline.submit(f"pod-{i}", cpu_cores) for i in range(pods)]
+        placed = sum(1 for future in futures if future.result()["success"])
+        elapsed = time.perf_counter() - started
+    finally:
+        pipeline.stop()
+    return {
+        "workers": workers,
+        "placed": placed,
+        "seconds": round(elapsed, 3),
+        "pods_per_second": round(pods / elapsed),
+        "score_seconds": round(spent["score"], 3),
+        "commit_seconds": round(spent["commit"], 3),
+        "conflicts": pipeline.get_stats()["conflicts"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Scheduling pipeline throughput benchmark")
+    parser.add_argument("--nodes", type=int, default=5000)
+    parser.add_argument("--cores", type=int, default=16, help="cores per node")
+    parser.add_argument("--pods", type=int, default=20000)
+    parser.add_argument("--cpu-cores", type=int, default=2, help="cores per pod")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    # The scheduler logs every placement at INFO
+    logging.disable(logging.WARNING)
+    results = [run(args.nodes, args.cores, args.pods, args.cpu_cores, workers, args.batch_size)
+               for workers in args.workers]
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"params": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
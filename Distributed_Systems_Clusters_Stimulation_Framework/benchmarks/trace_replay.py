@@ -0,0 +1,314 @@
+# benchmarks/trace_replay.py
+"""Replay cluster traces against PodScheduler and NodeManager.
+
+Traces are streamed from local CSV files (optionally gzipped) in chunks, so
+multi-gigabyte traces never have to fit in memory. Supported layouts:
+    google   Google cluster-data 2011 task_events: no header; timestamp in
+             microseconds, job id, task index, event type and a CPU request
+             normalized to the largest machine (--machine-cores). Tasks are
+             placed on SUBMIT and removed on their EVICT/FAIL/FINISH/KILL/LOST
+             event.
+    alibaba  Alibaba cluster-trace-v2018 batch_task: no header; start and
+             end time in seconds, instance count and plan_cpu in percent of
+             a core. Every instance becomes a pod.
+    generic  a header with submit_time, duration and cpu_cores columns
+             (seconds), and optionally task_id.
+Traces should be sorted by time; --reorder-window buffers that many events
+to absorb small disorder, later ones are replayed at the current time.
+
+The cluster is simulated in-process. Time advances with the trace, slept
+out at --speed trace seconds per real second (0 replays as fast as
+possible). Pods that fit nowhere wait in the scheduler's pending queue.
+
+    python -m benchmarks.trace_replay task_events/part-00000-of-00500.csv.gz --format google --nodes 500
+    python -m benchmarks.trace_replay jobs.csv --format generic --speed 3600 --output replay.json
+
+The output has a utilization curve, queueing delay percentiles and
+failure counts.
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import math
+import time
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+
+# Google task_events event types
+GOOGLE_SUBMIT = 0
+GOOGLE_END_EVENTS = {2, 3, 4, 5, 6}  # evict, fail, finish, kill, lost
+
+def read_chunks(path, chunk_size):
+    """Yield lists of up to chunk_size CSV rows"""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", newline="") as f:
+        reader = csv.reader(f)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def _float(value, default=None):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+def google_events(path, chunk_size, machine_cores):
+    for chunk in read_chunks(path, chunk_size):
+        for row in chunk:
+            if len(row) < 10:
+                continue
+            timestamp = _float(row[0])
+            event_type = _float(row[5])
+            if timestamp is None or event_type is None:
+                continue
+            task_id = f"{row[2]}-{row[3]}"
+            if event_type == GOOGLE_SUBMIT:
+                cpu = _float(row[9], 0.0)
+                yield (timestamp / 1e6, "submit", task_id, max(1, math.ceil(cpu * machine_cores)), None)
+            elif event_type in GOOGLE_END_EVENTS:
+                yield (timestamp / 1e6, "end", task_id, None, None)
+
+def alibaba_events(path, chunk_size):
+    for chunk in read_chunks(path, chunk_size):
+        for row in chunk:
+            if len(row) < 8:
+                continue
+            start, end = _float(row[5]), _float(row[6])
+            instances = int(_float(row[1], 0) or 0)
+            if start is None or end is None or end < start or instances <= 0:
+                continue
+            cpu_cores = max(1, math.ceil(_float(row[7], 100.0) / 100))
+            for i in range(instances):
+                yield (start, "submit", f"{row[2]}-{row[0]}-{i}", cpu_cores, end - start)
+
+def generic_events(path, chunk_size):
+    header = None
+    row_no = 0
+    for chunk in read_chunks(path, chunk_size):
+        for row in chunk:
+            if header is None:
+                header = {name.strip(): i for i, name in enumerate(row)}
+                missing = {"submit_time", "duration", "cpu_cores"} - set(header)
+                if missing:
+                    raise ValueError(f"Trace is missing columns: {', '.join(sorted(missing))}")
+                continue
+            row_no += 1
+            submit = _float(row[header["submit_time"]])
+            duration = _float(row[header["duration"]])
+            cpu_cores = _float(row[header["cpu_cores"]])
+            if submit is None or duration is None or not cpu_cores:
+                continue
+            task_id = row[header["task_id"]] if "task_id" in header else f"task-{row_no}"
+            yield (submit, "submit", task_id, max(1, math.ceil(cpu_cores)), duration)
+
+def reorder(events, window):
+    """Emit events in time order as long as they are at most window events out of place"""
+    buffer = []
+    for seq, event in enumerate(events):
+        heapq.heappush(buffer, (event[0], seq, event))
+        if len(buffer) > window:
+            yield heapq.heappop(buffer)[2]
+    while buffer:
+        yield heapq.heappop(buffer)[2]
+
+def percentiles(values):
+    if not values:
+        return None
+    values = sorted(values)
+    return {name: round(values[min(len(values) - 1, int(q * len(values)))], 3)
+            for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))}
+
+class PlacementLog:
+    """Stands in for the scheduler's mutation log to learn which pending pods were placed"""
+    def __init__(self, placed):
+        self.placed = placed
+
+    def append(self, kind, key, value):
+        if kind == "pod" and value is not None and value["node_id"] is not None:
+            self.placed.append(key)
+
+class TraceReplay:
+    def __init__(self, nodes, node_cores, speed=0, sample_interval=60, max_pending=100000):
+        self.node_manager = NodeManager()
+        for i in range(nodes):
+            self.node_manager.register_node(f"node-{i}", node_cores)
+        self.total_cores = nodes * node_cores
+        self.node_cores = node_cores
+        self.scheduler = PodScheduler(self.node_manager, max_pending=max_pending)
+        self.placed = []
+        self.scheduler.set_mutation_log(PlacementLog(self.placed))
+        self.speed = speed
+        self.sample_interval = sample_interval
+        self.finishes = []  # heap of (trace time, pod_id) for pods with a known duration
+        self.durations = {}  # pod_id -> duration, for pods waiting to start
+        self.waiting = {}  # pod_id -> submit time, pods in the pending queue
+        self.running = set()
+        self.delays = []  # seconds between submit and start
+        self.curve = []  # [trace time, allocated fraction, running pods, pending pods]
+        self.counts = {"submitted": 0, "started": 0, "finished": 0, "rejected": 0,
+                       "too_large": 0, "ended_pending": 0, "duplicates": 0, "out_of_order": 0}
+        self.now = None
+        self.next_sample = None
+        self.real_start = None
+        self.trace_start = None
+
+    def _advance(self, timestamp):
+        """Move trace time forward, sampling the curve and pacing the replay"""
+        if self.now is None:
+            self.now = self.trace_start = self.next_sample = timestamp
+            self.real_start = time.monotonic()
+        if timestamp < self.now:
+            self.counts["out_of_order"] += 1
+            return
+        while self.next_sample <= timestamp:
+            self._sample(self.next_sample)
+            self.next_sample += self.sample_interval
+        self.now = timestamp
+        if self.speed > 0:
+            delay = self.real_start + (timestamp - self.trace_start) / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _sample(self, timestamp):
+        available = sum(info["available_cores"] for info in self.node_manager.get_healthy_nodes().values())
+        self.curve.append([round(timestamp - self.trace_start, 3),
+                           round(1 - available / self.total_cores, 4) if self.total_cores else 0.0,
+                           len(self.running), len(self.waiting)])
+
+    def _started(self, pod_id, submitted):
+        self.running.add(pod_id)
+        self.counts["started"] += 1
+        self.delays.append(self.now - submitted)
+        duration = self.durations.pop(pod_id, None)
+        if duration is not None:
+            heapq.heappush(self.finishes, (self.now + duration, pod_id))
+
+    def submit(self, pod_id, cpu_cores, duration):
+        if pod_id in self.running or pod_id in self.waiting:
+            self.counts["duplicates"] += 1  # e.g. a resubmitted Google task still in flight
+            return
+        self.counts["submitted"] += 1
+        if cpu_cores > self.node_cores:
+            self.counts["too_large"] += 1
+            return
+        if duration is not None:
+            self.durations[pod_id] = duration
+        # Rank candidates the way the launch pipeline does, then commit or queue
+        candidates = self.scheduler.candidates.candidates(cpu_cores, self.scheduler.scheduling_algorithm, 3)
+        result = self.scheduler.commit_placement(pod_id, cpu_cores, candidates, queue_if_unschedulable=True)
+        if result["success"]:
+            self._started(pod_id, self.now)
+        elif result.get("pending"):
+            self.waiting[pod_id] = self.now
+        else:
+            self.durations.pop(pod_id, None)
+            self.counts["rejected"] += 1
+
+    def end(self, pod_id):
+        if pod_id in self.running:
+            self.running.discard(pod_id)
+            self.counts["finished"] += 1
+        elif pod_id in self.waiting:
+            del self.waiting[pod_id]
+            self.durations.pop(pod_id, None)
+            self.counts["ended_pending"] += 1
+        else:
+            return
+        self.scheduler.unschedule_pod(pod_id)
+        self._place_pending()
+
+    def _place_pending(self):
+        self.placed.clear()
+        if self.waiting and self.scheduler.retry_pending():
+            for pod_id in self.placed:
+                submitted = self.waiting.pop(pod_id, None)
+                if submitted is not None:
+                    self._started(pod_id, submitted)
+
+    def _finish_until(self, timestamp):
+        while self.finishes and self.finishes[0][0] <= timestamp:
+            finish, pod_id = heapq.heappop(self.finishes)
+            self._advance(finish)
+            self.end(pod_id)
+
+    def run(self, events, limit=None):
+        for i, (timestamp, kind, pod_id, cpu_cores, duration) in enumerate(events):
+            if limit is not None and i >= limit:
+                break
+            self._finish_until(timestamp)
+            self._advance(timestamp)
+            if kind == "submit":
+                self.submit(pod_id, cpu_cores, duration)
+            else:
+                self.end(pod_id)
+        # Play out the pods still running
+        self._finish_until(float("inf"))
+        if self.now is not None:
+            self._sample(self.now)
+        return self.report()
+
+    def report(self):
+        return {
+            "trace_seconds": round(self.now - self.trace_start, 3) if self.now is not None else 0,
+            "total_cores": self.total_cores,
+            "tasks": dict(self.counts, still_pending=len(self.waiting), still_running=len(self.running)),
+            "queueing_delay_seconds": percentiles(self.delays),
+            "mean_utilization": round(sum(point[1] for point in self.curve) / len(self.curve), 4) if self.curve else 0.0,
+            "utilization": self.curve
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a cluster trace against the scheduler")
+    parser.add_argument("trace", help="CSV trace file, optionally .gz")
+    parser.add_argument("--format", choices=("google", "alibaba", "generic"), default="generic")
+    parser.add_argument("--nodes", type=int, default=100)
+    parser.add_argument("--node-cores", type=int, default=16)
+    parser.add_argument("--machine-cores", type=int, default=16,
+                        help="cores of the largest machine, to scale Google's normalized CPU requests")
+    parser.add_argument("--algorithm", choices=("first-fit", "best-fit", "worst-fit"), default="best-fit")
+    parser.add_argument("--speed", type=float, default=0, help="trace seconds per real second, 0 for no pacing")
+    parser.add_argument("--sample-interval", type=float, default=60, help="trace seconds between utilization samples")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="rows read at a time")
+    parser.add_argument("--reorder-window", type=int, default=10000, help="events buffered to fix small disorder")
+    parser.add_argument("--limit", type=int, help="replay at most this many events")
+    parser.add_argument("--output", default="trace_replay.json")
+    parser.add_argument("--curve-csv", help="also write the utilization curve as CSV")
+    args = parser.parse_args()
+
+    # The scheduler logs every placement at INFO
+    logging.disable(logging.WARNING)
+    if args.format == "google":
+        events = google_events(args.trace, args.chunk_size, args.machine_cores)
+    elif args.format == "alibaba":
+        events = alibaba_events(args.trace, args.chunk_size)
+    else:
+        events = generic_events(args.trace, args.chunk_size)
+
+    replay = TraceReplay(args.nodes, args.node_cores, speed=args.speed, sample_interval=args.sample_interval)
+    replay.scheduler.set_scheduling_algorithm(args.algorithm)
+    started = time.monotonic()
+    results = replay.run(reorder(events, args.reorder_window), limit=args.limit)
+    results["replay_seconds"] = round(time.monotonic() - started, 3)
+    results["params"] = vars(args)
+
+    summary = {key: value for key, value in results.items() if key not in ("utilization", "params")}
+    print(json.dumps(summary, indent=2))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    if args.curve_csv:
+        with open(args.curve_csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["trace_seconds", "allocated_fraction", "running_pods", "pending_pods"])
+            writer.writerows(results["utilization"])
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/udp_heartbeat.py
+"""Heartbeat ingestion rate of the UDP heartbeat listener.
+
+Registers --nodes nodes with an in-process NodeManager (publishing to a
+MutationLog, as in app.py) and feeds the UdpHeartbeatListener
+--rounds heartbeats per node, each carrying --pods pod metrics:
+    apply   datagrams are handed to UdpHeartbeatListener.process in
+            batches, measuring decoding and applying alone
+    socket  a separate process sends the datagrams over loopback at
+            --rate per second and the listener thread receives them;
+            datagrams the socket buffer had no room for are reported as
+            dropped
+
+    python -m benchmarks.udp_heartbeat --nodes 10000 --rounds 10
+    python -m benchmarks.udp_heartbeat --mode socket --nodes 10000 --rate 50000
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import socket
+import time
+
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+from api_server.health_monitor import HealthMonitor
+from api_server.resource_monitor import ResourceMonitor
+from api_server.replication import MutationLog
+from api_server.udp_heartbeat import UdpHeartbeatListener, encode_heartbeat
+
+def build_datagrams(handles, rounds, pods):
+    """Every node's heartbeats for one round, then the next round"""
+    metrics = {handle: {f"pod-{handle}-{i}": {"cpu_usage": 0.5, "memory_usage": 64.0, "io_rate": 1.0}
+                        for i in range(pods)} for handle in handles}
+    return [encode_heartbeat(handle, seq, metrics[handle]) for seq in range(1, rounds + 1) for handle in handles]
+
+def send_datagrams(datagrams, port, rate):
+    """Send in chunks of a millisecond's worth, sleeping to keep to the rate"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    chunk = max(1, rate // 1000)
+    started = time.perf_counter()
+    for i in range(0, len(datagrams), chunk):
+        for datagram in datagrams[i:i + chunk]:
+            sock.sendto(datagram, ("127.0.0.1", port))
+        delay = started + (i + chunk) / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure UDP heartbeat ingestion")
+    parser.add_argument("--mode", choices=("apply", "socket"), default="apply")
+    parser.add_argument("--nodes", type=int, default=10000)
+    parser.add_argument("--rounds", type=int, default=10, help="heartbeats sent per node")
+    parser.add_argument("--pods", type=int, default=0, help="pod metrics carried by each heartbeat")
+    parser.add_argument("--rate", type=int, default=50000, help="datagrams sent per second with --mode socket")
+    parser.add_argument("--batch-size", type=int, default=1024, help="datagrams applied per lock acquisition")
+    parser.add_argument("--no-log", action="store_true", help="don't publish to a mutation log")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    node_manager = NodeManager()
+    PodScheduler(node_manager)
+    health_monitor = HealthMonitor(node_manager)
+    resource_monitor = ResourceMonitor(node_manager)
+    if not args.no_log:
+        mutation_log = MutationLog()
+        node_manager.set_mutation_log(mutation_log)
+        resource_monitor.set_mutation_log(mutation_log)
+    node_ids = [f"node-{i:05d}" for i in range(args.nodes)]
+    node_manager.register_nodes([(node_id, 4, None) for node_id in node_ids])
+
+    listener = UdpHeartbeatListener(health_monitor, resource_monitor, host="127.0.0.1", port=0,
+                                    batch_size=args.batch_size)
+    handles = [listener.handle_for(node_id) for node_id in node_ids]
+    datagrams = build_datagrams(handles, args.rounds, args.pods)
+
+    started = time.perf_counter()
+    if args.mode == "apply":
+        for i in range(0, len(datagrams), args.batch_size):
+            listener.process(datagrams[i:i + args.batch_size])
+    else:
+        listener.start_listening()
+        sender = multiprocessing.Process(target=send_datagrams, args=(datagrams, listener.port, args.rate))
+        sender.start()
+        sender.join()
+        # Wait until the listener has drained what the socket kept
+        received, last_change = -1, time.perf_counter()
+        while time.perf_counter() - last_change < 0.5:
+            if listener.get_stats()["received"] != received:
+                received, last_change = listener.get_stats()["received"], time.perf_counter()
+            time.sleep(0.01)
+        listener.stop_listening()
+    elapsed = (last_change if args.mode == "socket" else time.perf_counter()) - started
+
+    stats = listener.get_stats()
+    print(json.dumps({
+        "mode": args.mode,
+        "nodes": args.nodes,
+        "pods_per_heartbeat": args.pods,
+        "datagram_bytes": len(datagrams[0]),
+        "sent": len(datagrams),
+        "received": stats["received"],
+        "dropped": len(datagrams) - stats["received"],
+        "stale": stats["stale"],
+        "malformed": stats["malformed"],
+        "seconds": round(elapsed, 3),
+        "heartbeats_per_second": round(stats["received"] / elapsed)
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
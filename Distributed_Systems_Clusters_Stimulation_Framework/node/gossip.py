@@ -0,0 +1,331 @@
+# node/gossip.py
+"""SWIM-style membership among node agents.
+
+Each protocol period a member pings the next member of a shuffled round
+robin. If no ack comes within ack_timeout, it asks indirect_probes other
+members to ping the target on its behalf. If there is still no ack by the
+end of the period, the target becomes suspect. A suspect that does not
+refute the suspicion within the suspicion timeout, which grows with
+log(members), is confirmed dead. A member refutes a suspicion about itself
+by raising its incarnation number and announcing that it is alive.
+
+Membership changes (alive, suspect, dead) ride along on pings and acks.
+Each change is retransmitted a number of times that grows with
+log(members), the least-sent changes first. A joining member asks a seed
+for the full member list once. After that, every member learns of later
+joins and failures from the piggybacked updates. Every sync_every
+periods a member also pulls the member list of a random member, which
+repairs views that missed an update once its retransmissions ran out.
+
+Only the member that raised a suspicion reports the confirmed failure, via
+on_confirmed, so the API server hears about each failure a handful of
+times however big the fleet is. Incarnations start at the current time,
+so a restarted agent always comes back newer than the failure that was
+recorded for it.
+
+Messages are compact JSON in single UDP datagrams:
+    {"t": "ping" | "ack" | "req" | "join" | "sync", "f": sender, "s": seq, "u": [updates]}
+    update = [state, node_id, incarnation, host, port]
+"""
+import json
+import math
+import random
+import socket
+import threading
+import time
+from threading import Lock, Event
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALIVE, SUSPECT, DEAD = "alive", "suspect", "dead"
+RANK = {ALIVE: 0, SUSPECT: 1, DEAD: 2}  # which state wins at the same incarnation
+MAX_DATAGRAM = 1400
+MAX_PIGGYBACK = 8  # updates per message
+
+class GossipMember:
+    def __init__(self, node_id, host="0.0.0.0", port=7946, advertise_host=None, on_confirmed=None,
+                 protocol_period=1.0, ack_timeout=0.3, indirect_probes=3, suspicion_mult=4, retransmit_mult=3,
+                 sync_every=30):
+        self.node_id = node_id
+        self.host = host
+        self.port = port
+        self.advertise_host = advertise_host or socket.gethostbyname(socket.gethostname())
+        self.on_confirmed = on_confirmed  # callback(node_id, state, incarnation) for failures this member confirmed
+        self.protocol_period = protocol_period  # seconds between probes
+        self.ack_timeout = ack_timeout
+        self.indirect_probes = indirect_probes  # members asked to probe when a direct ping goes unanswered
+        self.suspicion_mult = suspicion_mult
+        self.retransmit_mult = retransmit_mult
+        self.sync_every = sync_every  # protocol periods between member list pulls
+        self.periods = 0
+        self.lock = Lock()
+        self.incarnation = int(time.time())
+        self.members = {}  # node_id -> {"addr", "state", "incarnation", "since", "mine"}
+        self.updates = {}  # node_id -> [update, transmissions left]
+        self.probe_order = []
+        self.seq = 0
+        self.acks = {}  # seq -> Event set when the probe with that seq is acked
+        self.relays = {}  # seq of a ping we sent for someone else -> (their address, their seq)
+        self.stats = {"sent": 0, "received": 0, "probes": 0, "indirect_probes": 0, "suspected": 0,
+                      "confirmed": 0, "reported": 0, "refuted": 0}
+        self.sock = None
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        """Bind the socket and start the receive and probe threads"""
+        with self.lock:
+            if self.running:
+                return False
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.bind((self.host, self.port))
+            self.port = self.sock.getsockname()[1]
+            self.sock.settimeout(0.5)
+            self.running = True
+            self.threads = [threading.Thread(target=self._receive_loop, daemon=True),
+                            threading.Thread(target=self._probe_loop, daemon=True)]
+            for thread in self.threads:
+                thread.start()
+            return True
+
+    def stop(self):
+        """Stop gossiping; the other members will find this member dead"""
+        with self.lock:
+            if not self.running:
+                return False
+            self.running = False
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.sock.close()
+        return True
+
+    def join(self, seeds):
+        """Join through seeds, a list of {"node_id", "host", "port"}, asking each for the member list"""
+        message = {"t": "join", "f": self.node_id, "u": [self._self_update()]}
+        for seed in seeds:
+            if seed["node_id"] != self.node_id:
+                self._send(message, (seed["host"], seed["port"]))
+
+    def alive_members(self):
+        with self.lock:
+            return sorted(node_id for node_id, member in self.members.items() if member["state"] != DEAD)
+
+    def get_stats(self):
+        with self.lock:
+            states = {ALIVE: 0, SUSPECT: 0, DEAD: 0}
+            for member in self.members.values():
+                states[member["state"]] += 1
+            return dict(self.stats, incarnation=self.incarnation, members=states)
+
+    # ---- protocol period ----
+
+    def _probe_loop(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                self._probe_once()
+                self._expire_suspects()
+                self.periods += 1
+                if self.periods % self.sync_every == 0:
+                    self._pull_member_list()
+            except Exception as e:
+                logger.error(f"Error in gossip probe: {e}")
+            time.sleep(max(0.0, self.protocol_period - (time.monotonic() - started)))
+
+    def _probe_once(self):
+        with self.lock:
+            target = self._next_target()
+            if target is None:
+                return
+            seq = self._next_seq()
+            acked = self.acks[seq] = Event()
+            addr = self.members[target]["addr"]
+            self.stats["probes"] += 1
+        self._send({"t": "ping", "f": self.node_id, "s": seq}, addr)
+        if not acked.wait(self.ack_timeout):
+            with self.lock:
+                helpers = [node_id for node_id, member in self.members.items()
+                           if member["state"] == ALIVE and node_id != target]
+                helpers = random.sample(helpers, min(self.indirect_probes, len(helpers)))
+                helper_addrs = [self.members[node_id]["addr"] for node_id in helpers]
+                self.stats["indirect_probes"] += len(helpers)
+            for helper_addr in helper_addrs:
+                self._send({"t": "req", "f": self.node_id, "s": seq, "target": addr}, helper_addr)
+            acked.wait(max(0.0, self.protocol_period - self.ack_timeout))
+        with self.lock:
+            self.acks.pop(seq, None)
+            member = self.members.get(target)
+            if not acked.is_set() and member is not None and member["state"] == ALIVE:
+                self.stats["suspected"] += 1
+                self._apply([SUSPECT, target, member["incarnation"], *member["addr"]], mine=True)
+
+    def _pull_member_list(self):
+        with self.lock:
+            live = [member["addr"] for member in self.members.values() if member["state"] == ALIVE]
+        if live:
+            self._send({"t": "join", "f": self.node_id, "u": [self._self_update()]}, random.choice(live),
+                       piggyback=False)
+
+    def _next_target(self):
+        # Called with self.lock held; shuffled round robin over the live members
+        while self.probe_order:
+            node_id = self.probe_order.pop()
+            member = self.members.get(node_id)
+            if member is not None and member["state"] != DEAD:
+                return node_id
+        self.probe_order = [node_id for node_id, member in self.members.items() if member["state"] != DEAD]
+        random.shuffle(self.probe_order)
+        return self.probe_order.pop() if self.probe_order else None
+
+    def _expire_suspects(self):
+        now = time.monotonic()
+        confirmed = []
+        with self.lock:
+            timeout = self._suspicion_timeout()
+            for node_id, member in list(self.members.items()):
+                if member["state"] == SUSPECT and now - member["since"] > timeout:
+                    mine = member["mine"]
+                    self._apply([DEAD, node_id, member["incarnation"], *member["addr"]])
+                    self.stats["confirmed"] += 1
+                    if mine:
+                        confirmed.append((node_id, member["incarnation"]))
+                elif member["state"] == DEAD and now - member["since"] > 10 * timeout:
+                    del self.members[node_id]  # tombstones only need to outlive the gossip about them
+        for node_id, incarnation in confirmed:
+            logger.info(f"Gossip confirmed {node_id} dead")
+            if self.on_confirmed is not None:
+                self.stats["reported"] += 1
+                try:
+                    self.on_confirmed(node_id, DEAD, incarnation)
+                except Exception as e:
+                    logger.error(f"Failed to report {node_id} dead: {e}")
+
+    def _suspicion_timeout(self):
+        return self.suspicion_mult * max(1.0, math.log10(len(self.members) + 1)) * self.protocol_period
+
+    # ---- messages ----
+
+    def _receive_loop(self):
+        while self.running:
+            try:
+                data, addr = self.sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.running:
+                    logger.error("Gossip socket failed")
+                break
+            try:
+                self._handle(json.loads(data), addr)
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning(f"Dropped gossip message from {addr}: {e}")
+
+    def _handle(self, message, addr):
+        kind = message["t"]
+        with self.lock:
+            self.stats["received"] += 1
+            # A member list answering a join is news to the joiner only, don't spread it
+            for update in message.get("u", ()):
+                self._apply(update, spread=kind != "sync")
+        if kind == "ping":
+            self._send({"t": "ack", "f": self.node_id, "s": message["s"]}, addr)
+        elif kind == "ack":
+            with self.lock:
+                acked = self.acks.get(message["s"])
+                relay = self.relays.pop(message["s"], None)
+            if acked is not None:
+                acked.set()
+            elif relay is not None:
+                requester_addr, requester_seq = relay
+                self._send({"t": "ack", "f": self.node_id, "s": requester_seq}, requester_addr)
+        elif kind == "req":
+            with self.lock:
+                seq = self._next_seq()
+                self.relays[seq] = (addr, message["s"])
+                if len(self.relays) > 1024:  # acks that never came
+                    del self.relays[next(iter(self.relays))]
+            self._send({"t": "ping", "f": self.node_id, "s": seq}, tuple(message["target"]))
+        elif kind == "join":
+            self._send_member_list(addr)
+
+    def _send_member_list(self, addr):
+        """Answer a join with every known live member, in as many datagrams as it takes"""
+        with self.lock:
+            updates = [self._self_update()] + [
+                [member["state"], node_id, member["incarnation"], *member["addr"]]
+                for node_id, member in self.members.items() if member["state"] != DEAD]
+        batch, size = [], 0
+        for update in updates:
+            length = len(json.dumps(update)) + 1
+            if batch and size + length > MAX_DATAGRAM - 64:
+                self._send({"t": "sync", "f": self.node_id, "u": batch}, addr, piggyback=False)
+                batch, size = [], 0
+            batch.append(update)
+            size += length
+        self._send({"t": "sync", "f": self.node_id, "u": batch}, addr, piggyback=False)
+
+    def _send(self, message, addr, piggyback=True):
+        if piggyback:
+            with self.lock:
+                updates = self._piggyback()
+            if updates:
+                message["u"] = updates
+        data = json.dumps(message, separators=(",", ":")).encode()
+        try:
+            self.sock.sendto(data, addr)
+        except OSError as e:
+            logger.debug(f"Failed to send gossip to {addr}: {e}")
+            return
+        with self.lock:
+            self.stats["sent"] += 1
+
+    # ---- membership state, called with self.lock held ----
+
+    def _next_seq(self):
+        self.seq += 1
+        return self.seq
+
+    def _self_update(self):
+        return [ALIVE, self.node_id, self.incarnation, self.advertise_host, self.port]
+
+    def _apply(self, update, mine=False, spread=True):
+        """Merge an update; newer incarnations win, then dead over suspect over alive"""
+        state, node_id, incarnation, host, port = update
+        if node_id == self.node_id:
+            if state != ALIVE and incarnation >= self.incarnation:
+                self.incarnation = incarnation + 1
+                self.stats["refuted"] += 1
+                self._queue(self._self_update())
+            return
+        member = self.members.get(node_id)
+        if member is not None:
+            if (incarnation, RANK[state]) <= (member["incarnation"], RANK[member["state"]]):
+                return
+        elif state == DEAD:
+            return
+        self.members[node_id] = {
+            "addr": (host, port),
+            "state": state,
+            "incarnation": incarnation,
+            "since": time.monotonic(),
+            "mine": mine  # whether this member raised the suspicion, and so reports the failure
+        }
+        if spread:
+            self._queue([state, node_id, incarnation, host, port])
+
+    def _queue(self, update):
+        limit = self.retransmit_mult * max(1, math.ceil(math.log10(len(self.members) + 1)))
+        self.updates[update[1]] = [update, limit]
+
+    def _piggyback(self):
+        if not self.updates:
+            return []
+        chosen = sorted(self.updates.items(), key=lambda item: -item[1][1])[:MAX_PIGGYBACK]
+        updates = []
+        for node_id, entry in chosen:
+            updates.append(entry[0])
+            entry[1] -= 1
+            if entry[1] <= 0:
+                del self.updates[node_id]
+        return updates
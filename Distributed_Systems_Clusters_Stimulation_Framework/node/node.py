@@ -4,9 +4,15 @@ import time
 import requests
 import random
 import json
+import socket
+import struct
+from urllib.parse import urlparse
 from threading import Thread
 import logging
 
+from node.workload import WorkloadManager
+from node.gossip import GossipMember
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -18,14 +24,61 @@ logger = logging.getLogger(__name__)
 NODE_ID = os.getenv("NODE_ID", f"node-{random.randint(1000, 9999)}")
 CPU_CORES = int(os.getenv("CPU_CORES", "2"))
 API_SERVER = os.getenv("API_SERVER", "http://api_server:5000")
-HEARTBEAT_INTERVAL = 10  # seconds
+# Node labels for placement constraints, e.g. "zone=a,rack=r1,instance_type=c5"
+NODE_LABELS = dict(
+    item.split("=", 1) for item in os.getenv("NODE_LABELS", "").split(",") if "=" in item
+)
+HEARTBEAT_INTERVAL = 10  # seconds, until the API server tells us otherwise
+# Intensity of the simulated pod workloads that are actually run and measured
+POD_CPU_DUTY = float(os.getenv("POD_CPU_DUTY", "0.5"))  # busy share of each requested core
+POD_MEMORY_MB = float(os.getenv("POD_MEMORY_MB", "64"))  # memory held per pod
 REGISTRATION_RETRY_INTERVAL = 5  # seconds
+# When the server hands out a UDP heartbeat handle, only every Nth heartbeat
+# goes over HTTP, which notices a server that forgot this node
+HTTP_HEARTBEAT_EVERY = int(os.getenv("HTTP_HEARTBEAT_EVERY", "6"))
+# UDP port for gossip failure detection among the nodes; unset disables it
+GOSSIP_PORT = os.getenv("GOSSIP_PORT")
+GOSSIP_ADVERTISE_HOST = os.getenv("GOSSIP_ADVERTISE_HOST")  # address other nodes reach us at
+
+# UDP heartbeat datagram, the same format as api_server/udp_heartbeat.py
+HEARTBEAT_HEADER = struct.Struct("!2sBBIIH")
+HEARTBEAT_POD = struct.Struct("!fff")
+MAX_HEARTBEAT_DATAGRAM = 1400
+
+def encode_heartbeat(handle, seq, pod_metrics):
+    """Pack a heartbeat datagram, or return None when the metrics don't fit in one"""
+    parts = [HEARTBEAT_HEADER.pack(b"HB", 1, 0, handle, seq & 0xFFFFFFFF, len(pod_metrics))]
+    size = HEARTBEAT_HEADER.size
+    for pod_id, metrics in pod_metrics.items():
+        raw_id = pod_id.encode()
+        size += 1 + len(raw_id) + HEARTBEAT_POD.size
+        if len(raw_id) > 255 or size > MAX_HEARTBEAT_DATAGRAM:
+            return None
+        parts.append(bytes((len(raw_id),)) + raw_id)
+        parts.append(HEARTBEAT_POD.pack(metrics.get("cpu_usage", 0), metrics.get("memory_usage", 0),
+                                        metrics.get("io_rate", 0)))
+    return b"".join(parts)
 
 class Node:
     def __init__(self):
         self.pods = []  # List of pod IDs
         self.pod_resources = {}  # pod_id -> cpu_cores
+        self.workloads = WorkloadManager(duty=POD_CPU_DUTY, memory_mb=POD_MEMORY_MB)
         self.running = True
+        # Server handling heartbeats and pod polls; a sharded API server
+        # answers registration with the URL of the shard owning this node
+        self.api_server = API_SERVER
+        self.registered = False
+        self.heartbeat_interval = HEARTBEAT_INTERVAL
+        # (host, port) and handle for UDP heartbeats, if the server accepts them
+        self.udp_target = None
+        self.heartbeat_handle = None
+        self.heartbeat_seq = 0
+        self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.gossip = None
+        if GOSSIP_PORT:
+            self.gossip = GossipMember(NODE_ID, port=int(GOSSIP_PORT), advertise_host=GOSSIP_ADVERTISE_HOST,
+                                       on_confirmed=self._report_failure)
         
         # Poll for pod assignments every 15 seconds
         self.pod_poll_thread = Thread(target=self._poll_for_pods, daemon=True)
@@ -38,12 +91,26 @@ class Node:
                     f"{API_SERVER}/api/nodes/register",
                     json={
                         "node_id": NODE_ID,
-                        "cpu_cores": CPU_CORES
+                        "cpu_cores": CPU_CORES,
+                        "labels": NODE_LABELS
                     },
                     timeout=5
                 )
                 if response.status_code == 200:
-                    logger.info(f"Node {NODE_ID} registered successfully")
+                    body = response.json()
+                    self.api_server = body.get("shard_url", API_SERVER)
+                    self._set_heartbeat_interval(body)
+                    if body.get("udp_port"):
+                        # Registration restarts the sequence the server expects
+                        self.udp_target = (urlparse(self.api_server).hostname, body["udp_port"])
+                        self.heartbeat_handle = body["heartbeat_handle"]
+                        self.heartbeat_seq = 0
+                    else:
+                        self.udp_target = None
+                    self.registered = True
+                    logger.info(f"Node {NODE_ID} registered successfully via {self.api_server}")
+                    if self.gossip is not None:
+                        self._join_gossip()
                     return True
                 else:
                     logger.warning(f"Failed to register node: {response.text}")
@@ -53,59 +120,102 @@ class Node:
             logger.info(f"Retrying registration in {REGISTRATION_RETRY_INTERVAL} seconds...")
             time.sleep(REGISTRATION_RETRY_INTERVAL)
     
+    def _join_gossip(self):
+        """Tell the API server our gossip address and join through the seeds it returns"""
+        try:
+            response = requests.post(
+                f"{self.api_server}/api/gossip/join",
+                json={"node_id": NODE_ID, "host": self.gossip.advertise_host, "port": self.gossip.port},
+                timeout=5
+            )
+            if response.status_code == 200:
+                seeds = response.json().get("seeds", [])
+                self.gossip.join(seeds)
+                logger.info(f"Joined gossip through {[seed['node_id'] for seed in seeds]}")
+            else:
+                logger.warning(f"Failed to join gossip: {response.text}")
+        except Exception as e:
+            logger.error(f"Error joining gossip: {str(e)}")
+
+    def _report_failure(self, node_id, state, incarnation):
+        """Gossip callback: report a node this agent confirmed dead"""
+        response = requests.post(
+            f"{self.api_server}/api/gossip/report",
+            json={"reporter": NODE_ID, "node_id": node_id, "state": state, "incarnation": incarnation},
+            timeout=5
+        )
+        if response.status_code != 200:
+            logger.warning(f"Failure report for {node_id} refused: {response.text}")
+
     def _poll_for_pods(self):
         """Poll the API server for pod assignments"""
         while self.running:
             try:
-                # Get node information
-                response = requests.get(f"{API_SERVER}/api/nodes", timeout=5)
+                # Only fetch the running pods assigned to this node (not gang
+                # members that are merely reserved), and only the fields we use
+                response = requests.get(
+                    f"{self.api_server}/api/pods",
+                    params={"node_id": NODE_ID, "status": "running", "fields": "cpu_cores"},
+                    timeout=5
+                )
                 if response.status_code == 200:
-                    nodes = response.json().get("nodes", {})
-                    if NODE_ID in nodes:
-                        node_info = nodes[NODE_ID]
-                        assigned_pod_ids = node_info.get("pods", [])
-                        
-                        # Get detailed pod information
-                        response = requests.get(f"{API_SERVER}/api/pods", timeout=5)
-                        if response.status_code == 200:
-                            all_pods = response.json().get("pods", {})
-                            
-                            # Update our local pod tracking with comprehensive info
-                            updated_pods = {}
-                            for pod_id in assigned_pod_ids:
-                                if pod_id in all_pods:
-                                    # Store complete pod info
-                                    updated_pods[pod_id] = {
-                                        "node_id": NODE_ID,
-                                        "cpu_cores": all_pods[pod_id].get("cpu_cores", 1),
-                                        "status": "running"
-                                    }
-                                else:
-                                    # Fallback with basic info
-                                    updated_pods[pod_id] = {
-                                        "node_id": NODE_ID,
-                                        "cpu_cores": self.pod_resources.get(pod_id, 1),
-                                        "status": "running"
-                                    }
-                            
-                            # Update the pod list
-                            self.pods = updated_pods
-                            
-                            logger.info(f"Updated pod assignments: {self.pods}")
+                    assigned_pods = response.json().get("pods", {})
+                    
+                    # Update our local pod tracking
+                    updated_pods = {}
+                    for pod_id, pod_info in assigned_pods.items():
+                        updated_pods[pod_id] = {
+                            "node_id": NODE_ID,
+                            "cpu_cores": pod_info.get("cpu_cores", self.pod_resources.get(pod_id, 1)),
+                            "status": "running"
+                        }
+                    
+                    # Update the pod list and run exactly these pods' workloads
+                    self.pods = updated_pods
+                    self.pod_resources = {pod_id: info["cpu_cores"] for pod_id, info in updated_pods.items()}
+                    self.workloads.sync(self.pod_resources)
+                    
+                    logger.info(f"Updated pod assignments: {self.pods}")
                 
             except Exception as e:
                 logger.error(f"Error polling for pods: {str(e)}")
             
             time.sleep(15)
 
+    def _set_heartbeat_interval(self, body):
+        """Follow the interval the API server negotiated, if it sent one"""
+        interval = body.get("heartbeat_interval")
+        if interval and interval != self.heartbeat_interval:
+            logger.info(f"Heartbeat interval changed from {self.heartbeat_interval}s to {interval}s")
+            self.heartbeat_interval = interval
+
+    def _send_udp_heartbeat(self, pod_metrics):
+        """Send the heartbeat as one datagram, returning False to fall back to HTTP"""
+        self.heartbeat_seq += 1
+        datagram = encode_heartbeat(self.heartbeat_handle, self.heartbeat_seq, pod_metrics)
+        if datagram is None:
+            return False
+        try:
+            self.udp_sock.sendto(datagram, self.udp_target)
+        except OSError as e:
+            logger.warning(f"Failed to send UDP heartbeat: {e}")
+            return False
+        logger.debug(f"UDP heartbeat {self.heartbeat_seq} sent from {NODE_ID}")
+        return True
+
     def send_heartbeat(self):
         """Send heartbeat to the API server"""
+        beats = 0
         while self.running:
             try:
-                pod_metrics = self._generate_pod_metrics()
+                pod_metrics = self.workloads.sample()
+                beats += 1
+                if self.udp_target and beats % HTTP_HEARTBEAT_EVERY and self._send_udp_heartbeat(pod_metrics):
+                    time.sleep(self.heartbeat_interval)
+                    continue
                 
                 response = requests.post(
-                    f"{API_SERVER}/api/nodes/heartbeat",
+                    f"{self.api_server}/api/nodes/heartbeat",
                     json={
                         "node_id": NODE_ID,
                         "pod_metrics": pod_metrics
@@ -115,6 +225,12 @@ class Node:
                 
                 if response.status_code == 200:
                     logger.debug(f"Heartbeat sent from {NODE_ID} with metrics: {pod_metrics}")
+                    self._set_heartbeat_interval(response.json())
+                elif response.status_code == 404 and self.registered:
+                    # The server lost this node, e.g. after a restart
+                    logger.warning(f"Node {NODE_ID} unknown to the API server, registering again")
+                    self.registered = False
+                    self.register()
                 else:
                     logger.warning(f"Failed to send heartbeat: {response.text}")
             
@@ -123,22 +239,13 @@ class Node:
             except Exception as e:
                 logger.error(f"Error sending heartbeat: {str(e)}")
             
-            time.sleep(HEARTBEAT_INTERVAL)
-
-    def _generate_pod_metrics(self):
-        """Generate simulated resource metrics for pods"""
-        metrics = {}
-        for pod_id in self.pods:
-            cpu_cores = self.pod_resources.get(pod_id, 1)
-            metrics[pod_id] = {
-                "cpu_usage": round(random.uniform(0.1, 0.9) * cpu_cores, 2),
-                "memory_usage": random.randint(50, 500)
-            }
-        logger.info(f"Generated metrics for pods: {metrics}")
-        return metrics
+            time.sleep(self.heartbeat_interval)
 
     def run(self):
         """Main node execution"""
+        if self.gossip is not None:
+            self.gossip.start()
+
         # Register with API server
         registration_thread = Thread(target=self.register, daemon=True)
         registration_thread.start()
@@ -157,6 +264,9 @@ class Node:
         except KeyboardInterrupt:
             logger.info("Shutting down node...")
             self.running = False
+            self.workloads.stop_all()
+            if self.gossip is not None:
+                self.gossip.stop()
 
 if __name__ == "__main__":
     node = Node()
@@ -0,0 +1,165 @@
+# node/workload.py
+"""Pod workloads run as real child processes, measured through /proc.
+
+Each pod gets one worker process per requested core. A worker keeps a share
+of a core busy (its duty cycle), holds some memory and writes a little to a
+scratch file, so CPU, RSS and I/O all show up in /proc. ProcSampler reads
+/proc/<pid>/stat and /proc/<pid>/io for every worker in one pass per
+heartbeat and turns the counter deltas into rates.
+
+Run a single worker by hand with:
+    python -m node.workload --duty 0.5 --memory-mb 64
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from threading import Lock
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+PROC_AVAILABLE = os.path.exists("/proc/self/stat")
+
+def read_proc_counters(pid):
+    """Read (cpu_seconds, rss_bytes, io_bytes) of a process, or None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, the fields we need follow its closing parenthesis
+    fields = stat[stat.rindex(b")") + 2:].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+    rss_bytes = int(fields[21]) * PAGE_SIZE
+
+    io_bytes = 0
+    try:
+        with open(f"/proc/{pid}/io", "rb") as f:
+            for line in f:
+                if line.startswith((b"rchar:", b"wchar:")):
+                    io_bytes += int(line.split()[1])
+    except OSError:
+        pass  # /proc/<pid>/io needs the same user; report CPU and memory anyway
+    return cpu_seconds, rss_bytes, io_bytes
+
+class ProcSampler:
+    """Turns cumulative /proc counters of groups of processes into usage rates"""
+
+    def __init__(self):
+        self.last = {}  # pid -> (sampled at, cpu_seconds, io_bytes)
+
+    def sample(self, groups):
+        """Sample {key: [pid, ...]} in one pass, returning {key: usage}.
+
+        Usage is cpu_usage in cores, memory_usage in MB and io_rate in KB/s,
+        averaged since the previous sample of each process.
+        """
+        now = time.monotonic()
+        usage = {}
+        seen = {}
+        for key, pids in groups.items():
+            cpu = memory = io = 0.0
+            for pid in pids:
+                counters = read_proc_counters(pid)
+                if counters is None:
+                    continue
+                cpu_seconds, rss_bytes, io_bytes = counters
+                seen[pid] = (now, cpu_seconds, io_bytes)
+                memory += rss_bytes
+                previous = self.last.get(pid)
+                if previous is not None and now > previous[0]:
+                    elapsed = now - previous[0]
+                    cpu += (cpu_seconds - previous[1]) / elapsed
+                    io += (io_bytes - previous[2]) / elapsed
+            usage[key] = {
+                "cpu_usage": round(cpu, 3),
+                "memory_usage": round(memory / (1024 * 1024), 1),
+                "io_rate": round(io / 1024, 1)
+            }
+        # Forget processes that exited
+        self.last = seen
+        return usage
+
+class WorkloadManager:
+    """Starts, stops and measures the worker processes of the pods on this node"""
+
+    def __init__(self, duty=0.5, memory_mb=64):
+        self.duty = duty  # share of each requested core a worker keeps busy
+        self.memory_mb = memory_mb  # memory held by each pod, split over its workers
+        self.workers = {}  # pod_id -> [Popen]
+        self.sampler = ProcSampler()
+        self.lock = Lock()  # pod polling and heartbeats run on different threads
+        if not PROC_AVAILABLE:
+            logger.warning("/proc is not available, pod usage will be reported as zero")
+
+    def sync(self, pods):
+        """Run workers for exactly the given {pod_id: cpu_cores}"""
+        with self.lock:
+            for pod_id in list(self.workers):
+                if pod_id not in pods:
+                    self._stop(pod_id)
+            for pod_id, cpu_cores in pods.items():
+                if pod_id not in self.workers:
+                    self._start(pod_id, cpu_cores)
+
+    def _start(self, pod_id, cpu_cores):
+        count = max(1, int(cpu_cores))
+        memory_mb = self.memory_mb / count
+        self.workers[pod_id] = [
+            subprocess.Popen(
+                [sys.executable, "-m", "node.workload", "--duty", str(self.duty), "--memory-mb", str(memory_mb)],
+                stdin=subprocess.DEVNULL
+            )
+            for _ in range(count)
+        ]
+        logger.info(f"Started {count} worker processes for pod {pod_id}")
+
+    def _stop(self, pod_id):
+        for worker in self.workers.pop(pod_id, []):
+            worker.terminate()
+            worker.wait()
+        logger.info(f"Stopped worker processes of pod {pod_id}")
+
+    def stop_all(self):
+        with self.lock:
+            for pod_id in list(self.workers):
+                self._stop(pod_id)
+
+    def sample(self):
+        """Measured usage of every running pod"""
+        with self.lock:
+            groups = {}
+            for pod_id, workers in self.workers.items():
+                # Reap exited workers so they don't linger as zombies
+                for worker in workers:
+                    worker.poll()
+                groups[pod_id] = [worker.pid for worker in workers]
+        return self.sampler.sample(groups)
+
+def run_worker(duty, memory_mb, period=0.1):
+    """Keep duty of a core busy, hold memory_mb and do some I/O until the parent exits"""
+    parent = os.getppid()
+    ballast = bytearray(int(memory_mb * 1024 * 1024))
+    for i in range(0, len(ballast), PAGE_SIZE):
+        ballast[i] = 1  # touch every page so it counts towards RSS
+    busy = max(0.0, min(duty, 1.0)) * period
+    with tempfile.TemporaryFile() as scratch:
+        while os.getppid() == parent:
+            deadline = time.perf_counter() + busy
+            while time.perf_counter() < deadline:
+                pass
+            scratch.seek(0)
+            scratch.write(ballast[:4096])
+            time.sleep(period - busy)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated pod worker process")
+    parser.add_argument("--duty", type=float, default=0.5)
+    parser.add_argument("--memory-mb", type=float, default=64)
+    args = parser.parse_args()
+    run_worker(args.duty, args.memory_mb)
@@ -0,0 +1,53 @@
+from api_server.node_manager import NodeManager
+from api_server.pod_scheduler import PodScheduler
+
+def make_scheduler():
+    node_manager = NodeManager()
+    return node_manager, PodScheduler(node_manager)
+
+def fail_node(node_manager, scheduler, node_id):
+    node_manager.update_node_status(node_id, "failed")
+    return scheduler.reschedule_pods_from_node(node_id)
+
+def test_evacuated_high_priority_pod_preempts_best_effort_pods():
+    node_manager, scheduler = make_scheduler()
+    node_manager.register_node("n1", 4)
+    assert scheduler.schedule_pod("p1", 2)["node_id"] == "n1"
+    assert scheduler.schedule_pod("p2", 2)["node_id"] == "n1"
+    node_manager.register_node("n2", 4)
+    assert scheduler.schedule_pod("p4", 4, priority=100)["node_id"] == "n2"
+
+    result = fail_node(node_manager, scheduler, "n2")
+
+    assert result["rescheduled"] == ["p4"]
+    assert scheduler.get_pod("p4")["node_id"] == "n1"
+    assert scheduler.get_pod("p1")["status"] == "pending"
+    assert scheduler.get_pod("p2")["status"] == "pending"
+    assert node_manager.get_node("n1")["available_cores"] == 0
+
+def test_evacuated_pod_does_not_preempt_equal_priority():
+    node_manager, scheduler = make_scheduler()
+    node_manager.register_node("n1", 4)
+    scheduler.schedule_pod("p1", 4, priority=100)
+    node_manager.register_node("n2", 4)
+    scheduler.schedule_pod("p2", 4, priority=100)
+
+    result = fail_node(node_manager, scheduler, "n2")
+
+    assert result["pending"] == ["p2"]
+    assert scheduler.get_pod("p1")["node_id"] == "n1"
+
+def test_pending_high_priority_pod_preempts_on_retry():
+    node_manager, scheduler = make_scheduler()
+    node_manager.register_node("n2", 4)
+    scheduler.schedule_pod("p4", 4, priority=100)
+    assert fail_node(node_manager, scheduler, "n2")["pending"] == ["p4"]
+
+    node_manager.register_node("n1", 4)
+    # Best-effort launches that arrive before the retry take the new node
+    scheduler.commit_placement("p1", 2, ["n1"])
+    scheduler.commit_placement("p2", 2, ["n1"])
+
+    assert scheduler.retry_pending() >= 1
+    assert scheduler.get_pod("p4")["node_id"] == "n1"
+    assert {scheduler.get_pod(pod_id)["status"] for pod_id in ("p1", "p2")} == {"pending"}
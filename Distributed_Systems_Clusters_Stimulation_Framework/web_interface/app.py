@@ -10,6 +10,12 @@ app.secret_key = "distributed_cluster_secret"
 # API server URL
 API_SERVER = os.getenv("API_SERVER", "http://api_server:5000")
 
+# Tables only request one page and the columns they render
+PAGE_SIZE = 50
+NODE_TABLE_FIELDS = "status,cpu_cores,available_cores,pod_count,last_heartbeat"
+POD_TABLE_FIELDS = "node_id,cpu_cores,priority,status"
+METRIC_TABLE_FIELDS = "cpu_usage,memory_usage,io_rate"
+
 @app.route('/')
 def index():
     """Dashboard page"""
@@ -18,13 +24,20 @@ def index():
 @app.route('/nodes')
 def nodes():
     """Node management page"""
+    status = request.args.get('status')
     try:
-        response = requests.get(f"{API_SERVER}/api/nodes")
-        nodes_data = response.json().get("nodes", {})
-        return render_template('nodes.html', nodes=nodes_data)
+        response = requests.get(f"{API_SERVER}/api/nodes", params={
+            "limit": PAGE_SIZE,
+            "cursor": request.args.get('cursor'),
+            "status": status,
+            "fields": NODE_TABLE_FIELDS
+        })
+        data = response.json()
+        return render_template('nodes.html', nodes=data.get("nodes", {}),
+                               next_cursor=data.get("next_cursor"), status=status)
     except Exception as e:
         flash(f"Error retrieving nodes: {str(e)}", "danger")
-        return render_template('nodes.html', nodes={})
+        return render_template('nodes.html', nodes={}, next_cursor=None, status=status)
 
 @app.route('/nodes/add', methods=['GET', 'POST'])
 def add_node():
@@ -71,34 +84,53 @@ def remove_node(node_id):
 @app.route('/pods')
 def pods():
     """Pod management page"""
+    node_id = request.args.get('node_id')
     try:
-        # Get pods
-        pods_response = requests.get(f"{API_SERVER}/api/pods")
-        pods_data = pods_response.json().get("pods", {})
+        # Get one page of pods
+        pods_response = requests.get(f"{API_SERVER}/api/pods", params={
+            "limit": PAGE_SIZE,
+            "cursor": request.args.get('cursor'),
+            "node_id": node_id,
+            "fields": POD_TABLE_FIELDS
+        })
+        pods_json = pods_response.json()
+        pods_data = pods_json.get("pods", {})
         
-        # Get metrics
-        metrics_response = requests.get(f"{API_SERVER}/api/pods/metrics")
-        metrics_data = metrics_response.json().get("metrics", {})
+        # Get metrics for the pods on this page only
+        metrics_data = {}
+        if pods_data:
+            metrics_response = requests.get(f"{API_SERVER}/api/pods/metrics", params={
+                "ids": ",".join(pods_data),
+                "fields": METRIC_TABLE_FIELDS
+            })
+            metrics_data = metrics_response.json().get("metrics", {})
         
-        return render_template('pods.html', pods=pods_data, metrics=metrics_data)
+        return render_template('pods.html', pods=pods_data, metrics=metrics_data,
+                               next_cursor=pods_json.get("next_cursor"), node_id=node_id)
     except Exception as e:
         flash(f"Error retrieving pods: {str(e)}", "danger")
-        return render_template('pods.html', pods={}, metrics={})
+        return render_template('pods.html', pods={}, metrics={}, next_cursor=None, node_id=node_id)
 
 @app.route('/pods/launch', methods=['GET', 'POST'])
 def launch_pod():
     """Launch a new pod"""
     if request.method == 'POST':
         cpu_cores = request.form.get('cpu_cores')
+        priority = request.form.get('priority', 'default')
         try:
             response = requests.post(
                 f"{API_SERVER}/api/pods/launch",
-                json={"cpu_cores": cpu_cores}
+                json={"cpu_cores": cpu_cores, "priority": priority}
             )
             
             if response.status_code == 201:
                 data = response.json()
                 flash(f"Pod {data['pod_id']} launched successfully on node {data['node_id']}", "success")
+                if data.get("preempted_pods"):
+                    flash(f"Preempted pods: {', '.join(data['preempted_pods'])}", "warning")
+            elif response.status_code == 202:
+                data = response.json()
+                flash(f"Pod {data['pod_id']} is pending until capacity is available", "warning")
             else:
                 flash(f"Failed to launch pod: {response.json().get('error')}", "danger")
             
@@ -1,12 +1,30 @@
+import argparse
+import time
 import docker
 import uuid
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # This URL must match the service name from docker-compose!
 API_SERVER_URL = "http://apiserver:5000/register_node"
+BULK_REGISTER_URL = "http://apiserver:5000/register_nodes"
 DOCKER_NETWORK = "backend"  # Match your docker-compose.yml network name
 IMAGE_NAME = "node1:latest"  # Match the image name from docker-compose.yml
 
+def launch_container(client, node_id, cpu_cores):
+    return client.containers.run(
+        IMAGE_NAME,
+        name=node_id,
+        detach=True,
+        environment={
+            "NODE_ID": node_id,
+            "CPU_CORES": str(cpu_cores),
+            "API_SERVER": API_SERVER_URL
+        },
+        network=DOCKER_NETWORK,
+        restart_policy={"Name": "on-failure"},
+    )
+
 def main():
     try:
         cpu_cores = input("Enter number of CPU cores: ").strip()
@@ -18,18 +36,7 @@ def main():
 
         # Launch the Docker container
         client = docker.from_env()
-        container = client.containers.run(
-            IMAGE_NAME,
-            name=node_id,
-            detach=True,
-            environment={
-                "NODE_ID": node_id,
-                "CPU_CORES": cpu_cores,
-                "API_SERVER": API_SERVER_URL
-            },
-            network=DOCKER_NETWORK,
-            restart_policy={"Name": "on-failure"},
-        )
+        container = launch_container(client, node_id, cpu_cores)
         print(f"✅ Container launched: {container.short_id}")
 
         # Register the node with the API server
@@ -50,5 +57,55 @@ def main():
     except Exception as e:
         print(f"❌ Unexpected error: {str(e)}")
 
+def launch_fleet(count, cpu_cores, parallelism, batch_size):
+    """Launch count nodes with at most parallelism container starts at once, registering them in batches"""
+    started = time.monotonic()
+    node_ids = [f"node-{str(uuid.uuid4())[:8]}" for _ in range(count)]
+    client = docker.from_env()
+    registered = 0
+    batch = []
+
+    def register(batch):
+        try:
+            response = requests.post(BULK_REGISTER_URL, json={
+                "nodes": [{"node_id": node_id, "cpu_cores": cpu_cores} for node_id in batch]
+            }, timeout=30)
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Failed to reach API server: {str(e)}")
+            return 0
+        if response.status_code != 200:
+            print(f"❌ Failed to register {len(batch)} nodes: {response.text}")
+            return 0
+        return len(batch)
+
+    with ThreadPoolExecutor(max_workers=parallelism) as pool:
+        futures = {pool.submit(launch_container, client, node_id, cpu_cores): node_id for node_id in node_ids}
+        for future in as_completed(futures):
+            node_id = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ Failed to launch {node_id}: {str(e)}")
+                continue
+            batch.append(node_id)
+            if len(batch) >= batch_size:
+                registered += register(batch)
+                batch = []
+        if batch:
+            registered += register(batch)
+
+    print(f"✅ {registered}/{count} nodes launched and registered in {time.monotonic() - started:.1f}s")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Launch node containers; without --count, asks for one node's cores")
+    parser.add_argument("--count", type=int, help="launch this many nodes in parallel")
+    parser.add_argument("--cpu-cores", type=int, default=2, help="cores per node with --count")
+    parser.add_argument("--parallelism", type=int, default=16, help="containers started at once")
+    parser.add_argument("--batch-size", type=int, default=100, help="nodes per bulk registration")
+    args = parser.parse_args()
+    if args.count is None:
+        main()
+    elif min(args.count, args.cpu_cores, args.parallelism, args.batch_size) <= 0:
+        parser.error("--count, --cpu-cores, --parallelism and --batch-size must be positive")
+    else:
+        launch_fleet(args.count, args.cpu_cores, args.parallelism, args.batch_size)
@@ -2,14 +2,22 @@ from flask import Flask, request, jsonify
 import docker
 import threading
 import time
-from datetime import datetime
 import uuid
 import sys
 import logging
+import os
+import subprocess
 
-import random
+import base64
+import bisect
+import heapq
 from collections import defaultdict
 
+from pod_worker import read_proc_counters
+from clock import make_clock
+from failure_detector import PhiAccrualDetector
+from metrics_history import MetricsHistory
+
 # Configure logging with more details
 logging.basicConfig(
     level=logging.INFO,
@@ -34,8 +42,79 @@ except docker.errors.DockerException as e:
     logger.error("You can download Docker Desktop from: https://www.docker.com/products/docker-desktop/")
     sys.exit(1)
 
-nodes = {}
-pods = {}
+nodes = {}  # node_id -> node info; info['pods'] is an insertion-ordered set (a dict of pod_id -> None)
+pods = {}  # pod_id -> pod info; info['node_id'] is the pod's node, the reverse of info['pods']
+
+# Secondary indexes backing the /cluster/status filters and cursors
+node_ids_sorted = []
+pod_ids_sorted = []
+nodes_by_status = defaultdict(set)
+pods_by_cpu = defaultdict(set)
+orphaned_pods = set()  # pods of removed nodes, rescheduled by the next status read
+
+# Pod workloads run as local child processes whose /proc counters are the pod metrics
+POD_WORKER_DUTY = float(os.getenv('POD_WORKER_DUTY', '0.5'))  # busy share of each required core
+POD_WORKER_MEMORY_MB = float(os.getenv('POD_WORKER_MEMORY_MB', '64'))  # memory held per pod
+# Workers share the API server's host, so their total is capped to leave it room for heartbeats
+POD_WORKER_MAX = int(os.getenv('POD_WORKER_MAX', str(max(1, (os.cpu_count() or 2) // 2))))
+pod_workers = {}  # pod_id -> [Popen], one worker per required core while under POD_WORKER_MAX
+pod_worker_count = 0  # running workers across all pods
+pod_counters = {}  # pod_id -> (sampled at, cpu_seconds, io_bytes) of the last sample
+
+# Heartbeat times and health checks read this clock; CLOCK_MODE is real, scaled or manual
+clock = make_clock(os.getenv('CLOCK_MODE', 'real'), float(os.getenv('CLOCK_SCALE', '1')))
+
+# Nodes are judged by phi accrual (FAILURE_DETECTOR=phi) or the fixed 15s timeout
+FAILURE_DETECTOR = os.getenv('FAILURE_DETECTOR', 'phi')
+PHI_SUSPECT_THRESHOLD = float(os.getenv('PHI_SUSPECT_THRESHOLD', '3'))
+PHI_FAILED_THRESHOLD = float(os.getenv('PHI_FAILED_THRESHOLD', '8'))
+
+# Node and cluster usage history under METRICS_HISTORY_DIR (unset disables it),
+# set up by the serving process only
+METRICS_HISTORY_DIR = os.getenv('METRICS_HISTORY_DIR')
+metrics_history = None
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def set_node_status(node_id, status):
+    """Update a node's status and keep the status index in sync"""
+    node_info = nodes[node_id]
+    nodes_by_status[node_info['status']].discard(node_id)
+    node_info['status'] = status
+    nodes_by_status[status].add(node_id)
+
+def forget_pod(pod_id):
+    """Delete a pod and drop it from the secondary indexes"""
+    pod_info = pods.pop(pod_id)
+    ResourceMonitor.stop_pod_workers(pod_id)
+    if pod_info['node_id'] in nodes:
+        nodes[pod_info['node_id']]['pods'].pop(pod_id, None)
+    pods_by_cpu[pod_info['cpu_required']].discard(pod_id)
+    i = bisect.bisect_left(pod_ids_sorted, pod_id)
+    if i < len(pod_ids_sorted) and pod_ids_sorted[i] == pod_id:
+        del pod_ids_sorted[i]
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode(key.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+
+def page_keys(sorted_keys, candidates, cursor, limit):
+    """Return the keys of the page after cursor and the next page's cursor"""
+    if candidates is None:
+        start = bisect.bisect_right(sorted_keys, cursor) if cursor else 0
+        keys = sorted_keys[start:] if limit is None else sorted_keys[start:start + limit + 1]
+    else:
+        remaining = [k for k in candidates if not cursor or k > cursor]
+        keys = sorted(remaining) if limit is None else heapq.nsmallest(limit + 1, remaining)
+    if limit is not None and len(keys) > limit:
+        keys = keys[:limit]
+        return keys, encode_cursor(keys[-1])
+    return keys, None
 
 class NodeManager:
     @staticmethod
@@ -54,14 +133,16 @@ class NodeManager:
             nodes[node_id] = {
                 'cpu_capacity': cpu_capacity,
                 'cpu_available': cpu_capacity,
-                'pods': [],
-                'last_heartbeat': datetime.now(),
+                'pods': {},
+                'last_heartbeat': clock.now(),
                 'status': 'healthy',
                 'container_id': container.id,
                 'heartbeat_enabled': True
             }
-            threading.Thread(target=HealthMonitor.start_heartbeat, args=(node_id,), daemon=True).start()
-            logger.info(f"Started heartbeat monitoring for node {node_id}")
+            bisect.insort(node_ids_sorted, node_id)
+            nodes_by_status['healthy'].add(node_id)
+            HealthMonitor.schedule_heartbeat(node_id)
+            logger.info(f"Scheduled simulated heartbeats for node {node_id}")
             return node_id
         except docker.errors.APIError as e:
             logger.error(f"Docker API error while creating node: {str(e)}")
@@ -75,9 +156,15 @@ class NodeManager:
         if node_id in nodes:
             try:
                 logger.info(f"Removing node: {node_id}")
+                HealthMonitor.cancel_heartbeat(node_id)
+                if HealthMonitor.failure_detector:
+                    HealthMonitor.failure_detector.forget(node_id)
                 container = client.containers.get(nodes[node_id]['container_id'])
                 container.stop()
                 container.remove()
+                orphaned_pods.update(nodes[node_id]['pods'])
+                nodes_by_status[nodes[node_id]['status']].discard(node_id)
+                del node_ids_sorted[bisect.bisect_left(node_ids_sorted, node_id)]
                 del nodes[node_id]
                 logger.info(f"Successfully removed node {node_id} and its container")
                 return {'message': f'Node {node_id} removed successfully'}
@@ -95,12 +182,14 @@ class PodScheduler:
             if node_info['status'] == 'healthy' and node_info['cpu_available'] >= cpu_required:
                 pod_id = str(uuid.uuid4())
                 node_info['cpu_available'] -= cpu_required
-                node_info['pods'].append(pod_id)
+                node_info['pods'][pod_id] = None
                 pods[pod_id] = {
                     'node_id': node_id,
                     'cpu_required': cpu_required,
-                    'created_at': datetime.now().isoformat()
+                    'created_at': clock.now().isoformat()
                 }
+                bisect.insort(pod_ids_sorted, pod_id)
+                pods_by_cpu[cpu_required].add(pod_id)
                 ResourceMonitor.initialize_pod_metrics(pod_id, cpu_required)
                 logger.info(f"Successfully scheduled pod {pod_id} on node {node_id}")
                 logger.info(f"Node {node_id} now has {node_info['cpu_available']} CPU cores available")
@@ -108,68 +197,198 @@ class PodScheduler:
         logger.error(f"Failed to find suitable node for pod requiring {cpu_required} CPU cores")
         return {'error': 'No suitable node found'}
 
+    @staticmethod
+    def place_pod(pod_id, cpu_required):
+        """Move an existing pod to the first healthy node with room, returning the node id or None"""
+        for node_id, node_info in nodes.items():
+            if node_info['status'] == 'healthy' and node_info['cpu_available'] >= cpu_required:
+                node_info['cpu_available'] -= cpu_required
+                node_info['pods'][pod_id] = None
+                pods[pod_id]['node_id'] = node_id
+                return node_id
+        return None
+
     @staticmethod
     def reschedule_pods(failed_node_id):
         if failed_node_id not in nodes:
             logger.error(f"Failed node not found: {failed_node_id}")
             return
-        failed_pods = nodes[failed_node_id]['pods']
+        failed_node = nodes[failed_node_id]
+        failed_pods = failed_node['pods']
         logger.info(f"Rescheduling {len(failed_pods)} pods from failed node {failed_node_id}")
-        for pod_id in failed_pods:
+        for pod_id in list(failed_pods):
             pod_info = pods[pod_id]
             logger.info(f"Attempting to reschedule pod {pod_id}")
-            new_node_id = PodScheduler.schedule_pod(pod_info['cpu_required'])
-            if isinstance(new_node_id, dict):
-                pods[pod_id]['status'] = 'failed'
+            new_node_id = PodScheduler.place_pod(pod_id, pod_info['cpu_required'])
+            if new_node_id is None:
+                pod_info['status'] = 'failed'
                 logger.error(f"Failed to reschedule pod {pod_id}")
             else:
-                pods[pod_id]['node_id'] = new_node_id
+                del failed_pods[pod_id]
+                failed_node['cpu_available'] += pod_info['cpu_required']
                 logger.info(f"Successfully rescheduled pod {pod_id} to node {new_node_id}")
 
 class HealthMonitor:
+    # Simulated heartbeats for every node are driven by a single timer thread.
+    # _heartbeat_queue is a heap of (due_time, node_id, token); a node's entry is
+    # only honoured while its token matches _heartbeat_tokens, so cancelling a
+    # node just drops its token and the stale heap entry is discarded lazily.
+    heartbeat_interval = 5  # seconds
+    heartbeat_batch_size = 500
+    _heartbeat_queue = []
+    _heartbeat_tokens = {}
+    _heartbeat_cond = threading.Condition()
+    _next_token = 0
+
+    @staticmethod
+    def schedule_heartbeat(node_id):
+        """Start simulating heartbeats for a node"""
+        with HealthMonitor._heartbeat_cond:
+            HealthMonitor._next_token += 1
+            token = HealthMonitor._next_token
+            HealthMonitor._heartbeat_tokens[node_id] = token
+            due = clock.monotonic() + HealthMonitor.heartbeat_interval
+            heapq.heappush(HealthMonitor._heartbeat_queue, (due, node_id, token))
+            HealthMonitor._heartbeat_cond.notify()
+
     @staticmethod
-    def start_heartbeat(node_id):
-        logger.info(f"Starting heartbeat monitoring for node {node_id}")
+    def cancel_heartbeat(node_id):
+        """Stop simulating heartbeats for a node"""
+        with HealthMonitor._heartbeat_cond:
+            HealthMonitor._heartbeat_tokens.pop(node_id, None)
+
+    @staticmethod
+    def run_heartbeats():
+        """Send due heartbeats for all nodes in batches from one thread"""
+        queue = HealthMonitor._heartbeat_queue
+        tokens = HealthMonitor._heartbeat_tokens
         while True:
-            if node_id in nodes:
-                if nodes[node_id].get('heartbeat_enabled', True):
-                    nodes[node_id]['last_heartbeat'] = datetime.now()
-                    nodes[node_id]['status'] = 'healthy'
-            time.sleep(5)
+            with HealthMonitor._heartbeat_cond:
+                # Drop entries of cancelled nodes, then sleep until the next one is due
+                while queue and tokens.get(queue[0][1]) != queue[0][2]:
+                    heapq.heappop(queue)
+                if not queue:
+                    HealthMonitor._heartbeat_cond.wait()
+                    continue
+                delay = queue[0][0] - clock.monotonic()
+                if delay > 0:
+                    clock.wait(HealthMonitor._heartbeat_cond, delay)
+                    continue
+
+                now = clock.monotonic()
+                batch = []
+                while queue and queue[0][0] <= now and len(batch) < HealthMonitor.heartbeat_batch_size:
+                    due, node_id, token = heapq.heappop(queue)
+                    if tokens.get(node_id) == token:
+                        batch.append(node_id)
+                        heapq.heappush(queue, (max(due, now) + HealthMonitor.heartbeat_interval, node_id, token))
+
+            beat_time = clock.now()
+            detector = HealthMonitor.failure_detector
+            for node_id in batch:
+                node_info = nodes.get(node_id)
+                if node_info and node_info.get('heartbeat_enabled', True):
+                    node_info['last_heartbeat'] = beat_time
+                    if detector:
+                        detector.heartbeat(node_id, beat_time.timestamp())
+                    if node_info['status'] != 'healthy':
+                        set_node_status(node_id, 'healthy')
+
+    heartbeat_timeout = 15  # seconds, for nodes the failure detector has not heard from yet
+    check_interval = 5  # seconds
+    failure_detector = None
 
     @staticmethod
     def check_health():
         while True:
-            current_time = datetime.now()
-            for node_id, node_info in nodes.items():
-                if (current_time - node_info['last_heartbeat']).seconds > 15:
-                    if node_info['status'] == 'healthy':
-                        logger.warning(f"Node {node_id} marked as unhealthy - missed heartbeats")
-                        node_info['status'] = 'unhealthy'
-                        PodScheduler.reschedule_pods(node_id)
-            time.sleep(5)
+            current_time = clock.now()
+            detector = HealthMonitor.failure_detector
+            for node_id, node_info in list(nodes.items()):
+                state = detector.classify(node_id, current_time.timestamp()) if detector else None
+                if state is None:
+                    if (current_time - node_info['last_heartbeat']).total_seconds() <= HealthMonitor.heartbeat_timeout:
+                        continue
+                    state = 'unhealthy'
+                if state == 'unhealthy' and node_info['status'] in ('healthy', 'suspect'):
+                    logger.warning(f"Node {node_id} marked as unhealthy - missed heartbeats")
+                    set_node_status(node_id, 'unhealthy')
+                    if detector:
+                        detector.forget(node_id)
+                    PodScheduler.reschedule_pods(node_id)
+                elif state == 'suspect' and node_info['status'] == 'healthy':
+                    # No new pods until it heartbeats again, but its pods stay put
+                    logger.info(f"Node {node_id} marked as suspect - heartbeat late")
+                    set_node_status(node_id, 'suspect')
+            clock.sleep(HealthMonitor.check_interval)
 
 class ResourceMonitor:
     @staticmethod
     def initialize_pod_metrics(pod_id, cpu_required):
         pods[pod_id]['metrics'] = {
-            'cpu_usage': [],  # Store historical CPU usage as percentage of required
-            'memory_usage': [],  # Simulated memory usage in MB
-            'network_io': [],  # Simulated network I/O in KB/s
+            'cpu_usage': [],  # Measured CPU usage as percentage of required
+            'memory_usage': [],  # Measured resident memory in MB
+            'network_io': [],  # Measured read+write I/O in KB/s
         }
-    
+        global pod_worker_count
+        worker_count = min(max(1, int(cpu_required)), POD_WORKER_MAX - pod_worker_count)
+        if worker_count <= 0:
+            logger.warning(f"POD_WORKER_MAX ({POD_WORKER_MAX}) workers running, pod {pod_id} runs without workers")
+            return
+        pod_worker_count += worker_count
+        pod_workers[pod_id] = [
+            subprocess.Popen(
+                [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pod_worker.py'),
+                 str(POD_WORKER_DUTY), str(POD_WORKER_MEMORY_MB / worker_count)],
+                stdin=subprocess.DEVNULL
+            )
+            for _ in range(worker_count)
+        ]
+        logger.info(f"Started {worker_count} worker processes for pod {pod_id}")
+
+    @staticmethod
+    def stop_pod_workers(pod_id):
+        global pod_worker_count
+        for worker in pod_workers.pop(pod_id, []):
+            pod_worker_count -= 1
+            worker.terminate()
+            worker.wait()
+        pod_counters.pop(pod_id, None)
+
+    @staticmethod
+    def sample_pod(pod_id):
+        """Read the summed /proc counters of a pod's workers, returning (cpu_cores, memory_mb, io_kbps) or None"""
+        cpu_seconds = rss_bytes = io_bytes = 0
+        alive = False
+        for worker in pod_workers.get(pod_id, []):
+            counters = read_proc_counters(worker.pid)
+            if counters is not None and worker.poll() is None:
+                alive = True
+                cpu_seconds += counters[0]
+                rss_bytes += counters[1]
+                io_bytes += counters[2]
+        if not alive:
+            return None
+        now = time.monotonic()
+        previous = pod_counters.get(pod_id)
+        pod_counters[pod_id] = (now, cpu_seconds, io_bytes)
+        if previous is None or now <= previous[0]:
+            return None  # rates need two samples
+        elapsed = now - previous[0]
+        return ((cpu_seconds - previous[1]) / elapsed,
+                rss_bytes / (1024 * 1024),
+                (io_bytes - previous[2]) / elapsed / 1024)
+
     @staticmethod
     def update_pod_metrics():
-        """Simulates updating resource usage metrics for all pods"""
+        """Samples the resource usage of every pod's worker processes"""
         while True:
             for pod_id, pod_info in list(pods.items()):
                 if pod_id in pods and 'metrics' in pod_info:
-                    # Simulate CPU usage (60-100% of required)
-                    cpu_percent = random.uniform(60, 100)
-                    # Memory usage simulation (50-500 MB)
-                    memory_mb = random.uniform(50, 500)
-                    # Network I/O simulation (10-1000 KB/s)
-                    network_io = random.uniform(10, 1000)
+                    sample = ResourceMonitor.sample_pod(pod_id)
+                    if sample is None:
+                        continue
+                    cpu_cores, memory_mb, io_kbps = sample
+                    cpu_percent = cpu_cores / pod_info['cpu_required'] * 100
                     
                     # Keep only the last 100 data points for each metric
                     max_history = 100
@@ -182,7 +401,7 @@ class ResourceMonitor:
                     if len(pod_info['metrics']['memory_usage']) > max_history:
                         pod_info['metrics']['memory_usage'] = pod_info['metrics']['memory_usage'][-max_history:]
                     
-                    pod_info['metrics']['network_io'].append(network_io)
+                    pod_info['metrics']['network_io'].append(io_kbps)
                     if len(pod_info['metrics']['network_io']) > max_history:
                         pod_info['metrics']['network_io'] = pod_info['metrics']['network_io'][-max_history:]
                     
@@ -211,6 +430,12 @@ class ResourceMonitor:
                         'network': usage['network'],
                         'pod_count': usage['pod_count']
                     }
+
+            if metrics_history:
+                metrics_history.record(clock.time(), {
+                    node_id: (usage['cpu'], usage['memory'], usage['network'])
+                    for node_id, usage in node_resource_usage.items() if node_id in nodes
+                })
             
             time.sleep(3)  # Update every 3 seconds
 
@@ -230,6 +455,24 @@ def get_pod_metrics(pod_id):
         })
     return jsonify({'error': 'Pod not found'}), 404
 
+@app.route('/metrics/history', methods=['GET'])
+def get_metrics_history():
+    """Usage of one node (series=<node_id>) or of the cluster over a time range"""
+    if metrics_history is None:
+        return jsonify({'error': 'Metrics history is disabled, set METRICS_HISTORY_DIR'}), 404
+    series = request.args.get('series', 'cluster')
+    try:
+        end = float(request.args.get('end', clock.time()))
+        start = float(request.args.get('start', end - 3600))
+        # Raw samples within the last hour, minutes up to two days, hours beyond
+        resolution = request.args.get('resolution') or (
+            'raw' if start >= clock.time() - metrics_history.raw_seconds
+            else '1m' if end - start <= 2 * 86400 else '1h')
+        points = metrics_history.query(series, start, end, resolution)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'series': series, 'resolution': resolution, 'start': start, 'end': end, 'points': points})
+
 @app.route('/nodes/<node_id>/resource-usage', methods=['GET'])
 def get_node_resource_usage(node_id):
     if node_id in nodes:
@@ -277,8 +520,10 @@ def remove_node(node_id):
 @app.route('/nodes/<node_id>/fail', methods=['POST'])
 def fail_node(node_id):
     if node_id in nodes:
-        nodes[node_id]['status'] = 'unhealthy'
+        set_node_status(node_id, 'unhealthy')
         nodes[node_id]['heartbeat_enabled'] = False
+        if HealthMonitor.failure_detector:
+            HealthMonitor.failure_detector.forget(node_id)
         logger.warning(f"Node {node_id} marked as unhealthy (failed).")
         PodScheduler.reschedule_pods(node_id)
         return jsonify({"message": f"Node {node_id} marked as failed."}), 200
@@ -301,51 +546,115 @@ def create_pod():
         return jsonify(pod_id), 400
     return jsonify({'pod_id': pod_id, 'message': 'Pod scheduled successfully'})
 
+@app.route('/clock', methods=['GET'])
+def get_clock():
+    return jsonify({'mode': clock.mode, 'time': clock.now().isoformat()})
+
+@app.route('/clock/advance', methods=['POST'])
+def advance_clock():
+    if clock.mode != 'manual':
+        return jsonify({'error': 'Only a manual clock can be advanced'}), 409
+    data = request.get_json(silent=True) or {}
+    try:
+        clock.advance(float(data.get('seconds', 0)))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'mode': clock.mode, 'time': clock.now().isoformat()})
+
 @app.route('/cluster/status', methods=['GET'])
 def get_cluster_status():
+    """Cluster status, optionally paginated, filtered and projected.
+
+    Query args: limit, node_cursor, pod_cursor, status (node status),
+    node_id (pods on a node), cpu_min/cpu_max (pod cpu_required),
+    node_fields and pod_fields (comma separated projections).
+    """
     logger.info("Received request for cluster status")
-    logger.info(f"Total nodes in memory: {len(nodes)}")
-    orphaned_pods = []
-    for pod_id, pod_info in list(pods.items()):
-        if pod_info['node_id'] not in nodes:
-            orphaned_pods.append(pod_id)
-    for orphan_pod_id in orphaned_pods:
-        pod_info = pods[orphan_pod_id]
-        rescheduled = False
-        for node_id, node_info in nodes.items():
-            if node_info['status'] == 'healthy' and node_info['cpu_available'] >= pod_info['cpu_required']:
-                pod_info['node_id'] = node_id
-                pods[orphan_pod_id] = pod_info
-                node_info['cpu_available'] -= pod_info['cpu_required']
-                node_info['pods'].append(orphan_pod_id)
-                logger.info(f"Rescheduled orphaned pod {orphan_pod_id[:8]} to node {node_id[:8]}")
-                rescheduled = True
-                break
-        if not rescheduled:
+    args = request.args
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+        cpu_min = float(args['cpu_min']) if args.get('cpu_min') else None
+        cpu_max = float(args['cpu_max']) if args.get('cpu_max') else None
+        node_cursor = decode_cursor(args.get('node_cursor'))
+        pod_cursor = decode_cursor(args.get('pod_cursor'))
+    except ValueError:
+        return jsonify({'error': 'Invalid limit, cursor or cpu range'}), 400
+    if limit is None and (node_cursor or pod_cursor):
+        limit = DEFAULT_PAGE_SIZE
+    if limit is not None:
+        if limit <= 0:
+            return jsonify({'error': 'limit must be positive'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+    node_fields = [f for f in args.get('node_fields', '').split(',') if f]
+    pod_fields = [f for f in args.get('pod_fields', '').split(',') if f]
+
+    logger.info(f"Total nodes in memory: {len(nodes)}, pods: {len(pods)}")
+    # Only pods of removed nodes can be orphaned, so look at those instead of every pod
+    for orphan_pod_id in list(orphaned_pods):
+        orphaned_pods.discard(orphan_pod_id)
+        if orphan_pod_id not in pods or pods[orphan_pod_id]['node_id'] in nodes:
+            continue
+        node_id = PodScheduler.place_pod(orphan_pod_id, pods[orphan_pod_id]['cpu_required'])
+        if node_id is not None:
+            logger.info(f"Rescheduled orphaned pod {orphan_pod_id[:8]} to node {node_id[:8]}")
+        else:
             logger.warning(f"Pod {orphan_pod_id[:8]} is assigned to a non-existent node and could not be rescheduled. Removing the pod.")
-            del pods[orphan_pod_id]
-    for node_id, info in nodes.items():
-        logger.info(f"Node {node_id[:8]} | Status: {info['status']}, CPU: {info['cpu_available']}/{info['cpu_capacity']} | Last heartbeat: {info['last_heartbeat']}")
-    logger.info(f"Total pods in memory: {len(pods)}")
-    for pod_id, pod_info in pods.items():
-        logger.info(f"Pod {pod_id[:8]} assigned to node {pod_info['node_id'][:8]}, CPU: {pod_info['cpu_required']}")
+            forget_pod(orphan_pod_id)
+
+    # Nodes page, narrowed by the status index
+    node_candidates = None
+    if args.get('status'):
+        node_candidates = nodes_by_status.get(args['status'], set())
+    node_page, next_node_cursor = page_keys(node_ids_sorted, node_candidates, node_cursor, limit)
+
+    # Pods page, narrowed by the node's pod set and the cpu index
+    pod_filters = []
+    if args.get('node_id'):
+        pod_filters.append(set(nodes[args['node_id']]['pods']) if args['node_id'] in nodes else set())
+    if cpu_min is not None or cpu_max is not None:
+        pod_filters.append({pid for cpu, ids in pods_by_cpu.items()
+                            if (cpu_min is None or cpu >= cpu_min) and (cpu_max is None or cpu <= cpu_max)
+                            for pid in ids})
+    pod_candidates = set.intersection(*pod_filters) if pod_filters else None
+    pod_page, next_pod_cursor = page_keys(pod_ids_sorted, pod_candidates, pod_cursor, limit)
+
+    node_views = {}
+    for node_id in node_page:
+        info = nodes[node_id]
+        view = {
+            'cpu_capacity': info['cpu_capacity'],
+            'cpu_available': info['cpu_available'],
+            'status': info['status'],
+            'pods': list(info['pods']),
+            'last_heartbeat': info['last_heartbeat'].isoformat()
+        }
+        node_views[node_id] = {f: view[f] for f in node_fields if f in view} if node_fields else view
+    pod_views = {}
+    for pod_id in pod_page:
+        info = pods[pod_id]
+        pod_views[pod_id] = {f: info[f] for f in pod_fields if f in info} if pod_fields else info
+
     status = {
-        'nodes': {
-            node_id: {
-                'cpu_capacity': info['cpu_capacity'],
-                'cpu_available': info['cpu_available'],
-                'status': info['status'],
-                'pods': info['pods'],
-                'last_heartbeat': info['last_heartbeat'].isoformat()
-            }
-            for node_id, info in nodes.items()
-        },
-        'pods': pods
+        'nodes': node_views,
+        'pods': pod_views,
+        'next_node_cursor': next_node_cursor,
+        'next_pod_cursor': next_pod_cursor
     }
     return jsonify(status)
 
 if __name__ == '__main__':
     logger.info("Starting API server...")
+    if FAILURE_DETECTOR == 'phi':
+        HealthMonitor.failure_detector = PhiAccrualDetector(suspect_threshold=PHI_SUSPECT_THRESHOLD,
+                                                            failed_threshold=PHI_FAILED_THRESHOLD,
+                                                            first_interval=HealthMonitor.heartbeat_interval)
+        HealthMonitor.check_interval = 1
+    # With debug=True this block also runs in the reloader's watcher process; only its child serves
+    if METRICS_HISTORY_DIR and os.getenv('WERKZEUG_RUN_MAIN') == 'true':
+        metrics_history = MetricsHistory(METRICS_HISTORY_DIR)
+    threading.Thread(target=HealthMonitor.run_heartbeats, daemon=True).start()
+    logger.info("Heartbeat simulator thread started")
+
     threading.Thread(target=HealthMonitor.check_health, daemon=True).start()
     logger.info("Health monitoring thread started")
 
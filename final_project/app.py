@@ -59,7 +59,10 @@ if "pod_created" in st.session_state:
 refresh_clicked = st.button("🔄 Refresh Cluster Status")
 
 # Get Cluster Status
-status_res = requests.get(f"{BASE_URL}/cluster/status")
+# Pod metric histories are fetched per pod below, leave them out of the overview
+status_res = requests.get(f"{BASE_URL}/cluster/status", params={
+    "pod_fields": "node_id,cpu_required,created_at"
+})
 cluster_data = status_res.json() if status_res.status_code == 200 else {}
 
 # Display Nodes
@@ -73,7 +76,7 @@ else:
     st.markdown(f"🧮 Total Nodes: **{len(nodes)}**")
     for node_id, info in nodes.items():
         status = info['status']
-        status_icon = "🟢" if status == 'healthy' else "🔴"
+        status_icon = {'healthy': "🟢", 'suspect': "🟡"}.get(status, "🔴")
         heartbeat_time = datetime.fromisoformat(info["last_heartbeat"]).strftime("%Y-%m-%d %H:%M:%S")
         st.markdown(f"""
         {status_icon} **Node ID**: `{node_id[:8]}`
@@ -145,7 +148,7 @@ if pods:
             
             with col3:
                 st.metric(
-                    "Avg Network I/O", 
+                    "Avg I/O", 
                     f"{avg_metrics.get('network', 0):.1f} KB/s",
                     delta=None
                 )
@@ -171,10 +174,10 @@ if pods:
                 ax2.plot(memory_data, 'g-')
                 ax2.set_title('Memory Usage (MB)')
                 
-                # Plot network I/O
+                # Plot read+write I/O
                 network_data = metrics_history.get('network_io', [])
                 ax3.plot(network_data, 'r-')
-                ax3.set_title('Network I/O (KB/s)')
+                ax3.set_title('I/O (KB/s)')
                 
                 plt.tight_layout()
                 st.pyplot(fig)
@@ -219,7 +222,7 @@ if nodes:
         
         with col3:
             st.metric(
-                "Network I/O", 
+                "I/O", 
                 f"{usage_data.get('network', 0):.1f} KB/s",
                 None
             )
@@ -6,6 +6,12 @@ import time
 # Update BASE_URL to use the IP address where the server is running
 BASE_URL = 'http://127.0.0.1:5000'
 
+# `status` shows one page at a time and only the columns it prints
+STATUS_PAGE_SIZE = 20
+STATUS_NODE_FIELDS = 'status,cpu_capacity,cpu_available,pods,last_heartbeat'
+STATUS_POD_FIELDS = 'node_id,cpu_required,created_at,status'
+status_cursors = {}
+
 def check_server():
     try:
         response = requests.get(f'{BASE_URL}/cluster/status')
@@ -27,7 +33,7 @@ Commands:
 1. add-node <cpu_capacity>    - Add a new node with specified CPU capacity
 2. remove-node <node_id>      - Remove a node by ID
 3. create-pod <cpu_required>  - Create a new pod with CPU requirements
-4. status                    - Show cluster status
+4. status [more]             - Show cluster status (one page; "more" for the next page)
 5. pod-metrics <pod_id>      - Show resource usage metrics for a pod
 6. node-usage <node_id>      - Show resource usage for a node
 7. help                      - Show this help message
@@ -61,10 +67,28 @@ def create_pod(cpu_required):
     except Exception as e:
         print(f"Error: {str(e)}")
 
-def show_status():
+def show_status(more=False):
+    params = {
+        'limit': STATUS_PAGE_SIZE,
+        'node_fields': STATUS_NODE_FIELDS,
+        'pod_fields': STATUS_POD_FIELDS
+    }
+    if more:
+        if not status_cursors:
+            print("No more results.")
+            return
+        params.update(status_cursors)
     try:
-        response = requests.get(f'{BASE_URL}/cluster/status')
-        print(json.dumps(response.json(), indent=2))
+        response = requests.get(f'{BASE_URL}/cluster/status', params=params)
+        data = response.json()
+        status_cursors.clear()
+        for key in ('node_cursor', 'pod_cursor'):
+            cursor = data.pop(f'next_{key}', None)
+            if cursor:
+                status_cursors[key] = cursor
+        print(json.dumps(data, indent=2))
+        if status_cursors:
+            print("More results available, type 'status more' to see the next page.")
     except requests.exceptions.ConnectionError:
         print("Error: Cannot connect to the API server. Is it running?")
     except Exception as e:
@@ -86,7 +110,7 @@ def show_pod_metrics(pod_id):
         averages = data.get('averages', {})
         print(f"Average CPU Usage:    {averages.get('cpu', 0):.2f}%")
         print(f"Average Memory Usage: {averages.get('memory', 0):.2f} MB")
-        print(f"Average Network I/O:  {averages.get('network', 0):.2f} KB/s")
+        print(f"Average I/O:          {averages.get('network', 0):.2f} KB/s")
         
         # Show latest metrics if available
         metrics = data.get('metrics', {})
@@ -94,7 +118,7 @@ def show_pod_metrics(pod_id):
             print("\nCurrent Metrics:")
             print(f"CPU Usage:    {metrics['cpu_usage'][-1]:.2f}%")
             print(f"Memory Usage: {metrics['memory_usage'][-1]:.2f} MB")
-            print(f"Network I/O:  {metrics['network_io'][-1]:.2f} KB/s")
+            print(f"I/O:          {metrics['network_io'][-1]:.2f} KB/s")
             
     except requests.exceptions.ConnectionError:
         print("Error: Cannot connect to the API server. Is it running?")
@@ -123,7 +147,7 @@ def show_node_resource_usage(node_id):
         
         print(f"CPU Usage:      {cpu_usage:.2f}/{cpu_capacity} cores ({cpu_percent:.2f}%)")
         print(f"Memory Usage:   {usage.get('memory', 0):.2f} MB")
-        print(f"Network I/O:    {usage.get('network', 0):.2f} KB/s")
+        print(f"I/O:            {usage.get('network', 0):.2f} KB/s")
         print(f"Pods Running:   {usage.get('pod_count', 0)}")
             
     except requests.exceptions.ConnectionError:
@@ -156,7 +180,7 @@ def main():
             elif cmd == 'help':
                 print_help()
             elif cmd == 'status':
-                show_status()
+                show_status(more=len(command) == 2 and command[1].lower() == 'more')
             elif cmd == 'add-node' and len(command) == 2:
                 add_node(command[1])
             elif cmd == 'remove-node' and len(command) == 2:
@@ -0,0 +1,105 @@
+"""Clocks for the health checks and the heartbeat simulator.
+
+CLOCK_MODE picks one: 'real' wall-clock time, 'scaled' time running
+CLOCK_SCALE times faster, or 'manual' time that only moves when advanced
+(POST /clock/advance), so long failure scenarios can run in moments.
+"""
+import threading
+import time
+from datetime import datetime
+
+class RealClock:
+    mode = 'real'
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+    def now(self):
+        return datetime.fromtimestamp(self.time())
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, condition, timeout=None):
+        """Wait on a held threading.Condition for up to timeout clock seconds"""
+        return condition.wait(timeout)
+
+class ScaledClock(RealClock):
+    mode = 'scaled'
+
+    def __init__(self, scale):
+        if scale <= 0:
+            raise ValueError('Clock scale must be positive')
+        self.scale = scale
+        self.start = time.time()
+        self.real_start = time.monotonic()
+
+    def monotonic(self):
+        return (time.monotonic() - self.real_start) * self.scale
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.scale)
+
+    def wait(self, condition, timeout=None):
+        return condition.wait(None if timeout is None else timeout / self.scale)
+
+class ManualClock(RealClock):
+    mode = 'manual'
+
+    def __init__(self):
+        self.start = time.time()
+        self.elapsed = 0.0
+        self.advanced = threading.Condition()
+        self.waiters = set()
+
+    def monotonic(self):
+        with self.advanced:
+            return self.elapsed
+
+    def time(self):
+        return self.start + self.monotonic()
+
+    def advance(self, seconds):
+        """Move the clock forward and wake everything waiting on it"""
+        if seconds < 0:
+            raise ValueError('A clock cannot go backwards')
+        with self.advanced:
+            self.elapsed += seconds
+            self.advanced.notify_all()
+            waiters = list(self.waiters)
+        for condition in waiters:
+            with condition:
+                condition.notify_all()
+        return self.time()
+
+    def sleep(self, seconds):
+        with self.advanced:
+            deadline = self.elapsed + seconds
+            while self.elapsed < deadline:
+                self.advanced.wait()
+
+    def wait(self, condition, timeout=None):
+        # Also wake now and then, in case the clock moved after the caller
+        # computed timeout but before it started waiting
+        with self.advanced:
+            self.waiters.add(condition)
+        try:
+            return condition.wait(None if timeout is None else 0.1)
+        finally:
+            with self.advanced:
+                self.waiters.discard(condition)
+
+def make_clock(mode='real', scale=1.0):
+    if mode == 'real':
+        return RealClock()
+    if mode == 'scaled':
+        return ScaledClock(scale)
+    if mode == 'manual':
+        return ManualClock()
+    raise ValueError(f'Unknown clock mode: {mode}')
@@ -0,0 +1,71 @@
+"""Phi-accrual failure detection for the health checks.
+
+Each node's heartbeat inter-arrival times are kept as an exponentially
+weighted mean and variance, three numbers per node. The silence since its
+last heartbeat becomes phi = -log10(P(the heartbeat is merely late)):
+phi 3 means a 0.1% chance the node is only slow. A node is suspect (no new
+pods) from suspect_threshold and unhealthy (pods rescheduled) from
+failed_threshold, so a node on a steady network is caught a few seconds
+after its usual interval, while one that has shown pauses before gets
+room for them.
+"""
+import math
+import threading
+
+class PhiAccrualDetector:
+    def __init__(self, suspect_threshold=3.0, failed_threshold=8.0, alpha=0.03, min_std=0.2, min_std_ratio=0.1,
+                 acceptable_pause=3.0, first_interval=5.0):
+        self.suspect_threshold = suspect_threshold
+        self.failed_threshold = failed_threshold
+        self.alpha = alpha  # weight of the newest inter-arrival time
+        self.min_std = min_std  # seconds
+        self.min_std_ratio = min_std_ratio  # standard deviation floor as a share of the mean
+        self.acceptable_pause = acceptable_pause  # seconds of extra silence tolerated on top of the mean
+        self.first_interval = first_interval  # assumed mean until a node has sent two heartbeats
+        self.lock = threading.Lock()
+        self.arrivals = {}  # node_id -> [last arrival, mean interval, interval variance]
+
+    def heartbeat(self, node_id, now):
+        """Record a heartbeat arrival at clock time `now` (seconds)"""
+        with self.lock:
+            entry = self.arrivals.get(node_id)
+            if entry is None:
+                self.arrivals[node_id] = [now, self.first_interval, (self.first_interval / 4) ** 2]
+                return
+            interval = now - entry[0]
+            if interval <= 0:
+                return
+            diff = interval - entry[1]
+            entry[1] += self.alpha * diff
+            entry[2] = (1 - self.alpha) * (entry[2] + self.alpha * diff * diff)
+            entry[0] = now
+
+    def forget(self, node_id):
+        with self.lock:
+            self.arrivals.pop(node_id, None)
+
+    def phi(self, node_id, now):
+        """Suspicion level of a node, None if it never sent a heartbeat"""
+        with self.lock:
+            entry = self.arrivals.get(node_id)
+            if entry is None:
+                return None
+            last, mean, variance = entry
+        std = max(math.sqrt(variance), self.min_std, self.min_std_ratio * mean)
+        # Logistic approximation of the normal CDF; y is clamped to keep exp() in range
+        y = min(10.0, max(-10.0, (now - last - mean - self.acceptable_pause) / std))
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if y > 0:
+            return -math.log10(e / (1.0 + e))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def classify(self, node_id, now):
+        """'healthy', 'suspect' or 'unhealthy' by phi; None if the node never sent a heartbeat"""
+        phi = self.phi(node_id, now)
+        if phi is None:
+            return None
+        if phi >= self.failed_threshold:
+            return 'unhealthy'
+        if phi >= self.suspect_threshold:
+            return 'suspect'
+        return 'healthy'
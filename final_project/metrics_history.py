@@ -0,0 +1,318 @@
+"""Tiered, disk-backed history of node and cluster resource usage.
+
+Pods keep only their last 100 samples. The resource monitoring thread also
+hands each round's per-node usage to MetricsHistory, which keeps it in three
+tiers:
+
+    raw   the last raw_seconds of samples, in a fixed-size ring per series
+    1m    per series and minute, the min, max, mean and p95 of each metric
+    1h    the same per hour, computed from the hour's raw samples
+
+Finished minutes and hours are appended as 64-byte records to segment files
+under directory/1m and directory/1h. Each tier starts a new segment every
+segment_bytes and deletes its oldest ones beyond max_bytes. Records are
+sorted by (bucket, series), so range reads binary search the mapped
+segments and unpack only the records asked for. Series ids are numbered in
+directory/series.txt; a series unsampled for the raw window whose rollups
+have all been deleted gives its number back for reuse.
+"""
+import heapq
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('cpu', 'memory', 'network')
+STATS = ('min', 'max', 'mean', 'p95')
+CLUSTER_SERIES = 'cluster'
+
+# bucket start, series number, sample count, then min/max/mean/p95 of each metric
+RECORD = struct.Struct('<dII12f')
+KEY = struct.Struct('<dI')
+LAST_SERIES = 2 ** 32 - 1
+
+def rollup(samples):
+    """Count, then min/max/mean/p95 of each metric of [(cpu, memory, network), ...]"""
+    stats = [len(samples)]
+    for column in zip(*samples):
+        ordered = sorted(column)
+        stats += [ordered[0], ordered[-1], sum(ordered) / len(ordered),
+                  ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]]
+    return stats
+
+class SampleRing:
+    """The last `capacity` samples of one series, in preallocated arrays"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = array('d', bytes(8 * capacity))
+        self.values = array('f', bytes(4 * len(METRICS) * capacity))
+        self.next = 0
+        self.count = 0
+
+    def append(self, timestamp, values):
+        self.times[self.next] = timestamp
+        base = self.next * len(METRICS)
+        self.values[base:base + len(METRICS)] = array('f', values)
+        self.next = (self.next + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def last_time(self):
+        return self.times[(self.next - 1) % self.capacity] if self.count else None
+
+    def between(self, start, end):
+        """(time, values) samples with start <= time < end, oldest first"""
+        found = []
+        for i in range(self.count):
+            slot = (self.next - 1 - i) % self.capacity
+            timestamp = self.times[slot]
+            if timestamp < start:
+                break
+            if timestamp < end:
+                base = slot * len(METRICS)
+                found.append((timestamp, tuple(self.values[base:base + len(METRICS)])))
+        found.reverse()
+        return found
+
+class RollupTier:
+    """Append-only segment files of rollup records, bounded to max_bytes on disk"""
+
+    def __init__(self, directory, width, segment_bytes, max_bytes):
+        self.directory = directory
+        self.width = width
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # Segments are named after their first bucket, so sorting by name sorts by time
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(directory) if name.endswith('.seg'))
+        self.maps = {}  # segment -> (mapped size, mmap)
+        self.active = None
+        self.last_bucket = None
+        if self.segments:
+            path = self._path(self.segments[-1])
+            size = os.path.getsize(path)
+            usable = size - size % RECORD.size  # drop a record torn by a crash
+            if usable != size:
+                os.truncate(path, usable)
+            if usable:
+                with open(path, 'rb') as f:
+                    f.seek(usable - RECORD.size)
+                    self.last_bucket = KEY.unpack(f.read(KEY.size))[0]
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f'{segment:012d}.seg')
+
+    def append(self, bucket, records):
+        """Append the packed records of one bucket, which must be later than the last one"""
+        if self.last_bucket is not None and bucket <= self.last_bucket:
+            logger.warning(f'Dropping {len(records)} rollups for {bucket}, not after the last one')
+            return False
+        data = b''.join(records)
+        if self.active is None or self.active.tell() + len(data) > self.segment_bytes:
+            if self.active is not None:
+                self.active.close()
+            if not self.segments or os.path.getsize(self._path(self.segments[-1])) + len(data) > self.segment_bytes:
+                self.segments.append(int(bucket))
+            self.active = open(self._path(self.segments[-1]), 'ab')
+        self.active.write(data)
+        self.active.flush()
+        self.last_bucket = bucket
+        while len(self.segments) > 1 and self.size() > self.max_bytes:
+            segment = self.segments.pop(0)
+            mapped = self.maps.pop(segment, None)
+            if mapped is not None:
+                mapped[1].close()
+            os.remove(self._path(segment))
+        return True
+
+    def size(self):
+        return sum(os.path.getsize(self._path(segment)) for segment in self.segments)
+
+    def oldest_bucket(self):
+        """Bucket of the oldest record still on disk, None while the tier is empty"""
+        for segment in self.segments:
+            path = self._path(segment)
+            if os.path.getsize(path) >= RECORD.size:
+                with open(path, 'rb') as f:
+                    return KEY.unpack(f.read(KEY.size))[0]
+        return None
+
+    def _map(self, segment):
+        """The segment's mmap, remapped when it has grown; None while it is empty"""
+        size = os.path.getsize(self._path(segment))
+        size -= size % RECORD.size
+        mapped = self.maps.get(segment)
+        if mapped is not None and mapped[0] == size:
+            return mapped[1]
+        if mapped is not None:
+            mapped[1].close()
+            del self.maps[segment]
+        if size == 0:
+            return None
+        with open(self._path(segment), 'rb') as f:
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        self.maps[segment] = (size, mm)
+        return mm
+
+    def read(self, series, start, end):
+        """Unpacked records of one series with start <= bucket < end"""
+        found = []
+        first = max(0, bisect_right(self.segments, start) - 1)
+        for segment in self.segments[first:]:
+            if segment >= end:
+                break
+            mm = self._map(segment)
+            if mm is None:
+                continue
+            count = len(mm) // RECORD.size
+            position = self._bisect(mm, 0, count, (start, 0))
+            # Per bucket, jump to the series' record, then past the bucket
+            while position < count:
+                bucket = KEY.unpack_from(mm, position * RECORD.size)[0]
+                if bucket >= end:
+                    break
+                hit = self._bisect(mm, position, count, (bucket, series))
+                if hit < count and KEY.unpack_from(mm, hit * RECORD.size) == (bucket, series):
+                    found.append(RECORD.unpack_from(mm, hit * RECORD.size))
+                position = self._bisect(mm, hit, count, (bucket, LAST_SERIES))
+        return found
+
+    @staticmethod
+    def _bisect(mm, lo, hi, key):
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if KEY.unpack_from(mm, mid * RECORD.size) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+class MetricsHistory:
+    def __init__(self, directory, sample_interval=3, raw_seconds=3600, minute_max_bytes=256 * 2 ** 20,
+                 hour_max_bytes=64 * 2 ** 20, segment_bytes=16 * 2 ** 20):
+        self.directory = directory
+        self.raw_seconds = max(raw_seconds, 3600)  # hourly rollups are computed from the raw samples
+        # A full hour plus the sample that closes it, with 5% for early wakeups
+        self.ring_capacity = math.ceil(1.05 * self.raw_seconds / sample_interval) + 2
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.tiers = {
+            '1m': RollupTier(os.path.join(directory, '1m'), 60, segment_bytes, minute_max_bytes),
+            '1h': RollupTier(os.path.join(directory, '1h'), 3600, segment_bytes, hour_max_bytes)
+        }
+        self.series_path = os.path.join(directory, 'series.txt')
+        self.series_ids = []  # '' marks a retired number
+        if os.path.exists(self.series_path):
+            with open(self.series_path) as f:
+                self.series_ids = [line.rstrip('\n') for line in f]
+        self.series_numbers = {series: number for number, series in enumerate(self.series_ids) if series}
+        self.free_numbers = [number for number, series in enumerate(self.series_ids) if not series]
+        # Newest rollup bucket per series; series loaded from disk may reach the newest bucket on disk
+        newest = max((tier.last_bucket for tier in self.tiers.values() if tier.last_bucket is not None), default=None)
+        self.last_rollups = dict.fromkeys(self.series_numbers.values(), newest)
+        self.rings = {}  # series number -> SampleRing
+        self.open_buckets = {'1m': None, '1h': None}
+
+    def record(self, now, usage):
+        """Add one round of samples, usage = {node_id: (cpu, memory, network)}, plus the cluster total"""
+        with self.lock:
+            for name, tier in self.tiers.items():
+                bucket = now // tier.width * tier.width
+                if self.open_buckets[name] is not None and bucket > self.open_buckets[name]:
+                    self._close_bucket(tier, self.open_buckets[name])
+                    if name == '1h':
+                        self._retire_series()
+                self.open_buckets[name] = bucket
+
+            totals = [sum(values[i] for values in usage.values()) for i in range(len(METRICS))]
+            sampled = set()
+            for series, values in [(CLUSTER_SERIES, totals)] + list(usage.items()):
+                number = self.series_numbers.get(series)
+                if number is None:
+                    if self.free_numbers:
+                        number = heapq.heappop(self.free_numbers)
+                        self.series_ids[number] = series
+                        self._write_series()
+                    else:
+                        number = len(self.series_ids)
+                        self.series_ids.append(series)
+                        with open(self.series_path, 'a') as f:
+                            f.write(series + '\n')
+                    self.series_numbers[series] = number
+                if number not in self.rings:
+                    self.rings[number] = SampleRing(self.ring_capacity)
+                self.rings[number].append(now, values)
+                sampled.add(number)
+            # Nodes gone for longer than the raw window give their ring back
+            for number in [n for n, ring in self.rings.items()
+                           if n not in sampled and ring.last_time() < now - self.raw_seconds]:
+                del self.rings[number]
+
+    def _close_bucket(self, tier, bucket):
+        # Series numbers ascend, keeping the segment in (bucket, series) order
+        records = []
+        numbers = []
+        for number in sorted(self.rings):
+            samples = self.rings[number].between(bucket, bucket + tier.width)
+            if samples:
+                records.append(RECORD.pack(bucket, number, *rollup([values for _, values in samples])))
+                numbers.append(number)
+        if records and tier.append(bucket, records):
+            for number in numbers:
+                last = self.last_rollups.get(number)
+                self.last_rollups[number] = bucket if last is None else max(last, bucket)
+
+    def _retire_series(self):
+        # Series without a ring whose last rollup every tier has deleted give their number back
+        oldest = min((bucket for bucket in (tier.oldest_bucket() for tier in self.tiers.values())
+                      if bucket is not None), default=None)
+        retired = [(series, number) for series, number in self.series_numbers.items()
+                   if number not in self.rings and (
+                       self.last_rollups.get(number) is None or oldest is None or self.last_rollups[number] < oldest)]
+        if not retired:
+            return
+        for series, number in retired:
+            del self.series_numbers[series]
+            self.last_rollups.pop(number, None)
+            self.series_ids[number] = ''
+        while self.series_ids and not self.series_ids[-1]:
+            self.series_ids.pop()
+        self.free_numbers = [number for number, series in enumerate(self.series_ids) if not series]
+        self._write_series()
+        logger.info(f'Retired {len(retired)} metrics history series')
+
+    def _write_series(self):
+        # Replace the file whole, so a crash leaves either numbering intact
+        partial = self.series_path + '.tmp'
+        with open(partial, 'w') as f:
+            f.writelines(series + '\n' for series in self.series_ids)
+        os.replace(partial, self.series_path)
+
+    def query(self, series, start, end, resolution):
+        """Points of one series with start <= time < end at 'raw', '1m' or '1h' resolution"""
+        if resolution not in ('raw', '1m', '1h'):
+            raise ValueError(f'Unknown resolution {resolution}, use raw, 1m or 1h')
+        with self.lock:
+            number = self.series_numbers.get(series)
+            if number is None:
+                return []
+            if resolution == 'raw':
+                ring = self.rings.get(number)
+                return [dict(zip(METRICS, (round(v, 4) for v in values)), time=timestamp)
+                        for timestamp, values in (ring.between(start, end) if ring else [])]
+            # Include the bucket that start falls in
+            tier = self.tiers[resolution]
+            records = tier.read(number, start // tier.width * tier.width, end)
+        points = []
+        for record in records:
+            point = {'time': record[0], 'samples': record[2]}
+            for i, metric in enumerate(METRICS):
+                point[metric] = {stat: round(record[3 + 4 * i + j], 4) for j, stat in enumerate(STATS)}
+            points.append(point)
+        return points
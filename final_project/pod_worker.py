@@ -0,0 +1,52 @@
+"""Simulated pod workload, run by the API server as one child process per requested core.
+
+A worker keeps a share of a core busy, holds some memory and writes a little
+to a scratch file, so the usage the resource monitor reads from /proc is real.
+"""
+import os
+import sys
+import tempfile
+import time
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def read_proc_counters(pid):
+    """Return (cpu_seconds, rss_bytes, io_bytes) of a process, or None if it is gone"""
+    try:
+        with open(f'/proc/{pid}/stat', 'rb') as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # Fields after the parenthesised command name, which may contain spaces
+    fields = stat[stat.rindex(b')') + 2:].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    rss_bytes = int(fields[21]) * PAGE_SIZE
+    io_bytes = 0
+    try:
+        with open(f'/proc/{pid}/io', 'rb') as f:
+            for line in f:
+                if line.startswith((b'rchar:', b'wchar:')):
+                    io_bytes += int(line.split()[1])
+    except OSError:
+        pass
+    return cpu_seconds, rss_bytes, io_bytes
+
+def run_worker(duty, memory_mb, period=0.1):
+    """Burn duty of a core, hold memory_mb and do some I/O until the parent exits"""
+    parent = os.getppid()
+    ballast = bytearray(int(memory_mb * 1024 * 1024))
+    for i in range(0, len(ballast), PAGE_SIZE):
+        ballast[i] = 1  # touch every page so it counts towards RSS
+    busy = max(0.0, min(duty, 1.0)) * period
+    with tempfile.TemporaryFile() as scratch:
+        while os.getppid() == parent:
+            deadline = time.perf_counter() + busy
+            while time.perf_counter() < deadline:
+                pass
+            scratch.seek(0)
+            scratch.write(ballast[:4096])
+            time.sleep(period - busy)
+
+if __name__ == '__main__':
+    run_worker(float(sys.argv[1]), float(sys.argv[2]))
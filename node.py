@@ -1,30 +1,65 @@
 import requests
+import socket
+import struct
 import time
 import os
 
 NODE_ID = os.getenv("NODE_ID", "default_node")
 CPU_CORES = int(os.getenv("CPU_CORES", "2"))
 API_SERVER = "http://apiserver:5000"
+API_SERVER_HOST = "apiserver"
+# With UDP heartbeats, every Nth heartbeat still goes over HTTP to notice a server that forgot this node
+HTTP_HEARTBEAT_EVERY = 6
+HEARTBEAT_HEADER = struct.Struct("!2sBBIIH")  # same format as APIServer.py
+
+udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+udp = {}  # handle, port and seq when the API server accepts UDP heartbeats
+heartbeat = {"interval": 10}  # seconds, until the API server tells us otherwise
+
+def register():
+    try:
+        res = requests.post(f"{API_SERVER}/register_node", json={
+            "node_id": NODE_ID,
+            "cpu_cores": CPU_CORES
+        }, timeout=5)
+        body = res.json()
+        heartbeat["interval"] = body.get("heartbeat_interval", heartbeat["interval"])
+        udp.clear()
+        if body.get("udp_port"):
+            udp.update(handle=body["heartbeat_handle"], port=body["udp_port"], seq=0)
+        print(f"✅ Registered node {NODE_ID}: {body}", flush=True)
+    except Exception as e:
+        print(f"❌ Failed to register node {NODE_ID}: {e}", flush=True)
+
+def send_udp_heartbeat():
+    udp["seq"] = (udp["seq"] + 1) & 0xFFFFFFFF
+    try:
+        udp_sock.sendto(HEARTBEAT_HEADER.pack(b"HB", 1, 0, udp["handle"], udp["seq"], 0),
+                        (API_SERVER_HOST, udp["port"]))
+        return True
+    except OSError as e:
+        print(f"❌ UDP heartbeat failed from {NODE_ID}, using HTTP: {e}", flush=True)
+        return False
 
 # Register the node first
-try:
-    res = requests.post(f"{API_SERVER}/register_node", json={
-        "node_id": NODE_ID,
-        "cpu_cores": CPU_CORES
-    }, timeout=5)
-    print(f"✅ Registered node {NODE_ID}: {res.json()}", flush=True)
-except Exception as e:
-    print(f"❌ Failed to register node {NODE_ID}: {e}", flush=True)
+register()
 
 # Send heartbeat in a loop
+beats = 0
 while True:
+    beats += 1
+    if udp and beats % HTTP_HEARTBEAT_EVERY and send_udp_heartbeat():
+        time.sleep(heartbeat["interval"])
+        continue
     try:
         response = requests.post(f"{API_SERVER}/send_heartbeat", json={"node_id": NODE_ID}, timeout=5)
         print(f"✅ Heartbeat sent from {NODE_ID}: {response.json()}", flush=True)
+        heartbeat["interval"] = response.json().get("heartbeat_interval", heartbeat["interval"])
+        if response.status_code == 400 and "not registered" in response.text:
+            register()
     except requests.ConnectionError:
         print(f"❌ API server is down. {NODE_ID} retrying...", flush=True)
     except Exception as e:
         print(f"❌ Error sending heartbeat from {NODE_ID}: {e}", flush=True)
 
-    time.sleep(10)
-
+    time.sleep(heartbeat["interval"])